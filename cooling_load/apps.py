@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class CoolingLoadConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cooling_load'
+
+    def ready(self):
+        from .models import Commodity
+        from .products import invalidate_catalog
+        post_save.connect(invalidate_catalog, sender=Commodity, dispatch_uid='commodity_saved')
+        post_delete.connect(invalidate_catalog, sender=Commodity, dispatch_uid='commodity_deleted')
@@ -0,0 +1,134 @@
+import numpy as np
+import time
+from typing import Dict, Optional
+from core import metrics
+from .models import CoolingLoadResult
+from .products import ProductCatalog
+
+# Load equation constants
+U_VALUE = 0.4
+# Product specific heat (kJ/kg.K) and respiration (W/kg) when no product catalog values are given
+PRODUCT_SPECIFIC_HEAT = 3.5
+PERSON_HEAT = 120
+AIR_CHANGES = 0.5
+AIR_DENSITY = 1.2
+AIR_SPECIFIC_HEAT = 1.0
+RESPIRATION_RATE = 0.02
+SAFETY_FACTOR = 1.15
+
+# Project fields used by the load equations
+INPUT_FIELDS = [
+    'length', 'width', 'height', 'outdoor_temp', 'indoor_temp',
+    'product_mass', 'daily_product_input', 'number_of_workers',
+    'working_hours', 'lighting_power', 'fan_power',
+]
+
+LOAD_ROOMS = metrics.counter('cooling_load_rooms_total', 'Rooms evaluated by cooling load computations',
+                             ['computation'])
+LOAD_SECONDS = metrics.histogram('cooling_load_seconds', 'Time of one cooling load computation', ['computation'])
+
+LOAD_COMPONENTS = [
+    'transmission_load', 'product_load', 'internal_load',
+    'infiltration_load', 'respiration_load',
+]
+
+
+def calculate_loads(length, width, height, outdoor_temp, indoor_temp,
+                    product_mass, daily_product_input, number_of_workers,
+                    working_hours, lighting_power, fan_power, specific_heat=PRODUCT_SPECIFIC_HEAT,
+                    respiration_rate=RESPIRATION_RATE, **kwargs) -> Dict:
+    """Calculate cooling loads (W) for scalars or numpy arrays of inputs
+
+    specific_heat (kJ/kg.K) and respiration_rate (W/kg) are the stored
+    product's at the indoor temperature, as given by project_inputs.
+    """
+    start = time.perf_counter()
+    length = np.asarray(length, dtype=float)
+    width = np.asarray(width, dtype=float)
+    height = np.asarray(height, dtype=float)
+
+    # Transmission load
+    area = 2 * (length * width + length * height + width * height)
+    temp_diff = np.asarray(outdoor_temp, dtype=float) - np.asarray(indoor_temp, dtype=float)
+    transmission_load = area * U_VALUE * temp_diff
+
+    # Product load
+    product_load = np.asarray(daily_product_input, dtype=float) * np.asarray(specific_heat, dtype=float) / 24
+
+    # Internal load
+    people_load = np.asarray(number_of_workers, dtype=float) * PERSON_HEAT * (np.asarray(working_hours, dtype=float) / 24)
+    internal_load = people_load + np.asarray(lighting_power, dtype=float) + np.asarray(fan_power, dtype=float)
+
+    # Infiltration load
+    volume = length * width * height
+    infiltration_load = volume * AIR_CHANGES * AIR_DENSITY * AIR_SPECIFIC_HEAT * temp_diff / 3600
+
+    # Respiration load
+    respiration_load = np.asarray(product_mass, dtype=float) * np.asarray(respiration_rate, dtype=float)
+
+    total_load = transmission_load + product_load + internal_load + infiltration_load + respiration_load
+    design_load = total_load * SAFETY_FACTOR
+
+    LOAD_SECONDS.labels('steady').observe(time.perf_counter() - start)
+    LOAD_ROOMS.labels('steady').inc(np.size(design_load))
+    return {
+        'transmission_load': transmission_load,
+        'product_load': product_load,
+        'internal_load': internal_load,
+        'infiltration_load': infiltration_load,
+        'respiration_load': respiration_load,
+        'total_load': total_load,
+        'design_load': design_load,
+    }
+
+
+def project_inputs(projects, catalog: Optional[ProductCatalog] = None) -> Dict:
+    """Load equation inputs of a sequence of projects, one array per input
+
+    Product properties come from the catalog in one lookup for all projects.
+    """
+    inputs = {
+        field: np.array([getattr(project, field) for project in projects], dtype=float)
+        for field in INPUT_FIELDS
+    }
+    catalog = catalog or ProductCatalog.get()
+    inputs.update(catalog.load_inputs(catalog.codes(projects), inputs['indoor_temp']))
+    return inputs
+
+
+def calculate_project_loads(project, catalog: Optional[ProductCatalog] = None) -> Dict:
+    """Calculate cooling loads for a single ColdStorageProject
+
+    With a catalog given no queries are made, so the loads can be computed
+    off the request thread.
+    """
+    loads = calculate_loads(**project_inputs([project], catalog))
+    return {key: float(value[0]) for key, value in loads.items()}
+
+
+def calculate_projects_loads(projects) -> Dict:
+    """Calculate cooling loads for a sequence of projects in one vectorized pass"""
+    return calculate_loads(**project_inputs(projects))
+
+
+def build_results(projects):
+    """Build unsaved CoolingLoadResult rows for a sequence of projects"""
+    projects = list(projects)
+    if not projects:
+        return []
+
+    inputs = project_inputs(projects)
+    loads = calculate_loads(**inputs)
+    results = []
+    for i, project in enumerate(projects):
+        values = {key: float(value[i]) for key, value in loads.items()}
+        details = {field: getattr(project, field) for field in INPUT_FIELDS}
+        details['specific_heat'] = float(inputs['specific_heat'][i])
+        details['respiration_rate'] = float(inputs['respiration_rate'][i])
+        results.append(CoolingLoadResult(
+            project=project,
+            safety_factor=SAFETY_FACTOR,
+            calculation_details={'inputs': details},
+            **values
+        ))
+    return results
@@ -0,0 +1,6 @@
+from django import forms
+
+
+class ProjectImportForm(forms.Form):
+    file = forms.FileField(help_text='CSV or XLSX file with one project per row')
+    chunk_size = forms.IntegerField(min_value=1, max_value=5000, initial=500, required=False)
@@ -0,0 +1,202 @@
+import csv
+import io
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .calculations import build_results
+from .models import ColdStorageProject, Commodity, CoolingLoadResult
+from .products import PROPERTY_FIELDS
+
+IMPORT_FIELDS = [
+    'name', 'storage_type', 'length', 'width', 'height',
+    'outdoor_temp', 'outdoor_humidity', 'indoor_temp', 'indoor_humidity',
+    'insulation_type', 'insulation_thickness', 'product_mass',
+    'daily_product_input', 'number_of_workers', 'working_hours',
+    'lighting_power', 'fan_power', 'door_openings'
+]
+
+COMMODITY_FIELDS = ['name'] + PROPERTY_FIELDS
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+class ImportReport:
+    """Outcome of a project import: created count and per-row errors"""
+
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+    @property
+    def total(self):
+        return self.created + self.failed
+
+    def add_error(self, row_number: int, errors: Dict):
+        self.errors.append({'row': row_number, 'errors': errors})
+
+
+def read_csv_rows(file) -> Iterator[Tuple[int, Dict]]:
+    """Yield (row number, row dict) from a CSV file opened in binary or text mode"""
+    if isinstance(file.read(0), bytes):
+        file = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(file)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_xlsx_rows(file) -> Iterator[Tuple[int, Dict]]:
+    """Yield (row number, row dict) from the first sheet of an XLSX workbook"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("openpyxl is required to import XLSX files")
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [str(cell).strip() if cell is not None else '' for cell in header]
+        for row_number, values in enumerate(rows, start=2):
+            if all(value is None for value in values):
+                continue
+            yield row_number, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def read_rows(file, filename: str) -> Iterator[Tuple[int, Dict]]:
+    """Pick a row reader from the file extension"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.csv':
+        return read_csv_rows(file)
+    if extension in ('.xlsx', '.xlsm'):
+        return read_xlsx_rows(file)
+    raise ValueError(f"Unsupported file type: {extension or filename}")
+
+
+def build_project(row: Dict, commodities: Optional[Dict[str, Commodity]] = None) -> Tuple[ColdStorageProject, Dict]:
+    """Build a project from a row and validate it against the model validators
+
+    An optional commodity column names the stored product among commodities.
+    """
+    values = {}
+    for field in IMPORT_FIELDS:
+        value = row.get(field)
+        if isinstance(value, str):
+            value = value.strip()
+            if value == '':
+                value = None
+        values[field] = value
+
+    errors = {}
+    commodity = str(row.get('commodity') or '').strip()
+    if commodity:
+        values['commodity'] = (commodities or {}).get(commodity)
+        if values['commodity'] is None:
+            errors['commodity'] = [f"Unknown commodity: {commodity}"]
+
+    project = ColdStorageProject(**values)
+    try:
+        project.full_clean(validate_unique=False, validate_constraints=False)
+    except ValidationError as e:
+        errors = {**e.message_dict, **errors}
+    return project, errors
+
+
+def save_chunk(projects: List[ColdStorageProject]):
+    """Insert a chunk of validated projects and their computed results"""
+    with transaction.atomic():
+        ColdStorageProject.objects.bulk_create(projects)
+        CoolingLoadResult.objects.bulk_create(build_results(projects))
+
+
+def import_projects(rows, chunk_size: int = DEFAULT_CHUNK_SIZE) -> ImportReport:
+    """Validate, insert and compute results for projects from (row number, row) pairs"""
+    report = ImportReport()
+    chunk = []
+    commodities = {commodity.name: commodity for commodity in Commodity.objects.all()}
+
+    for row_number, row in rows:
+        project, errors = build_project(row, commodities)
+        if errors:
+            report.add_error(row_number, errors)
+            continue
+
+        chunk.append(project)
+        if len(chunk) >= chunk_size:
+            save_chunk(chunk)
+            report.created += len(chunk)
+            chunk = []
+
+    if chunk:
+        save_chunk(chunk)
+        report.created += len(chunk)
+
+    return report
+
+
+def parse_respiration(value) -> List[List[float]]:
+    """Read respiration points written as 'temperature:rate' pairs separated by semicolons"""
+    if value is None or not str(value).strip():
+        return []
+    points = [[float(v) for v in point.split(':')] for point in str(value).split(';') if point.strip()]
+    if any(len(point) != 2 for point in points):
+        raise ValueError("Points must be 'temperature:rate' pairs")
+    return sorted(points)
+
+
+def build_commodity(row: Dict) -> Tuple[Commodity, Dict]:
+    """Build a commodity from an import row and validate it against the model validators"""
+    values = {}
+    for field in COMMODITY_FIELDS:
+        value = row.get(field)
+        if isinstance(value, str):
+            value = value.strip()
+            if value == '':
+                value = None
+        values[field] = value
+
+    errors = {}
+    try:
+        values['respiration'] = parse_respiration(row.get('respiration'))
+    except ValueError as e:
+        values['respiration'] = []
+        errors['respiration'] = [str(e)]
+    if any(rate < 0 for _, rate in values['respiration']):
+        errors['respiration'] = ['Respiration rates cannot be negative']
+
+    commodity = Commodity(**values)
+    try:
+        commodity.full_clean(validate_unique=False, validate_constraints=False)
+    except ValidationError as e:
+        errors = {**e.message_dict, **errors}
+    return commodity, errors
+
+
+def import_commodities(rows: Iterator[Tuple[int, Dict]]) -> ImportReport:
+    """Create or update commodities from (row number, row) pairs, keyed by name"""
+    report = ImportReport()
+    commodities = {}
+    for row_number, row in rows:
+        commodity, errors = build_commodity(row)
+        if errors:
+            report.add_error(row_number, errors)
+            continue
+        # A later row for the same commodity replaces an earlier one
+        commodities[commodity.name] = commodity
+
+    Commodity.objects.bulk_create(
+        list(commodities.values()), update_conflicts=True, unique_fields=['name'],
+        update_fields=PROPERTY_FIELDS + ['respiration', 'updated_at'],
+    )
+    report.created = len(commodities)
+    return report
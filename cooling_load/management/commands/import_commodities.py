@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cooling_load.importers import import_commodities, read_rows
+
+
+class Command(BaseCommand):
+    help = ('Import product commodities from a CSV or XLSX file with name, freezing_point (C), cp_above and '
+            'cp_below (kJ/kg.K), latent_heat (kJ/kg) and respiration columns, the latter as '
+            "'temperature:W/kg' points separated by semicolons")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file with one commodity per row')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            with open(path, 'rb') as file:
+                report = import_commodities(read_rows(file, path))
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in report.errors:
+            messages = '; '.join(
+                f"{field}: {' '.join(field_errors)}" for field, field_errors in error['errors'].items()
+            )
+            self.stderr.write(f"Row {error['row']}: {messages}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report.created} of {report.total} commodities ({report.failed} rows failed)"
+        ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cooling_load.importers import DEFAULT_CHUNK_SIZE, import_projects, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Import cold storage projects from a CSV or XLSX file and compute their cooling loads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file with one project per row')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help='Number of rows validated and inserted per batch')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            with open(path, 'rb') as file:
+                report = import_projects(read_rows(file, path), chunk_size=options['chunk_size'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in report.errors:
+            messages = '; '.join(
+                f"{field}: {' '.join(field_errors)}" for field, field_errors in error['errors'].items()
+            )
+            self.stderr.write(f"Row {error['row']}: {messages}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report.created} of {report.total} projects ({report.failed} rows failed)"
+        ))
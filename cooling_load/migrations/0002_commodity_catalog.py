@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:21
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cooling_load', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Commodity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('freezing_point', models.FloatField()),
+                ('cp_above', models.FloatField(validators=[django.core.validators.MinValueValidator(0.1)])),
+                ('cp_below', models.FloatField(validators=[django.core.validators.MinValueValidator(0.1)])),
+                ('latent_heat', models.FloatField(validators=[django.core.validators.MinValueValidator(0)])),
+                ('respiration', models.JSONField(blank=True, default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'commodities',
+            },
+        ),
+        migrations.AddField(
+            model_name='coldstorageproject',
+            name='commodity',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='projects', to='cooling_load.commodity'),
+        ),
+    ]
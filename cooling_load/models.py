@@ -3,6 +3,24 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 import uuid
 
 
+class Commodity(models.Model):
+    """Thermal and respiration properties of a stored product"""
+    name = models.CharField(max_length=100, unique=True)
+    freezing_point = models.FloatField()  # C
+    cp_above = models.FloatField(validators=[MinValueValidator(0.1)])  # kJ/kg.K, above freezing
+    cp_below = models.FloatField(validators=[MinValueValidator(0.1)])  # kJ/kg.K, below freezing
+    latent_heat = models.FloatField(validators=[MinValueValidator(0)])  # kJ/kg
+    # Respiration heat as [temperature (C), rate (W/kg)] points in increasing temperature
+    respiration = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'commodities'
+
+    def __str__(self):
+        return self.name
+
+
 class ColdStorageProject(models.Model):
     STORAGE_TYPES = [
         ('fruit', 'Fruits & Vegetables'),
@@ -23,6 +41,9 @@ class ColdStorageProject(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=200)
     storage_type = models.CharField(max_length=20, choices=STORAGE_TYPES)
+    # Stored product, the storage type's typical product when not given
+    commodity = models.ForeignKey(Commodity, on_delete=models.SET_NULL, null=True, blank=True,
+                                  related_name='projects')
 
     # Dimensions
     length = models.FloatField(validators=[MinValueValidator(1), MaxValueValidator(200)])
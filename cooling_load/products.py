@@ -0,0 +1,164 @@
+import threading
+import time
+import numpy as np
+from typing import Dict, Tuple
+
+from django.db import transaction
+from django.db.models import Count, Max
+
+from .models import Commodity
+
+# Typical product of each storage type, used for projects without a commodity: specific heat above and
+# below freezing (kJ/kg.K), initial freezing point (C), latent heat of fusion (kJ/kg) and respiration
+# heat as (temperature C, W/kg) points. Only fresh produce respires; general storage keeps a flat rate
+DEFAULT_PRODUCTS = {
+    'fruit': {'cp_above': 3.7, 'cp_below': 1.9, 'freezing_point': -1.0, 'latent_heat': 290.0,
+              'respiration': [[0, 0.012], [5, 0.022], [10, 0.04], [15, 0.06], [20, 0.09]]},
+    'meat': {'cp_above': 3.2, 'cp_below': 1.7, 'freezing_point': -1.8, 'latent_heat': 230.0, 'respiration': []},
+    'dairy': {'cp_above': 3.3, 'cp_below': 1.8, 'freezing_point': -0.6, 'latent_heat': 250.0, 'respiration': []},
+    'frozen': {'cp_above': 3.4, 'cp_below': 1.8, 'freezing_point': -2.0, 'latent_heat': 250.0, 'respiration': []},
+    'medicine': {'cp_above': 2.0, 'cp_below': 1.4, 'freezing_point': -5.0, 'latent_heat': 100.0,
+                 'respiration': []},
+    'general': {'cp_above': 2.5, 'cp_below': 1.5, 'freezing_point': -1.5, 'latent_heat': 150.0,
+                'respiration': [[0, 0.02]]},
+}
+
+PROPERTY_FIELDS = ['cp_above', 'cp_below', 'freezing_point', 'latent_heat']
+
+# Seconds a catalog is used before checking whether commodities were changed by another process
+CATALOG_TTL = 60.0
+
+_catalog = None
+_catalog_checked = 0.0
+_catalog_lock = threading.Lock()
+
+
+def _drop_catalog():
+    global _catalog
+    with _catalog_lock:
+        _catalog = None
+
+
+def invalidate_catalog(**kwargs):
+    """Drop the cached catalog; connected to saves and deletes of commodities
+
+    It is dropped again once the transaction commits, in case another
+    thread reloaded the committed rows in between.
+    """
+    _drop_catalog()
+    transaction.on_commit(_drop_catalog, using=kwargs.get('using'))
+
+
+def interpolate_curves(temps: np.ndarray, values: np.ndarray, t) -> np.ndarray:
+    """Piecewise linear interpolation of one curve per row, held constant beyond its ends
+
+    temps and values have shape (*rows, points), with temperatures
+    increasing along the last axis and shorter curves padded by repeating
+    their last point. t broadcasts against the rows.
+    """
+    t = np.asarray(t, dtype=float)
+    shape = np.broadcast_shapes(t.shape, temps.shape[:-1])
+    temps = np.broadcast_to(temps, shape + temps.shape[-1:])
+    values = np.broadcast_to(values, shape + values.shape[-1:])
+    t = np.broadcast_to(t, shape)[..., None]
+    # Index of the first point above t, so each t falls on the segment ending there
+    upper = np.clip(np.count_nonzero(temps <= t, axis=-1), 1, temps.shape[-1] - 1)[..., None]
+    t0, t1 = np.take_along_axis(temps, upper - 1, -1), np.take_along_axis(temps, upper, -1)
+    v0, v1 = np.take_along_axis(values, upper - 1, -1), np.take_along_axis(values, upper, -1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = np.where(t1 > t0, np.clip((t - t0) / (t1 - t0), 0, 1), 0.0)
+    return (v0 + weight * (v1 - v0))[..., 0]
+
+
+class ProductCatalog:
+    """Product properties of every commodity and storage type default, indexed for array lookups
+
+    Rows are addressed by integer codes: projects map to their commodity's
+    row, or to their storage type's default product, and lookups for any
+    number of codes and temperatures are single array operations.
+    Respiration curves are padded to a common length so they interpolate
+    together.
+    """
+
+    def __init__(self, products: Dict, version=None):
+        self.keys = list(products)
+        self.index = {key: row for row, key in enumerate(self.keys)}
+        self.version = version
+        for field in PROPERTY_FIELDS:
+            setattr(self, field, np.array([products[key][field] for key in self.keys], dtype=float))
+
+        points = max([len(product['respiration']) for product in products.values()] + [2])
+        self.respiration_temps = np.zeros((len(self.keys), points))
+        self.respiration_rates = np.zeros((len(self.keys), points))
+        for row, key in enumerate(self.keys):
+            curve = np.asarray(products[key]['respiration'], dtype=float).reshape(-1, 2)
+            if len(curve):
+                curve = curve[np.argsort(curve[:, 0], kind='stable')]
+                self.respiration_temps[row, :len(curve)], self.respiration_rates[row, :len(curve)] = curve.T
+                self.respiration_temps[row, len(curve):], self.respiration_rates[row, len(curve):] = curve[-1]
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_commodities(cls, commodities, version=None) -> 'ProductCatalog':
+        """The storage type defaults followed by commodities, keyed by primary key"""
+        products = dict(DEFAULT_PRODUCTS)
+        for commodity in commodities:
+            products[commodity.pk] = {field: getattr(commodity, field) for field in PROPERTY_FIELDS + ['respiration']}
+        return cls(products, version)
+
+    @classmethod
+    def get(cls) -> 'ProductCatalog':
+        """The catalog of this process, reloaded only when commodities were added, changed or deleted
+
+        Saves and deletes in this process drop the catalog at once. Changes
+        made by other processes or by bulk queries are noticed within
+        CATALOG_TTL seconds, when the commodity count and latest update are
+        checked again.
+        """
+        global _catalog, _catalog_checked
+        with _catalog_lock:
+            now = time.monotonic()
+            if _catalog is not None and now - _catalog_checked < CATALOG_TTL:
+                return _catalog
+            stamp = Commodity.objects.aggregate(count=Count('pk'), updated=Max('updated_at'))
+            version = (stamp['count'], stamp['updated'])
+            if _catalog is None or _catalog.version != version:
+                _catalog = cls.from_commodities(Commodity.objects.all(), version)
+            _catalog_checked = now
+            return _catalog
+
+    def codes(self, projects) -> np.ndarray:
+        """Row of each project's commodity, or of its storage type's default product"""
+        general = self.index['general']
+        return np.array([self.index.get(project.commodity_id, self.index.get(project.storage_type, general))
+                         for project in projects], dtype=int)
+
+    def properties(self, codes) -> Dict[str, np.ndarray]:
+        """Specific heats (kJ/kg.K), freezing point and latent heat of each code"""
+        codes = np.asarray(codes, dtype=int)
+        return {field: getattr(self, field)[codes] for field in PROPERTY_FIELDS}
+
+    def respiration_curves(self, codes) -> Tuple[np.ndarray, np.ndarray]:
+        """Respiration curve points of each code, for interpolate_curves"""
+        codes = np.asarray(codes, dtype=int)
+        return self.respiration_temps[codes], self.respiration_rates[codes]
+
+    def respiration_rate(self, codes, temperature) -> np.ndarray:
+        """Respiration heat (W/kg) of each code at broadcastable temperatures (C)"""
+        codes, temperature = np.broadcast_arrays(np.asarray(codes, dtype=int), np.asarray(temperature, dtype=float))
+        return interpolate_curves(*self.respiration_curves(codes), temperature)
+
+    def specific_heat(self, codes, temperature) -> np.ndarray:
+        """Specific heat (kJ/kg.K) of each code at broadcastable temperatures, frozen below the freezing point"""
+        codes = np.asarray(codes, dtype=int)
+        return np.where(np.asarray(temperature, dtype=float) < self.freezing_point[codes],
+                        self.cp_below[codes], self.cp_above[codes])
+
+    def load_inputs(self, codes, storage_temp) -> Dict[str, np.ndarray]:
+        """Product specific heat and respiration rate inputs of calculate_loads at the storage temperature"""
+        return {
+            'specific_heat': self.specific_heat(codes, storage_temp),
+            'respiration_rate': self.respiration_rate(codes, storage_temp),
+        }
@@ -0,0 +1,150 @@
+import numpy as np
+from typing import Dict, Optional
+from django.core.validators import MinValueValidator, MaxValueValidator
+
+from .calculations import INPUT_FIELDS, calculate_loads
+from .models import ColdStorageProject
+from .products import ProductCatalog
+
+DEFAULT_SPAN = 0.2
+DEFAULT_SAMPLES = 10000
+MAX_SAMPLES = 200000
+
+# Inputs perturbed by an absolute amount instead of a fraction of the nominal value
+ABSOLUTE_SPANS = {
+    'outdoor_temp': 5.0,
+    'indoor_temp': 2.0,
+}
+
+
+def field_bounds(field_name: str):
+    """Get the (min, max) allowed by the model validators of a project field"""
+    low, high = -np.inf, np.inf
+    for validator in ColdStorageProject._meta.get_field(field_name).validators:
+        if isinstance(validator, MinValueValidator):
+            low = validator.limit_value
+        elif isinstance(validator, MaxValueValidator):
+            high = validator.limit_value
+    return low, high
+
+
+def input_ranges(project, span: float = DEFAULT_SPAN, fields=None) -> Dict:
+    """Build the (low, nominal, high) range of each input, clamped to model bounds"""
+    ranges = {}
+    for field in fields or INPUT_FIELDS:
+        nominal = float(getattr(project, field))
+        delta = ABSOLUTE_SPANS.get(field, abs(nominal) * span)
+        low, high = field_bounds(field)
+        ranges[field] = (max(nominal - delta, low), nominal, min(nominal + delta, high))
+    return ranges
+
+
+def _design_load(inputs: Dict, catalog: ProductCatalog, code: int) -> np.ndarray:
+    """Design load of input rows, with the product properties at each row's indoor temperature"""
+    return calculate_loads(**inputs, **catalog.load_inputs(code, inputs['indoor_temp']))['design_load']
+
+
+def tornado(project, span: float = DEFAULT_SPAN, ranges: Optional[Dict] = None) -> Dict:
+    """One-at-a-time swing of the design load for each input, evaluated in one batch"""
+    ranges = ranges or input_ranges(project, span)
+    fields = list(ranges)
+
+    # Row 0 is the base case, then a low and a high row per input
+    n_rows = 1 + 2 * len(fields)
+    inputs = {field: np.full(n_rows, float(getattr(project, field))) for field in INPUT_FIELDS}
+    for i, field in enumerate(fields):
+        inputs[field][1 + 2 * i] = ranges[field][0]
+        inputs[field][2 + 2 * i] = ranges[field][2]
+
+    catalog = ProductCatalog.get()
+    loads = _design_load(inputs, catalog, catalog.codes([project])[0])
+    base = float(loads[0])
+
+    bars = []
+    for i, field in enumerate(fields):
+        load_low = float(loads[1 + 2 * i])
+        load_high = float(loads[2 + 2 * i])
+        bars.append({
+            'input': field,
+            'low': ranges[field][0],
+            'nominal': ranges[field][1],
+            'high': ranges[field][2],
+            'load_low': load_low,
+            'load_high': load_high,
+            'swing': abs(load_high - load_low),
+        })
+
+    bars.sort(key=lambda bar: bar['swing'], reverse=True)
+    return {'base_design_load': base, 'bars': bars}
+
+
+def sobol_indices(project, span: float = DEFAULT_SPAN, samples: int = DEFAULT_SAMPLES,
+                  seed: Optional[int] = None, ranges: Optional[Dict] = None) -> Dict:
+    """Monte Carlo first-order and total Sobol indices of the design load
+
+    Inputs are sampled uniformly over their ranges using the Saltelli scheme
+    with Jansen estimators, so the load equations are evaluated on
+    samples * (inputs + 2) points.
+    """
+    ranges = ranges or input_ranges(project, span)
+    fields = list(ranges)
+    samples = int(min(max(samples, 2), MAX_SAMPLES))
+    rng = np.random.default_rng(seed)
+
+    low = np.array([ranges[field][0] for field in fields])
+    high = np.array([ranges[field][2] for field in fields])
+    a = low + (high - low) * rng.random((samples, len(fields)))
+    b = low + (high - low) * rng.random((samples, len(fields)))
+
+    fixed = {field: float(getattr(project, field)) for field in INPUT_FIELDS if field not in ranges}
+    catalog = ProductCatalog.get()
+    code = catalog.codes([project])[0]
+
+    def evaluate(matrix):
+        inputs = dict(fixed)
+        inputs.update({field: matrix[:, i] for i, field in enumerate(fields)})
+        return _design_load(inputs, catalog, code)
+
+    f_a = evaluate(a)
+    f_b = evaluate(b)
+    variance = float(np.var(np.concatenate([f_a, f_b])))
+    # Centering f_B leaves the first order estimator unbiased, but stops the mean load from swamping it
+    f_b_centered = f_b - np.mean(np.concatenate([f_a, f_b]))
+
+    indices = []
+    for i, field in enumerate(fields):
+        ab = a.copy()
+        ab[:, i] = b[:, i]
+        f_ab = evaluate(ab)
+
+        if variance > 0:
+            first_order = float(np.mean(f_b_centered * (f_ab - f_a)) / variance)
+            total = float(0.5 * np.mean((f_a - f_ab) ** 2) / variance)
+        else:
+            first_order = total = 0.0
+        indices.append({'input': field, 'first_order': first_order, 'total': total})
+
+    indices.sort(key=lambda index: index['total'], reverse=True)
+    percentiles = np.percentile(f_a, [5, 50, 95])
+    return {
+        'samples': samples,
+        'mean_design_load': float(np.mean(f_a)),
+        'std_design_load': float(np.std(f_a)),
+        'p5_design_load': float(percentiles[0]),
+        'p50_design_load': float(percentiles[1]),
+        'p95_design_load': float(percentiles[2]),
+        'indices': indices,
+    }
+
+
+def sensitivity_analysis(project, span: float = DEFAULT_SPAN, samples: int = DEFAULT_SAMPLES,
+                         seed: Optional[int] = None) -> Dict:
+    """Tornado chart data and Sobol indices for a project's design load"""
+    ranges = input_ranges(project, span)
+    return {
+        'project': str(project.pk),
+        'span': span,
+        'ranges': {field: {'low': r[0], 'nominal': r[1], 'high': r[2]} for field, r in ranges.items()},
+        'tornado': tornado(project, ranges=ranges),
+        'sobol': sobol_indices(project, samples=samples, seed=seed, ranges=ranges),
+    }
@@ -1,3 +1,293 @@
-from django.test import TestCase
+import io
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .calculations import AIR_CHANGES, AIR_DENSITY, AIR_SPECIFIC_HEAT, U_VALUE, calculate_project_loads
+from .importers import IMPORT_FIELDS, import_projects, read_csv_rows, read_xlsx_rows
+from .models import ColdStorageProject, Commodity, CoolingLoadResult
+from .products import DEFAULT_PRODUCTS, ProductCatalog, interpolate_curves
+from .sensitivity import sobol_indices, tornado
+from .transient import (STRUCTURE_HEAT_CAPACITY, THROTTLING_RANGE, product_enthalpy, product_temperature,
+                        simulate_pull_down)
+
+
+# Valid fields of a project, as an import row would give them
+PROJECT_VALUES = {
+    'name': 'Store', 'storage_type': 'fruit', 'length': 20, 'width': 10, 'height': 6, 'outdoor_temp': 35,
+    'outdoor_humidity': 40, 'indoor_temp': 2, 'indoor_humidity': 90, 'insulation_type': 'polyurethane',
+    'insulation_thickness': 0.1, 'product_mass': 20000, 'daily_product_input': 2000, 'number_of_workers': 3,
+    'working_hours': 8, 'lighting_power': 800, 'fan_power': 1500, 'door_openings': 20,
+}
+
+
+def create_project(**values):
+    return ColdStorageProject.objects.create(**{**PROJECT_VALUES, **values})
+
+
+def csv_file(rows):
+    """A CSV upload with the import columns and a commodity column"""
+    lines = [','.join(IMPORT_FIELDS + ['commodity'])]
+    for row in rows:
+        lines.append(','.join(str(row.get(field, '')) for field in IMPORT_FIELDS + ['commodity']))
+    return io.BytesIO('\n'.join(lines).encode())
+
+
+def room_inputs(**inputs):
+    """Load equation inputs of a 10 x 8 x 4 m room without internal gains"""
+    room = {
+        'length': 10.0, 'width': 8.0, 'height': 4.0, 'outdoor_temp': 30.0, 'indoor_temp': 2.0,
+        'product_mass': 0.0, 'daily_product_input': 0.0, 'number_of_workers': 0.0, 'working_hours': 0.0,
+        'lighting_power': 0.0, 'fan_power': 0.0,
+    }
+    room.update(inputs)
+    return room
+
+
+def envelope(inputs):
+    """Envelope conductance (W/K) and air and structure heat capacity (J/K) of a room"""
+    length, width, height = inputs['length'], inputs['width'], inputs['height']
+    area = 2 * (length * width + length * height + width * height)
+    volume = length * width * height
+    conductance = area * U_VALUE + volume * AIR_CHANGES * AIR_DENSITY * AIR_SPECIFIC_HEAT / 3600
+    return conductance, volume * AIR_DENSITY * AIR_SPECIFIC_HEAT * 1000 + area * STRUCTURE_HEAT_CAPACITY
+
+
+class ProductEnthalpyTests(SimpleTestCase):
+    def test_round_trip_and_freezing_plateau(self):
+        properties = {'cp_above': 3700.0, 'cp_below': 1900.0, 'freezing_point': -1.0, 'latent_heat': 290000.0}
+        temperatures = np.array([-30.0, -5.0, -1.0, 0.0, 20.0])
+        temperature, slope = product_temperature(product_enthalpy(temperatures, **properties), **properties)
+        np.testing.assert_allclose(temperature, temperatures)
+        np.testing.assert_allclose(slope, [1 / 1900, 1 / 1900, 0, 1 / 3700, 1 / 3700])
+        # Anywhere between frozen and thawed the product sits at the freezing point
+        temperature, slope = product_temperature(np.array([1.0, 145000.0, 289999.0]), **properties)
+        np.testing.assert_allclose(temperature, -1.0)
+        np.testing.assert_array_equal(slope, 0.0)
+
+
+class PullDownTests(SimpleTestCase):
+    catalog = ProductCatalog(DEFAULT_PRODUCTS)
+
+    def simulate(self, inputs, code='meat', **kwargs):
+        return simulate_pull_down(inputs, self.catalog, self.catalog.index[code], **kwargs)
+
+    def test_free_drift_is_exponential(self):
+        # Without plant or product the air relaxes to outdoor as T_o + (T_0 - T_o) exp(-G t / C)
+        inputs = room_inputs()
+        conductance, capacity = envelope(inputs)
+        time_step = 60.0
+        results = self.simulate(inputs, capacity=0.0, initial_temp=0.0, time_step=time_step, horizon=24,
+                                trace_every=1)
+        times = results['times'] * 3600
+        air = results['air_temp'][:, 0]
+        # Implicit Euler divides the deviation by 1 + G dt / C every step
+        np.testing.assert_allclose(air, 30 - 30 / (1 + conductance * time_step / capacity) ** (times / time_step))
+        np.testing.assert_allclose(air, 30 - 30 * np.exp(-conductance * times / capacity), atol=0.02)
+        np.testing.assert_array_equal(results['energy'], 0.0)
+
+    def test_pull_down_time_at_full_capacity(self):
+        # Above the throttling band the plant removes its full capacity, so the air follows an exponential
+        # towards T_o - Q / G and reaches the top of the band at t = C / G ln((T_0 - T_s) / (T_b - T_s))
+        inputs = room_inputs()
+        conductance, capacity = envelope(inputs)
+        plant = 20000.0
+        steady = 30 - plant / conductance
+        band = 2.0 + THROTTLING_RANGE
+        expected = capacity / conductance * np.log((30 - steady) / (band - steady)) / 3600
+        for time_step in (60.0, 10.0):
+            with self.subTest(time_step=time_step):
+                results = self.simulate(inputs, capacity=plant, time_step=time_step, horizon=24)
+                self.assertAlmostEqual(results['pull_down_time'][0], expected, delta=0.01 * expected)
+                self.assertEqual(results['product_cooling_time'][0], 0.0)
+
+    def test_capacity_below_envelope_gain_never_pulls_down(self):
+        inputs = room_inputs()
+        conductance, _ = envelope(inputs)
+        results = self.simulate(inputs, capacity=0.9 * conductance * (30 - 2.5), horizon=72)
+        self.assertTrue(np.isnan(results['pull_down_time'][0]))
+
+    def test_product_settles_above_air_by_respiration(self):
+        # At a flat respiration rate the product settles where transfer to the air carries that heat away
+        inputs = room_inputs(product_mass=5000.0, indoor_temp=4.0)
+        results = self.simulate(inputs, code='general', capacity=60000.0, horizon=200, time_step=300,
+                                trace_every=1)
+        air, product = results['air_temp'][-1, 0], results['product_temp'][-1, 0]
+        self.assertAlmostEqual(product - air, DEFAULT_PRODUCTS['general']['respiration'][0][1] / 0.3, places=3)
+        self.assertLess(results['product_cooling_time'][0], 200)
+
+    def test_time_steps_converge(self):
+        inputs = room_inputs(product_mass=np.array([2000.0, 8000.0]), indoor_temp=np.array([0.0, -20.0]))
+        codes = np.array([self.catalog.index['fruit'], self.catalog.index['frozen']])
+        coarse = simulate_pull_down(inputs, self.catalog, codes, 60000.0, time_step=120, horizon=48)
+        fine = simulate_pull_down(inputs, self.catalog, codes, 60000.0, time_step=10, horizon=48)
+        # Crossing times are only resolved to the coarse step
+        for key in ('pull_down_time', 'product_cooling_time'):
+            np.testing.assert_allclose(coarse[key], fine[key], rtol=0.01, atol=120 / 3600)
+        np.testing.assert_allclose(coarse['energy'], fine['energy'], rtol=0.01)
+
+
+class ProjectImportTests(TestCase):
+    def setUp(self):
+        self.apple = Commodity.objects.create(name='Apple', freezing_point=-1.5, cp_above=3.6, cp_below=1.9,
+                                              latent_heat=280, respiration=[[0, 0.01], [10, 0.03]])
+
+    def test_valid_rows_are_saved_in_chunks_with_results(self):
+        rows = [{**PROJECT_VALUES, 'name': f'Store {i}'} for i in range(5)]
+        rows[1]['commodity'] = 'Apple'
+        with CaptureQueriesContext(connection) as queries:
+            report = import_projects(read_csv_rows(csv_file(rows)), chunk_size=2)
+        # One insert of projects and one of results per chunk
+        inserts = [query['sql'] for query in queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 6)
+        self.assertEqual((report.created, report.failed, report.total), (5, 0, 5))
+        self.assertEqual(CoolingLoadResult.objects.count(), 5)
+
+        project = ColdStorageProject.objects.get(name='Store 1')
+        self.assertEqual(project.commodity, self.apple)
+        for key, value in calculate_project_loads(project).items():
+            self.assertAlmostEqual(getattr(project.result, key), value)
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        rows = [
+            PROJECT_VALUES,
+            {**PROJECT_VALUES, 'height': 50},
+            {**PROJECT_VALUES, 'storage_type': 'garage', 'commodity': 'Durian'},
+            {**PROJECT_VALUES, 'length': ''},
+        ]
+        report = import_projects(read_csv_rows(csv_file(rows)))
+        self.assertEqual((report.created, report.failed), (1, 3))
+        # Row numbers count the header line
+        self.assertEqual([error['row'] for error in report.errors], [3, 4, 5])
+        self.assertEqual(list(report.errors[0]['errors']), ['height'])
+        self.assertEqual(sorted(report.errors[1]['errors']), ['commodity', 'storage_type'])
+        self.assertEqual(list(report.errors[2]['errors']), ['length'])
+        self.assertEqual(ColdStorageProject.objects.count(), 1)
+
+    def test_xlsx_rows(self):
+        from openpyxl import Workbook
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(IMPORT_FIELDS)
+        sheet.append([PROJECT_VALUES[field] for field in IMPORT_FIELDS])
+        sheet.append([None] * len(IMPORT_FIELDS))
+        sheet.append([PROJECT_VALUES[field] if field != 'indoor_temp' else -40 for field in IMPORT_FIELDS])
+        upload = io.BytesIO()
+        workbook.save(upload)
+        upload.seek(0)
+
+        report = import_projects(read_xlsx_rows(upload))
+        self.assertEqual(report.created, 1)
+        self.assertEqual(report.errors, [{'row': 4, 'errors': report.errors[0]['errors']}])
+        self.assertIn('indoor_temp', report.errors[0]['errors'])
+
+    def test_view_rejects_unsupported_files(self):
+        response = self.client.post(reverse('project_import'),
+                                     {'file': SimpleUploadedFile('projects.txt', b'name\nStore\n')})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Unsupported file type', response.context['form'].errors['file'][0])
+
+        upload = SimpleUploadedFile('projects.csv', csv_file([PROJECT_VALUES]).getvalue())
+        response = self.client.post(reverse('project_import'), {'file': upload, 'chunk_size': 10})
+        self.assertEqual(response.context['report'].created, 1)
+
+
+class SensitivityTests(TestCase):
+    def setUp(self):
+        self.project = create_project(height=19.0)
+
+    def test_tornado_bars_match_single_evaluations(self):
+        results = tornado(self.project, span=0.1)
+        self.assertAlmostEqual(results['base_design_load'], calculate_project_loads(self.project)['design_load'])
+        swings = [bar['swing'] for bar in results['bars']]
+        self.assertEqual(swings, sorted(swings, reverse=True))
+
+        bars = {bar['input']: bar for bar in results['bars']}
+        # Perturbations are clamped to the model's bounds
+        self.assertEqual((bars['height']['low'], bars['height']['high']), (19.0 * 0.9, 20.0))
+        self.assertEqual((bars['outdoor_temp']['low'], bars['outdoor_temp']['high']), (30.0, 40.0))
+        for field in ('height', 'indoor_temp', 'lighting_power'):
+            for end in ('low', 'high'):
+                varied = ColdStorageProject(**{**PROJECT_VALUES, 'height': 19.0, field: bars[field][end]})
+                self.assertAlmostEqual(bars[field][f'load_{end}'], calculate_project_loads(varied)['design_load'])
+
+    def test_sobol_indices_of_additive_inputs(self):
+        # The load is linear and additive in these inputs, so each first order index is its share of the
+        # squared swings and equals its total index
+        ranges = {'outdoor_temp': (30.0, 35.0, 40.0), 'lighting_power': (0.0, 800.0, 5000.0)}
+        swings = {bar['input']: bar['swing'] for bar in tornado(self.project, ranges=ranges)['bars']}
+        shares = {field: swing ** 2 / sum(s ** 2 for s in swings.values()) for field, swing in swings.items()}
+
+        results = sobol_indices(self.project, samples=20000, seed=1, ranges=ranges)
+        self.assertEqual(results, sobol_indices(self.project, samples=20000, seed=1, ranges=ranges))
+        for index in results['indices']:
+            self.assertAlmostEqual(index['first_order'], shares[index['input']], delta=0.03)
+            self.assertAlmostEqual(index['total'], shares[index['input']], delta=0.03)
+        self.assertLess(results['p5_design_load'], results['p50_design_load'])
+        self.assertLess(results['p50_design_load'], results['p95_design_load'])
+
+    def test_view_validates_parameters(self):
+        url = reverse('project_sensitivity', args=[self.project.pk])
+        response = self.client.get(url, {'span': 0.1, 'samples': 100, 'seed': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['sobol']['samples'], 100)
+        for params in ({'span': 'nan'}, {'span': 2}, {'samples': 1}, {'seed': 'x'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+
+
+class ProductCatalogTests(TestCase):
+    def create_commodity(self, name='Apple', **values):
+        return Commodity.objects.create(**{'name': name, 'freezing_point': -1.5, 'cp_above': 3.6, 'cp_below': 1.9,
+                                           'latent_heat': 280, 'respiration': [[10, 0.03], [0, 0.01]], **values})
+
+    def test_curves_interpolate_and_hold_beyond_their_ends(self):
+        temps = np.array([[0.0, 10.0, 20.0], [5.0, 5.0, 5.0]])
+        values = np.array([[1.0, 2.0, 4.0], [3.0, 3.0, 3.0]])
+        np.testing.assert_allclose(interpolate_curves(temps, values, [-5.0, 5.0]), [1.0, 3.0])
+        np.testing.assert_allclose(interpolate_curves(temps, values, np.array([[-5.0, 5.0, 15.0, 30.0]]).T),
+                                   [[1.0, 3.0], [1.5, 3.0], [3.0, 3.0], [4.0, 3.0]])
+
+    def test_lookups_by_project(self):
+        apple = self.create_commodity()
+        catalog = ProductCatalog.get()
+        projects = [ColdStorageProject(commodity=apple, storage_type='meat'), ColdStorageProject(storage_type='dairy'),
+                    ColdStorageProject(storage_type='unknown')]
+        codes = catalog.codes(projects)
+        np.testing.assert_array_equal(codes, [catalog.index[apple.pk], catalog.index['dairy'],
+                                              catalog.index['general']])
+        # Points are sorted by temperature when loaded
+        np.testing.assert_allclose(catalog.respiration_rate(codes[0], [-5.0, 5.0, 20.0]), [0.01, 0.02, 0.03])
+        np.testing.assert_allclose(catalog.respiration_rate(codes[1], [-5.0, 20.0]), 0.0)
+        np.testing.assert_allclose(catalog.specific_heat(codes[0], [-2.0, -1.5, 0.0]), [1.9, 3.6, 3.6])
+        inputs = catalog.load_inputs(codes, np.array([5.0, 5.0, 5.0]))
+        np.testing.assert_allclose(inputs['specific_heat'], [3.6, 3.3, 2.5])
+        np.testing.assert_allclose(inputs['respiration_rate'], [0.02, 0.0, 0.02])
+
+    def test_catalog_is_cached_until_commodities_change(self):
+        catalog = ProductCatalog.get()
+        with self.assertNumQueries(0):
+            self.assertIs(ProductCatalog.get(), catalog)
+
+        apple = self.create_commodity()
+        catalog = ProductCatalog.get()
+        self.assertIn(apple.pk, catalog.index)
+        apple.cp_above = 3.2
+        apple.save()
+        self.assertEqual(ProductCatalog.get().cp_above[ProductCatalog.get().index[apple.pk]], 3.2)
+        apple_pk = apple.pk
+        apple.delete()
+        self.assertNotIn(apple_pk, ProductCatalog.get().index)
+
+        # Bulk inserts send no signals, and are noticed once the catalog is checked again
+        catalog = ProductCatalog.get()
+        Commodity.objects.bulk_create([Commodity(name='Pear', freezing_point=-1.6, cp_above=3.6, cp_below=1.9,
+                                                 latent_heat=280)])
+        self.assertIs(ProductCatalog.get(), catalog)
+        with mock.patch('cooling_load.products.CATALOG_TTL', 0.0):
+            self.assertIn(Commodity.objects.get(name='Pear').pk, ProductCatalog.get().index)
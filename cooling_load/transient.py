@@ -0,0 +1,221 @@
+import numpy as np
+from typing import Dict, Optional
+
+from .calculations import (AIR_CHANGES, AIR_DENSITY, AIR_SPECIFIC_HEAT, LOAD_ROOMS, LOAD_SECONDS, U_VALUE,
+                           calculate_loads, project_inputs)
+from .products import ProductCatalog
+
+# Heat capacity of the room structure that follows the air temperature, per m2 of inner surface (J/m2.K)
+STRUCTURE_HEAT_CAPACITY = 10000.0
+# Air to product heat transfer per kg of stacked product (W/kg.K)
+PRODUCT_HEAT_TRANSFER = 0.3
+# The plant runs at full capacity above setpoint plus this band (K), in proportion within it
+THROTTLING_RANGE = 0.5
+# Pull-down ends when the air is within the throttling range, product cooling within this of setpoint (K)
+PRODUCT_TOLERANCE = 1.0
+
+DEFAULT_TIME_STEP = 60.0  # s
+DEFAULT_HORIZON = 72.0  # h
+MAX_STEPS = 20000
+
+
+def product_temperature(enthalpy, cp_above, cp_below, freezing_point, latent_heat):
+    """Product temperature (C) from its enthalpy (J/kg, zero when just frozen at the freezing point)
+
+    Also returns dT/dH, zero on the freezing plateau.
+    """
+    frozen = enthalpy < 0
+    thawed = enthalpy > latent_heat
+    slope = np.where(frozen, 1 / cp_below, np.where(thawed, 1 / cp_above, 0.0))
+    temperature = freezing_point + np.where(frozen, enthalpy, np.where(thawed, enthalpy - latent_heat, 0.0)) * slope
+    return temperature, slope
+
+
+def product_enthalpy(temperature, cp_above, cp_below, freezing_point, latent_heat):
+    """Inverse of product_temperature, taking product at the freezing point as unfrozen"""
+    above = temperature >= freezing_point
+    return np.where(above, latent_heat + (temperature - freezing_point) * cp_above,
+                    (temperature - freezing_point) * cp_below)
+
+
+def simulate_pull_down(inputs: Dict, catalog: ProductCatalog, codes, capacity=None, initial_temp=None,
+                       product_temp=None, time_step: float = DEFAULT_TIME_STEP,
+                       horizon: float = DEFAULT_HORIZON, trace_every: Optional[int] = None,
+                       loads: Optional[Dict] = None) -> Dict:
+    """Integrate room air and product temperatures of many rooms from a warm start
+
+    inputs holds the load equation inputs, scalars or arrays with one value
+    per room, and codes the rows of each room's product in the catalog.
+    Each room has two states, the air with the structure around it and the
+    product enthalpy, which carries the latent heat of freezing. Envelope and
+    internal gains are those of calculate_loads, passed as loads when already
+    computed; respiration follows the product temperature along its catalog
+    curve. The plant removes up to capacity (W, the design load by default)
+    under proportional control around the indoor temperature. Steps are
+    linearly implicit Euler, solving the 2x2 system of every room at once, so
+    they stay stable at minute steps however stiff the coupling. Air and
+    product start at initial_temp and product_temp, the outdoor temperature
+    unless given. Returns pull-down and product cooling times (h, NaN if not
+    reached within horizon h), the peak load (W) and, with trace_every, the
+    temperatures of every trace_every-th step.
+    """
+    if loads is None:
+        loads = calculate_loads(**inputs)
+    codes = np.broadcast_to(np.asarray(codes, dtype=int), np.shape(loads['design_load'])).ravel()
+    shape = codes.shape
+
+    def per_room(value):
+        return np.broadcast_to(np.asarray(value, dtype=float), shape).astype(float)
+
+    length, width, height = per_room(inputs['length']), per_room(inputs['width']), per_room(inputs['height'])
+    area = 2 * (length * width + length * height + width * height)
+    volume = length * width * height
+    # Envelope conductance (W/K) of the transmission and infiltration terms of calculate_loads
+    conductance = area * U_VALUE + volume * AIR_CHANGES * AIR_DENSITY * AIR_SPECIFIC_HEAT / 3600
+    outdoor = per_room(inputs['outdoor_temp'])
+    setpoint = per_room(inputs['indoor_temp'])
+    internal = per_room(loads['internal_load'])
+    mass = per_room(inputs['product_mass'])
+    capacity = per_room(loads['design_load'] if capacity is None else capacity)
+
+    properties = catalog.properties(codes)
+    for key in ('cp_above', 'cp_below', 'latent_heat'):
+        properties[key] = properties[key] * 1000  # J/kg
+    # Respiration curves as sums of clipped segments, cheaper per step than locating each temperature's segment
+    respiration_temps, respiration_rates = catalog.respiration_curves(codes)
+    segment_low, segment_high = respiration_temps[:, :-1], respiration_temps[:, 1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        segment_slope = np.where(segment_high > segment_low,
+                                 np.diff(respiration_rates, axis=1) / (segment_high - segment_low), 0.0)
+    respiration_base = mass * respiration_rates[:, 0]
+    segment_slope *= mass[:, None]
+
+    air_capacity = volume * AIR_DENSITY * AIR_SPECIFIC_HEAT * 1000 + area * STRUCTURE_HEAT_CAPACITY  # J/K
+    product_transfer = mass * PRODUCT_HEAT_TRANSFER  # W/K
+    has_product = mass > 0
+    gain = capacity / THROTTLING_RANGE  # W/K
+
+    steps = int(np.ceil(horizon * 3600 / time_step))
+    if steps > MAX_STEPS:
+        raise ValueError(f"At most {MAX_STEPS} time steps, use a longer step or a shorter horizon")
+    t_air = per_room(outdoor if initial_temp is None else initial_temp)
+    enthalpy = product_enthalpy(per_room(outdoor if product_temp is None else product_temp), **properties)
+    t_product, slope = product_temperature(enthalpy, **properties)
+
+    air_target = setpoint + THROTTLING_RANGE
+    product_target = np.where(has_product, setpoint + PRODUCT_TOLERANCE, np.inf)
+    pull_down_time = np.full(shape, np.nan)
+    product_cooling_time = np.where(has_product, np.nan, 0.0)
+    peak_load = np.zeros(shape)
+    energy = np.zeros(shape)
+    traced = []
+
+    def record(step):
+        # First crossings are kept as they happen, so no trace of every step is needed
+        hours = step * time_step / 3600
+        pull_down_time[np.isnan(pull_down_time) & (t_air <= air_target)] = hours
+        product_cooling_time[np.isnan(product_cooling_time) & (t_product <= product_target)] = hours
+        if trace_every and step % trace_every == 0:
+            traced.append((hours, t_air, t_product))
+
+    # Step matrix terms that do not change over time; rooms without product keep a unit product equation
+    air_diagonal = air_capacity / time_step + conductance + product_transfer
+    product_diagonal = np.where(has_product, mass / time_step, 1.0)
+    transfer_squared = product_transfer ** 2
+
+    record(0)
+    for step in range(1, steps + 1):
+        # Plant duty and its slope at the start of the step
+        fraction = (t_air - setpoint) / THROTTLING_RANGE
+        duty = capacity * np.clip(fraction, 0, 1)
+        duty_slope = np.where((fraction > 0) & (fraction < 1), gain, 0.0)
+
+        clipped = np.minimum(np.maximum(t_product[:, None], segment_low), segment_high)
+        respiration = respiration_base + ((clipped - segment_low) * segment_slope).sum(axis=1)
+        coupling = product_transfer * (t_product - t_air)
+        demand = conductance * (outdoor - t_air) + internal + coupling
+        peak_load = np.maximum(peak_load, demand)
+
+        # (C_a/dt + G + hA + g) dT_a - hA s dH = G (T_o - T_a) + Q_int + hA (T_p - T_a) - Q_ref
+        # -hA dT_a + (m/dt + hA s) dH = Q_resp + hA (T_a - T_p)
+        # Without product m and hA are zero, so the second row leaves dH at zero
+        a11 = air_diagonal + duty_slope
+        a12 = -product_transfer * slope
+        a22 = product_diagonal + product_transfer * slope
+        r1 = demand - duty
+        r2 = respiration - coupling
+        determinant = a11 * a22 - transfer_squared * slope
+        d_air = (r1 * a22 - a12 * r2) / determinant
+        d_enthalpy = (a11 * r2 + product_transfer * r1) / determinant
+
+        t_air = t_air + d_air
+        enthalpy = enthalpy + d_enthalpy
+        energy += duty * time_step
+        t_product, slope = product_temperature(enthalpy, **properties)
+        record(step)
+
+    results = {
+        'pull_down_time': pull_down_time,
+        'product_cooling_time': product_cooling_time,
+        'peak_load': peak_load,
+        'capacity': capacity,
+        'energy': energy / 3.6e6,  # kWh
+    }
+    if trace_every:
+        results['times'] = np.array([hours for hours, _, _ in traced])
+        results['air_temp'] = np.array([air for _, air, _ in traced])
+        results['product_temp'] = np.where(has_product, np.array([product for _, _, product in traced]), np.nan)
+    return results
+
+
+def pull_down_report(projects, capacity_factor: float = 1.0, initial_temp: Optional[float] = None,
+                     product_temp: Optional[float] = None, time_step: float = DEFAULT_TIME_STEP,
+                     horizon: float = DEFAULT_HORIZON, trace_interval: Optional[float] = None) -> Dict:
+    """Pull-down feasibility of a set of projects, simulated together
+
+    The plant of each room is its design load times capacity_factor. With
+    trace_interval (h), temperature traces are sampled at that interval.
+    """
+    projects = list(projects)
+    if not projects:
+        return {'horizon': horizon, 'rooms': []}
+    catalog = ProductCatalog.get()
+    inputs = project_inputs(projects, catalog)
+    trace_every = max(int(round(trace_interval * 3600 / time_step)), 1) if trace_interval else None
+    with LOAD_SECONDS.labels('pull_down').time():
+        loads = calculate_loads(**inputs)
+        results = simulate_pull_down(inputs, catalog, catalog.codes(projects), loads['design_load'] * capacity_factor,
+                                     initial_temp, product_temp, time_step, horizon, trace_every, loads)
+    LOAD_ROOMS.labels('pull_down').inc(len(projects))
+
+    def rounded(value):
+        return round(float(value), 2) if np.isfinite(value) else None
+
+    rooms = []
+    for i, project in enumerate(projects):
+        room = {
+            'project': str(project.pk),
+            'name': project.name,
+            'storage_type': project.storage_type,
+            'capacity': round(float(results['capacity'][i]), 2),
+            'peak_load': round(float(results['peak_load'][i]), 2),
+            'pull_down_time': rounded(results['pull_down_time'][i]),
+            'product_cooling_time': rounded(results['product_cooling_time'][i]),
+            'energy': round(float(results['energy'][i]), 2),
+        }
+        room['feasible'] = room['pull_down_time'] is not None and room['product_cooling_time'] is not None
+        if trace_interval:
+            room['trace'] = {
+                'times': [round(t, 3) for t in results['times'].tolist()],
+                'air_temp': [round(t, 2) for t in results['air_temp'][:, i].tolist()],
+                'product_temp': [rounded(t) for t in results['product_temp'][:, i]],
+            }
+        rooms.append(room)
+
+    return {
+        'horizon': horizon,
+        'time_step': time_step,
+        'capacity_factor': capacity_factor,
+        'feasible': sum(room['feasible'] for room in rooms),
+        'rooms': rooms,
+    }
@@ -4,5 +4,10 @@ from . import views
 urlpatterns = [
     path('', views.ProjectCreateView.as_view(), name='project_create'),
     path('projects/', views.ProjectListView.as_view(), name='project_list'),
+    path('projects/pulldown/', views.site_pull_down, name='site_pull_down'),
+    path('projects/import/', views.ProjectImportView.as_view(), name='project_import'),
     path('result/<uuid:pk>/', views.project_result, name='project_result'),
+    path('result/<uuid:pk>/async/', views.project_result_async, name='project_result_async'),
+    path('result/<uuid:pk>/sensitivity/', views.project_sensitivity, name='project_sensitivity'),
+    path('result/<uuid:pk>/pulldown/', views.project_pull_down, name='project_pull_down'),
 ]
@@ -1,13 +1,31 @@
+import logging
+import math
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
 from django.shortcuts import render, redirect
-from django.views.generic import CreateView, ListView
+from django.views.generic import CreateView, ListView, FormView
 from .models import ColdStorageProject
+from .calculations import calculate_project_loads
+from .forms import ProjectImportForm
+from .products import ProductCatalog
+from .importers import DEFAULT_CHUNK_SIZE, import_projects, read_rows
+from core import metrics
+from core.executors import ExecutorBusy, run_offloaded
+from .sensitivity import DEFAULT_SAMPLES, DEFAULT_SPAN, MAX_SAMPLES, sensitivity_analysis
+from .transient import DEFAULT_HORIZON, DEFAULT_TIME_STEP, pull_down_report
 from django.urls import reverse_lazy
 
+logger = logging.getLogger(__name__)
+
+INVALID_FORMS = metrics.counter('invalid_form_submissions_total', 'Form submissions rejected by validation', ['form'])
+
 
 class ProjectCreateView(CreateView):
     model = ColdStorageProject
     fields = [
-        'name', 'storage_type', 'length', 'width', 'height',
+        'name', 'storage_type', 'commodity', 'length', 'width', 'height',
         'outdoor_temp', 'outdoor_humidity', 'indoor_temp', 'indoor_humidity',
         'insulation_type', 'insulation_thickness', 'product_mass',
         'daily_product_input', 'number_of_workers', 'working_hours',
@@ -20,7 +38,8 @@ class ProjectCreateView(CreateView):
         return redirect('project_result', pk=project.pk)
 
     def form_invalid(self, form):
-        print("Form errors:", form.errors)
+        logger.info("Invalid project form: %s", form.errors.as_json())
+        INVALID_FORMS.labels('project').inc()
         return super().form_invalid(form)
 
 
@@ -30,46 +49,125 @@ class ProjectListView(ListView):
     context_object_name = 'projects'
 
 
+class ProjectImportView(FormView):
+    form_class = ProjectImportForm
+    template_name = 'cooling_load/project_import.html'
+
+    def form_valid(self, form):
+        upload = form.cleaned_data['file']
+        chunk_size = form.cleaned_data.get('chunk_size') or DEFAULT_CHUNK_SIZE
+        try:
+            report = import_projects(read_rows(upload, upload.name), chunk_size=chunk_size)
+        except ValueError as e:
+            form.add_error('file', str(e))
+            return self.form_invalid(form)
+
+        return self.render_to_response(self.get_context_data(form=form, report=report))
+
+
 def project_result(request, pk):
     try:
         project = ColdStorageProject.objects.get(pk=pk)
     except ColdStorageProject.DoesNotExist:
         return redirect('project_create')
 
-    # Calculate transmission load
-    area = 2 * (project.length * project.width + project.length * project.height + project.width * project.height)
-    u_value = 0.4
-    temp_diff = project.outdoor_temp - project.indoor_temp
-    transmission_load = area * u_value * temp_diff
+    loads = calculate_project_loads(project)
 
-    # Calculate product load
-    product_load = project.daily_product_input * 3.5 / 24
-
-    # Calculate internal load
-    people_load = project.number_of_workers * 120 * (project.working_hours / 24)
-    lighting_load = project.lighting_power
-    fan_load = project.fan_power
-    internal_load = people_load + lighting_load + fan_load
+    context = {
+        'project': project,
+        **loads
+    }
+    return render(request, 'cooling_load/project_result.html', context)
 
-    # Calculate infiltration load
-    volume = project.length * project.width * project.height
-    infiltration_load = volume * 0.5 * 1.2 * 1.0 * temp_diff / 3600
 
-    # Calculate respiration load
-    respiration_load = project.product_mass * 0.02
+async def project_result_async(request, pk):
+    try:
+        project = await ColdStorageProject.objects.aget(pk=pk)
+    except ColdStorageProject.DoesNotExist:
+        return redirect('project_create')
 
-    # Total calculations
-    total_load = transmission_load + product_load + internal_load + infiltration_load + respiration_load
-    design_load = total_load * 1.15
+    try:
+        # Queries stay on this side: pool threads do not close their database connections
+        catalog = await sync_to_async(ProductCatalog.get)()
+        loads = await run_offloaded(calculate_project_loads, project, catalog)
+    except ExecutorBusy:
+        response = render(request, 'cooling_load/project_result.html', {'project': project}, status=503)
+        response['Retry-After'] = '5'
+        return response
 
     context = {
         'project': project,
-        'transmission_load': transmission_load,
-        'product_load': product_load,
-        'internal_load': internal_load,
-        'infiltration_load': infiltration_load,
-        'respiration_load': respiration_load,
-        'total_load': total_load,
-        'design_load': design_load
+        **loads
     }
     return render(request, 'cooling_load/project_result.html', context)
+
+
+def project_sensitivity(request, pk):
+    try:
+        project = ColdStorageProject.objects.get(pk=pk)
+    except ColdStorageProject.DoesNotExist:
+        return JsonResponse({'error': 'Project not found'}, status=404)
+
+    try:
+        span = float(request.GET.get('span', DEFAULT_SPAN))
+        samples = int(request.GET.get('samples', DEFAULT_SAMPLES))
+        seed = request.GET.get('seed')
+        seed = int(seed) if seed is not None else None
+    except ValueError:
+        return JsonResponse({'error': 'span, samples and seed must be numbers'}, status=400)
+
+    if not 0 < span <= 1:
+        return JsonResponse({'error': 'span must be between 0 and 1'}, status=400)
+    if not 2 <= samples <= MAX_SAMPLES:
+        return JsonResponse({'error': f'samples must be between 2 and {MAX_SAMPLES}'}, status=400)
+
+    return JsonResponse(sensitivity_analysis(project, span=span, samples=samples, seed=seed))
+
+
+def _pull_down(request, projects, trace_interval=None):
+    try:
+        capacity_factor = float(request.GET.get('capacity_factor', 1.0))
+        time_step = float(request.GET.get('time_step', DEFAULT_TIME_STEP))
+        horizon = float(request.GET.get('horizon', DEFAULT_HORIZON))
+        initial_temp = request.GET.get('initial_temp')
+        initial_temp = float(initial_temp) if initial_temp is not None else None
+        product_temp = request.GET.get('product_temp')
+        product_temp = float(product_temp) if product_temp is not None else None
+        trace_interval = request.GET.get('trace_interval', trace_interval)
+        trace_interval = float(trace_interval) if trace_interval is not None else None
+    except ValueError:
+        return JsonResponse({'error': 'capacity_factor, time_step, horizon, initial_temp, product_temp and '
+                                      'trace_interval must be numbers'}, status=400)
+
+    given = [value for value in (initial_temp, product_temp, trace_interval) if value is not None]
+    if not all(math.isfinite(value) for value in [capacity_factor, time_step, horizon] + given):
+        return JsonResponse({'error': 'capacity_factor, time_step, horizon, initial_temp, product_temp and '
+                                      'trace_interval must be finite'}, status=400)
+    if capacity_factor <= 0 or time_step <= 0 or horizon <= 0:
+        return JsonResponse({'error': 'capacity_factor, time_step and horizon must be positive'}, status=400)
+    try:
+        return JsonResponse(pull_down_report(projects, capacity_factor, initial_temp, product_temp,
+                                             time_step, horizon, trace_interval))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+def project_pull_down(request, pk):
+    try:
+        project = ColdStorageProject.objects.get(pk=pk)
+    except ColdStorageProject.DoesNotExist:
+        return JsonResponse({'error': 'Project not found'}, status=404)
+
+    return _pull_down(request, [project], trace_interval=1.0)
+
+
+def site_pull_down(request):
+    projects = ColdStorageProject.objects.order_by('name')
+    ids = request.GET.get('ids')
+    if ids:
+        try:
+            projects = projects.filter(pk__in=[i.strip() for i in ids.split(',') if i.strip()])
+            projects = list(projects)
+        except ValidationError:
+            return JsonResponse({'error': 'ids must be project UUIDs'}, status=400)
+    return _pull_down(request, projects)
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from . import metrics
+
+_lock = threading.Lock()
+_process_pool = None
+_thread_pool = None
+_queue_slots = None
+
+
+class ExecutorBusy(Exception):
+    """Raised when the calculation queue is full"""
+
+
+def _start_worker(initializer, *initargs):
+    """Initializer of every pool worker: flush its metrics on exit, then run the caller's"""
+    metrics.flush_at_worker_exit()
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def get_process_pool(initializer=None, initargs=()):
+    """Get the shared process pool, creating it on first use
+
+    The initializer only runs for the workers of the pool that is created,
+    so callers pass the warm-up that their tasks benefit from. initargs may
+    be a callable returning them, so costly arguments are only computed
+    when the pool is created rather than on every submission.
+    """
+    global _process_pool
+    with _lock:
+        if _process_pool is None:
+            if callable(initargs):
+                initargs = initargs()
+            workers = getattr(settings, 'CALCULATION_PROCESSES', None) or os.cpu_count() or 1
+            _process_pool = ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                                                initargs=(initializer, *initargs))
+        return _process_pool
+
+
+def reset_process_pool():
+    """Drop a broken pool so the next call creates a fresh one"""
+    global _process_pool
+    with _lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+def map_in_processes(function, arguments, initializer=None, initargs=()):
+    """Run function(*args) for each args tuple in the process pool, in order
+
+    Falls back to running in the current process when the pool is disabled or broken.
+    """
+    arguments = list(arguments)
+    if not getattr(settings, 'CALCULATION_PROCESSES', 1) or len(arguments) < 2:
+        return [function(*args) for args in arguments]
+
+    try:
+        pool = get_process_pool(initializer, initargs)
+        futures = [pool.submit(function, *args) for args in arguments]
+        return [future.result() for future in futures]
+    except BrokenProcessPool:
+        reset_process_pool()
+        return [function(*args) for args in arguments]
+
+
+def get_thread_pool():
+    """Get the shared thread pool for offloading work from async views"""
+    global _thread_pool
+    with _lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=getattr(settings, 'CALCULATION_THREADS', 4),
+                                              thread_name_prefix='calculation')
+        return _thread_pool
+
+
+def _get_queue_slots():
+    global _queue_slots
+    with _lock:
+        if _queue_slots is None:
+            _queue_slots = threading.BoundedSemaphore(getattr(settings, 'CALCULATION_QUEUE_LIMIT', 32))
+        return _queue_slots
+
+
+async def run_offloaded(function, *args, use_processes: bool = False):
+    """Await function(*args) on the thread or process pool
+
+    At most CALCULATION_QUEUE_LIMIT jobs may be running or queued at once;
+    beyond that ExecutorBusy is raised immediately so callers can shed load.
+    A slot is held until the job itself finishes, even if the awaiting
+    request is cancelled.
+    """
+    slots = _get_queue_slots()
+    if not slots.acquire(blocking=False):
+        raise ExecutorBusy("Too many calculations in progress")
+
+    try:
+        if use_processes and getattr(settings, 'CALCULATION_PROCESSES', 1):
+            future = get_process_pool().submit(function, *args)
+        else:
+            future = get_thread_pool().submit(function, *args)
+    except Exception:
+        slots.release()
+        raise
+
+    future.add_done_callback(lambda f: slots.release())
+    try:
+        return await asyncio.wrap_future(future)
+    except BrokenProcessPool:
+        reset_process_pool()
+        raise
@@ -0,0 +1,504 @@
+import atexit
+import json
+import math
+import multiprocessing.util
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows, where snapshots of exited processes are left in place
+    fcntl = None
+
+# Latency buckets (s), from a batch lookup to a full diagram render
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Seconds between snapshots of a process's values in multiprocess mode
+FLUSH_INTERVAL = 5.0
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_registry = {}
+_registry_lock = threading.Lock()
+_writer = None
+_writer_lock = threading.Lock()
+_process_token = uuid.uuid4().hex
+
+
+class _Child:
+    """One series, recorded by every thread into a cell of its own
+
+    Only the owning thread writes a cell, so recording takes no lock; the
+    lock is taken when a thread records for the first time and when the
+    cells are summed. Cells of threads that have ended are folded into the
+    base when a new one is added, so thread churn does not grow the list.
+    """
+    __slots__ = ('local', 'cells', 'base', 'lock')
+
+    def __init__(self):
+        self.local = threading.local()
+        self.cells = []
+        self.base = self._empty()
+        self.lock = threading.Lock()
+
+    def _empty(self) -> list:
+        raise NotImplementedError
+
+    def _cell(self) -> list:
+        try:
+            return self.local.cell
+        except AttributeError:
+            pass
+        cell = self.local.cell = self._empty()
+        with self.lock:
+            cells = []
+            for thread, other in self.cells:
+                if thread.is_alive():
+                    cells.append((thread, other))
+                else:
+                    self._fold(other)
+            cells.append((threading.current_thread(), cell))
+            self.cells = cells
+        return cell
+
+    def _fold(self, cell: list):
+        for i, value in enumerate(cell):
+            self.base[i] += value
+
+    def _total(self) -> list:
+        with self.lock:
+            total = list(self.base)
+            for _, cell in self.cells:
+                for i, value in enumerate(cell):
+                    total[i] += value
+        return total
+
+    def reset(self):
+        with self.lock:
+            self.base = self._empty()
+            for _, cell in self.cells:
+                cell[:] = self._empty()
+
+
+class _CounterChild(_Child):
+    __slots__ = ()
+
+    def _empty(self) -> list:
+        return [0.0]
+
+    def inc(self, amount: float = 1.0):
+        self._cell()[0] += amount
+
+    def snapshot(self):
+        return self._total()[0]
+
+
+class _HistogramChild(_Child):
+    """Cells hold the count of each bucket, the last one unbounded, followed by the sum"""
+    __slots__ = ('buckets',)
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        super().__init__()
+
+    def _empty(self) -> list:
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def observe(self, value: float):
+        cell = self._cell()
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    @contextmanager
+    def time(self):
+        """Observe the duration of the with block, also when it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self):
+        return self._total()
+
+
+class Metric:
+    """A named metric with one child per combination of label values
+
+    Each process aggregates its own values in memory. Children are created
+    once, and each thread records into its own cell of a child, so threads
+    never contend, not even on the same series.
+    """
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        self.lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """The child of one combination of label values, in labelnames order"""
+        key = tuple(str(value) for value in values)
+        child = self.children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}")
+            with self.lock:
+                child = self.children.setdefault(key, self._new_child())
+            _start_writer()
+        return child
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            children = list(self.children.items())
+        return {
+            'type': self.kind,
+            'help': self.documentation,
+            'labelnames': list(self.labelnames),
+            'samples': [[list(key), child.snapshot()] for key, child in children],
+            **self._meta(),
+        }
+
+    def _meta(self) -> Dict:
+        return {}
+
+    def reset(self):
+        with self.lock:
+            for child in self.children.values():
+                child.reset()
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        """Increment the series of a counter without labels"""
+        self.labels().inc(amount)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(bucket) for bucket in buckets if bucket != math.inf))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _meta(self) -> Dict:
+        return {'buckets': list(self.buckets)}
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+
+def _register(cls, name: str, *args, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, *args, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+        return metric
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    """Get or register a counter; names of counters end in _total"""
+    return _register(Counter, name, documentation, labelnames)
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """Get or register a histogram, typically of durations in seconds"""
+    return _register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+# Shared by every cache, so hit ratios can be compared across them
+CACHE_REQUESTS = counter('cache_requests_total', 'Cache lookups by cache and result', ['cache', 'result'])
+
+
+def cache_lookup(cache: str, hit: bool):
+    """Count a lookup of a cache"""
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def snapshot() -> Dict[str, Dict]:
+    """Values of every metric of this process"""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return {metric.name: metric.snapshot() for metric in metrics}
+
+
+# Multiprocess mode
+
+def multiprocess_directory() -> Optional[str]:
+    """Directory the processes share their snapshots through, or None in single process mode"""
+    if not settings.configured:
+        return None
+    return getattr(settings, 'METRICS_MULTIPROCESS_DIR', '') or None
+
+
+# Snapshots of exited processes are folded into this file, and the lock file serializes the folding
+ARCHIVE_NAME = 'metrics-archive.json'
+LOCK_NAME = 'metrics.lock'
+
+
+def _snapshot_path(directory: str) -> str:
+    return os.path.join(directory, f'metrics-{os.getpid()}-{_process_token}.json')
+
+
+def _snapshot_pid(filename: str) -> Optional[int]:
+    """PID of the process that wrote a snapshot, or None for other files"""
+    parts = filename.split('-')
+    if len(parts) != 3 or parts[0] != 'metrics' or not parts[1].isdigit():
+        return None
+    return int(parts[1])
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def write_snapshot():
+    """Write this process's values to the shared directory, replacing its previous snapshot"""
+    directory = multiprocess_directory()
+    if directory is None:
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = _snapshot_path(directory)
+    partial_path = f'{path}.partial'
+    with open(partial_path, 'w') as f:
+        json.dump(snapshot(), f)
+    os.replace(partial_path, path)
+
+
+def _flush_loop(stop: threading.Event):
+    while not stop.wait(FLUSH_INTERVAL):
+        try:
+            write_snapshot()
+        except OSError:
+            pass
+
+
+def _start_writer():
+    """Start the thread writing this process's snapshots, once per process in multiprocess mode"""
+    global _writer
+    if _writer is not None or multiprocess_directory() is None:
+        return
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_flush_loop, args=(threading.Event(),), name='metrics-writer',
+                                       daemon=True)
+            _writer.start()
+
+
+def _after_fork():
+    """Start a forked child from zero, so the parent's values are not counted twice"""
+    global _writer, _writer_lock, _registry_lock, _process_token
+    _writer = None
+    _writer_lock = threading.Lock()
+    _registry_lock = threading.Lock()
+    _process_token = uuid.uuid4().hex
+    with _registry_lock:
+        metrics = list(_registry.values())
+    for metric in metrics:
+        metric.lock = threading.Lock()
+        for child in metric.children.values():
+            child.lock = threading.Lock()
+        metric.reset()
+    if any(metric.children for metric in metrics):
+        _start_writer()
+
+
+def _flush_at_exit():
+    if _writer is not None:
+        try:
+            write_snapshot()
+        except OSError:
+            pass
+
+
+def flush_at_worker_exit():
+    """Write a last snapshot when this multiprocessing worker exits
+
+    Pool workers end through os._exit, which skips atexit handlers, but
+    multiprocessing runs its own finalizers first. Call this from the
+    worker itself, as a pool initializer does: finalizers registered before
+    the worker started are dropped.
+    """
+    multiprocessing.util.Finalize(None, _flush_at_exit, exitpriority=0)
+
+
+os.register_at_fork(after_in_child=_after_fork)
+atexit.register(_flush_at_exit)
+
+
+def _merge(total: Dict, metrics: Dict):
+    for name, metric in metrics.items():
+        merged = total.setdefault(name, {**metric, 'samples': {}})
+        if merged['type'] != metric['type'] or merged.get('buckets') != metric.get('buckets'):
+            continue
+        for key, value in metric['samples']:
+            key = tuple(key)
+            previous = merged['samples'].get(key)
+            if previous is None:
+                merged['samples'][key] = value
+            elif metric['type'] == 'histogram':
+                merged['samples'][key] = [a + b for a, b in zip(previous, value)]
+            else:
+                merged['samples'][key] = previous + value
+
+
+def _as_snapshot(total: Dict) -> Dict[str, Dict]:
+    """Merged metrics back in the format of snapshot, which JSON can hold"""
+    return {name: {**metric, 'samples': [[list(key), value] for key, value in metric['samples'].items()]}
+            for name, metric in total.items()}
+
+
+def _read_json(path: str, default=None):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def fold_exited(directory: str):
+    """Fold the snapshots of processes that have exited into the archive and remove them
+
+    The archive lists the snapshots it holds, so one left behind by an
+    interrupted fold is removed rather than counted twice. Without fcntl
+    nothing is folded.
+    """
+    if fcntl is None:
+        return
+    with open(os.path.join(directory, LOCK_NAME), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        names = os.listdir(directory)
+        exited = [name for name in names
+                  if _snapshot_pid(name) is not None and not _pid_alive(_snapshot_pid(name))]
+        if not exited:
+            return
+        archive_path = os.path.join(directory, ARCHIVE_NAME)
+        archive = _read_json(archive_path, {'metrics': {}, 'folded': []})
+        folded = set(archive['folded'])
+        total = {}
+        _merge(total, archive['metrics'])
+        for name in exited:
+            if name.endswith('.json') and name not in folded:
+                try:
+                    _merge(total, _read_json(os.path.join(directory, name), {}))
+                except ValueError:
+                    # Truncated by the exit of its writer
+                    pass
+                folded.add(name)
+        archive = {'metrics': _as_snapshot(total), 'folded': sorted(folded & set(names))}
+        partial_path = f'{archive_path}.partial'
+        with open(partial_path, 'w') as f:
+            json.dump(archive, f)
+        os.replace(partial_path, archive_path)
+        for name in exited:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+def collect() -> Dict[str, Dict]:
+    """Values of every metric, summed over all processes in multiprocess mode
+
+    The calling process contributes its live values; other processes their
+    latest snapshots. Snapshots of exited processes are first folded into
+    the archive, which is counted as well, so counters keep growing across
+    worker restarts while the directory holds one file per live process.
+    """
+    total = {}
+    directory = multiprocess_directory()
+    if directory is not None and os.path.isdir(directory):
+        try:
+            fold_exited(directory)
+        except (OSError, ValueError):
+            # Folding is retried on the next scrape; the snapshots are still counted below
+            pass
+        own = os.path.basename(_snapshot_path(directory))
+        for filename in sorted(os.listdir(directory)):
+            if filename == own or not filename.endswith('.json'):
+                continue
+            try:
+                metrics = _read_json(os.path.join(directory, filename), {})
+            except (OSError, ValueError):
+                # A snapshot being replaced or truncated is picked up on the next scrape
+                continue
+            _merge(total, metrics['metrics'] if filename == ARCHIVE_NAME else metrics)
+    _merge(total, snapshot())
+    return total
+
+
+# Text exposition format
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Optional[tuple] = None) -> str:
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value: float) -> str:
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def exposition(metrics: Optional[Dict[str, Dict]] = None) -> str:
+    """Render metrics in the Prometheus text exposition format"""
+    metrics = collect() if metrics is None else metrics
+    lines: List[str] = []
+    for name in sorted(metrics):
+        metric = metrics[name]
+        documentation = metric['help'].replace('\\', '\\\\').replace('\n', '\\n')
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        labelnames = metric['labelnames']
+        samples = metric['samples']
+        samples = samples.items() if isinstance(samples, dict) else [(tuple(k), v) for k, v in samples]
+        for key, value in sorted(samples):
+            if metric['type'] == 'histogram':
+                cumulative = 0
+                for bound, count in zip(metric['buckets'] + [math.inf], value[:-1]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labelnames, key, ('le', _number(bound)))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labelnames, key)} {_number(value[-1])}")
+                lines.append(f"{name}_count{_labels(labelnames, key)} {cumulative}")
+            else:
+                lines.append(f"{name}{_labels(labelnames, key)} {_number(value)}")
+    return '\n'.join(lines) + '\n'
@@ -3,7 +3,7 @@ Django settings for refrigeration project.
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 import os
 import dj_database_url
 
@@ -123,6 +123,36 @@ SECURE_SSL_REDIRECT = not DEBUG
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Worker processes for parallel calculations (0 runs them in the request process)
+CALCULATION_PROCESSES = config('CALCULATION_PROCESSES', default=os.cpu_count() or 1, cast=int)
+
+# Threads for work offloaded by async views, and the cap on running plus queued jobs
+CALCULATION_THREADS = config('CALCULATION_THREADS', default=4, cast=int)
+CALCULATION_QUEUE_LIMIT = config('CALCULATION_QUEUE_LIMIT', default=32, cast=int)
+
+# Draw only the cycle over cached, pre-rendered diagram backgrounds
+DIAGRAM_FAST_RENDERING = config('DIAGRAM_FAST_RENDERING', default=True, cast=bool)
+
+# Resolutions offered by the diagram image endpoints, and how long browsers may cache them (seconds)
+DIAGRAM_DPI_CHOICES = config('DIAGRAM_DPI_CHOICES', default='100,150,200', cast=Csv(int))
+DIAGRAM_DEFAULT_DPI = config('DIAGRAM_DEFAULT_DPI', default=100, cast=int)
+DIAGRAM_CACHE_MAX_AGE = config('DIAGRAM_CACHE_MAX_AGE', default=86400, cast=int)
+
+# Seconds to wait for diagrams rendered in parallel before showing an error image
+DIAGRAM_RENDER_TIMEOUT = config('DIAGRAM_RENDER_TIMEOUT', default=30, cast=float)
+
+# Memory-mapped tables shared by all workers: saturation properties and diagram backgrounds
+# (build_property_tables) and the COP/capacity grids answering quotes (build_response_surfaces).
+# An empty value disables them.
+PROPERTY_TABLE_DIR = config('PROPERTY_TABLE_DIR', default=str(BASE_DIR / 'tables'))
+
+# Directory where each process writes its metric snapshots, summed by the /metrics endpoint. Set it to
+# include several gunicorn workers and the calculation process pool, and empty it before the server starts;
+# an empty value reports the metrics of the answering process only
+METRICS_MULTIPROCESS_DIR = config('METRICS_MULTIPROCESS_DIR', default='')
+# Bearer token required to scrape /metrics, open to all when empty
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
 # Logging
 LOGGING = {
     'version': 1,
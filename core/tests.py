@@ -0,0 +1,139 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from . import metrics
+from .executors import get_process_pool, reset_process_pool
+
+_POOL_COUNTER = metrics.counter('test_pool_tasks_total', 'Tasks run by the test pool')
+
+
+def _count_in_worker(amount):
+    _POOL_COUNTER.inc(amount)
+    return os.getpid()
+
+
+def counter_snapshot(name, samples):
+    return {name: {'type': 'counter', 'help': 'Test', 'labelnames': ['kind'], 'samples': samples}}
+
+
+class ExpositionTests(SimpleTestCase):
+    def test_counter_and_histogram_text(self):
+        requests = metrics.counter('test_requests_total', 'Requests\nby "kind"', ['kind'])
+        requests.labels('a"b').inc(2)
+        requests.labels('c').inc(0.5)
+        latency = metrics.histogram('test_latency_seconds', 'Latency', buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 3.0):
+            latency.observe(value)
+
+        text = metrics.exposition({name: metrics.snapshot()[name]
+                                   for name in ('test_requests_total', 'test_latency_seconds')})
+        self.assertEqual(text, '\n'.join([
+            '# HELP test_latency_seconds Latency',
+            '# TYPE test_latency_seconds histogram',
+            'test_latency_seconds_bucket{le="0.1"} 1',
+            'test_latency_seconds_bucket{le="1"} 3',
+            'test_latency_seconds_bucket{le="+Inf"} 4',
+            'test_latency_seconds_sum 4.25',
+            'test_latency_seconds_count 4',
+            '# HELP test_requests_total Requests\\nby "kind"',
+            '# TYPE test_requests_total counter',
+            'test_requests_total{kind="a\\"b"} 2',
+            'test_requests_total{kind="c"} 0.5',
+        ]) + '\n')
+
+    def test_registration(self):
+        first = metrics.counter('test_registered_total', 'Registered', ['kind'])
+        self.assertIs(metrics.counter('test_registered_total', 'Registered', ['kind']), first)
+        with self.assertRaises(ValueError):
+            metrics.histogram('test_registered_total', 'Registered')
+        with self.assertRaises(ValueError):
+            first.labels('a', 'b')
+
+    def test_threads_record_every_increment(self):
+        counter = metrics.counter('test_threaded_total', 'Threaded')
+        histogram = metrics.histogram('test_threaded_seconds', 'Threaded', buckets=(1.0,))
+
+        def record():
+            for _ in range(20000):
+                counter.inc()
+                histogram.observe(0.5)
+
+        threads = [threading.Thread(target=record) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counter.labels().snapshot(), 160000)
+        self.assertEqual(histogram.labels().snapshot(), [160000, 0, 80000.0])
+        # Cells of finished threads are folded away as new threads record
+        thread = threading.Thread(target=counter.inc)
+        thread.start()
+        thread.join()
+        self.assertLessEqual(len(counter.labels().cells), 2)
+        self.assertEqual(counter.labels().snapshot(), 160001)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_view_requires_the_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        self.assertIn('# TYPE cache_requests_total counter', response.content.decode())
+
+
+class MultiprocessTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings = override_settings(METRICS_MULTIPROCESS_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def write(self, filename, snapshot):
+        with open(os.path.join(self.directory, filename), 'w') as f:
+            json.dump(snapshot, f)
+
+    def exited_pid(self):
+        process = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process.wait()
+        return process.pid
+
+    def test_snapshots_of_exited_processes_are_folded(self):
+        name = 'test_merged_total'
+        live = f'metrics-{os.getpid()}-other.json'
+        exited = [f'metrics-{self.exited_pid()}-{i}.json' for i in range(2)]
+        self.write(live, counter_snapshot(name, [[['a'], 1.0]]))
+        self.write(exited[0], counter_snapshot(name, [[['a'], 2.0], [['b'], 5.0]]))
+        self.write(exited[1], counter_snapshot(name, [[['a'], 4.0]]))
+        self.write(f'{exited[1]}.partial', {})
+
+        for _ in range(2):
+            self.assertEqual(metrics.collect()[name]['samples'], {('a',): 7.0, ('b',): 5.0})
+            self.assertEqual(sorted(os.listdir(self.directory)), [live, metrics.ARCHIVE_NAME, metrics.LOCK_NAME])
+
+        # Later exits add to the archive
+        self.write(f'metrics-{self.exited_pid()}-2.json', counter_snapshot(name, [[['b'], 1.0]]))
+        self.assertEqual(metrics.collect()[name]['samples'], {('a',): 7.0, ('b',): 6.0})
+        self.assertIn('test_merged_total{kind="b"} 6', metrics.exposition())
+
+    @override_settings(CALCULATION_PROCESSES=2)
+    def test_pool_workers_flush_on_shutdown(self):
+        self.addCleanup(reset_process_pool)
+        reset_process_pool()
+        before = _POOL_COUNTER.labels().snapshot()
+        pool = get_process_pool()
+        pids = {pool.submit(_count_in_worker, amount).result() for amount in range(1, 11)}
+        self.assertNotIn(os.getpid(), pids)
+        pool.shutdown(wait=True)
+        reset_process_pool()
+
+        self.assertEqual(metrics.collect()['test_pool_tasks_total']['samples'][()], before + 55)
+        self.assertEqual(_POOL_COUNTER.labels().snapshot(), before)
@@ -5,6 +5,7 @@ from . import views
 urlpatterns = [
     path('', views.navigate_view, name='navigate'),
     path('admin/', admin.site.urls),
+    path('metrics', views.metrics_view, name='metrics'),
     path('cycle_calculator/', include('cycle_calculator.urls')),
     path('cooling-load/', include('cooling_load.urls')),
 ]
@@ -1,5 +1,18 @@
+import hmac
 
+from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import render
 
+from . import metrics
+
 def navigate_view(request):
-    return render(request, 'core/navigate.html') 
\ No newline at end of file
+    return render(request, 'core/navigate.html') 
+
+
+def metrics_view(request):
+    """Metrics of every worker in the Prometheus text format"""
+    token = settings.METRICS_TOKEN
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    return HttpResponse(metrics.exposition(), content_type=metrics.CONTENT_TYPE)
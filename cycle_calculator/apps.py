@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CycleCalculatorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cycle_calculator'
+
+    def ready(self):
+        from . import tables
+        tables.configure(settings.PROPERTY_TABLE_DIR or None)
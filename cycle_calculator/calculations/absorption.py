@@ -0,0 +1,306 @@
+import CoolProp.CoolProp as CP
+import numpy as np
+from typing import Dict, Optional
+
+from ..tables import open_table, table_path, write_table
+from .properties import props_array, props_arrays
+
+WATER = 'Water'
+LIBR = 'INCOMP::LiBr'
+# Specific gas constant of water vapor (J/kg.K)
+R_WATER = 8.314462618 / 0.018015268
+
+# Solution table grid: temperature (C) and LiBr mass fraction, as (start, stop, step). Above about
+# 70% LiBr crystallizes at absorber temperatures, so solutions beyond the table count as infeasible
+SOLUTION_TEMPS = (5.0, 180.0, 1.0)
+SOLUTION_FRACTIONS = (0.30, 0.70, 0.005)
+# Mass fraction whose CoolProp enthalpy anchors the tabulated solution enthalpy
+REFERENCE_FRACTION = 0.5
+DEFAULT_HEAT_EXCHANGER_EFFECTIVENESS = 0.7
+
+_solution = None
+
+
+def is_water(fluid: str) -> bool:
+    """Whether a CoolProp fluid name, such as 'Water' or 'R718', is water"""
+    try:
+        return CP.get_fluid_param_string(fluid.rpartition('::')[2], 'CAS') == '7732-18-5'
+    except ValueError:
+        return False
+
+
+def _grid(start: float, stop: float, step: float) -> np.ndarray:
+    return np.round(start + step * np.arange(round((stop - start) / step) + 1), 6)
+
+
+def solution_table_path() -> Optional[str]:
+    return table_path('solution', 'LiBr.table')
+
+
+def solution_columns() -> Dict[str, np.ndarray]:
+    """Tabulate LiBr-water solution properties over temperature (rows) and mass fraction (columns)
+
+    CoolProp's incompressible LiBr enthalpy is zero at 20 C at every mass
+    fraction, so it lacks the heat of mixing that absorber and generator
+    balances depend on. The enthalpy is rebuilt from CoolProp's vapor
+    pressure instead: by Clausius-Clapeyron the partial enthalpy of water in
+    the solution is h_vapor - R T^2 dln(p)/dT, and along an isotherm
+    h - x dh/dx equals it, which is integrated outwards from the CoolProp
+    enthalpy at REFERENCE_FRACTION.
+    """
+    t = _grid(*SOLUTION_TEMPS)
+    x = _grid(*SOLUTION_FRACTIONS)
+    T = t + 273.15
+    log_p = np.empty((t.size, x.size))
+    density = np.empty((t.size, x.size))
+    for j, fraction in enumerate(x.tolist()):
+        fluid = f'{LIBR}[{fraction}]'
+        log_p[:, j] = np.log(props_array('P', 'T', T, 'Q', 0, fluid))
+        # Liquid properties barely depend on pressure, so any pressure above the vapor pressure will do
+        density[:, j] = props_array('D', 'T', T, 'P', 2 * np.exp(log_p[:, j]), fluid)
+
+    h_vapor = props_array('H', 'T', T[:, None], 'P', np.exp(log_p), WATER)
+    h_water = h_vapor - R_WATER * T[:, None] ** 2 * np.gradient(log_p, T, axis=0)
+
+    reference = int(np.argmin(np.abs(x - REFERENCE_FRACTION)))
+    fluid = f'{LIBR}[{x[reference]}]'
+    h_reference = props_array('H', 'T', T, 'P', 2 * np.exp(log_p[:, reference]), fluid)
+    # d(h/x)/dx = -h_water/x^2, by the trapezoid rule
+    slope = -h_water / x ** 2
+    integral = np.concatenate([np.zeros((t.size, 1)),
+                               np.cumsum(0.5 * (slope[:, 1:] + slope[:, :-1]) * np.diff(x), axis=1)], axis=1)
+    integral -= integral[:, [reference]]
+    enthalpy = x * (h_reference[:, None] / x[reference] + integral)
+    return {'t': t, 'x': x, 'log_p': log_p, 'h': enthalpy, 'density': density}
+
+
+def build_solution_table(path: str) -> int:
+    """Write the LiBr solution table, returning its number of cells"""
+    columns = solution_columns()
+    write_table(path, columns, {'solution': LIBR})
+    return int(columns['h'].size)
+
+
+class SolutionProperties:
+    """Vectorized LiBr-water solution properties interpolated from the solution table
+
+    Temperatures are in C and mass fractions are of LiBr. Points outside
+    the table give NaN.
+    """
+
+    def __init__(self, columns):
+        self.t = np.asarray(columns['t'])
+        self.x = np.asarray(columns['x'])
+        self.columns = columns
+
+    @classmethod
+    def get(cls) -> 'SolutionProperties':
+        """The memory-mapped table when one was built, otherwise one computed once per process"""
+        global _solution
+        table = open_table(solution_table_path())
+        if table is not None:
+            if _solution is None or _solution.columns is not table:
+                _solution = cls(table)
+        elif _solution is None:
+            _solution = cls(solution_columns())
+        return _solution
+
+    @staticmethod
+    def _cell(grid: np.ndarray, value):
+        """Lower grid index and interpolation weight of each value, NaN weight outside the grid"""
+        step = grid[1] - grid[0]
+        position = (np.asarray(value, dtype=float) - grid[0]) / step
+        inside = (position >= 0) & (position <= grid.size - 1)
+        index = np.clip(np.floor(np.nan_to_num(position)), 0, grid.size - 2).astype(int)
+        weight = np.where(inside, position - index, np.nan)
+        return index, weight
+
+    def _interpolate(self, column: str, t, x) -> np.ndarray:
+        t, x = np.broadcast_arrays(np.asarray(t, dtype=float), np.asarray(x, dtype=float))
+        values = self.columns[column]
+        i, u = self._cell(self.t, t)
+        j, v = self._cell(self.x, x)
+        return ((1 - u) * (1 - v) * values[i, j] + u * (1 - v) * values[i + 1, j]
+                + (1 - u) * v * values[i, j + 1] + u * v * values[i + 1, j + 1])
+
+    @staticmethod
+    def _invert(curves: np.ndarray, target: np.ndarray, grid: np.ndarray) -> np.ndarray:
+        """Where each row of curves, monotonic along grid, crosses its target"""
+        if curves[..., -1].mean() < curves[..., 0].mean():
+            curves, target = -curves, -target
+        above = (curves > target[:, None]).sum(axis=1)
+        j = np.clip(curves.shape[1] - above - 1, 0, grid.size - 2)
+        rows = np.arange(curves.shape[0])
+        low, high = curves[rows, j], curves[rows, j + 1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fraction = (target - low) / (high - low)
+        inside = (fraction >= 0) & (fraction <= 1)
+        return np.where(inside, grid[j] + fraction * (grid[1] - grid[0]), np.nan)
+
+    def _along_x(self, column: str, t, target) -> np.ndarray:
+        """Mass fraction at which a column reaches target at temperature t"""
+        t, target = np.broadcast_arrays(np.asarray(t, dtype=float), np.asarray(target, dtype=float))
+        values = self.columns[column]
+        i, u = self._cell(self.t, t.ravel())
+        curves = (1 - u)[:, None] * values[i] + u[:, None] * values[i + 1]
+        return self._invert(curves, target.ravel(), self.x).reshape(t.shape)
+
+    def _along_t(self, column: str, x, target) -> np.ndarray:
+        """Temperature at which a column reaches target at mass fraction x"""
+        x, target = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(target, dtype=float))
+        values = self.columns[column]
+        j, v = self._cell(self.x, x.ravel())
+        curves = (1 - v)[:, None] * values[:, j].T + v[:, None] * values[:, j + 1].T
+        return self._invert(curves, target.ravel(), self.t).reshape(x.shape)
+
+    def pressure(self, t, x) -> np.ndarray:
+        """Water vapor pressure over the solution (Pa)"""
+        return np.exp(self._interpolate('log_p', t, x))
+
+    def enthalpy(self, t, x) -> np.ndarray:
+        """Solution enthalpy (J/kg), on the same water reference as CoolProp's Water"""
+        return self._interpolate('h', t, x)
+
+    def density(self, t, x) -> np.ndarray:
+        return self._interpolate('density', t, x)
+
+    def concentration(self, t, p) -> np.ndarray:
+        """Mass fraction of the solution in equilibrium with water vapor at p (Pa)"""
+        return self._along_x('log_p', t, np.log(p))
+
+    def equilibrium_temperature(self, x, p) -> np.ndarray:
+        """Temperature of the solution in equilibrium with water vapor at p (Pa)"""
+        return self._along_t('log_p', x, np.log(p))
+
+    def temperature(self, x, h) -> np.ndarray:
+        """Temperature of the solution from its enthalpy"""
+        return self._along_t('h', x, h)
+
+
+class BatchAbsorptionCycle:
+    """Single-effect LiBr-water absorption cycle for arrays of operating points
+
+    Weak solution leaves the absorber saturated at the absorber temperature
+    and evaporator pressure, strong solution leaves the generator saturated
+    at the generator temperature and condenser pressure, and a solution heat
+    exchanger recovers heat from the strong solution. Generator vapor leaves
+    at the equilibrium temperature of the incoming weak solution.
+    Quantities are per kg of water vapor generated. Points follow the usual
+    numbering: 1-6 solution (absorber exit, pump exit, generator inlet,
+    generator exit, heat exchanger exit, valve exit), 7-10 water
+    (generator vapor, condensate, evaporator inlet and exit).
+    """
+
+    def __init__(self, t_evap, t_cond, t_gen, t_abs,
+                 effectiveness: float = DEFAULT_HEAT_EXCHANGER_EFFECTIVENESS):
+        self.t_evap = np.asarray(t_evap, dtype=float)
+        self.t_cond = np.asarray(t_cond, dtype=float)
+        self.t_gen = np.asarray(t_gen, dtype=float)
+        self.t_abs = np.asarray(t_abs, dtype=float)
+        self.shape = np.broadcast_shapes(self.t_evap.shape, self.t_cond.shape, self.t_gen.shape, self.t_abs.shape)
+        self.effectiveness = effectiveness
+        self.solution = SolutionProperties.get()
+
+    def calculate(self) -> Dict[str, np.ndarray]:
+        solution = self.solution
+        T_evap = self.t_evap + 273.15
+        T_cond = self.t_cond + 273.15
+        p_low = props_array('P', 'T', T_evap, 'Q', 1, WATER)
+        p_high = props_array('P', 'T', T_cond, 'Q', 0, WATER)
+
+        # Point 1: Absorber exit (weak solution)
+        x_weak = solution.concentration(self.t_abs, p_low)
+        h1 = solution.enthalpy(self.t_abs, x_weak)
+        # Point 4: Generator exit (strong solution)
+        x_strong = solution.concentration(self.t_gen, p_high)
+        h4 = solution.enthalpy(self.t_gen, x_strong)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weak_flow = x_strong / (x_strong - x_weak)
+        strong_flow = weak_flow - 1
+
+        # Point 2: Pump exit
+        w_pump = weak_flow * (p_high - p_low) / solution.density(self.t_abs, x_weak)
+        h2 = h1 + w_pump / weak_flow
+        # Point 5: Strong solution leaving the heat exchanger, the side with the smaller heat capacity
+        t5 = self.t_gen - self.effectiveness * (self.t_gen - self.t_abs)
+        h5 = solution.enthalpy(t5, x_strong)
+        # Point 3: Weak solution entering the generator
+        h3 = h2 + strong_flow * (h4 - h5) / weak_flow
+        t3 = solution.temperature(x_weak, h3)
+        # Point 6: After the solution valve
+        h6 = h5
+
+        # Point 7: Generator vapor, in equilibrium with the incoming weak solution
+        t7 = solution.equilibrium_temperature(x_weak, p_high)
+        h7, s7 = props_arrays(['H', 'S'], 'T', t7 + 273.15, 'P', p_high, WATER)
+        # Point 8: Condenser exit (saturated liquid)
+        h8, s8 = props_arrays(['H', 'S'], 'T', T_cond, 'Q', 0, WATER)
+        # Point 9: After the expansion valve
+        h9 = h8
+        t9, s9, x9 = props_arrays(['T', 'S', 'Q'], 'P', p_low, 'H', h9, WATER)
+        # Point 10: Evaporator exit (saturated vapor)
+        h10, s10 = props_arrays(['H', 'S'], 'T', T_evap, 'Q', 1, WATER)
+
+        q_evap = h10 - h9
+        q_cond = h7 - h8
+        q_gen = h7 + strong_flow * h4 - weak_flow * h3
+        q_abs = h10 + strong_flow * h6 - weak_flow * h1
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            valid = (np.isfinite(q_evap) & np.isfinite(q_gen) & np.isfinite(q_abs) & (x_strong > x_weak)
+                     & (q_gen > 0) & (self.t_evap < self.t_cond) & (self.t_cond < self.t_gen))
+            cop = np.where(valid, q_evap / (q_gen + w_pump), np.nan)
+
+        results = {
+            'valid': valid,
+            'cop': cop,
+            'cooling_capacity': q_evap / 1000,  # kJ/kg
+            'generator_heat': q_gen / 1000,  # kJ/kg
+            'absorber_heat': q_abs / 1000,  # kJ/kg
+            'condenser_heat': q_cond / 1000,  # kJ/kg
+            'pump_work': w_pump / 1000,  # kJ/kg
+            'heat_exchanger_duty': strong_flow * (h4 - h5) / 1000,  # kJ/kg
+            'circulation_ratio': weak_flow,
+            'weak_concentration': x_weak,
+            'strong_concentration': x_strong,
+            'p_evap': p_low / 1000,  # kPa
+            'p_cond': p_high / 1000,  # kPa
+            't1': self.t_abs, 't3': t3, 't4': self.t_gen, 't5': t5, 't7': t7,
+            't8': self.t_cond, 't9': t9 - 273.15, 't10': self.t_evap,
+            'h1': h1 / 1000, 'h2': h2 / 1000, 'h3': h3 / 1000, 'h4': h4 / 1000, 'h5': h5 / 1000,
+            'h6': h6 / 1000, 'h7': h7 / 1000, 'h8': h8 / 1000, 'h9': h9 / 1000, 'h10': h10 / 1000,
+            's7': s7 / 1000, 's8': s8 / 1000, 's9': s9 / 1000, 's10': s10 / 1000, 'x9': x9,
+        }
+        return {key: np.array(np.broadcast_to(value, self.shape)) for key, value in results.items()}
+
+
+def sweep_absorption(t_evap: float, t_cond: float, generator_temps, absorber_temps,
+                     effectiveness: float = DEFAULT_HEAT_EXCHANGER_EFFECTIVENESS) -> Dict:
+    """Absorption cycle over every generator and absorber temperature pair, solved as one batch
+
+    Grids are indexed [generator][absorber], with None where the cycle is infeasible.
+    """
+    generator_temps = np.asarray(generator_temps, dtype=float)
+    absorber_temps = np.asarray(absorber_temps, dtype=float)
+    results = BatchAbsorptionCycle(t_evap, t_cond, generator_temps[:, None], absorber_temps[None, :],
+                                   effectiveness).calculate()
+    valid = results['valid']
+
+    def grid(key: str, digits: int):
+        values = np.round(results[key], digits).astype(object)
+        values[~valid] = None
+        return values.tolist()
+
+    return {
+        'evaporator_temp': t_evap,
+        'condenser_temp': t_cond,
+        'effectiveness': effectiveness,
+        'generator_temps': generator_temps.tolist(),
+        'absorber_temps': absorber_temps.tolist(),
+        'cop': grid('cop', 4),
+        'generator_heat': grid('generator_heat', 2),
+        'circulation_ratio': grid('circulation_ratio', 3),
+        'weak_concentration': grid('weak_concentration', 4),
+        'strong_concentration': grid('strong_concentration', 4),
+    }
@@ -0,0 +1,104 @@
+import numpy as np
+from typing import Dict
+
+from core import metrics
+from .properties import constant, props_arrays
+
+BATCH_SOLVES = metrics.counter('batch_cycle_points_total', 'Operating points solved by batch vapor compression cycles')
+BATCH_SOLVE_SECONDS = metrics.histogram('batch_cycle_solve_seconds', 'Time to solve one batch of vapor compression '
+                                        'cycles')
+
+
+class BatchVaporCompressionCycle:
+    """Vapor compression cycle solved for arrays of evaporator/condenser temperatures
+
+    Every property is evaluated for all operating points at once on the
+    thread's pooled AbstractState, so batches can run on concurrent threads.
+    The temperature arrays are only broadcast against each other where a
+    property depends on both, so evaporator states of a (n, 1) by (1, m)
+    grid cost n evaluations rather than n * m. The compressor isentropic
+    efficiency broadcasts the same way and defaults to ideal compression.
+    """
+
+    def __init__(self, refrigerant: str, t_evap, t_cond, expansion_device: str = 'throttle',
+                 isentropic_efficiency=1.0):
+        self.refrigerant = refrigerant
+        self.t_evap = np.asarray(t_evap, dtype=float) + 273.15
+        self.t_cond = np.asarray(t_cond, dtype=float) + 273.15
+        self.isentropic_efficiency = np.asarray(isentropic_efficiency, dtype=float)
+        self.shape = np.broadcast_shapes(self.t_evap.shape, self.t_cond.shape, self.isentropic_efficiency.shape)
+        self.expansion_device = expansion_device
+        self.t_min = constant('Tmin', refrigerant)
+        self.t_crit = constant('Tcrit', refrigerant)
+
+    def _props(self, outputs, name1: str, value1, name2: str, value2):
+        """One output array, or a list of them for a list of outputs of the same states"""
+        value1, value2 = np.broadcast_arrays(np.asarray(value1, dtype=float), np.asarray(value2, dtype=float))
+        names = [outputs] if isinstance(outputs, str) else outputs
+        if value1.size == 0:
+            results = [value1.copy() for _ in names]
+        else:
+            results = props_arrays(names, name1, value1, name2, value2, self.refrigerant)
+        for result in results:
+            result[~np.isfinite(result)] = np.nan
+        return results[0] if isinstance(outputs, str) else results
+
+    def calculate(self) -> Dict[str, np.ndarray]:
+        with BATCH_SOLVE_SECONDS.time():
+            results = self._calculate()
+        BATCH_SOLVES.inc(int(np.prod(self.shape)))
+        return results
+
+    def _calculate(self) -> Dict[str, np.ndarray]:
+        p_evap = self._props('P', 'T', self.t_evap, 'Q', 1)
+        p_cond = self._props('P', 'T', self.t_cond, 'Q', 0)
+
+        # Point 1: Evaporator exit (saturated vapor)
+        h1, s1, d1 = self._props(['H', 'S', 'D'], 'P', p_evap, 'Q', 1)
+
+        # Point 2: Compressor exit, from the isentropic discharge enthalpy
+        if np.all(self.isentropic_efficiency == 1):
+            h2, t2 = self._props(['H', 'T'], 'P', p_cond, 'S', s1)
+        else:
+            h2 = h1 + (self._props('H', 'P', p_cond, 'S', s1) - h1) / self.isentropic_efficiency
+            t2 = self._props('T', 'P', p_cond, 'H', h2)
+
+        # Point 3: Condenser exit (saturated liquid)
+        h3, s3 = self._props(['H', 'S'], 'P', p_cond, 'Q', 0)
+
+        # Point 4: After expansion
+        if self.expansion_device == 'throttle':
+            h4 = h3
+            s4, t4, x4 = self._props(['S', 'T', 'Q'], 'P', p_evap, 'H', h4)
+        else:
+            s4 = s3
+            h4 = self._props('H', 'P', p_evap, 'S', s4)
+            t4, x4 = self._props(['T', 'Q'], 'P', p_evap, 'H', h4)
+
+        q_evap = h1 - h4
+        w_comp = h2 - h1
+        w_turb = h3 - h4 if self.expansion_device == 'turbine' else np.zeros_like(h1)
+        net_work = w_comp - w_turb
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            valid = (np.isfinite(q_evap) & np.isfinite(net_work) & (net_work > 0)
+                     & (self.isentropic_efficiency > 0) & (self.isentropic_efficiency <= 1)
+                     & (self.t_evap < self.t_cond) & (self.t_evap >= self.t_min) & (self.t_cond < self.t_crit))
+            cop = np.where(valid, q_evap / net_work, np.nan)
+
+        results = {
+            'valid': valid,
+            'cop': cop,
+            'cooling_capacity': q_evap / 1000,  # kJ/kg
+            'compressor_work': w_comp / 1000,  # kJ/kg
+            'net_work': net_work / 1000,  # kJ/kg
+            'suction_density': d1,  # kg/m3
+            'discharge_temp': t2 - 273.15,
+            'pressure_ratio': p_cond / p_evap,
+            'p_evap': p_evap / 1000,  # kPa
+            'p_cond': p_cond / 1000,  # kPa
+            'h1': h1 / 1000, 'h2': h2 / 1000, 'h3': h3 / 1000, 'h4': h4 / 1000,
+            's1': s1 / 1000, 's3': s3 / 1000, 's4': s4 / 1000,
+            't4': t4 - 273.15, 'x4': x4,
+        }
+        return {key: np.array(np.broadcast_to(value, self.shape)) for key, value in results.items()}
@@ -0,0 +1,71 @@
+from typing import Dict, List
+
+from .batch import BatchVaporCompressionCycle
+from .multistage import DEFAULT_CASCADE_DELTA_T, BatchCascadeCycle, BatchTwoStageCycle
+from .properties import get_state
+
+MULTISTAGE_FIELDS = ['cop', 'cooling_capacity', 'net_work', 'mass_ratio', 'discharge_temp', 'p_evap', 'p_cond']
+
+
+def warm_fluids(fluids: List[str]):
+    """Load fluid data into CoolProp and the pooled states of the current thread"""
+    for fluid in fluids:
+        try:
+            get_state(fluid)
+        except ValueError:
+            continue
+
+
+def compare_fluid(fluid: str, t_evap: float, t_cond: float, expansion_device: str = 'throttle') -> Dict:
+    """Solve one refrigerant at the given operating conditions"""
+    try:
+        results = BatchVaporCompressionCycle(fluid, t_evap, t_cond, expansion_device).calculate()
+    except ValueError as e:
+        return {'valid': False, 'error': str(e)}
+
+    if not results['valid']:
+        return {'valid': False, 'error': 'Operating point outside the refrigerant range'}
+
+    cooling_capacity = float(results['cooling_capacity'])  # kJ/kg
+    return {
+        'valid': True,
+        'cop': float(results['cop']),
+        'cooling_capacity': cooling_capacity,
+        'volumetric_capacity': cooling_capacity * float(results['suction_density']),  # kJ/m3
+        'compressor_work': float(results['net_work']),  # kJ/kg
+        'discharge_temp': float(results['discharge_temp']),
+        'pressure_ratio': float(results['pressure_ratio']),
+        'p_evap': float(results['p_evap']),
+        'p_cond': float(results['p_cond']),
+    }
+
+
+def _multistage_row(results: Dict, extra_keys: List[str]) -> Dict:
+    if not results['valid']:
+        return {'valid': False, 'error': 'No feasible cycle for these temperatures'}
+    row = {'valid': True}
+    for key in MULTISTAGE_FIELDS + extra_keys:
+        row[key] = float(results[key])
+    row['volumetric_capacity'] = row['cooling_capacity'] * float(results['suction_density'])  # kJ/m3
+    return row
+
+
+def compare_multistage_fluid(fluid: str, high_stage_fluids: List[str], t_evap: float, t_cond: float,
+                             expansion_device: str = 'throttle',
+                             cascade_delta_t: float = DEFAULT_CASCADE_DELTA_T) -> Dict:
+    """Optimised two-stage cycle of a fluid, and cascades with it as the low stage fluid"""
+    try:
+        two_stage = _multistage_row(BatchTwoStageCycle.optimize(fluid, t_evap, t_cond, expansion_device),
+                                    ['intermediate_temp', 'p_int'])
+    except ValueError as e:
+        two_stage = {'valid': False, 'error': str(e)}
+
+    cascades = []
+    for high_stage_fluid in high_stage_fluids:
+        try:
+            results = BatchCascadeCycle.optimize(fluid, high_stage_fluid, t_evap, t_cond, expansion_device,
+                                                 cascade_delta_t)
+            cascades.append(_multistage_row(results, ['cascade_temp', 'p_cascade']))
+        except ValueError as e:
+            cascades.append({'valid': False, 'error': str(e)})
+    return {'two_stage': two_stage, 'cascades': cascades}
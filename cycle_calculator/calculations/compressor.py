@@ -0,0 +1,201 @@
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+
+from .batch import BatchVaporCompressionCycle
+
+# AHRI 540 polynomials have ten coefficients, in the order of ahri_terms
+COEFFICIENT_COUNT = 10
+
+
+def ahri_terms(t_evap, t_cond) -> np.ndarray:
+    """Terms of the AHRI 540 polynomial, stacked on a new last axis
+
+    X = C1 + C2 S + C3 D + C4 S^2 + C5 S D + C6 D^2 + C7 S^3 + C8 D S^2
+        + C9 S D^2 + C10 D^3
+    with S and D the evaporating and condensing dew point temperatures (C).
+    """
+    s, d = np.broadcast_arrays(np.asarray(t_evap, dtype=float), np.asarray(t_cond, dtype=float))
+    return np.stack([np.ones_like(s), s, d, s * s, s * d, d * d, s ** 3, d * s * s, s * d * d, d ** 3], axis=-1)
+
+
+def inside_envelopes(vertices: np.ndarray, t_evap, t_cond) -> np.ndarray:
+    """Whether operating points lie inside each compressor's envelope polygon
+
+    vertices has shape (compressors, n, 2) with (evaporating, condensing)
+    vertices, padded by repeating the last one; padding adds zero-length
+    edges, which never cross the ray. Points on an edge are inside, as
+    envelope limits are inclusive. A compressor without an envelope has NaN
+    vertices and accepts every point. Returns shape (compressors, *points).
+    """
+    s, d = np.broadcast_arrays(np.asarray(t_evap, dtype=float), np.asarray(t_cond, dtype=float))
+    start = vertices[:, :, None, :]
+    end = np.roll(vertices, -1, axis=1)[:, :, None, :]
+    x, y = s.reshape(1, 1, -1), d.reshape(1, 1, -1)
+
+    # Even-odd rule with a ray towards increasing evaporating temperature
+    with np.errstate(divide='ignore', invalid='ignore'):
+        straddles = (start[..., 1] > y) != (end[..., 1] > y)
+        crossing = start[..., 0] + (y - start[..., 1]) * (end[..., 0] - start[..., 0]) / (end[..., 1] - start[..., 1])
+        crosses = straddles & (x < crossing)
+    # The even-odd rule alone leaves out points on the upper and right-hand edges
+    on_edge = ((np.abs((end[..., 0] - start[..., 0]) * (y - start[..., 1])
+                       - (end[..., 1] - start[..., 1]) * (x - start[..., 0])) <= 1e-9)
+               & (np.minimum(start[..., 0], end[..., 0]) <= x) & (x <= np.maximum(start[..., 0], end[..., 0]))
+               & (np.minimum(start[..., 1], end[..., 1]) <= y) & (y <= np.maximum(start[..., 1], end[..., 1])))
+    inside = (np.count_nonzero(crosses, axis=1) % 2 == 1) | on_edge.any(axis=1)
+    unlimited = np.isnan(vertices).any(axis=(1, 2))
+    inside[unlimited] = True
+    return inside.reshape((vertices.shape[0],) + s.shape)
+
+
+class CompressorMap:
+    """AHRI 540 mass flow (kg/h) and power (W) polynomials of one compressor"""
+
+    def __init__(self, name: str, refrigerant: str, mass_flow_coefficients: Sequence[float],
+                 power_coefficients: Sequence[float], envelope: Optional[Sequence[Sequence[float]]] = None):
+        if len(mass_flow_coefficients) != COEFFICIENT_COUNT or len(power_coefficients) != COEFFICIENT_COUNT:
+            raise ValueError(f"AHRI 540 maps have {COEFFICIENT_COUNT} coefficients")
+        if envelope and len(envelope) < 3:
+            raise ValueError("An envelope needs at least three vertices")
+        self.name = name
+        self.refrigerant = refrigerant
+        self.mass_flow_coefficients = [float(c) for c in mass_flow_coefficients]
+        self.power_coefficients = [float(c) for c in power_coefficients]
+        self.envelope = [[float(t_evap), float(t_cond)] for t_evap, t_cond in envelope or []]
+
+    def mass_flow(self, t_evap, t_cond):
+        """Mass flow (kg/s)"""
+        return ahri_terms(t_evap, t_cond) @ np.asarray(self.mass_flow_coefficients) / 3600
+
+    def power(self, t_evap, t_cond):
+        """Electrical power (kW)"""
+        return ahri_terms(t_evap, t_cond) @ np.asarray(self.power_coefficients) / 1000
+
+    def contains(self, t_evap, t_cond):
+        """Whether operating points lie inside the envelope"""
+        return CompressorCatalog.from_maps([self]).contains(t_evap, t_cond)[0]
+
+    def rate(self, t_evap: float, t_cond: float, refrigerating_effect: float, ideal_work: float) -> Dict:
+        """Map results at one operating point of a cycle
+
+        refrigerating_effect and ideal_work are the cycle's per-kg evaporator
+        duty and isentropic compressor work (kJ/kg). As in
+        CompressorCatalog.evaluate, capacity is the map mass flow times the
+        refrigerating effect; points outside the envelope are rated but
+        flagged.
+        """
+        mass_flow = float(self.mass_flow(t_evap, t_cond))  # kg/s
+        power = float(self.power(t_evap, t_cond))  # kW
+        if not (mass_flow > 0 and power > 0):
+            raise ValueError(f"The map of {self.name} gives no mass flow or power at these temperatures")
+        capacity = mass_flow * refrigerating_effect  # kW
+        return {
+            'name': self.name,
+            'mass_flow': mass_flow,
+            'capacity': capacity,
+            'power': power,
+            'cop': capacity / power,
+            'isentropic_efficiency': mass_flow * ideal_work / power,
+            'inside_envelope': bool(self.contains(t_evap, t_cond)),
+        }
+
+
+class CompressorCatalog:
+    """AHRI 540 mass flow and power maps of many compressors, evaluated together
+
+    Maps give mass flow in kg/h and power in W from the dew point
+    temperatures. Every compressor is evaluated on every operating point in
+    one tensor contraction, and the refrigerating effect comes from one
+    batch cycle solve per refrigerant, so selecting from hundreds of
+    compressors or tracing their envelopes is a single pass. Capacity is the
+    map mass flow times the refrigerating effect of the saturated cycle.
+    """
+
+    def __init__(self, names: List[str], refrigerants: List[str], mass_flow_coefficients, power_coefficients,
+                 envelopes: Sequence[Optional[Sequence[Sequence[float]]]]):
+        self.names = list(names)
+        self.refrigerants = list(refrigerants)
+        self.mass_flow_coefficients = np.asarray(mass_flow_coefficients, dtype=float).reshape(-1, COEFFICIENT_COUNT)
+        self.power_coefficients = np.asarray(power_coefficients, dtype=float).reshape(-1, COEFFICIENT_COUNT)
+
+        vertex_count = max([len(envelope) for envelope in envelopes if envelope] or [1])
+        self.envelopes = np.full((len(self.names), vertex_count, 2), np.nan)
+        for i, envelope in enumerate(envelopes):
+            if envelope:
+                envelope = np.asarray(envelope, dtype=float)
+                self.envelopes[i, :len(envelope)] = envelope
+                self.envelopes[i, len(envelope):] = envelope[-1]
+
+    def __len__(self):
+        return len(self.names)
+
+    def contains(self, t_evap, t_cond) -> np.ndarray:
+        """Whether operating points lie inside each envelope, with shape (compressors, *points)"""
+        return inside_envelopes(self.envelopes, t_evap, t_cond)
+
+    @classmethod
+    def from_maps(cls, maps: List['CompressorMap']) -> 'CompressorCatalog':
+        return cls([m.name for m in maps], [m.refrigerant for m in maps],
+                   [m.mass_flow_coefficients for m in maps], [m.power_coefficients for m in maps],
+                   [m.envelope for m in maps])
+
+    def evaluate(self, t_evap, t_cond, expansion_device: str = 'throttle') -> Dict[str, np.ndarray]:
+        """Map results of every compressor at broadcastable operating points
+
+        Arrays have shape (compressors, *points): mass flow (kg/s), power,
+        capacity (kW), COP, the overall isentropic efficiency implied by the
+        map, and whether the point is inside the envelope with a valid cycle.
+        """
+        terms = ahri_terms(t_evap, t_cond)
+        mass_flow = np.einsum('ck,...k->c...', self.mass_flow_coefficients, terms) / 3600  # kg/s
+        power = np.einsum('ck,...k->c...', self.power_coefficients, terms) / 1000  # kW
+
+        refrigerating_effect = np.full(mass_flow.shape, np.nan)  # kJ/kg
+        ideal_work = np.full(mass_flow.shape, np.nan)  # kJ/kg
+        for refrigerant in set(self.refrigerants):
+            rows = np.array([r == refrigerant for r in self.refrigerants])
+            try:
+                cycle = BatchVaporCompressionCycle(refrigerant, t_evap, t_cond, expansion_device).calculate()
+            except ValueError:
+                continue
+            refrigerating_effect[rows] = np.where(cycle['valid'], cycle['cooling_capacity'], np.nan)
+            ideal_work[rows] = cycle['compressor_work']
+
+        capacity = mass_flow * refrigerating_effect
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cop = capacity / power
+            efficiency = mass_flow * ideal_work / power
+        valid = self.contains(t_evap, t_cond) & np.isfinite(cop) & (mass_flow > 0) & (power > 0)
+        results = {
+            'mass_flow': mass_flow,
+            'power': power,
+            'capacity': capacity,
+            'cop': cop,
+            'isentropic_efficiency': efficiency,
+        }
+        results = {key: np.where(valid, value, np.nan) for key, value in results.items()}
+        results['valid'] = valid
+        return results
+
+    def select(self, t_evap: float, t_cond: float, capacity: float, expansion_device: str = 'throttle',
+               max_oversize: Optional[float] = None) -> List[Dict]:
+        """Compressors meeting a capacity (kW) inside their envelope, by ascending power
+
+        max_oversize limits the capacity to that multiple of the required one.
+        """
+        results = self.evaluate(t_evap, t_cond, expansion_device)
+        fits = results['valid'] & (results['capacity'] >= capacity)
+        if max_oversize is not None:
+            fits &= results['capacity'] <= capacity * max_oversize
+        order = np.flatnonzero(fits)
+        order = order[np.argsort(results['power'][order], kind='stable')]
+        return [{
+            'index': int(i),
+            'name': self.names[i],
+            'refrigerant': self.refrigerants[i],
+            'capacity': float(results['capacity'][i]),
+            'power': float(results['power'][i]),
+            'mass_flow': float(results['mass_flow'][i]),
+            'cop': float(results['cop'][i]),
+            'isentropic_efficiency': float(results['isentropic_efficiency'][i]),
+        } for i in order]
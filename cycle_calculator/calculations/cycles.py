@@ -1,13 +1,17 @@
+from .absorption import DEFAULT_HEAT_EXCHANGER_EFFECTIVENESS, BatchAbsorptionCycle, is_water
+from .compressor import CompressorMap
+from .properties import props
 from .refrigerants import CoolPropRefrigerant
-from typing import Dict
-import CoolProp.CoolProp as CP
+from typing import Dict, Optional
 
 class VaporCompressionCycle:
-    def __init__(self, refrigerant: str, t_evap: float, t_cond: float, expansion_device: str = 'throttle'):
+    def __init__(self, refrigerant: str, t_evap: float, t_cond: float, expansion_device: str = 'throttle',
+                 compressor: Optional[CompressorMap] = None):
         self.refrigerant = CoolPropRefrigerant(refrigerant)
         self.t_evap = t_evap + 273.15
         self.t_cond = t_cond + 273.15
         self.expansion_device = expansion_device
+        self.compressor = compressor
 
     def calculate(self) -> Dict:
         p_evap = self.refrigerant.get_pressure(self.t_evap)
@@ -16,21 +20,21 @@ class VaporCompressionCycle:
         h1 = self.refrigerant.get_enthalpy(p_evap, quality=1.0)
         s1 = self.refrigerant.get_entropy(p_evap, quality=1.0)
 
-        h2 = CP.PropsSI('H', 'P', p_cond, 'S', s1, self.refrigerant.name)
-        t2 = CP.PropsSI('T', 'P', p_cond, 'S', s1, self.refrigerant.name)
+        h2 = props('H', 'P', p_cond, 'S', s1, self.refrigerant.name)
+        t2 = props('T', 'P', p_cond, 'S', s1, self.refrigerant.name)
 
         h3 = self.refrigerant.get_enthalpy(p_cond, quality=0.0)
         s3 = self.refrigerant.get_entropy(p_cond, quality=0.0)
 
         if self.expansion_device == 'throttle':
             h4 = h3
-            s4 = CP.PropsSI('S', 'P', p_evap, 'H', h4, self.refrigerant.name)
+            s4 = props('S', 'P', p_evap, 'H', h4, self.refrigerant.name)
         else:
             s4 = s3
-            h4 = CP.PropsSI('H', 'P', p_evap, 'S', s4, self.refrigerant.name)
+            h4 = props('H', 'P', p_evap, 'S', s4, self.refrigerant.name)
 
-        t4 = CP.PropsSI('T', 'P', p_evap, 'H', h4, self.refrigerant.name)
-        x4 = CP.PropsSI('Q', 'P', p_evap, 'H', h4, self.refrigerant.name)
+        t4 = props('T', 'P', p_evap, 'H', h4, self.refrigerant.name)
+        x4 = props('Q', 'P', p_evap, 'H', h4, self.refrigerant.name)
 
         q_evap = h1 - h4
         w_comp = h2 - h1
@@ -38,7 +42,7 @@ class VaporCompressionCycle:
         net_work = w_comp - w_turb
         cop = q_evap / net_work
 
-        return {
+        results = {
             'cop': round(cop, 3),
             'cooling_capacity': round(q_evap / 1000, 2),
             'points': {
@@ -49,32 +53,61 @@ class VaporCompressionCycle:
             }
         }
 
-class AbsorptionCycle:
-    def __init__(self, refrigerant: str, t_evap: float, t_cond: float, t_gen: float, t_abs: float):
-        self.refrigerant = CoolPropRefrigerant(refrigerant)
-        self.t_evap = t_evap + 273.15
-        self.t_cond = t_cond + 273.15
-        self.t_gen = t_gen + 273.15
-        self.t_abs = t_abs + 273.15
+        if self.compressor is not None:
+            # Real mass flow and power from the compressor map replace ideal compression
+            rating = self.compressor.rate(self.t_evap - 273.15, self.t_cond - 273.15, q_evap / 1000, w_comp / 1000)
+            results['compressor'] = {
+                'name': rating['name'],
+                'mass_flow': round(rating['mass_flow'], 5),
+                'capacity': round(rating['capacity'], 3),
+                'power': round(rating['power'], 3),
+                'cop': round(rating['cop'], 3),
+                'isentropic_efficiency': round(rating['isentropic_efficiency'], 3),
+                'inside_envelope': rating['inside_envelope'],
+            }
+        return results
 
-    def calculate(self) -> Dict:
-        p_evap = self.refrigerant.get_pressure(self.t_evap)
-        p_cond = self.refrigerant.get_pressure(self.t_cond)
+class AbsorptionCycle:
+    """Single-effect LiBr-water absorption cycle, with water as the refrigerant"""
 
-        h1 = self.refrigerant.get_enthalpy(p_evap, quality=1.0)
-        h2 = self.refrigerant.get_enthalpy(p_cond, quality=0.0)
-        h3 = h2
+    def __init__(self, refrigerant: str, t_evap: float, t_cond: float, t_gen: float, t_abs: float,
+                 effectiveness: float = DEFAULT_HEAT_EXCHANGER_EFFECTIVENESS):
+        if not is_water(refrigerant):
+            raise ValueError("LiBr absorption cycles use water (R-718) as the refrigerant")
+        self.refrigerant = refrigerant
+        self.t_evap = t_evap
+        self.t_cond = t_cond
+        self.t_gen = t_gen
+        self.t_abs = t_abs
+        self.effectiveness = effectiveness
 
-        q_evap = h1 - h3
-        q_gen = 1800000
-        cop = q_evap / q_gen
+    def calculate(self) -> Dict:
+        r = BatchAbsorptionCycle(self.t_evap, self.t_cond, self.t_gen, self.t_abs, self.effectiveness).calculate()
+        if not r['valid']:
+            raise ValueError("No feasible absorption cycle for these temperatures")
+        r = {key: float(value) for key, value in r.items()}
+        p_evap, p_cond = round(r['p_evap'], 3), round(r['p_cond'], 3)
+        x_weak, x_strong = round(r['weak_concentration'], 4), round(r['strong_concentration'], 4)
 
         return {
-            'cop': round(cop, 3),
-            'cooling_capacity': round(q_evap / 1000, 2),
+            'cop': round(r['cop'], 3),
+            'cooling_capacity': round(r['cooling_capacity'], 2),
+            'generator_heat': round(r['generator_heat'], 2),
+            'absorber_heat': round(r['absorber_heat'], 2),
+            'condenser_heat': round(r['condenser_heat'], 2),
+            'circulation_ratio': round(r['circulation_ratio'], 2),
             'points': {
-                1: {'h': round(h1/1000, 2), 't': round(self.t_evap-273.15, 1), 'p': round(p_evap/1000, 1)},
-                2: {'h': round(h2/1000, 2), 't': round(self.t_cond-273.15, 1), 'p': round(p_cond/1000, 1)},
-                3: {'h': round(h3/1000, 2), 't': round(self.t_evap-273.15, 1), 'p': round(p_evap/1000, 1)}
+                1: {'h': round(r['h1'], 2), 't': round(r['t1'], 1), 'p': p_evap, 'concentration': x_weak},
+                2: {'h': round(r['h2'], 2), 't': round(r['t1'], 1), 'p': p_cond, 'concentration': x_weak},
+                3: {'h': round(r['h3'], 2), 't': round(r['t3'], 1), 'p': p_cond, 'concentration': x_weak},
+                4: {'h': round(r['h4'], 2), 't': round(r['t4'], 1), 'p': p_cond, 'concentration': x_strong},
+                5: {'h': round(r['h5'], 2), 't': round(r['t5'], 1), 'p': p_cond, 'concentration': x_strong},
+                6: {'h': round(r['h6'], 2), 't': round(r['t5'], 1), 'p': p_evap, 'concentration': x_strong},
+                7: {'h': round(r['h7'], 2), 't': round(r['t7'], 1), 'p': p_cond, 's': round(r['s7'], 3)},
+                8: {'h': round(r['h8'], 2), 't': round(r['t8'], 1), 'p': p_cond, 's': round(r['s8'], 3), 'x': 0.0},
+                9: {'h': round(r['h9'], 2), 't': round(r['t9'], 1), 'p': p_evap, 's': round(r['s9'], 3),
+                    'x': round(r['x9'], 3)},
+                10: {'h': round(r['h10'], 2), 't': round(r['t10'], 1), 'p': p_evap, 's': round(r['s10'], 3),
+                     'x': 1.0},
             }
         }
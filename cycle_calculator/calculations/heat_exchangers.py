@@ -0,0 +1,117 @@
+import numpy as np
+from typing import Dict, List, Optional
+
+AIR_DENSITY = 1.2  # kg/m3
+AIR_SPECIFIC_HEAT = 1006.0  # J/kg.K
+
+
+def effectiveness(ntu, capacity_ratio=0.0) -> np.ndarray:
+    """Counterflow effectiveness from NTU and the capacity rate ratio Cmin/Cmax
+
+    With the refrigerant evaporating or condensing its capacity rate is
+    unbounded, the ratio is 0 and every flow arrangement gives 1 - exp(-NTU).
+    """
+    ntu, capacity_ratio = np.broadcast_arrays(np.asarray(ntu, dtype=float), np.asarray(capacity_ratio, dtype=float))
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        decay = np.exp(-ntu * (1 - capacity_ratio))
+        counterflow = (1 - decay) / (1 - capacity_ratio * decay)
+        balanced = ntu / (1 + ntu)
+    return np.where(np.isclose(capacity_ratio, 1), balanced, counterflow)
+
+
+def log_mean_temperature_difference(dt_in, dt_out) -> np.ndarray:
+    """LMTD of the terminal temperature differences, their mean where they are equal"""
+    dt_in, dt_out = np.broadcast_arrays(np.asarray(dt_in, dtype=float), np.asarray(dt_out, dtype=float))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lmtd = (dt_in - dt_out) / np.log(dt_in / dt_out)
+    return np.where(np.isclose(dt_in, dt_out), (dt_in + dt_out) / 2, lmtd)
+
+
+def minimum_air_flow(duty, t_air_in, t_refrigerant) -> np.ndarray:
+    """Air flow (m3/h) that carries a duty (W) with the air leaving at the refrigerant temperature"""
+    return np.abs(duty) / (AIR_DENSITY * AIR_SPECIFIC_HEAT * np.abs(t_air_in - t_refrigerant)) * 3600
+
+
+def required_ua(duty, air_flow, t_air_in, t_refrigerant) -> np.ndarray:
+    """UA (W/K) an air coil needs for a duty (W) at a refrigerant saturation temperature, by LMTD
+
+    Positive duties cool the air, as in an evaporator, negative ones heat it,
+    as in a condenser. NaN where the air flow cannot carry the duty.
+    """
+    air_capacity_rate = AIR_DENSITY * np.asarray(air_flow, dtype=float) / 3600 * AIR_SPECIFIC_HEAT  # W/K
+    t_air_out = t_air_in - np.asarray(duty, dtype=float) / air_capacity_rate
+    dt_in = np.abs(t_air_in - t_refrigerant)
+    dt_out = np.abs(t_air_out - t_refrigerant)
+    # The air can only approach the refrigerant temperature, never cross it
+    feasible = (dt_in > 0) & ((t_air_in - t_refrigerant) * (t_air_out - t_refrigerant) > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(feasible, np.abs(duty) / log_mean_temperature_difference(dt_in, dt_out), np.nan)
+
+
+class CoilCatalog:
+    """Air coils rated against a refrigerant at uniform saturation temperature
+
+    Every coil of the catalog is rated in one array computation by the
+    effectiveness-NTU method, the refrigerant side having no capacity rate
+    limit. Coil wetting and the superheated and subcooled zones are left
+    out, so ratings are those of a dry coil at the saturation temperature.
+    """
+
+    def __init__(self, names: List[str], heat_transfer_area, u_value, air_flow, fan_power):
+        self.names = list(names)
+        self.heat_transfer_area = np.asarray(heat_transfer_area, dtype=float)  # m2
+        self.u_value = np.asarray(u_value, dtype=float)  # W/m2.K
+        self.air_flow = np.asarray(air_flow, dtype=float)  # m3/h
+        self.fan_power = np.asarray(fan_power, dtype=float)  # W
+
+    def __len__(self):
+        return len(self.names)
+
+    def rate(self, t_air_in: float, t_refrigerant: float) -> Dict[str, np.ndarray]:
+        """Duty (W, positive when cooling the air), air outlet temperature, NTU and effectiveness of every coil"""
+        ua = self.u_value * self.heat_transfer_area  # W/K
+        air_capacity_rate = AIR_DENSITY * self.air_flow / 3600 * AIR_SPECIFIC_HEAT  # W/K
+        ntu = ua / air_capacity_rate
+        eps = effectiveness(ntu)
+        duty = eps * air_capacity_rate * (t_air_in - t_refrigerant)
+        return {
+            'ua': ua,
+            'ntu': ntu,
+            'effectiveness': eps,
+            'duty': duty,
+            'air_outlet_temp': t_air_in - duty / air_capacity_rate,
+        }
+
+    def select(self, duty: float, t_air_in: float, t_refrigerant: float,
+               max_oversize: Optional[float] = None, limit: Optional[int] = None) -> List[Dict]:
+        """Coils meeting a duty (W), smallest heat transfer area first
+
+        The duty is positive for evaporators and negative for condensers,
+        matching the sign of the rating. max_oversize caps the rated duty at
+        that multiple of the required one. Each option also carries the UA
+        its air flow needs for the duty by LMTD, to compare with its own.
+        """
+        ratings = self.rate(t_air_in, t_refrigerant)
+        ua_needed = required_ua(duty, self.air_flow, t_air_in, t_refrigerant)
+        margin = ratings['duty'] / duty if duty else np.full(len(self), np.nan)
+        fits = margin >= 1
+        if max_oversize is not None:
+            fits &= margin <= max_oversize
+        order = np.flatnonzero(fits)
+        order = order[np.lexsort((self.fan_power[order], self.heat_transfer_area[order]))]
+        if limit is not None:
+            order = order[:limit]
+        return [{
+            'index': int(i),
+            'name': self.names[i],
+            'duty': float(abs(ratings['duty'][i])),
+            'margin': float(margin[i]),
+            'ua': float(ratings['ua'][i]),
+            'required_ua': float(ua_needed[i]),
+            'ntu': float(ratings['ntu'][i]),
+            'effectiveness': float(ratings['effectiveness'][i]),
+            'air_outlet_temp': float(ratings['air_outlet_temp'][i]),
+            'heat_transfer_area': float(self.heat_transfer_area[i]),
+            'air_flow': float(self.air_flow[i]),
+            'fan_power': float(self.fan_power[i]),
+        } for i in order]
@@ -0,0 +1,164 @@
+import numpy as np
+from typing import Dict, Optional
+
+from .batch import BatchVaporCompressionCycle
+from .optimize import find_roots
+from .properties import constant
+
+# Quantities a design can be solved for, in the units of compare_fluid
+TARGETS = ['cop', 'cooling_capacity', 'volumetric_capacity']
+UNKNOWNS = ['evaporator_temp', 'condenser_temp', 'isentropic_efficiency']
+
+# Smallest lift between evaporator and condenser searched (K), and the distance kept from the critical point
+MIN_LIFT = 1.0
+CRITICAL_MARGIN = 0.5
+# Resolution of the solved temperatures (K)
+TEMPERATURE_TOLERANCE = 1e-4
+
+
+def _target_values(results: Dict[str, np.ndarray], target: str) -> np.ndarray:
+    if target == 'volumetric_capacity':
+        values = results['cooling_capacity'] * results['suction_density']  # kJ/m3
+    else:
+        values = results[target]
+    return np.where(results['valid'], values, np.nan)
+
+
+class InverseDesign:
+    """Operating temperatures or compressor efficiency that meet target cycle results
+
+    One of the evaporator temperature, condenser temperature or isentropic
+    efficiency is unknown and the others are given. Every target of a batch
+    is solved at once: each root-finding iteration is one batch solve on the
+    thread's pooled CoolProp state. COP and capacity both rise with the
+    evaporator temperature and fall with the condenser temperature, so the
+    root is bracketed by the widest feasible temperature range. The
+    efficiency needs no iteration: the cycle states do not depend on it and
+    COP is solved for in closed form.
+    """
+
+    def __init__(self, refrigerant: str, target: str, values, unknown: str,
+                 evaporator_temp: Optional[float] = None, condenser_temp: Optional[float] = None,
+                 isentropic_efficiency: float = 1.0, expansion_device: str = 'throttle'):
+        if target not in TARGETS:
+            raise ValueError(f"Unknown target: {target}")
+        if unknown not in UNKNOWNS:
+            raise ValueError(f"Unknown quantity to solve for: {unknown}")
+        if unknown == 'isentropic_efficiency' and target != 'cop':
+            raise ValueError("Cooling capacity does not depend on the compressor efficiency")
+        if unknown != 'evaporator_temp' and evaporator_temp is None:
+            raise ValueError("The evaporator temperature is needed")
+        if unknown != 'condenser_temp' and condenser_temp is None:
+            raise ValueError("The condenser temperature is needed")
+        if not 0 < isentropic_efficiency <= 1:
+            raise ValueError("Isentropic efficiency must be above 0 and at most 1")
+
+        self.refrigerant = refrigerant
+        self.target = target
+        self.values = np.atleast_1d(np.asarray(values, dtype=float))
+        self.unknown = unknown
+        self.evaporator_temp = evaporator_temp
+        self.condenser_temp = condenser_temp
+        self.isentropic_efficiency = isentropic_efficiency
+        self.expansion_device = expansion_device
+
+    def _cycle(self, t_evap, t_cond, isentropic_efficiency) -> Dict[str, np.ndarray]:
+        return BatchVaporCompressionCycle(self.refrigerant, t_evap, t_cond, self.expansion_device,
+                                          isentropic_efficiency).calculate()
+
+    def _bounds(self):
+        t_min = constant('Tmin', self.refrigerant) - 273.15
+        t_crit = constant('Tcrit', self.refrigerant) - 273.15 - CRITICAL_MARGIN
+        if self.unknown == 'evaporator_temp':
+            return t_min, self.condenser_temp - MIN_LIFT
+        return self.evaporator_temp + MIN_LIFT, t_crit
+
+    def _solve_temperature(self):
+        low, high = self._bounds()
+        if low >= high:
+            raise ValueError("No feasible temperature range for these conditions")
+
+        def cycle(t):
+            if self.unknown == 'evaporator_temp':
+                return self._cycle(t, self.condenser_temp, self.isentropic_efficiency)
+            return self._cycle(self.evaporator_temp, t, self.isentropic_efficiency)
+
+        solved, evaluations = find_roots(
+            lambda t, rows: _target_values(cycle(t), self.target) - self.values[rows],
+            np.full(self.values.shape, low), np.full(self.values.shape, high), TEMPERATURE_TOLERANCE,
+        )
+        results = cycle(solved)
+        if self.unknown == 'evaporator_temp':
+            results['evaporator_temp'] = solved
+            results['condenser_temp'] = np.full(solved.shape, float(self.condenser_temp))
+        else:
+            results['evaporator_temp'] = np.full(solved.shape, float(self.evaporator_temp))
+            results['condenser_temp'] = solved
+        results['isentropic_efficiency'] = np.full(solved.shape, self.isentropic_efficiency)
+        ends = _target_values(cycle(np.array([low, high])), self.target)
+        return results, evaluations, sorted(float(value) for value in ends if np.isfinite(value))
+
+    def _solve_efficiency(self):
+        ideal = self._cycle(self.evaporator_temp, self.condenser_temp, 1.0)
+        # COP = q / (w_s / eta - w_turb), with w_s the isentropic compressor work
+        isentropic_work = float(ideal['compressor_work'])
+        expander_work = isentropic_work - float(ideal['net_work'])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            efficiency = isentropic_work / (float(ideal['cooling_capacity']) / self.values + expander_work)
+        efficiency = np.where((efficiency > 0) & (efficiency <= 1), efficiency, np.nan)
+        results = self._cycle(self.evaporator_temp, self.condenser_temp, efficiency)
+        results['evaporator_temp'] = np.full(efficiency.shape, float(self.evaporator_temp))
+        results['condenser_temp'] = np.full(efficiency.shape, float(self.condenser_temp))
+        results['isentropic_efficiency'] = efficiency
+        # Ideal compression bounds the COP any efficiency can reach
+        return results, 1, [0.0, float(ideal['cop'])] if ideal['valid'] else []
+
+    def calculate(self) -> Dict[str, np.ndarray]:
+        if self.unknown == 'isentropic_efficiency':
+            results, evaluations, achievable = self._solve_efficiency()
+        else:
+            results, evaluations, achievable = self._solve_temperature()
+        results['valid'] = results['valid'] & np.isfinite(results[self.unknown])
+        results['volumetric_capacity'] = results['cooling_capacity'] * results['suction_density']
+        results['evaluations'] = evaluations
+        # Target values at the ends of the searched range
+        results['achievable'] = achievable
+        return results
+
+
+def solve_design(refrigerant: str, target: str, values, unknown: str, evaporator_temp: Optional[float] = None,
+                 condenser_temp: Optional[float] = None, isentropic_efficiency: float = 1.0,
+                 expansion_device: str = 'throttle') -> Dict:
+    """Solve a batch of design targets, one row per target"""
+    results = InverseDesign(refrigerant, target, values, unknown, evaporator_temp, condenser_temp,
+                            isentropic_efficiency, expansion_device).calculate()
+    rows = []
+    for i, value in enumerate(np.atleast_1d(np.asarray(values, dtype=float)).tolist()):
+        row = {'target': value, 'valid': bool(results['valid'][i])}
+        if row['valid']:
+            row.update({
+                'evaporator_temp': round(float(results['evaporator_temp'][i]), 3),
+                'condenser_temp': round(float(results['condenser_temp'][i]), 3),
+                'isentropic_efficiency': round(float(results['isentropic_efficiency'][i]), 4),
+                'cop': round(float(results['cop'][i]), 3),
+                'discharge_temp': round(float(results['discharge_temp'][i]), 1),
+            })
+            for key in ('cooling_capacity', 'volumetric_capacity', 'net_work', 'p_evap', 'p_cond'):
+                row[key] = round(float(results[key][i]), 2)
+        else:
+            row['error'] = 'Target not reachable for these conditions'
+        rows.append(row)
+
+    achievable = results['achievable']
+    return {
+        'refrigerant': refrigerant,
+        'target': target,
+        'solve_for': unknown,
+        'evaporator_temp': evaporator_temp,
+        'condenser_temp': condenser_temp,
+        'isentropic_efficiency': isentropic_efficiency if unknown != 'isentropic_efficiency' else None,
+        'expansion_device': expansion_device,
+        'achievable_range': [round(achievable[0], 3), round(achievable[-1], 3)] if achievable else None,
+        'evaluations': results['evaluations'],
+        'designs': rows,
+    }
@@ -0,0 +1,265 @@
+import numpy as np
+from typing import Dict, Optional
+
+from .base import CycleInterface
+from .batch import BatchVaporCompressionCycle
+from .optimize import grid_maximize
+from .properties import constant, props_arrays
+
+# Candidates per level and refinement levels of the intermediate temperature search; COP is flat
+# enough at its peak that the final parabola lands within 1e-7 of a fine brute-force optimum
+SEARCH_CANDIDATES = 7
+SEARCH_LEVELS = 3
+# Cascade heat exchanger: high stage evaporates this many kelvin below the low stage condensing temperature
+DEFAULT_CASCADE_DELTA_T = 5.0
+# Smallest lift (K) kept across each stage when bounding the search
+MIN_STAGE_LIFT = 1.0
+
+
+def _flatten(*arrays):
+    arrays = np.broadcast_arrays(*(np.asarray(array, dtype=float) for array in arrays))
+    return arrays[0].shape, [array.ravel() for array in arrays]
+
+
+class BatchTwoStageCycle(BatchVaporCompressionCycle):
+    """Two-stage compression with an open flash intercooler, for arrays of operating points
+
+    The low-stage discharge is desuperheated to saturated vapor in the flash
+    tank, whose flash gas joins the high-stage suction, and only saturated
+    liquid at the intermediate pressure is expanded to the evaporator.
+    Quantities are per kg circulated through the evaporator.
+    """
+
+    def __init__(self, refrigerant: str, t_evap, t_cond, t_intermediate, expansion_device: str = 'throttle'):
+        super().__init__(refrigerant, t_evap, t_cond, expansion_device)
+        self.t_int = np.asarray(t_intermediate, dtype=float) + 273.15
+        self.shape = np.broadcast_shapes(self.shape, self.t_int.shape)
+
+    def _expand(self, p_low, h_liquid, s_liquid):
+        if self.expansion_device == 'throttle':
+            return h_liquid
+        return self._props('H', 'P', p_low, 'S', s_liquid)
+
+    def calculate(self) -> Dict[str, np.ndarray]:
+        p_evap = self._props('P', 'T', self.t_evap, 'Q', 1)
+        p_int = self._props('P', 'T', self.t_int, 'Q', 1)
+        p_cond = self._props('P', 'T', self.t_cond, 'Q', 0)
+
+        # Point 1: Evaporator exit (saturated vapor)
+        h1, s1, d1 = self._props(['H', 'S', 'D'], 'P', p_evap, 'Q', 1)
+        # Point 2: Low-stage discharge (isentropic compression)
+        h2, t2 = self._props(['H', 'T'], 'P', p_int, 'S', s1)
+        # Point 3: High-stage suction (saturated vapor from the flash tank)
+        h3, s3 = self._props(['H', 'S'], 'P', p_int, 'Q', 1)
+        # Point 4: High-stage discharge (isentropic compression)
+        h4, t4 = self._props(['H', 'T'], 'P', p_cond, 'S', s3)
+        # Point 5: Condenser exit (saturated liquid)
+        h5, s5 = self._props(['H', 'S'], 'P', p_cond, 'Q', 0)
+        # Point 6: Into the flash tank
+        h6 = self._expand(p_int, h5, s5)
+        # Point 7: Flash tank liquid (saturated)
+        h7, s7 = self._props(['H', 'S'], 'P', p_int, 'Q', 0)
+        # Point 8: Into the evaporator
+        h8 = self._expand(p_evap, h7, s7)
+
+        # Flash tank energy balance: high-stage flow per kg through the evaporator
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mass_ratio = (h2 - h7) / (h3 - h6)
+        q_evap = h1 - h8
+        w_low = h2 - h1
+        w_high = mass_ratio * (h4 - h3)
+        w_turb = (mass_ratio * (h5 - h6) + h7 - h8) if self.expansion_device == 'turbine' else np.zeros_like(h1)
+        net_work = w_low + w_high - w_turb
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            valid = (np.isfinite(q_evap) & np.isfinite(net_work) & (net_work > 0) & (mass_ratio > 0)
+                     & (self.t_evap < self.t_int) & (self.t_int < self.t_cond)
+                     & (self.t_evap >= self.t_min) & (self.t_cond < self.t_crit))
+            cop = np.where(valid, q_evap / net_work, np.nan)
+
+        results = {
+            'valid': valid,
+            'cop': cop,
+            'cooling_capacity': q_evap / 1000,  # kJ/kg
+            'compressor_work': (w_low + w_high) / 1000,  # kJ/kg
+            'net_work': net_work / 1000,  # kJ/kg
+            'mass_ratio': mass_ratio,
+            'suction_density': d1,  # kg/m3
+            'discharge_temp': t4 - 273.15,
+            'low_stage_discharge_temp': t2 - 273.15,
+            'intermediate_temp': self.t_int - 273.15,
+            'p_evap': p_evap / 1000,  # kPa
+            'p_int': p_int / 1000,  # kPa
+            'p_cond': p_cond / 1000,  # kPa
+            'h1': h1 / 1000, 'h2': h2 / 1000, 'h3': h3 / 1000, 'h4': h4 / 1000,
+            'h5': h5 / 1000, 'h6': h6 / 1000, 'h7': h7 / 1000, 'h8': h8 / 1000,
+        }
+        return {key: np.array(np.broadcast_to(value, self.shape)) for key, value in results.items()}
+
+    @classmethod
+    def optimize(cls, refrigerant: str, t_evap, t_cond, expansion_device: str = 'throttle') -> Dict[str, np.ndarray]:
+        """Results at the COP-optimal intermediate temperature of every operating point
+
+        All candidate intermediate temperatures of all points are solved as
+        one batch per search level.
+        """
+        shape, (t_evap, t_cond) = _flatten(t_evap, t_cond)
+
+        def cop(t_intermediate):
+            return cls(refrigerant, t_evap[:, None], t_cond[:, None], t_intermediate,
+                       expansion_device).calculate()['cop']
+
+        t_intermediate, _ = grid_maximize(cop, t_evap + MIN_STAGE_LIFT, t_cond - MIN_STAGE_LIFT,
+                                          SEARCH_CANDIDATES, SEARCH_LEVELS)
+        results = cls(refrigerant, t_evap, t_cond, t_intermediate, expansion_device).calculate()
+        return {key: value.reshape(shape) for key, value in results.items()}
+
+
+class BatchCascadeCycle:
+    """Cascade of two single-stage cycles, for arrays of operating points
+
+    The low stage condenses at the cascade temperature into the high stage
+    evaporating cascade_delta_t below it. Quantities are per kg circulated
+    through the low stage.
+    """
+
+    def __init__(self, low_refrigerant: str, high_refrigerant: str, t_evap, t_cond, t_cascade,
+                 expansion_device: str = 'throttle', cascade_delta_t: float = DEFAULT_CASCADE_DELTA_T):
+        self.low_refrigerant = low_refrigerant
+        self.high_refrigerant = high_refrigerant
+        self.t_evap = np.asarray(t_evap, dtype=float)
+        self.t_cond = np.asarray(t_cond, dtype=float)
+        self.t_cascade = np.asarray(t_cascade, dtype=float)
+        self.shape = np.broadcast_shapes(self.t_evap.shape, self.t_cond.shape, self.t_cascade.shape)
+        self.expansion_device = expansion_device
+        self.cascade_delta_t = cascade_delta_t
+
+    def calculate(self) -> Dict[str, np.ndarray]:
+        low = BatchVaporCompressionCycle(self.low_refrigerant, self.t_evap, self.t_cascade,
+                                         self.expansion_device).calculate()
+        high = BatchVaporCompressionCycle(self.high_refrigerant, self.t_cascade - self.cascade_delta_t,
+                                          self.t_cond, self.expansion_device).calculate()
+
+        # Cascade heat exchanger balance: high-stage flow per kg through the low stage
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mass_ratio = (low['h2'] - low['h3']) / high['cooling_capacity']
+            net_work = low['net_work'] + mass_ratio * high['net_work']
+            valid = low['valid'] & high['valid'] & (mass_ratio > 0)
+            cop = np.where(valid, low['cooling_capacity'] / net_work, np.nan)
+
+        results = {
+            'valid': valid,
+            'cop': cop,
+            'cooling_capacity': low['cooling_capacity'],  # kJ/kg
+            'compressor_work': low['compressor_work'] + mass_ratio * high['compressor_work'],  # kJ/kg
+            'net_work': net_work,  # kJ/kg
+            'mass_ratio': mass_ratio,
+            'suction_density': low['suction_density'],  # kg/m3
+            'discharge_temp': high['discharge_temp'],
+            'low_stage_discharge_temp': low['discharge_temp'],
+            'cascade_temp': self.t_cascade,
+            'low_cop': low['cop'],
+            'high_cop': high['cop'],
+            'p_evap': low['p_evap'],  # kPa
+            'p_cascade': low['p_cond'],  # kPa
+            'p_cond': high['p_cond'],  # kPa
+        }
+        return {key: np.array(np.broadcast_to(value, self.shape)) for key, value in results.items()}
+
+    @classmethod
+    def optimize(cls, low_refrigerant: str, high_refrigerant: str, t_evap, t_cond,
+                 expansion_device: str = 'throttle',
+                 cascade_delta_t: float = DEFAULT_CASCADE_DELTA_T) -> Dict[str, np.ndarray]:
+        """Results at the COP-optimal cascade temperature of every operating point"""
+        shape, (t_evap, t_cond) = _flatten(t_evap, t_cond)
+
+        def cop(t_cascade):
+            return cls(low_refrigerant, high_refrigerant, t_evap[:, None], t_cond[:, None], t_cascade,
+                       expansion_device, cascade_delta_t).calculate()['cop']
+
+        # Keep the low stage below its critical point and the high stage above its triple point
+        low = np.maximum(t_evap + MIN_STAGE_LIFT, constant('Tmin', high_refrigerant) - 273.15 + cascade_delta_t)
+        high = np.minimum(t_cond - MIN_STAGE_LIFT, constant('Tcrit', low_refrigerant) - 273.15 - MIN_STAGE_LIFT)
+        t_cascade, _ = grid_maximize(cop, low, np.maximum(high, low), SEARCH_CANDIDATES, SEARCH_LEVELS)
+        results = cls(low_refrigerant, high_refrigerant, t_evap, t_cond, t_cascade, expansion_device,
+                      cascade_delta_t).calculate()
+        return {key: value.reshape(shape) for key, value in results.items()}
+
+
+class TwoStageCycle(CycleInterface):
+    """Two-stage flash-intercooled cycle, at the COP-optimal intermediate temperature unless one is given"""
+
+    def __init__(self, refrigerant: str, t_evap: float, t_cond: float, expansion_device: str = 'throttle',
+                 t_intermediate: Optional[float] = None):
+        self.refrigerant = refrigerant
+        self.t_evap = t_evap
+        self.t_cond = t_cond
+        self.expansion_device = expansion_device
+        self.t_intermediate = t_intermediate
+
+    def calculate(self) -> Dict:
+        if self.t_intermediate is None:
+            results = BatchTwoStageCycle.optimize(self.refrigerant, self.t_evap, self.t_cond, self.expansion_device)
+        else:
+            results = BatchTwoStageCycle(self.refrigerant, self.t_evap, self.t_cond, self.t_intermediate,
+                                         self.expansion_device).calculate()
+        if not results['valid']:
+            raise ValueError("No feasible two-stage cycle for these temperatures")
+
+        r = {key: float(value) for key, value in results.items()}
+        fluid = self.refrigerant
+        p = {key: r[key] * 1000 for key in ('p_evap', 'p_int', 'p_cond')}
+        h = {i: r[f'h{i}'] * 1000 for i in range(1, 9)}
+        # State points in order around the outline of the cycle on a P-h diagram, skipping the
+        # flash gas branch: LP compression, desuperheating, HP compression, condensation, expansion
+        # to the flash tank, its liquid, expansion to the evaporator
+        states = [(p['p_evap'], h[1]), (p['p_int'], h[2]), (p['p_int'], h[3]), (p['p_cond'], h[4]),
+                  (p['p_cond'], h[5]), (p['p_int'], h[6]), (p['p_int'], h[7]), (p['p_evap'], h[8])]
+        pressures = [state[0] for state in states]
+        enthalpies = [state[1] for state in states]
+        temperatures, entropies, qualities = props_arrays(['T', 'S', 'Q'], 'P', pressures, 'H', enthalpies, fluid)
+
+        points = []
+        for i in range(len(states)):
+            quality = float(qualities[i])
+            points.append((
+                float(temperatures[i]) - 273.15, pressures[i] / 1000, enthalpies[i] / 1000,
+                float(entropies[i]) / 1000, quality if 0 <= quality <= 1 else None,
+            ))
+        return {
+            'cop': r['cop'],
+            'cooling_capacity': r['cooling_capacity'],  # kJ/kg
+            'compressor_work': r['compressor_work'],  # kJ/kg
+            'net_work': r['net_work'],  # kJ/kg
+            'mass_ratio': r['mass_ratio'],
+            'intermediate_temp': r['intermediate_temp'],
+            'p_int': r['p_int'],  # kPa
+            # (temperature C, pressure kPa, enthalpy kJ/kg, entropy kJ/kg.K, quality)
+            'points': points,
+        }
+
+
+class CascadeCycle(CycleInterface):
+    """Two-fluid cascade cycle, at the COP-optimal cascade temperature unless one is given"""
+
+    def __init__(self, low_refrigerant: str, high_refrigerant: str, t_evap: float, t_cond: float,
+                 expansion_device: str = 'throttle', t_cascade: Optional[float] = None,
+                 cascade_delta_t: float = DEFAULT_CASCADE_DELTA_T):
+        self.low_refrigerant = low_refrigerant
+        self.high_refrigerant = high_refrigerant
+        self.t_evap = t_evap
+        self.t_cond = t_cond
+        self.expansion_device = expansion_device
+        self.t_cascade = t_cascade
+        self.cascade_delta_t = cascade_delta_t
+
+    def calculate(self) -> Dict:
+        if self.t_cascade is None:
+            results = BatchCascadeCycle.optimize(self.low_refrigerant, self.high_refrigerant, self.t_evap,
+                                                 self.t_cond, self.expansion_device, self.cascade_delta_t)
+        else:
+            results = BatchCascadeCycle(self.low_refrigerant, self.high_refrigerant, self.t_evap, self.t_cond,
+                                        self.t_cascade, self.expansion_device, self.cascade_delta_t).calculate()
+        if not results['valid']:
+            raise ValueError("No feasible cascade cycle for these fluids and temperatures")
+        return {key: float(value) if key != 'valid' else bool(value) for key, value in results.items()}
@@ -0,0 +1,194 @@
+import math
+import numpy as np
+from typing import Callable, Tuple
+
+_GOLDEN = 0.5 * (3 - math.sqrt(5))
+_SQRT_EPS = math.sqrt(2.2e-16)
+
+
+def minimize_scalar(f: Callable[[float], float], low: float, high: float, xtol: float = 1e-5,
+                    max_evaluations: int = 100, scan_points: int = 0) -> Tuple[float, float, int]:
+    """Minimize f on [low, high] with Brent's bounded method
+
+    Parabolic steps are taken while they make progress and golden-section
+    steps otherwise, so smooth unimodal functions converge in a dozen or so
+    evaluations. For functions that may have several local minima, a coarse
+    scan of scan_points evenly spaced points first narrows the interval to
+    the neighbourhood of the best of them. Points where f raises ValueError
+    count as +inf. Returns (x, f(x), evaluations).
+    """
+    def evaluate(x):
+        try:
+            value = f(x)
+        except ValueError:
+            return math.inf
+        return value if not math.isnan(value) else math.inf
+
+    evaluations = 0
+    scanned = None
+    if scan_points > 2:
+        grid = [low + (high - low) * i / (scan_points - 1) for i in range(scan_points)]
+        values = [evaluate(x) for x in grid]
+        evaluations += scan_points
+        best = min(range(scan_points), key=values.__getitem__)
+        scanned = grid[best], values[best]
+        low, high = grid[max(best - 1, 0)], grid[min(best + 1, scan_points - 1)]
+
+    a, b = low, high
+    x = w = v = a + _GOLDEN * (b - a)
+    fx = fw = fv = evaluate(x)
+    evaluations += 1
+    step = previous_step = 0.0
+    middle = 0.5 * (a + b)
+    tol1 = _SQRT_EPS * abs(x) + xtol / 3
+    tol2 = 2 * tol1
+
+    while abs(x - middle) > tol2 - 0.5 * (b - a) and evaluations < max_evaluations:
+        golden_step = True
+        if abs(previous_step) > tol1:
+            # Fit a parabola through x, w and v
+            r = (x - w) * (fx - fv)
+            q = (x - v) * (fx - fw)
+            p = (x - v) * q - (x - w) * r
+            q = 2 * (q - r)
+            if q > 0:
+                p = -p
+            q = abs(q)
+            r = previous_step
+            previous_step = step
+            if abs(p) < abs(0.5 * q * r) and q * (a - x) < p < q * (b - x):
+                step = p / q
+                golden_step = False
+                if (x + step) - a < tol2 or b - (x + step) < tol2:
+                    step = tol1 if middle >= x else -tol1
+        if golden_step:
+            previous_step = (a if x >= middle else b) - x
+            step = _GOLDEN * previous_step
+
+        u = x + (step if abs(step) >= tol1 else math.copysign(tol1, step or 1.0))
+        fu = evaluate(u)
+        evaluations += 1
+
+        if fu <= fx:
+            if u >= x:
+                a = x
+            else:
+                b = x
+            v, fv = w, fw
+            w, fw = x, fx
+            x, fx = u, fu
+        else:
+            if u < x:
+                a = u
+            else:
+                b = u
+            if fu <= fw or w == x:
+                v, fv = w, fw
+                w, fw = u, fu
+            elif fu <= fv or v == x or v == w:
+                v, fv = u, fu
+
+        middle = 0.5 * (a + b)
+        tol1 = _SQRT_EPS * abs(x) + xtol / 3
+        tol2 = 2 * tol1
+
+    # Brent's method never evaluates the interval ends, where a scanned point may be the minimum
+    if scanned is not None and scanned[1] < fx:
+        return scanned[0], scanned[1], evaluations
+    return x, fx, evaluations
+
+
+def maximize_scalar(f: Callable[[float], float], low: float, high: float, xtol: float = 1e-5,
+                    max_evaluations: int = 100, scan_points: int = 0) -> Tuple[float, float, int]:
+    """Maximize f on [low, high], returning (x, f(x), evaluations)"""
+    x, fx, evaluations = minimize_scalar(lambda x: -f(x), low, high, xtol, max_evaluations, scan_points)
+    return x, -fx, evaluations
+
+
+def grid_maximize(f: Callable[[np.ndarray], np.ndarray], low, high, candidates: int = 9,
+                  levels: int = 4) -> Tuple[np.ndarray, np.ndarray]:
+    """Maximize f on [low, high] for many independent problems at once
+
+    low and high hold one interval per problem. f is called with an array of
+    shape (problems, candidates) and returns values of the same shape, NaN
+    where infeasible, so each level is a single vectorized evaluation. Every
+    level narrows each interval to the neighbours of its best candidate, and
+    a parabola through the last best three points places the maximum.
+    Returns (x, f(x)) per problem, NaN where no candidate was feasible.
+    """
+    low = np.atleast_1d(np.asarray(low, dtype=float)).copy()
+    high = np.atleast_1d(np.asarray(high, dtype=float)).copy()
+    rows = np.arange(low.size)
+    fraction = np.linspace(0.0, 1.0, candidates)
+
+    for _ in range(levels):
+        x = low[:, None] + (high - low)[:, None] * fraction
+        values = np.asarray(f(x), dtype=float)
+        values = np.where(np.isnan(values), -np.inf, values)
+        best = np.argmax(values, axis=1)
+        best_x, best_value = x[rows, best], values[rows, best]
+        spacing = (high - low) / (candidates - 1)
+        low, high = np.maximum(best_x - spacing, low), np.minimum(best_x + spacing, high)
+
+    # Vertex of the parabola through the best candidate and its neighbours, where both are feasible
+    interior = (best > 0) & (best < candidates - 1)
+    left = values[rows, np.clip(best - 1, 0, candidates - 1)]
+    right = values[rows, np.clip(best + 1, 0, candidates - 1)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        curvature = left - 2 * best_value + right
+        shift = np.where(interior & np.isfinite(curvature) & (curvature < 0),
+                         0.5 * (left - right) / curvature, 0.0)
+    vertex = best_x + shift * spacing
+    vertex_value = np.asarray(f(vertex[:, None]), dtype=float)[:, 0]
+    improved = vertex_value > best_value
+    x = np.where(improved, vertex, best_x)
+    value = np.where(improved, vertex_value, best_value)
+
+    infeasible = ~np.isfinite(value)
+    return np.where(infeasible, np.nan, x), np.where(infeasible, np.nan, value)
+
+
+def find_roots(f: Callable[[np.ndarray, np.ndarray], np.ndarray], low, high, xtol: float = 1e-6,
+               max_iterations: int = 60) -> Tuple[np.ndarray, int]:
+    """Find a root of f in [low, high] for many independent problems at once
+
+    f is called with one point per unfinished problem and the indices of
+    those problems, and returns values of the same shape, NaN where
+    infeasible, so each iteration is a single vectorized evaluation. The
+    Illinois variant of regula falsi keeps every root bracketed and converges
+    superlinearly; problems whose interval holds no sign change, or that hit
+    an infeasible point, get NaN. Returns the roots and the number of
+    evaluations of f.
+    """
+    a = np.atleast_1d(np.asarray(low, dtype=float)).copy()
+    b = np.atleast_1d(np.asarray(high, dtype=float)).copy()
+    rows = np.arange(a.size)
+    fa = np.asarray(f(a, rows), dtype=float)
+    fb = np.asarray(f(b, rows), dtype=float)
+    evaluations = 2
+
+    root = np.full(a.shape, np.nan)
+    root[fa == 0], root[fb == 0] = a[fa == 0], b[fb == 0]
+    active = (fa * fb < 0) & np.isnan(root)
+    side = np.zeros(a.shape, dtype=int)
+
+    while active.any() and evaluations < max_iterations + 2:
+        x = np.where(active, (a * fb - b * fa) / np.where(active, fb - fa, 1.0), a)
+        fx = np.full(a.shape, np.nan)
+        fx[active] = np.asarray(f(x[active], rows[active]), dtype=float)
+        evaluations += 1
+
+        failed = active & np.isnan(fx)
+        upper = active & (fx * fb > 0)
+        lower = active & (fx * fa > 0)
+        b, fb = np.where(upper, x, b), np.where(upper, fx, fb)
+        a, fa = np.where(lower, x, a), np.where(lower, fx, fa)
+        # An end kept twice running has its value halved, so the interval also shrinks from that side
+        fa = np.where(upper & (side == -1), fa / 2, fa)
+        fb = np.where(lower & (side == 1), fb / 2, fb)
+        side = np.where(upper, -1, np.where(lower, 1, side))
+
+        done = active & ~failed & ((np.abs(b - a) < xtol) | (fx == 0))
+        root[done] = x[done]
+        active &= ~done & ~failed
+    return root, evaluations
@@ -0,0 +1,125 @@
+import CoolProp.CoolProp as CP
+import numpy as np
+import threading
+from typing import List, Tuple
+
+from core import metrics
+
+# Each thread keeps its own AbstractState per fluid: states are not safe to share,
+# and creating one means parsing the fluid, which costs far more than an update
+_local = threading.local()
+
+_parameters = {}
+_input_pairs = {}
+
+COOLPROP_CALLS = metrics.counter('coolprop_state_updates_total', 'CoolProp state updates by caller', ['function'])
+COOLPROP_ERRORS = metrics.counter('coolprop_errors_total', 'CoolProp state updates that failed, by caller',
+                                  ['function'])
+_props_calls = COOLPROP_CALLS.labels('props')
+_props_errors = COOLPROP_ERRORS.labels('props')
+_array_calls = COOLPROP_CALLS.labels('props_arrays')
+_array_errors = COOLPROP_ERRORS.labels('props_arrays')
+
+
+def _parameter(name: str) -> int:
+    index = _parameters.get(name)
+    if index is None:
+        index = _parameters[name] = CP.get_parameter_index(name)
+    return index
+
+
+def _input_pair(name1: str, name2: str) -> Tuple[int, bool]:
+    """CoolProp input pair for two input names, and whether their values must be swapped"""
+    key = (name1, name2)
+    pair = _input_pairs.get(key)
+    if pair is None:
+        pair_index, first, _ = CP.generate_update_pair(_parameter(name1), 1.0, _parameter(name2), 2.0)
+        pair = _input_pairs[key] = (pair_index, first != 1.0)
+    return pair
+
+
+def _new_state(fluid: str):
+    backend, _, name = fluid.rpartition('::')
+    fraction = None
+    if name.endswith(']'):
+        name, _, fraction = name[:-1].partition('[')
+    state = CP.AbstractState(backend or 'HEOS', name)
+    if fraction:
+        state.set_mass_fractions([float(fraction)])
+    return state
+
+
+def get_state(fluid: str):
+    """Get the calling thread's AbstractState for a fluid, creating it on first use
+
+    Fluids are named as for PropsSI, e.g. 'R134a', 'HEOS::R744' or 'INCOMP::LiBr[0.5]'.
+    """
+    states = getattr(_local, 'states', None)
+    if states is None:
+        states = _local.states = {}
+    state = states.get(fluid)
+    if state is None:
+        state = states[fluid] = _new_state(fluid)
+    return state
+
+
+def updated_state(name1: str, value1: float, name2: str, value2: float, fluid: str):
+    """The thread's pooled AbstractState for a fluid, updated to the given inputs
+
+    Useful for reading several outputs of one state; the state is only valid
+    until the next property call on the same thread.
+    """
+    state = get_state(fluid)
+    pair, swapped = _input_pair(name1, name2)
+    if swapped:
+        value1, value2 = value2, value1
+    state.update(pair, value1, value2)
+    return state
+
+
+def props(output: str, name1: str, value1: float, name2: str, value2: float, fluid: str) -> float:
+    """Scalar PropsSI equivalent evaluated on the thread's pooled AbstractState"""
+    _props_calls.inc()
+    try:
+        return updated_state(name1, value1, name2, value2, fluid).keyed_output(_parameter(output))
+    except ValueError:
+        _props_errors.inc()
+        raise
+
+
+def props_array(output: str, name1: str, values1, name2: str, values2, fluid: str) -> np.ndarray:
+    """Vectorized props over broadcast arrays, with NaN where CoolProp fails"""
+    return props_arrays([output], name1, values1, name2, values2, fluid)[0]
+
+
+def props_arrays(outputs: List[str], name1: str, values1, name2: str, values2, fluid: str) -> List[np.ndarray]:
+    """Several outputs of the same states, updating the pooled state only once per point
+
+    Worth using for slow flashes such as (P, S), whose cost is all in the update.
+    """
+    values1, values2 = np.broadcast_arrays(np.asarray(values1, dtype=float), np.asarray(values2, dtype=float))
+    state = get_state(fluid)
+    pair, swapped = _input_pair(name1, name2)
+    if swapped:
+        values1, values2 = values2, values1
+    indices = [_parameter(output) for output in outputs]
+
+    results = [np.full(values1.shape, np.nan) for _ in outputs]
+    flats = [result.reshape(-1) for result in results]
+    errors = 0
+    for i, (value1, value2) in enumerate(zip(values1.ravel().tolist(), values2.ravel().tolist())):
+        try:
+            state.update(pair, value1, value2)
+            for flat, index in zip(flats, indices):
+                flat[i] = state.keyed_output(index)
+        except ValueError:
+            errors += 1
+    _array_calls.inc(values1.size)
+    if errors:
+        _array_errors.inc(errors)
+    return results
+
+
+def constant(output: str, fluid: str) -> float:
+    """Fluid constant such as 'Tcrit', 'Pcrit' or 'Tmin', like PropsSI(output, fluid)"""
+    return get_state(fluid).keyed_output(_parameter(output))
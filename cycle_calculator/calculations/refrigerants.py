@@ -1,32 +1,93 @@
-import CoolProp.CoolProp as CP
+import numpy as np
 from .base import RefrigerantInterface
 from typing import Optional
 
+from ..tables import open_table, table_path, write_table
+from .properties import constant, props, props_array
+
+# Saturation table resolution, and its distance from the critical point where
+# properties change too quickly to interpolate (K)
+SATURATION_TABLE_POINTS = 8192
+SATURATION_TABLE_MARGIN = 1.0
+
+# Table columns holding each saturated property, by quality
+_SATURATION_COLUMNS = {
+    0: {'log_p': 'log_p_bubble', 'H': 'h_liquid', 'S': 's_liquid'},
+    1: {'log_p': 'log_p_dew', 'H': 'h_vapor', 'S': 's_vapor'},
+}
+
+
+def saturation_table_path(name: str) -> Optional[str]:
+    return table_path('saturation', f'{name}.table')
+
+
+def build_saturation_table(name: str, path: str, points: int = SATURATION_TABLE_POINTS) -> int:
+    """Tabulate saturation pressures, enthalpies and entropies against temperature, returning the row count"""
+    T = np.linspace(constant('Tmin', name), constant('Tcrit', name) - SATURATION_TABLE_MARGIN, points)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        columns = {
+            'T': T,
+            'log_p_bubble': np.log(props_array('P', 'T', T, 'Q', 0, name)),
+            'log_p_dew': np.log(props_array('P', 'T', T, 'Q', 1, name)),
+            'h_liquid': props_array('H', 'T', T, 'Q', 0, name),
+            'h_vapor': props_array('H', 'T', T, 'Q', 1, name),
+            's_liquid': props_array('S', 'T', T, 'Q', 0, name),
+            's_vapor': props_array('S', 'T', T, 'Q', 1, name),
+        }
+    finite = np.logical_and.reduce([np.isfinite(column) for column in columns.values()])
+    write_table(path, {key: column[finite] for key, column in columns.items()}, {'refrigerant': name})
+    return int(finite.sum())
+
 
 class CoolPropRefrigerant(RefrigerantInterface):
-    """CoolProp implementation for refrigerant properties"""
+    """CoolProp implementation for refrigerant properties
+
+    Saturated states are interpolated from the refrigerant's memory-mapped
+    saturation table when one was built, and computed by CoolProp otherwise.
+    """
 
     def __init__(self, name: str):
         self.name = name
         try:
             # Test if refrigerant exists in CoolProp
-            CP.PropsSI('Tcrit', self.name)
+            constant('Tcrit', self.name)
         except Exception as e:
             raise ValueError(f"Refrigerant {name} not found in CoolProp: {e}")
+        self.saturation_table = open_table(saturation_table_path(name))
+
+    def _tabulated(self, column: str, axis: str, value: float) -> Optional[float]:
+        """Interpolate a saturation table column, or None outside the table"""
+        if self.saturation_table is None:
+            return None
+        grid = self.saturation_table[axis]
+        if not grid[0] <= value <= grid[-1]:
+            return None
+        return float(np.interp(value, grid, self.saturation_table[column]))
+
+    def _saturated(self, output: str, pressure: float, quality: float) -> float:
+        if quality in _SATURATION_COLUMNS and pressure > 0:
+            columns = _SATURATION_COLUMNS[quality]
+            value = self._tabulated(columns[output], columns['log_p'], np.log(pressure))
+            if value is not None:
+                return value
+        return props(output, 'P', pressure, 'Q', quality, self.name)
 
     def get_pressure(self, temperature: float) -> float:
         """Get saturation pressure at temperature (K)"""
         temp_k = temperature + 273.15 if temperature < 200 else temperature
-        return CP.PropsSI('P', 'T', temp_k, 'Q', 0, self.name)
+        log_p = self._tabulated('log_p_bubble', 'T', temp_k)
+        if log_p is not None:
+            return float(np.exp(log_p))
+        return props('P', 'T', temp_k, 'Q', 0, self.name)
 
     def get_enthalpy(self, pressure: float, quality: Optional[float] = None,
                      temperature: Optional[float] = None) -> float:
         """Get enthalpy (J/kg)"""
         if quality is not None:
-            return CP.PropsSI('H', 'P', pressure, 'Q', quality, self.name)
+            return self._saturated('H', pressure, quality)
         elif temperature is not None:
             temp_k = temperature + 273.15 if temperature < 200 else temperature
-            return CP.PropsSI('H', 'P', pressure, 'T', temp_k, self.name)
+            return props('H', 'P', pressure, 'T', temp_k, self.name)
         else:
             raise ValueError("Either quality or temperature must be provided")
 
@@ -34,14 +95,18 @@ class CoolPropRefrigerant(RefrigerantInterface):
                     temperature: Optional[float] = None) -> float:
         """Get entropy (J/kg.K)"""
         if quality is not None:
-            return CP.PropsSI('S', 'P', pressure, 'Q', quality, self.name)
+            return self._saturated('S', pressure, quality)
         elif temperature is not None:
             temp_k = temperature + 273.15 if temperature < 200 else temperature
-            return CP.PropsSI('S', 'P', pressure, 'T', temp_k, self.name)
+            return props('S', 'P', pressure, 'T', temp_k, self.name)
         else:
             raise ValueError("Either quality or temperature must be provided")
 
     def get_temperature(self, pressure: float, quality: float = 0) -> float:
         """Get saturation temperature at pressure"""
-        temp_k = CP.PropsSI('T', 'P', pressure, 'Q', quality, self.name)
+        if quality in _SATURATION_COLUMNS and pressure > 0:
+            temp_k = self._tabulated('T', _SATURATION_COLUMNS[quality]['log_p'], np.log(pressure))
+            if temp_k is not None:
+                return temp_k - 273.15
+        temp_k = props('T', 'P', pressure, 'Q', quality, self.name)
         return temp_k - 273.15  # Return in Celsius
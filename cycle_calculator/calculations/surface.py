@@ -0,0 +1,148 @@
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+from ..tables import Table, write_table
+from .batch import BatchVaporCompressionCycle
+
+# Quantities stored per grid node, in the units of compare_fluid
+SURFACE_FIELDS = ['cop', 'cooling_capacity', 'volumetric_capacity', 'compressor_work', 'discharge_temp',
+                  'pressure_ratio', 'p_evap', 'p_cond']
+
+DEFAULT_EVAPORATOR_RANGE = (-50.0, 20.0)
+DEFAULT_CONDENSER_RANGE = (10.0, 70.0)
+DEFAULT_STEP = 1.0
+
+# Margin on the error bounds for the higher order terms the estimate ignores, e.g. near the critical point
+ERROR_SAFETY_FACTOR = 1.5
+
+
+def _solve(refrigerant: str, expansion_device: str, t_evap: np.ndarray, t_cond: np.ndarray) -> Dict[str, np.ndarray]:
+    results = BatchVaporCompressionCycle(refrigerant, t_evap[:, None], t_cond[None, :], expansion_device).calculate()
+    values = {
+        'cop': results['cop'],
+        'cooling_capacity': results['cooling_capacity'],
+        'volumetric_capacity': results['cooling_capacity'] * results['suction_density'],
+        'compressor_work': results['net_work'],
+        'discharge_temp': results['discharge_temp'],
+        'pressure_ratio': results['pressure_ratio'],
+        'p_evap': results['p_evap'],
+        'p_cond': results['p_cond'],
+    }
+    return {field: np.where(results['valid'], value, np.nan) for field, value in values.items()}
+
+
+def _cell_error(fine: np.ndarray) -> np.ndarray:
+    """Bound on the bilinear interpolation error of each grid cell
+
+    fine holds the exact values on a grid of half the step, so every coarse
+    cell also has exact values at its edge midpoints and its centre. With
+    locally constant second derivatives the bilinear error is the sum of the
+    errors along each axis, and those peak at the edge midpoints.
+    """
+    corners = fine[::2, ::2]
+    # Deviation of the exact value from linear interpolation at each edge midpoint
+    evap_edges = np.abs(fine[1::2, ::2] - (corners[:-1, :] + corners[1:, :]) / 2)
+    cond_edges = np.abs(fine[::2, 1::2] - (corners[:, :-1] + corners[:, 1:]) / 2)
+    centres = np.abs(fine[1::2, 1::2] - (corners[:-1, :-1] + corners[1:, :-1] + corners[:-1, 1:]
+                                          + corners[1:, 1:]) / 4)
+    bound = (np.maximum(evap_edges[:, :-1], evap_edges[:, 1:])
+             + np.maximum(cond_edges[:-1, :], cond_edges[1:, :]))
+    # np.maximum propagates NaN, so a cell touching an invalid point is marked unusable
+    return ERROR_SAFETY_FACTOR * np.maximum(bound, centres)
+
+
+class ResponseSurface:
+    """Cycle results of one refrigerant tabulated over evaporator and condenser temperatures
+
+    Lookups interpolate bilinearly between grid nodes and report, per
+    quantity, a bound on the interpolation error of the enclosing cell.
+    Cells touching an invalid operating point give no answer.
+    """
+
+    def __init__(self, refrigerant: str, expansion_device: str, t_evap_start: float, t_cond_start: float,
+                 step: float, values: Dict[str, np.ndarray], errors: Dict[str, np.ndarray]):
+        self.refrigerant = refrigerant
+        self.expansion_device = expansion_device
+        self.t_evap_start = float(t_evap_start)
+        self.t_cond_start = float(t_cond_start)
+        self.step = float(step)
+        self.values = values
+        self.errors = errors
+        self.shape = values['cop'].shape
+        self.table = None
+
+    @classmethod
+    def build(cls, refrigerant: str, expansion_device: str = 'throttle',
+              evaporator_range: Tuple[float, float] = DEFAULT_EVAPORATOR_RANGE,
+              condenser_range: Tuple[float, float] = DEFAULT_CONDENSER_RANGE,
+              step: float = DEFAULT_STEP) -> 'ResponseSurface':
+        """Solve the grid, and the half-step grid used for the error bounds, in one batch"""
+        n_evap = int(round((evaporator_range[1] - evaporator_range[0]) / step)) + 1
+        n_cond = int(round((condenser_range[1] - condenser_range[0]) / step)) + 1
+        t_evap = evaporator_range[0] + np.arange(2 * n_evap - 1) * step / 2
+        t_cond = condenser_range[0] + np.arange(2 * n_cond - 1) * step / 2
+
+        fine = _solve(refrigerant, expansion_device, t_evap, t_cond)
+        values = {field: fine[field][::2, ::2].astype(np.float32) for field in SURFACE_FIELDS}
+        errors = {field: _cell_error(fine[field]).astype(np.float32) for field in SURFACE_FIELDS}
+        return cls(refrigerant, expansion_device, evaporator_range[0], condenser_range[0], step, values, errors)
+
+    def save(self, path: str):
+        arrays = {f'value_{field}': self.values[field] for field in SURFACE_FIELDS}
+        arrays.update({f'error_{field}': self.errors[field] for field in SURFACE_FIELDS})
+        write_table(path, arrays, {
+            'refrigerant': self.refrigerant,
+            'expansion_device': self.expansion_device,
+            't_evap_start': self.t_evap_start,
+            't_cond_start': self.t_cond_start,
+            'step': self.step,
+        })
+
+    @classmethod
+    def from_table(cls, table: Table) -> 'ResponseSurface':
+        """Wrap a mapped table file without copying its arrays"""
+        meta = table.meta
+        surface = cls(
+            meta['refrigerant'], meta['expansion_device'], meta['t_evap_start'], meta['t_cond_start'], meta['step'],
+            {field: table[f'value_{field}'] for field in SURFACE_FIELDS},
+            {field: table[f'error_{field}'] for field in SURFACE_FIELDS},
+        )
+        surface.table = table
+        return surface
+
+    def lookup(self, t_evap: float, t_cond: float) -> Optional[Dict]:
+        """Interpolated results with their error bounds, or None outside the usable grid"""
+        x = (t_evap - self.t_evap_start) / self.step
+        y = (t_cond - self.t_cond_start) / self.step
+        if not (0 <= x <= self.shape[0] - 1 and 0 <= y <= self.shape[1] - 1):
+            return None
+
+        # Points on the upper edges belong to the last cell
+        i = min(int(x), self.shape[0] - 2)
+        j = min(int(y), self.shape[1] - 2)
+        u = x - i
+        v = y - j
+        weights = np.array([(1 - u) * (1 - v), u * (1 - v), (1 - u) * v, u * v])
+
+        results = {}
+        errors = {}
+        for field in SURFACE_FIELDS:
+            error = self.errors[field][i, j]
+            if np.isnan(error):
+                return None
+            grid = self.values[field]
+            corners = np.array([grid[i, j], grid[i + 1, j], grid[i, j + 1], grid[i + 1, j + 1]], dtype=float)
+            results[field] = float(weights @ corners)
+            errors[field] = float(error)
+        results['errors'] = errors
+        return results
+
+
+def build_surface_file(refrigerant: str, expansion_device: str, path: str,
+                       evaporator_range: Tuple[float, float] = DEFAULT_EVAPORATOR_RANGE,
+                       condenser_range: Tuple[float, float] = DEFAULT_CONDENSER_RANGE,
+                       step: float = DEFAULT_STEP) -> int:
+    """Build and save one response surface, returning the number of usable cells"""
+    surface = ResponseSurface.build(refrigerant, expansion_device, evaporator_range, condenser_range, step)
+    surface.save(path)
+    return int(np.isfinite(surface.errors['cop']).sum())
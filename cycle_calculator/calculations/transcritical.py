@@ -0,0 +1,187 @@
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+from .optimize import maximize_scalar
+from .properties import constant, props, updated_state
+
+CO2 = 'R744'
+
+# Highest high-side pressure searched (Pa), about the rating of transcritical CO2 components
+MAX_HIGH_SIDE_PRESSURE = 14e6
+# Resolution of the optimal high-side pressure (Pa), and the coarse scan that first brackets it:
+# near the critical point COP can peak both at the lowest pressure and further up
+PRESSURE_TOLERANCE = 1e3
+SCAN_POINTS = 9
+# Gas cooler exit temperature above the ambient air (K)
+DEFAULT_APPROACH = 3.0
+# Convergence of the discharge temperature iteration (J/kg.K) and its iteration cap
+ENTROPY_TOLERANCE = 1e-6
+MAX_NEWTON_STEPS = 20
+
+
+class TranscriticalCO2Cycle:
+    """Single-stage CO2 cycle rejecting heat in a gas cooler
+
+    Above the critical temperature the high-side pressure no longer follows
+    from the gas cooler exit temperature, so unless one is given it is set to
+    the pressure that maximises COP. Below it the search starts at the
+    saturation pressure and the cycle runs subcritical.
+    """
+
+    def __init__(self, t_evap: float, t_gc_exit: float, expansion_device: str = 'throttle',
+                 p_high: Optional[float] = None, refrigerant: str = CO2,
+                 max_pressure: float = MAX_HIGH_SIDE_PRESSURE):
+        self.refrigerant = refrigerant
+        self.t_evap = t_evap + 273.15
+        self.t_gc = t_gc_exit + 273.15
+        self.expansion_device = expansion_device
+        self.p_high = p_high
+        self.max_pressure = max_pressure
+        if not constant('Tmin', refrigerant) <= self.t_evap < min(self.t_gc, constant('Tcrit', refrigerant)):
+            raise ValueError("Evaporator temperature must be above the triple point and below the gas cooler "
+                             "exit and critical temperatures")
+
+        # Point 1: Evaporator exit (saturated vapor)
+        self.p_evap = props('P', 'T', self.t_evap, 'Q', 1, refrigerant)
+        self.h1 = props('H', 'P', self.p_evap, 'Q', 1, refrigerant)
+        self.s1 = props('S', 'P', self.p_evap, 'Q', 1, refrigerant)
+        self._t2_guess = None
+
+    def _isentropic_discharge(self, p_high: float) -> Tuple[float, float]:
+        """Enthalpy and temperature at p_high on the suction isentrope
+
+        Newton's method on temperature, (ds/dT)_p = cp/T, with cheap (P, T)
+        updates started from the previous discharge temperature replaces a
+        (P, S) flash costing several times as much.
+        """
+        if self._t2_guess is None:
+            self._t2_guess = props('T', 'P', p_high, 'S', self.s1, self.refrigerant)
+        T = self._t2_guess
+        for _ in range(MAX_NEWTON_STEPS):
+            state = updated_state('P', p_high, 'T', T, self.refrigerant)
+            error = state.smass() - self.s1
+            if abs(error) < ENTROPY_TOLERANCE:
+                break
+            T -= error * T / state.cpmass()
+        else:
+            return props('H', 'P', p_high, 'S', self.s1, self.refrigerant), \
+                props('T', 'P', p_high, 'S', self.s1, self.refrigerant)
+        self._t2_guess = T
+        return state.hmass(), T
+
+    def pressure_bounds(self) -> Tuple[float, float]:
+        """High-side pressures searched for the optimum (Pa)"""
+        if self.t_gc < constant('Tcrit', self.refrigerant):
+            # Just above saturation, so the gas cooler exit is subcooled liquid rather than two-phase
+            low = props('P', 'T', self.t_gc, 'Q', 0, self.refrigerant) * (1 + 1e-4)
+        else:
+            # CoolProp cannot flash exactly at the critical pressure
+            low = constant('Pcrit', self.refrigerant) * (1 + 1e-4)
+        return low, max(self.max_pressure, low)
+
+    def _states(self, p_high: float) -> Dict:
+        # Point 2: Compressor exit (isentropic compression)
+        h2, t2 = self._isentropic_discharge(p_high)
+        # Point 3: Gas cooler exit
+        state = updated_state('P', p_high, 'T', self.t_gc, self.refrigerant)
+        h3, s3 = state.hmass(), state.smass()
+        # Point 4: After expansion
+        if self.expansion_device == 'throttle':
+            h4 = h3
+        else:
+            h4 = props('H', 'P', self.p_evap, 'S', s3, self.refrigerant)
+
+        q_evap = self.h1 - h4
+        w_comp = h2 - self.h1
+        w_turb = h3 - h4 if self.expansion_device == 'turbine' else 0
+        net_work = w_comp - w_turb
+        return {
+            'h2': h2, 't2': t2, 'h3': h3, 's3': s3, 'h4': h4,
+            'q_evap': q_evap, 'w_comp': w_comp, 'net_work': net_work,
+            'cop': q_evap / net_work if net_work > 0 else 0,
+        }
+
+    def cop(self, p_high: float) -> float:
+        """COP at a high-side pressure (Pa)"""
+        return self._states(p_high)['cop']
+
+    def optimal_pressure(self) -> Tuple[float, int]:
+        """COP-optimal high-side pressure (Pa) and the number of cycle evaluations it took"""
+        p_high, _, evaluations = maximize_scalar(self.cop, *self.pressure_bounds(), xtol=PRESSURE_TOLERANCE,
+                                                 scan_points=SCAN_POINTS)
+        return p_high, evaluations
+
+    def calculate(self) -> Dict:
+        evaluations = 0
+        p_high = self.p_high
+        if p_high is None:
+            p_high, evaluations = self.optimal_pressure()
+        states = self._states(p_high)
+
+        t2 = states['t2']
+        s4 = props('S', 'P', self.p_evap, 'H', states['h4'], self.refrigerant)
+        t4 = props('T', 'P', self.p_evap, 'H', states['h4'], self.refrigerant)
+        x4 = props('Q', 'P', self.p_evap, 'H', states['h4'], self.refrigerant)
+        return {
+            'cop': states['cop'],
+            'cooling_capacity': states['q_evap'] / 1000,  # kJ/kg
+            'compressor_work': states['w_comp'] / 1000,  # kJ/kg
+            'net_work': states['net_work'] / 1000,  # kJ/kg
+            'p_high': p_high / 1000,  # kPa
+            'p_evap': self.p_evap / 1000,  # kPa
+            'transcritical': p_high > constant('Pcrit', self.refrigerant),
+            'evaluations': evaluations,
+            'points': [
+                # (temperature C, pressure kPa, enthalpy kJ/kg, entropy kJ/kg.K, quality)
+                (self.t_evap - 273.15, self.p_evap / 1000, self.h1 / 1000, self.s1 / 1000, 1.0),
+                (t2 - 273.15, p_high / 1000, states['h2'] / 1000, self.s1 / 1000, None),
+                (self.t_gc - 273.15, p_high / 1000, states['h3'] / 1000, states['s3'] / 1000, None),
+                (t4 - 273.15, self.p_evap / 1000, states['h4'] / 1000, s4 / 1000, x4),
+            ],
+        }
+
+
+class BatchTranscriticalCO2Cycle:
+    """Transcritical CO2 cycle optimised for arrays of evaporator and gas cooler exit temperatures
+
+    Each operating point gets its own pressure search; all of them share the
+    thread's pooled CoolProp state, so a sweep costs a few milliseconds per point.
+    """
+
+    def __init__(self, t_evap, t_gc_exit, expansion_device: str = 'throttle', refrigerant: str = CO2,
+                 max_pressure: float = MAX_HIGH_SIDE_PRESSURE):
+        t_evap, t_gc_exit = np.broadcast_arrays(np.asarray(t_evap, dtype=float),
+                                                np.asarray(t_gc_exit, dtype=float))
+        self.shape = t_evap.shape
+        self.t_evap = t_evap.ravel()
+        self.t_gc_exit = t_gc_exit.ravel()
+        self.expansion_device = expansion_device
+        self.refrigerant = refrigerant
+        self.max_pressure = max_pressure
+
+    def calculate(self) -> Dict[str, np.ndarray]:
+        keys = ['cop', 'cooling_capacity', 'compressor_work', 'net_work', 'p_high', 'p_evap', 'discharge_temp']
+        results = {key: np.full(self.t_evap.shape, np.nan) for key in keys}
+        results['valid'] = np.zeros(self.t_evap.shape, dtype=bool)
+        results['transcritical'] = np.zeros(self.t_evap.shape, dtype=bool)
+
+        for i, (t_evap, t_gc_exit) in enumerate(zip(self.t_evap.tolist(), self.t_gc_exit.tolist())):
+            try:
+                cycle = TranscriticalCO2Cycle(t_evap, t_gc_exit, self.expansion_device,
+                                              refrigerant=self.refrigerant, max_pressure=self.max_pressure)
+                result = cycle.calculate()
+            except ValueError:
+                continue
+            for key in keys[:-1]:
+                results[key][i] = result[key]
+            results['discharge_temp'][i] = result['points'][1][0]
+            results['transcritical'][i] = result['transcritical']
+            results['valid'][i] = result['cop'] > 0
+        return {key: value.reshape(self.shape) for key, value in results.items()}
+
+
+def sweep_gas_cooler(t_evap: float, t_gc_exits, expansion_device: str = 'throttle',
+                     refrigerant: str = CO2) -> Dict:
+    """Optimised cycle results for a list of gas cooler exit temperatures, as plain lists"""
+    results = BatchTranscriticalCO2Cycle(t_evap, t_gc_exits, expansion_device, refrigerant).calculate()
+    return {key: value.tolist() for key, value in results.items()}
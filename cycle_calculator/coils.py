@@ -0,0 +1,116 @@
+from typing import Dict, Iterator, Optional, Tuple
+
+from django.core.exceptions import ValidationError
+
+from cooling_load.calculations import calculate_project_loads
+from cooling_load.importers import ImportReport
+from .calculations.batch import BatchVaporCompressionCycle
+from .calculations.heat_exchangers import CoilCatalog, minimum_air_flow
+from .models import Coil
+from .sizing import DEFAULT_CONDENSER_APPROACH, DEFAULT_EVAPORATOR_TD, evaporator_temperature
+
+COIL_FIELDS = ['manufacturer', 'model_number', 'coil_type', 'heat_transfer_area', 'u_value', 'air_flow', 'fan_power']
+DEFAULT_OPTION_LIMIT = 10
+
+
+def load_coil_catalog(coil_type: str) -> Tuple[list, CoilCatalog]:
+    """Coils of one type and their ratings data as one catalog"""
+    coils = list(Coil.objects.filter(coil_type=coil_type).order_by('manufacturer', 'model_number'))
+    catalog = CoilCatalog([str(coil) for coil in coils], [coil.heat_transfer_area for coil in coils],
+                          [coil.u_value for coil in coils], [coil.air_flow for coil in coils],
+                          [coil.fan_power for coil in coils])
+    return coils, catalog
+
+
+def _coil_options(coil_type: str, duty: float, t_air_in: float, t_refrigerant: float,
+                  max_oversize: Optional[float], limit: int) -> Dict:
+    coils, catalog = load_coil_catalog(coil_type)
+    options = catalog.select(duty, t_air_in, t_refrigerant, max_oversize, limit)
+    for option in options:
+        coil = coils[option.pop('index')]
+        option.update({'id': coil.pk, 'manufacturer': coil.manufacturer, 'model_number': coil.model_number})
+        for key in ('duty', 'ua', 'required_ua', 'air_outlet_temp', 'heat_transfer_area', 'air_flow', 'fan_power'):
+            option[key] = round(option[key], 2)
+        for key in ('margin', 'ntu', 'effectiveness'):
+            option[key] = round(option[key], 3)
+    return {
+        'duty': round(abs(duty), 2),  # W
+        'air_inlet_temp': t_air_in,
+        'refrigerant_temp': t_refrigerant,
+        'min_air_flow': round(float(minimum_air_flow(duty, t_air_in, t_refrigerant)), 1),  # m3/h
+        'candidates': len(coils),
+        'options': options,
+    }
+
+
+def size_coils(project, refrigerant: str, condenser_temp: Optional[float] = None,
+               evaporator_td: float = DEFAULT_EVAPORATOR_TD, expansion_device: str = 'throttle',
+               max_oversize: Optional[float] = None, limit: int = DEFAULT_OPTION_LIMIT) -> Dict:
+    """Select evaporator and condenser coils for a project's design load
+
+    The evaporator cools room air to meet the design load at the cycle's
+    evaporating temperature; the condenser rejects the design load plus the
+    compressor work to outdoor air at the condensing temperature.
+    """
+    t_evap = evaporator_temperature(project.indoor_temp, evaporator_td)
+    if condenser_temp is None:
+        condenser_temp = project.outdoor_temp + DEFAULT_CONDENSER_APPROACH
+    cycle = BatchVaporCompressionCycle(refrigerant, t_evap, condenser_temp, expansion_device).calculate()
+    if not cycle['valid']:
+        raise ValueError("No feasible cycle for these temperatures")
+
+    design_load = calculate_project_loads(project)['design_load']  # W
+    heat_rejection = design_load * (1 + 1 / float(cycle['cop']))  # W
+
+    return {
+        'project': str(project.pk),
+        'refrigerant': refrigerant,
+        'design_load': round(design_load, 2),
+        'evaporator_temp': t_evap,
+        'condenser_temp': condenser_temp,
+        'cop': round(float(cycle['cop']), 3),
+        'evaporator': _coil_options('evaporator', design_load, project.indoor_temp, t_evap, max_oversize, limit),
+        'condenser': _coil_options('condenser', -heat_rejection, project.outdoor_temp, condenser_temp,
+                                   max_oversize, limit),
+    }
+
+
+def build_coil(row: Dict) -> Tuple[Coil, Dict]:
+    """Build a coil from an import row and validate it against the model validators"""
+    values = {}
+    for field in COIL_FIELDS:
+        value = row.get(field)
+        if isinstance(value, str):
+            value = value.strip()
+            if value == '':
+                value = None
+        values[field] = value
+    if values['fan_power'] is None:
+        values['fan_power'] = 0
+
+    coil = Coil(**values)
+    try:
+        coil.full_clean(validate_unique=False, validate_constraints=False)
+    except ValidationError as e:
+        return coil, e.message_dict
+    return coil, {}
+
+
+def import_coils(rows: Iterator[Tuple[int, Dict]]) -> ImportReport:
+    """Create or update coils from (row number, row) pairs, keyed by manufacturer and model number"""
+    report = ImportReport()
+    coils = {}
+    for row_number, row in rows:
+        coil, errors = build_coil(row)
+        if errors:
+            report.add_error(row_number, errors)
+            continue
+        # A later row for the same coil replaces an earlier one
+        coils[(coil.manufacturer, coil.model_number)] = coil
+
+    Coil.objects.bulk_create(
+        list(coils.values()), update_conflicts=True, unique_fields=['manufacturer', 'model_number'],
+        update_fields=COIL_FIELDS[2:],
+    )
+    report.created = len(coils)
+    return report
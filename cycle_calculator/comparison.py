@@ -0,0 +1,146 @@
+from typing import Dict, List
+
+from .calculations.comparison import compare_fluid, compare_multistage_fluid
+from .calculations.multistage import DEFAULT_CASCADE_DELTA_T
+from .calculations.transcritical import CO2, DEFAULT_APPROACH, sweep_gas_cooler
+from core.executors import map_in_processes
+from .models import Refrigerant
+from .diagrams import warm_worker
+
+# Ambient temperatures solved per pool task in a transcritical sweep, a few ms each
+SWEEP_CHUNK_SIZE = 8
+
+
+def compare_refrigerants(t_evap: float, t_cond: float, expansion_device: str = 'throttle',
+                         refrigerants=None) -> Dict:
+    """Solve the same operating conditions for every refrigerant, one pool task per fluid"""
+    if refrigerants is None:
+        refrigerants = Refrigerant.objects.all()
+    refrigerants = list(refrigerants)
+    fluids = [refrigerant.coolprop_name for refrigerant in refrigerants]
+
+    results = map_in_processes(
+        compare_fluid,
+        [(fluid, t_evap, t_cond, expansion_device) for fluid in fluids],
+        # The pool is shared with diagram rendering, so warm both on creation
+        initializer=warm_worker, initargs=(fluids,),
+    )
+
+    rows = []
+    for refrigerant, result in zip(refrigerants, results):
+        row = {
+            'refrigerant': refrigerant.name,
+            'coolprop_name': refrigerant.coolprop_name,
+            'gwp': refrigerant.gwp,
+            'odp': refrigerant.odp,
+            'safety_class': refrigerant.safety_class,
+            **result
+        }
+        if result['valid']:
+            # Refrigerant circulated per kWh of cooling, and its CO2-equivalent
+            mass_per_kwh = 3600 / result['cooling_capacity']
+            row['mass_per_kwh'] = round(mass_per_kwh, 3)
+            row['gwp_mass_per_kwh'] = round(refrigerant.gwp * mass_per_kwh, 1)
+            row['gwp_per_cop'] = round(refrigerant.gwp / result['cop'], 1)
+            for key in ('cop', 'pressure_ratio'):
+                row[key] = round(row[key], 3)
+            for key in ('cooling_capacity', 'volumetric_capacity', 'compressor_work', 'p_evap', 'p_cond'):
+                row[key] = round(row[key], 2)
+            row['discharge_temp'] = round(row['discharge_temp'], 1)
+        rows.append(row)
+
+    rows.sort(key=lambda row: (not row['valid'], -row.get('cop', 0)))
+    return {
+        'evaporator_temp': t_evap,
+        'condenser_temp': t_cond,
+        'expansion_device': expansion_device,
+        'refrigerants': rows,
+    }
+
+
+def compare_multistage(t_evap: float, t_cond: float, expansion_device: str = 'throttle',
+                       cascade_delta_t: float = DEFAULT_CASCADE_DELTA_T, refrigerants=None) -> Dict:
+    """Optimised two-stage cycles of every refrigerant and cascades of every pair of them
+
+    One pool task per low stage refrigerant solves its two-stage cycle and
+    its cascades with each other refrigerant on the high stage.
+    """
+    if refrigerants is None:
+        refrigerants = Refrigerant.objects.all()
+    refrigerants = list(refrigerants)
+    fluids = [refrigerant.coolprop_name for refrigerant in refrigerants]
+
+    results = map_in_processes(
+        compare_multistage_fluid,
+        [(fluid, [other for other in fluids if other != fluid], t_evap, t_cond, expansion_device, cascade_delta_t)
+         for fluid in fluids],
+        initializer=warm_worker, initargs=(fluids,),
+    )
+
+    def rounded(row):
+        if row['valid']:
+            for key, value in row.items():
+                if isinstance(value, float):
+                    row[key] = round(value, 3 if key in ('cop', 'mass_ratio') else 2)
+        return row
+
+    two_stage = []
+    cascades = []
+    for refrigerant, result in zip(refrigerants, results):
+        two_stage.append({'refrigerant': refrigerant.name, 'gwp': refrigerant.gwp, **rounded(result['two_stage'])})
+        high_stage = [other for other in refrigerants if other.coolprop_name != refrigerant.coolprop_name]
+        for other, row in zip(high_stage, result['cascades']):
+            cascades.append({'low_stage': refrigerant.name, 'high_stage': other.name, **rounded(row)})
+
+    for rows in (two_stage, cascades):
+        rows.sort(key=lambda row: (not row['valid'], -row.get('cop', 0)))
+    return {
+        'evaporator_temp': t_evap,
+        'condenser_temp': t_cond,
+        'expansion_device': expansion_device,
+        'cascade_delta_t': cascade_delta_t,
+        'two_stage': two_stage,
+        'cascades': cascades,
+    }
+
+
+def sweep_ambient(t_evap: float, ambient_temps: List[float], approach: float = DEFAULT_APPROACH,
+                  expansion_device: str = 'throttle', refrigerant: str = CO2) -> Dict:
+    """Transcritical cycle at its optimal high-side pressure across ambient temperatures
+
+    The gas cooler exit runs approach kelvin above ambient. The temperatures
+    are solved in chunks of SWEEP_CHUNK_SIZE, one batch per pool task.
+    """
+    t_gc_exits = [t + approach for t in ambient_temps]
+    chunks = [t_gc_exits[i:i + SWEEP_CHUNK_SIZE] for i in range(0, len(t_gc_exits), SWEEP_CHUNK_SIZE)]
+    results = map_in_processes(
+        sweep_gas_cooler,
+        [(t_evap, chunk, expansion_device, refrigerant) for chunk in chunks],
+        initializer=warm_worker, initargs=([refrigerant],),
+    )
+
+    rows = []
+    for result in results:
+        for i in range(len(result['cop'])):
+            row = {'valid': result['valid'][i]}
+            if row['valid']:
+                row.update({
+                    'cop': round(result['cop'][i], 3),
+                    'p_high': round(result['p_high'][i], 1),
+                    'discharge_temp': round(result['discharge_temp'][i], 1),
+                    'transcritical': result['transcritical'][i],
+                })
+                for key in ('cooling_capacity', 'compressor_work', 'net_work', 'p_evap'):
+                    row[key] = round(result[key][i], 2)
+            rows.append(row)
+    for ambient_temp, t_gc_exit, row in zip(ambient_temps, t_gc_exits, rows):
+        row['ambient_temp'] = ambient_temp
+        row['gas_cooler_temp'] = t_gc_exit
+
+    return {
+        'refrigerant': refrigerant,
+        'evaporator_temp': t_evap,
+        'approach': approach,
+        'expansion_device': expansion_device,
+        'ambient': rows,
+    }
@@ -0,0 +1,158 @@
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from cooling_load.importers import ImportReport
+from .calculations.compressor import COEFFICIENT_COUNT, CompressorCatalog, CompressorMap
+from .calculations.surface import DEFAULT_CONDENSER_RANGE, DEFAULT_EVAPORATOR_RANGE
+from .models import Compressor, Refrigerant
+
+MASS_FLOW_COLUMNS = [f'mass_flow_{i}' for i in range(1, COEFFICIENT_COUNT + 1)]
+POWER_COLUMNS = [f'power_{i}' for i in range(1, COEFFICIENT_COUNT + 1)]
+DEFAULT_ENVELOPE_STEP = 2.5
+MAX_ENVELOPE_POINTS = 100000
+
+
+def compressor_map(compressor: Compressor) -> CompressorMap:
+    return CompressorMap(str(compressor), compressor.refrigerant.coolprop_name, compressor.mass_flow_coefficients,
+                         compressor.power_coefficients, compressor.envelope)
+
+
+def load_catalog(refrigerant: Optional[str] = None) -> Tuple[List[Compressor], CompressorCatalog]:
+    """Compressors, optionally of one refrigerant, and their maps as one catalog"""
+    compressors = Compressor.objects.select_related('refrigerant').order_by('manufacturer', 'model_number')
+    if refrigerant:
+        compressors = compressors.filter(refrigerant__coolprop_name=refrigerant)
+    compressors = list(compressors)
+    return compressors, CompressorCatalog.from_maps([compressor_map(compressor) for compressor in compressors])
+
+
+def select_compressors(t_evap: float, t_cond: float, capacity: float, refrigerant: Optional[str] = None,
+                       expansion_device: str = 'throttle', max_oversize: Optional[float] = None) -> Dict:
+    """Rank the compressors that deliver a capacity (kW) at an operating point by power"""
+    compressors, catalog = load_catalog(refrigerant)
+    options = catalog.select(t_evap, t_cond, capacity, expansion_device, max_oversize)
+    for rank, option in enumerate(options, start=1):
+        compressor = compressors[option.pop('index')]
+        option.update({
+            'rank': rank,
+            'id': compressor.pk,
+            'manufacturer': compressor.manufacturer,
+            'model_number': compressor.model_number,
+        })
+        for key in ('capacity', 'power', 'cop', 'isentropic_efficiency'):
+            option[key] = round(option[key], 3)
+        option['mass_flow'] = round(option['mass_flow'], 5)
+    return {
+        'evaporator_temp': t_evap,
+        'condenser_temp': t_cond,
+        'capacity': capacity,
+        'refrigerant': refrigerant,
+        'expansion_device': expansion_device,
+        'candidates': len(compressors),
+        'options': options,
+    }
+
+
+def compressor_envelope(compressor: Compressor, step: float = DEFAULT_ENVELOPE_STEP,
+                        expansion_device: str = 'throttle') -> Dict:
+    """Capacity, power and COP of a compressor over a grid covering its envelope, null outside it"""
+    envelope = np.asarray(compressor.envelope, dtype=float).reshape(-1, 2)
+    if len(envelope):
+        (evap_low, cond_low), (evap_high, cond_high) = envelope.min(axis=0), envelope.max(axis=0)
+    else:
+        (evap_low, evap_high), (cond_low, cond_high) = DEFAULT_EVAPORATOR_RANGE, DEFAULT_CONDENSER_RANGE
+    # Check the grid size before allocating it, as a tiny step would exhaust memory
+    points = np.ceil((evap_high - evap_low) / step + 0.5) * np.ceil((cond_high - cond_low) / step + 0.5)
+    if not points <= MAX_ENVELOPE_POINTS:
+        raise ValueError("Envelope grid too fine, use a larger step")
+    t_evap = np.arange(evap_low, evap_high + step / 2, step)
+    t_cond = np.arange(cond_low, cond_high + step / 2, step)
+
+    results = CompressorCatalog.from_maps([compressor_map(compressor)]).evaluate(
+        t_evap[:, None], t_cond[None, :], expansion_device)
+
+    def grid(values, digits):
+        return [[round(float(v), digits) if np.isfinite(v) else None for v in row] for row in values[0]]
+
+    return {
+        'id': compressor.pk,
+        'compressor': str(compressor),
+        'refrigerant': compressor.refrigerant.coolprop_name,
+        'envelope': compressor.envelope,
+        'evaporator_temps': t_evap.tolist(),
+        'condenser_temps': t_cond.tolist(),
+        'capacity': grid(results['capacity'], 3),
+        'power': grid(results['power'], 3),
+        'mass_flow': grid(results['mass_flow'], 5),
+        'cop': grid(results['cop'], 3),
+    }
+
+
+def parse_envelope(value) -> List[List[float]]:
+    """Read envelope vertices written as 'evaporating:condensing' pairs separated by semicolons"""
+    if value is None or not str(value).strip():
+        return []
+    vertices = [[float(t) for t in vertex.split(':')] for vertex in str(value).split(';') if vertex.strip()]
+    if any(len(vertex) != 2 for vertex in vertices):
+        raise ValueError("Vertices must be 'evaporating:condensing' pairs")
+    return vertices
+
+
+def build_compressor(row: Dict, refrigerants: Dict[str, Refrigerant]) -> Tuple[Optional[Compressor], Dict]:
+    """Build a compressor from an import row, with errors by column"""
+    errors = {}
+    values = {}
+    for field in ('manufacturer', 'model_number'):
+        values[field] = str(row.get(field) or '').strip()
+        if not values[field]:
+            errors[field] = ['This field is required.']
+
+    refrigerant = refrigerants.get(str(row.get('refrigerant') or '').strip())
+    if refrigerant is None:
+        errors['refrigerant'] = [f"Unknown refrigerant: {row.get('refrigerant')}"]
+
+    for field, columns in (('mass_flow_coefficients', MASS_FLOW_COLUMNS), ('power_coefficients', POWER_COLUMNS)):
+        try:
+            values[field] = [float(row.get(column)) for column in columns]
+        except (TypeError, ValueError):
+            errors[field] = [f"{', '.join(columns)} must all be numbers"]
+
+    try:
+        values['envelope'] = parse_envelope(row.get('envelope'))
+    except ValueError:
+        errors['envelope'] = ["Vertices must be 'evaporating:condensing' pairs"]
+    else:
+        if 0 < len(values['envelope']) < 3:
+            errors['envelope'] = ['An envelope needs at least three vertices']
+
+    if errors:
+        return None, errors
+    return Compressor(refrigerant=refrigerant, **values), {}
+
+
+def import_compressors(rows: Iterator[Tuple[int, Dict]]) -> ImportReport:
+    """Create or update compressors from (row number, row) pairs, keyed by manufacturer and model number
+
+    Refrigerants are matched by CoolProp name or by name.
+    """
+    refrigerants = {}
+    for refrigerant in Refrigerant.objects.all():
+        refrigerants[refrigerant.name] = refrigerant
+        refrigerants[refrigerant.coolprop_name] = refrigerant
+
+    report = ImportReport()
+    compressors = {}
+    for row_number, row in rows:
+        compressor, errors = build_compressor(row, refrigerants)
+        if errors:
+            report.add_error(row_number, errors)
+            continue
+        # A later row for the same compressor replaces an earlier one
+        compressors[(compressor.manufacturer, compressor.model_number)] = compressor
+
+    Compressor.objects.bulk_create(
+        list(compressors.values()), update_conflicts=True, unique_fields=['manufacturer', 'model_number'],
+        update_fields=['refrigerant', 'mass_flow_coefficients', 'power_coefficients', 'envelope'],
+    )
+    report.created = len(compressors)
+    return report
@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from typing import Dict, List
+
+from core import metrics
+
+from .diagrams import DIAGRAM_TYPES, ThermodynamicDiagrams
+from .models import StatePoint
+from .rendering import render_images
+from .solver import state_point_dict
+
+
+def diagram_name(calculation, diagram_type: str, fmt: str, dpi: int) -> str:
+    """Storage name of a rendered diagram
+
+    The creation timestamp keeps a reused primary key from serving a stale image.
+    """
+    return (f'diagrams/{calculation.pk}-{calculation.created_at:%Y%m%d%H%M%S%f}/'
+            f'{diagram_type}-{dpi}.{fmt}')
+
+
+def calculation_state_points(calculation) -> List[Dict]:
+    return [
+        state_point_dict(point)
+        for point in StatePoint.objects.filter(calculation=calculation).order_by('point_number')
+    ]
+
+
+def render_diagram(calculation, diagram_type: str, fmt: str, dpi: int) -> bytes:
+    """Render one diagram of a calculation, raising if it cannot be drawn"""
+    return ThermodynamicDiagrams(calculation.refrigerant.coolprop_name).render_image(
+        diagram_type, calculation_state_points(calculation), fmt, dpi, fast=settings.DIAGRAM_FAST_RENDERING)
+
+
+def _store(name: str, content: bytes):
+    saved = default_storage.save(name, ContentFile(content))
+    if saved != name:
+        # Another request stored the same diagram first
+        default_storage.delete(saved)
+
+
+def stored_diagram(calculation, diagram_type: str, fmt: str, dpi: int) -> str:
+    """Get the storage name of a diagram, rendering and storing it on first use"""
+    name = diagram_name(calculation, diagram_type, fmt, dpi)
+    exists = default_storage.exists(name)
+    metrics.cache_lookup('diagram_image', exists)
+    if not exists:
+        _store(name, render_diagram(calculation, diagram_type, fmt, dpi))
+    return name
+
+
+def warm_diagrams(calculation, fmt: str, dpi: int) -> int:
+    """Render the missing diagrams of a calculation in parallel and store them, returning how many were stored"""
+    names = {diagram_type: diagram_name(calculation, diagram_type, fmt, dpi) for diagram_type in DIAGRAM_TYPES}
+    missing = [diagram_type for diagram_type, name in names.items() if not default_storage.exists(name)]
+    if not missing:
+        return 0
+
+    images = render_images(calculation.refrigerant.coolprop_name, calculation_state_points(calculation),
+                           missing, fmt, dpi, fast=settings.DIAGRAM_FAST_RENDERING, fallback=False)
+    for diagram_type, content in images.items():
+        _store(names[diagram_type], content)
+    return len(images)
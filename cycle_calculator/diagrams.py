@@ -1,598 +1,986 @@
-import matplotlib
-
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+from matplotlib import colors, font_manager, ticker
+from matplotlib.backends.backend_agg import FigureCanvasAgg, RendererAgg
+from matplotlib.figure import Figure
+from matplotlib.text import Text
+from collections import OrderedDict
+from contextlib import contextmanager
+from PIL import Image
 import numpy as np
-import pandas as pd
 import CoolProp.CoolProp as CP
-from CoolProp.Plots import PropertyPlot
 import io
 import base64
-from typing import Dict, List, Tuple
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
 import warnings
 
+from core import metrics
+from .calculations.comparison import warm_fluids
+from .calculations.properties import COOLPROP_ERRORS
+from .isolines import IsolineGenerator
+from .tables import open_table, table_path, write_table
+
 warnings.filterwarnings('ignore')
 
+logger = logging.getLogger(__name__)
+
+DIAGRAM_RENDERS = metrics.counter('diagram_renders_total', 'Diagram renders by type, mode and outcome',
+                                  ['diagram_type', 'mode', 'outcome'])
+DIAGRAM_RENDER_SECONDS = metrics.histogram('diagram_render_seconds', 'Time to render one diagram',
+                                           ['diagram_type', 'mode'])
+
+def _first_installed_font(families: List[str]) -> str:
+    """First of the families matplotlib has a font for, resolved once so lookups do not warn per text"""
+    installed = {font.name for font in font_manager.fontManager.ttflist}
+    return next((family for family in families if family in installed), 'sans-serif')
+
+
+# The seaborn-v0_8 style with the diagrams' own overrides, applied to each
+# figure explicitly: pyplot rcParams are process-global and would leak
+# between diagrams rendered on different threads.
+DIAGRAM_STYLE = {
+    'facecolor': 'white',
+    'edgecolor': 'black',
+    'spine_width': 1.2,
+    'text_color': '.15',
+    'font_family': _first_installed_font(['Arial', 'Liberation Sans', 'DejaVu Sans', 'Bitstream Vera Sans']),
+    'font_weight': 'bold',
+    'tick_size': 10,
+    'tick_length': 0,
+    'tick_pad': 7,
+    'grid_color': 'white',
+    'legend_frame': False,
+}
+
+DIAGRAM_TYPES = ['ph', 'pv', 'ts']
+
+# Image formats served for single diagrams and their content types
+IMAGE_FORMATS = {
+    'webp': 'image/webp',
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+# Pre-rendered backgrounds kept per (refrigerant, diagram type, axis window, dpi)
+BACKGROUND_CACHE_SIZE = 64
+FAST_RENDER_DPI = 100
+
+# Diagrams that can overlay several cycles, and the styles cycled through for them
+COMPARISON_TYPES = ['ph', 'ts']
+COMPARISON_COLORS = ['#1f77b4', '#d62728', '#2ca02c', '#9467bd', '#ff7f0e', '#8c564b', '#e377c2', '#17becf']
+COMPARISON_MARKERS = ['o', 's', '^', 'D', 'v', 'P', 'X', '*']
+COMPARISON_DOME_STYLES = ['-', '--', '-.', ':']
+
+_backgrounds = OrderedDict()
+_backgrounds_lock = threading.Lock()
+
+
+@contextmanager
+def _measured(diagram_type: str, mode: str):
+    """Count a render and its outcome, timing the successful ones"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        DIAGRAM_RENDERS.labels(diagram_type, mode, 'error').inc()
+        raise
+    DIAGRAM_RENDER_SECONDS.labels(diagram_type, mode).observe(time.perf_counter() - start)
+    DIAGRAM_RENDERS.labels(diagram_type, mode, 'ok').inc()
+
+
+def _snap_linear(low: float, high: float, step: float) -> Tuple[float, float]:
+    """Widen a range outward to multiples of step"""
+    return float(np.floor(low / step) * step), float(np.ceil(high / step) * step)
+
+
+def _snap_log(low: float, high: float, step: float = 0.25) -> Tuple[float, float]:
+    """Widen a positive range outward to multiples of step decades"""
+    return (float(10 ** (np.floor(np.log10(low) / step) * step)),
+            float(10 ** (np.ceil(np.log10(high) / step) * step)))
+
 
 class ThermodynamicDiagrams():
     """Enhanced class for generating high-quality thermodynamic diagrams"""
 
     def __init__(self, refrigerant_name: str):
         self.refrigerant = refrigerant_name
-        plt.style.use('seaborn-v0_8')
-        plt.rcParams.update({
-            'font.size': 10,
-            'font.weight': 'bold',
-            'axes.labelweight': 'bold',
-            'axes.titleweight': 'bold',
-            'figure.facecolor': 'white',
-            'axes.facecolor': 'white',
-            'axes.edgecolor': 'black',
-            'axes.linewidth': 1.2,
-            'grid.alpha': 0.3,
-            'lines.linewidth': 1.5
-        })
 
-    def create_ph_diagram(self, state_points: List[Dict], calculation_data: Dict = None) -> str:
-        """Create detailed P-h diagram with enhanced isolines"""
-        try:
-            fig, ax = plt.subplots(figsize=(14, 10))
-
-            # Get critical properties
-            T_crit = CP.PropsSI('Tcrit', self.refrigerant)
-            P_crit = CP.PropsSI('Pcrit', self.refrigerant)
-
-            # Create temperature range for isotherms
-            T_min = T_crit * 0.5
-            T_max = T_crit * 1.2
-            temperatures = np.linspace(T_min, T_max, 15)
-
-            # Draw isotherms
-            for T in temperatures:
-                try:
-                    if T < T_crit:
-                        # Two-phase region
-                        h_sat_liq = CP.PropsSI('H', 'T', T, 'Q', 0, self.refrigerant) / 1000
-                        h_sat_vap = CP.PropsSI('H', 'T', T, 'Q', 1, self.refrigerant) / 1000
-                        p_sat = CP.PropsSI('P', 'T', T, 'Q', 0, self.refrigerant) / 1000
-
-                        # Saturated liquid line
-                        ax.plot([h_sat_liq], [p_sat], 'b-', linewidth=2, alpha=0.8)
-                        # Saturated vapor line
-                        ax.plot([h_sat_vap], [p_sat], 'r-', linewidth=2, alpha=0.8)
-                        # Constant temperature line in two-phase region
-                        ax.plot([h_sat_liq, h_sat_vap], [p_sat, p_sat], 'g--',
-                                linewidth=1.5, alpha=0.6)
-
-                        # Superheated region
-                        pressures = np.logspace(np.log10(p_sat), np.log10(P_crit / 1000), 50)
-                        enthalpies = []
-                        valid_pressures = []
-
-                        for p in pressures:
-                            try:
-                                h = CP.PropsSI('H', 'T', T, 'P', p * 1000, self.refrigerant) / 1000
-                                enthalpies.append(h)
-                                valid_pressures.append(p)
-                            except:
-                                continue
-
-                        if len(enthalpies) > 5:
-                            ax.plot(enthalpies, valid_pressures, 'purple',
-                                    linewidth=1, alpha=0.5)
-
-                        # Label temperature
-                        if len(enthalpies) > 0:
-                            ax.annotate(f'{T - 273.15:.0f}°C',
-                                        (enthalpies[-1], valid_pressures[-1]),
-                                        fontsize=8, alpha=0.7, color='purple')
-
-                except Exception as e:
-                    continue
+    def _new_figure(self, figsize: Tuple[float, float], dpi: int = 100):
+        """Create a standalone Agg figure that does not touch pyplot state"""
+        fig = Figure(figsize=figsize, dpi=dpi, facecolor=DIAGRAM_STYLE['facecolor'])
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        ax.set_facecolor(DIAGRAM_STYLE['facecolor'])
+        for spine in ax.spines.values():
+            spine.set_edgecolor(DIAGRAM_STYLE['edgecolor'])
+            spine.set_linewidth(DIAGRAM_STYLE['spine_width'])
+        return fig, ax
+
+    def _apply_style(self, ax):
+        """Apply the text, tick, grid and legend style once scales, limits and labels are final"""
+        # Log axes default to mathtext labels, whose shared parser is not thread-safe
+        for axis, scale in ((ax.xaxis, ax.get_xscale()), (ax.yaxis, ax.get_yscale())):
+            if scale == 'log':
+                axis.set_major_formatter(ticker.LogFormatter())
+                axis.set_minor_formatter(ticker.LogFormatter(labelOnlyBase=False))
+        ax.tick_params(which='both', direction='out', length=DIAGRAM_STYLE['tick_length'],
+                       pad=DIAGRAM_STYLE['tick_pad'], labelsize=DIAGRAM_STYLE['tick_size'],
+                       labelcolor=DIAGRAM_STYLE['text_color'], grid_color=DIAGRAM_STYLE['grid_color'])
+
+        legend = ax.get_legend()
+        if legend is not None:
+            legend.set_frame_on(DIAGRAM_STYLE['legend_frame'])
+        texts = ax.get_xticklabels(which='both') + ax.get_yticklabels(which='both') + ax.texts
+        texts += [ax.title, ax.xaxis.label, ax.yaxis.label] + (legend.get_texts() if legend is not None else [])
+        for text in texts:
+            self._style_text(text)
+
+    def _style_text(self, text):
+        text.set_fontfamily(DIAGRAM_STYLE['font_family'])
+        text.set_fontweight(DIAGRAM_STYLE['font_weight'])
+        # Only text left at the default color takes the style's
+        if colors.same_color(text.get_color(), 'black'):
+            text.set_color(DIAGRAM_STYLE['text_color'])
+
+    def _to_bytes(self, fig: Figure, fmt: str = 'png', dpi: int = 200) -> bytes:
+        """Render a figure to image bytes"""
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=fmt, dpi=dpi, bbox_inches='tight',
+                    facecolor='white', edgecolor='none')
+        return buffer.getvalue()
+
+    def _to_base64(self, fig: Figure, dpi: int = 200) -> str:
+        """Render a figure to a base64 encoded PNG"""
+        return base64.b64encode(self._to_bytes(fig, dpi=dpi)).decode()
+
+    # P-h diagram
+
+    def _ph_points(self, state_points: List[Dict]) -> List[Tuple[float, float]]:
+        """Get the (enthalpy, pressure) cycle points"""
+        enthalpies = [point.get('enthalpy', 0) for point in state_points]
+        pressures = [point.get('pressure', 0) for point in state_points]
+
+        # Remove any invalid points
+        return [(h, p) for h, p in zip(enthalpies, pressures)
+                if h > 0 and p > 0]
+
+    def _ph_limits(self, valid_points):
+        if not valid_points:
+            return None
+        h_vals, p_vals = zip(*valid_points)
+        h_min, h_max = min(h_vals), max(h_vals)
+        p_min, p_max = min(p_vals), max(p_vals)
+        return (h_min * 0.8, h_max * 1.2), (p_min * 0.5, p_max * 2.0)
+
+    def _draw_ph_background(self, ax, p_min=None):
+        """Draw isotherms, quality lines and the saturation dome on a P-h axes
+
+        The dome starts at half the critical temperature, or lower when needed
+        to reach down to p_min (Pa), as for water at chiller pressures.
+        """
+        isolines = IsolineGenerator(self.refrigerant)
+
+        # Get critical properties
+        T_crit = isolines.t_crit
+        P_crit = isolines.p_crit
+
+        # Create temperature range for isotherms, within the fluid's range as blends stop above half T_crit
+        T_min = max(T_crit * 0.5, isolines.t_min)
+        if p_min is not None and p_min < isolines.saturation_pressure(T_min):
+            T_min = max(isolines.t_min, isolines.saturation_temperature(max(p_min, isolines.p_sat_min)))
+        T_max = T_crit * 1.2
+        temperatures = np.linspace(T_min, T_max, 15)
+
+        # Draw subcritical isotherms within the fluid's range
+        for T in temperatures:
+            if not isolines.t_min <= T < T_crit:
+                continue
+
+            # Constant temperature line in two-phase region
+            h_sat_liq = isolines.saturated('H', T, 0) / 1000
+            h_sat_vap = isolines.saturated('H', T, 1) / 1000
+            ax.plot([h_sat_liq, h_sat_vap],
+                    [isolines.saturation_pressure(T, 0) / 1000, isolines.saturation_pressure(T, 1) / 1000],
+                    'g--', linewidth=1.5, alpha=0.6)
+
+            # Compressed liquid region up to the critical pressure
+            liquid = isolines.liquid_isotherm('H', T, P_crit)
+            if liquid is not None:
+                enthalpies, pressures = liquid[0] / 1000, liquid[1] / 1000
+                ax.plot(enthalpies, pressures, 'purple', linewidth=1, alpha=0.5)
+
+                # Label temperature
+                ax.annotate(f'{T - 273.15:.0f}°C', (enthalpies[-1], pressures[-1]),
+                            fontsize=8, alpha=0.7, color='purple')
+
+        # Draw quality lines
+        qualities = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
+        for quality in qualities:
+            line = isolines.quality_line(quality, 'H', T_min, T_crit * 0.95, log_y=True)
+            if line is None:
+                continue
+            enthalpies, pressures = line[0] / 1000, line[1] / 1000
+            ax.plot(enthalpies, pressures, 'orange', linewidth=1, alpha=0.6, linestyle='--')
+
+            # Label quality
+            mid_idx = len(enthalpies) // 2
+            ax.annotate(f'{quality:.1f}', (enthalpies[mid_idx], pressures[mid_idx]),
+                        fontsize=7, alpha=0.7, color='orange')
+
+        # Draw saturation dome
+        dome = isolines.saturation_dome('H', T_min, T_crit * 0.99, log_y=True)
+        if dome is not None:
+            h_sat_liq, h_sat_vap, p_sat = dome[0] / 1000, dome[1] / 1000, dome[2] / 1000
+            ax.plot(h_sat_liq, p_sat, 'b-', linewidth=3, label='Saturated Liquid', alpha=0.8)
+            ax.plot(h_sat_vap, p_sat, 'r-', linewidth=3, label='Saturated Vapor', alpha=0.8)
+
+            # Fill saturation dome
+            ax.fill_betweenx(p_sat, h_sat_liq, h_sat_vap, alpha=0.1, color='lightblue')
+
+        ax.set_xlabel('Specific Enthalpy (kJ/kg)', fontsize=14, fontweight='bold')
+        ax.set_ylabel('Pressure (kPa)', fontsize=14, fontweight='bold')
+        ax.set_title(f'P-h Diagram for {self.refrigerant}\n'
+                     f'(Critical: T={T_crit - 273.15:.1f}°C, P={P_crit / 1000:.0f} kPa)',
+                     fontsize=16, fontweight='bold')
+        ax.grid(True, alpha=0.3, linestyle='-', linewidth=0.5)
+        ax.set_yscale('log')
+
+    def _draw_ph_cycle(self, ax, valid_points) -> List:
+        """Draw the cycle polygon, markers and labels on a P-h axes"""
+        artists = []
+        if valid_points:
+            h_vals, p_vals = zip(*valid_points)
+
+            # Close the cycle
+            h_cycle = list(h_vals) + [h_vals[0]]
+            p_cycle = list(p_vals) + [p_vals[0]]
 
-            # Draw quality lines
-            qualities = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
-            for quality in qualities:
-                try:
-                    T_range = np.linspace(T_min, T_crit * 0.95, 30)
-                    enthalpies = []
-                    pressures = []
-
-                    for T in T_range:
-                        try:
-                            h = CP.PropsSI('H', 'T', T, 'Q', quality, self.refrigerant) / 1000
-                            p = CP.PropsSI('P', 'T', T, 'Q', quality, self.refrigerant) / 1000
-                            enthalpies.append(h)
-                            pressures.append(p)
-                        except:
-                            continue
-
-                    if len(enthalpies) > 5:
-                        ax.plot(enthalpies, pressures, 'orange',
-                                linewidth=1, alpha=0.6, linestyle='--')
-
-                        # Label quality
-                        mid_idx = len(enthalpies) // 2
-                        ax.annotate(f'{quality:.1f}',
-                                    (enthalpies[mid_idx], pressures[mid_idx]),
-                                    fontsize=7, alpha=0.7, color='orange')
-
-                except:
-                    continue
+            # Plot cycle
+            artists += ax.plot(h_cycle, p_cycle, 'ko-', linewidth=4, markersize=10,
+                               markerfacecolor='yellow', markeredgecolor='black',
+                               markeredgewidth=2, label='Thermodynamic Cycle', zorder=10)
 
-            # Draw saturation dome
-            try:
-                T_sat_range = np.linspace(T_min, T_crit * 0.99, 100)
-                h_sat_liq = []
-                h_sat_vap = []
-                p_sat = []
-
-                for T in T_sat_range:
-                    try:
-                        h_l = CP.PropsSI('H', 'T', T, 'Q', 0, self.refrigerant) / 1000
-                        h_v = CP.PropsSI('H', 'T', T, 'Q', 1, self.refrigerant) / 1000
-                        p = CP.PropsSI('P', 'T', T, 'Q', 0, self.refrigerant) / 1000
-
-                        h_sat_liq.append(h_l)
-                        h_sat_vap.append(h_v)
-                        p_sat.append(p)
-                    except:
-                        continue
-
-                if len(h_sat_liq) > 10:
-                    ax.plot(h_sat_liq, p_sat, 'b-', linewidth=3,
-                            label='Saturated Liquid', alpha=0.8)
-                    ax.plot(h_sat_vap, p_sat, 'r-', linewidth=3,
-                            label='Saturated Vapor', alpha=0.8)
-
-                    # Fill saturation dome
-                    ax.fill_betweenx(p_sat, h_sat_liq, h_sat_vap,
-                                     alpha=0.1, color='lightblue')
-            except:
-                pass
+            # Add point labels with better positioning
+            for i, (h, p) in enumerate(valid_points):
+                artists.append(ax.annotate(f'  {i + 1}', (h, p), fontsize=14, fontweight='bold',
+                                           color='darkred', ha='left', va='bottom',
+                                           bbox=dict(boxstyle="round,pad=0.3",
+                                                     facecolor="white", alpha=0.8),
+                                           zorder=11))
 
-            # Plot cycle points
-            if state_points:
-                enthalpies = [point.get('enthalpy', 0) for point in state_points]
-                pressures = [point.get('pressure', 0) for point in state_points]
+            # Fill cycle area
+            artists += ax.fill(h_cycle, p_cycle, alpha=0.2, color='yellow', zorder=5)
+        return artists
 
-                # Remove any invalid points
-                valid_points = [(h, p) for h, p in zip(enthalpies, pressures)
-                                if h > 0 and p > 0]
+    def _ph_figure(self, state_points: List[Dict]) -> Figure:
+        fig, ax = self._new_figure((14, 10))
 
-                if valid_points:
-                    h_vals, p_vals = zip(*valid_points)
+        valid_points = self._ph_points(state_points)
+        limits = self._ph_limits(valid_points)
+        self._draw_ph_background(ax, limits[1][0] * 1000 if limits else None)
 
-                    # Close the cycle
-                    h_cycle = list(h_vals) + [h_vals[0]]
-                    p_cycle = list(p_vals) + [p_vals[0]]
+        # Plot cycle points
+        self._draw_ph_cycle(ax, valid_points)
 
-                    # Plot cycle
-                    ax.plot(h_cycle, p_cycle, 'ko-', linewidth=4, markersize=10,
-                            markerfacecolor='yellow', markeredgecolor='black',
-                            markeredgewidth=2, label='Thermodynamic Cycle', zorder=10)
+        # Set reasonable limits
+        if limits:
+            ax.set_xlim(*limits[0])
+            ax.set_ylim(*limits[1])
 
-                    # Add point labels with better positioning
-                    for i, (h, p) in enumerate(valid_points):
-                        ax.annotate(f'  {i + 1}', (h, p), fontsize=14, fontweight='bold',
-                                    color='darkred', ha='left', va='bottom',
-                                    bbox=dict(boxstyle="round,pad=0.3",
-                                              facecolor="white", alpha=0.8),
-                                    zorder=11)
+        ax.legend(fontsize=12, loc='upper left')
+        self._apply_style(ax)
+        fig.tight_layout()
 
-                    # Fill cycle area
-                    ax.fill(h_cycle, p_cycle, alpha=0.2, color='yellow', zorder=5)
+        return fig
 
-            ax.set_xlabel('Specific Enthalpy (kJ/kg)', fontsize=14, fontweight='bold')
-            ax.set_ylabel('Pressure (kPa)', fontsize=14, fontweight='bold')
-            ax.set_title(f'P-h Diagram for {self.refrigerant}\n'
-                         f'(Critical: T={T_crit - 273.15:.1f}°C, P={P_crit / 1000:.0f} kPa)',
-                         fontsize=16, fontweight='bold')
-            ax.grid(True, alpha=0.3, linestyle='-', linewidth=0.5)
-            ax.set_yscale('log')
+    def create_ph_diagram(self, state_points: List[Dict], calculation_data: Dict = None) -> str:
+        """Create detailed P-h diagram with enhanced isolines"""
+        try:
+            with _measured('ph', 'full'):
+                return self._to_base64(self._ph_figure(state_points))
+        except Exception as e:
+            return self._create_error_image(f"P-h Diagram Error: {str(e)}")
 
-            # Set reasonable limits
-            if state_points and valid_points:
-                h_vals, p_vals = zip(*valid_points)
-                h_min, h_max = min(h_vals), max(h_vals)
-                p_min, p_max = min(p_vals), max(p_vals)
+    # P-V diagram
 
-                ax.set_xlim(h_min * 0.8, h_max * 1.2)
-                ax.set_ylim(p_min * 0.5, p_max * 2.0)
+    def _pv_points(self, state_points: List[Dict]):
+        """Get the specific volumes, pressures (kPa) and temperatures (K) of the cycle"""
+        volumes = []
+        pressures = []
+        temperatures = []
 
-            ax.legend(fontsize=12, loc='upper left')
-            plt.tight_layout()
+        for point in state_points:
+            try:
+                p = point.get('pressure', 0) * 1000  # Convert kPa to Pa
+                h = point.get('enthalpy', 0) * 1000  # Convert kJ/kg to J/kg
+                t = point.get('temperature', 0) + 273.15  # Convert to K
+
+                # Calculate density then specific volume
+                density = CP.PropsSI('D', 'P', p, 'H', h, self.refrigerant)
+                v = 1 / density  # Specific volume
+
+                volumes.append(v)
+                pressures.append(point.get('pressure', 0))
+                temperatures.append(t)
+
+            except Exception as e:
+                COOLPROP_ERRORS.labels('pv_points').inc()
+                logger.warning("Skipping P-v point of %s: %s", self.refrigerant, e)
+                continue
+
+        return volumes, pressures, temperatures
+
+    def _pv_limits(self, volumes, pressures):
+        if not (volumes and pressures):
+            return None
+        v_min, v_max = min(volumes), max(volumes)
+        p_min, p_max = min(pressures), max(pressures)
+        return (v_min * 0.5, v_max * 2.0), (p_min * 0.5, p_max * 2.0)
+
+    def _draw_pv_background(self, ax, T_min=None, T_max=None):
+        """Draw isotherms between T_min and T_max (K) and the saturation dome on a P-V axes"""
+        isolines = IsolineGenerator(self.refrigerant)
+
+        # Get critical properties
+        T_crit = isolines.t_crit
+        P_crit = isolines.p_crit
+
+        if T_min is not None and T_max is not None:
+            # Draw isotherms through the vapor, two-phase and liquid regions
+            t_range = isolines.saturation_range(T_min, min(T_max, T_crit * 0.95))
+            for T in (np.linspace(*t_range, 10) if t_range else []):
+                p_sat = isolines.saturation_pressure(T)
+                line = isolines.isotherm('D', T, p_sat * 0.1, min(P_crit * 0.9, p_sat * 10), log_x=True)
+                if line is None:
+                    continue
+                volumes_iso, pressures_iso = 1 / line[0], line[1] / 1000  # Convert to kPa
+                ax.plot(volumes_iso, pressures_iso, 'gray', alpha=0.6, linewidth=1.5)
+
+                # Label temperature
+                ax.annotate(f'{T - 273.15:.0f}°C', (volumes_iso[0], pressures_iso[0]),
+                            fontsize=9, alpha=0.8, color='gray')
+
+            # Plot saturation dome
+            dome = isolines.saturation_dome('D', T_min, min(T_crit * 0.99, T_max), log_x=True, log_y=True)
+            if dome is not None:
+                v_sat_liq, v_sat_vap, p_sat_line = 1 / dome[0], 1 / dome[1], dome[2] / 1000
+                ax.plot(v_sat_liq, p_sat_line, 'b-', linewidth=3, label='Saturated Liquid', alpha=0.8)
+                ax.plot(v_sat_vap, p_sat_line, 'r-', linewidth=3, label='Saturated Vapor', alpha=0.8)
+
+                # Fill saturation dome
+                ax.fill_betweenx(p_sat_line, v_sat_liq, v_sat_vap, alpha=0.1, color='lightcyan')
+
+        ax.set_xlabel('Specific Volume (m³/kg)', fontsize=14, fontweight='bold')
+        ax.set_ylabel('Pressure (kPa)', fontsize=14, fontweight='bold')
+        ax.set_title(f'P-V Diagram for {self.refrigerant}',
+                     fontsize=16, fontweight='bold')
+        ax.grid(True, alpha=0.3, linestyle='-', linewidth=0.5)
+        ax.set_yscale('log')
+        ax.set_xscale('log')
+
+    def _draw_pv_cycle(self, ax, volumes, pressures) -> List:
+        """Draw the cycle polygon, work area and labels on a P-V axes"""
+        artists = []
+        if volumes and pressures and len(volumes) == len(pressures):
+            # Close the cycle
+            volumes_cycle = volumes + [volumes[0]]
+            pressures_cycle = pressures + [pressures[0]]
+
+            # Plot cycle
+            artists += ax.plot(volumes_cycle, pressures_cycle, 'ko-', linewidth=4,
+                               markersize=12, markerfacecolor='lime',
+                               markeredgecolor='darkgreen', markeredgewidth=2,
+                               label='Thermodynamic Cycle', zorder=10)
+
+            # Fill cycle area (work area)
+            artists += ax.fill(volumes_cycle, pressures_cycle, alpha=0.3,
+                               color='lightgreen', label='Work Area', zorder=5)
+
+            # Add point labels
+            for i, (v, p) in enumerate(zip(volumes, pressures)):
+                artists.append(ax.annotate(f'  {i + 1}', (v, p), fontsize=14, fontweight='bold',
+                                           color='darkgreen', ha='left', va='bottom',
+                                           bbox=dict(boxstyle="round,pad=0.3",
+                                                     facecolor="white", alpha=0.9),
+                                           zorder=11))
+
+            # Calculate and display work (area under curve)
+            try:
+                work_area = 0
+                for i in range(len(volumes)):
+                    j = (i + 1) % len(volumes)
+                    work_area += 0.5 * (pressures[i] + pressures[j]) * \
+                                 (volumes[j] - volumes[i])
+
+                artists.append(ax.text(0.02, 0.98, f'Net Work ≈ {abs(work_area):.2f} kJ/kg',
+                                       transform=ax.transAxes, fontsize=12, fontweight='bold',
+                                       bbox=dict(boxstyle="round,pad=0.5",
+                                                 facecolor="lightyellow", alpha=0.8),
+                                       verticalalignment='top'))
+            except:
+                pass
+        return artists
 
-            # Convert to base64
-            buffer = io.BytesIO()
-            plt.savefig(buffer, format='png', dpi=200, bbox_inches='tight',
-                        facecolor='white', edgecolor='none')
-            buffer.seek(0)
-            image_base64 = base64.b64encode(buffer.getvalue()).decode()
-            plt.close(fig)
+    def _pv_figure(self, state_points: List[Dict]) -> Figure:
+        fig, ax = self._new_figure((12, 10))
 
-            return image_base64
+        # Calculate specific volumes and pressures for state points
+        volumes, pressures, temperatures = self._pv_points(state_points)
 
-        except Exception as e:
-            plt.close('all')
-            return self._create_error_image(f"P-h Diagram Error: {str(e)}")
+        if volumes and pressures:
+            self._draw_pv_background(ax, min(temperatures) * 0.9, max(temperatures) * 1.1)
+        else:
+            self._draw_pv_background(ax)
 
-    def create_pv_diagram(self, state_points: List[Dict], calculation_data: Dict = None) -> str:
-        """Create detailed P-V diagram with isotherms"""
-        try:
-            fig, ax = plt.subplots(figsize=(12, 10))
+        # Plot cycle
+        self._draw_pv_cycle(ax, volumes, pressures)
 
-            # Get critical properties
-            T_crit = CP.PropsSI('Tcrit', self.refrigerant)
-            P_crit = CP.PropsSI('Pcrit', self.refrigerant)
+        # Set reasonable limits
+        limits = self._pv_limits(volumes, pressures)
+        if limits:
+            ax.set_xlim(*limits[0])
+            ax.set_ylim(*limits[1])
 
-            # Calculate specific volumes and pressures for state points
-            volumes = []
-            pressures = []
-            temperatures = []
+        ax.legend(fontsize=12, loc='upper right')
+        self._apply_style(ax)
+        fig.tight_layout()
 
-            for point in state_points:
-                try:
-                    p = point.get('pressure', 0) * 1000  # Convert kPa to Pa
-                    h = point.get('enthalpy', 0) * 1000  # Convert kJ/kg to J/kg
-                    t = point.get('temperature', 0) + 273.15  # Convert to K
+        return fig
 
-                    # Calculate density then specific volume
-                    density = CP.PropsSI('D', 'P', p, 'H', h, self.refrigerant)
-                    v = 1 / density  # Specific volume
+    def create_pv_diagram(self, state_points: List[Dict], calculation_data: Dict = None) -> str:
+        """Create detailed P-V diagram with isotherms"""
+        try:
+            with _measured('pv', 'full'):
+                return self._to_base64(self._pv_figure(state_points))
+        except Exception as e:
+            return self._create_error_image(f"P-V Diagram Error: {str(e)}")
 
-                    volumes.append(v)
-                    pressures.append(point.get('pressure', 0))
-                    temperatures.append(t)
+    # T-S diagram
 
-                except Exception as e:
-                    print(f"Error calculating volume for point: {e}")
-                    continue
+    def _ts_points(self, state_points: List[Dict]):
+        """Get the entropies, temperatures (K) and pressures (Pa) of the cycle"""
+        entropies = []
+        temperatures = []
+        pressures = []
 
-            # Draw isotherms
-            if volumes and pressures:
-                T_min = min(temperatures) * 0.9
-                T_max = max(temperatures) * 1.1
-                temp_range = np.linspace(T_min, min(T_max, T_crit * 0.95), 10)
-
-                for T in temp_range:
-                    try:
-                        # Create pressure range
-                        p_sat = CP.PropsSI('P', 'T', T, 'Q', 0, self.refrigerant)
-                        p_range = np.logspace(np.log10(p_sat * 0.1),
-                                              np.log10(min(P_crit * 0.9, p_sat * 10)), 50)
-
-                        volumes_iso = []
-                        pressures_iso = []
-
-                        for p in p_range:
-                            try:
-                                density = CP.PropsSI('D', 'T', T, 'P', p, self.refrigerant)
-                                v = 1 / density
-                                volumes_iso.append(v)
-                                pressures_iso.append(p / 1000)  # Convert to kPa
-                            except:
-                                continue
-
-                        if len(volumes_iso) > 5:
-                            ax.plot(volumes_iso, pressures_iso, 'gray',
-                                    alpha=0.6, linewidth=1.5)
-
-                            # Label temperature
-                            if volumes_iso:
-                                ax.annotate(f'{T - 273.15:.0f}°C',
-                                            (volumes_iso[0], pressures_iso[0]),
-                                            fontsize=9, alpha=0.8, color='gray')
-                    except:
-                        continue
-
-                # Plot saturation dome
-                try:
-                    T_sat_range = np.linspace(T_min, min(T_crit * 0.99, T_max), 50)
-                    v_sat_liq = []
-                    v_sat_vap = []
-                    p_sat_line = []
-
-                    for T in T_sat_range:
-                        try:
-                            p_sat = CP.PropsSI('P', 'T', T, 'Q', 0, self.refrigerant)
-                            rho_l = CP.PropsSI('D', 'T', T, 'Q', 0, self.refrigerant)
-                            rho_v = CP.PropsSI('D', 'T', T, 'Q', 1, self.refrigerant)
-
-                            v_sat_liq.append(1 / rho_l)
-                            v_sat_vap.append(1 / rho_v)
-                            p_sat_line.append(p_sat / 1000)
-                        except:
-                            continue
-
-                    if len(v_sat_liq) > 10:
-                        ax.plot(v_sat_liq, p_sat_line, 'b-', linewidth=3,
-                                label='Saturated Liquid', alpha=0.8)
-                        ax.plot(v_sat_vap, p_sat_line, 'r-', linewidth=3,
-                                label='Saturated Vapor', alpha=0.8)
-
-                        # Fill saturation dome
-                        ax.fill_betweenx(p_sat_line, v_sat_liq, v_sat_vap,
-                                         alpha=0.1, color='lightcyan')
-                except:
-                    pass
-
-                # Plot cycle
-                if len(volumes) == len(pressures):
-                    # Close the cycle
-                    volumes_cycle = volumes + [volumes[0]]
-                    pressures_cycle = pressures + [pressures[0]]
-
-                    # Plot cycle
-                    ax.plot(volumes_cycle, pressures_cycle, 'ko-', linewidth=4,
-                            markersize=12, markerfacecolor='lime',
-                            markeredgecolor='darkgreen', markeredgewidth=2,
-                            label='Thermodynamic Cycle', zorder=10)
-
-                    # Fill cycle area (work area)
-                    ax.fill(volumes_cycle, pressures_cycle, alpha=0.3,
-                            color='lightgreen', label='Work Area', zorder=5)
-
-                    # Add point labels
-                    for i, (v, p) in enumerate(zip(volumes, pressures)):
-                        ax.annotate(f'  {i + 1}', (v, p), fontsize=14, fontweight='bold',
-                                    color='darkgreen', ha='left', va='bottom',
-                                    bbox=dict(boxstyle="round,pad=0.3",
-                                              facecolor="white", alpha=0.9),
-                                    zorder=11)
-
-                    # Calculate and display work (area under curve)
-                    try:
-                        work_area = 0
-                        for i in range(len(volumes)):
-                            j = (i + 1) % len(volumes)
-                            work_area += 0.5 * (pressures[i] + pressures[j]) * \
-                                         (volumes[j] - volumes[i])
-
-                        ax.text(0.02, 0.98, f'Net Work ≈ {abs(work_area):.2f} kJ/kg',
-                                transform=ax.transAxes, fontsize=12, fontweight='bold',
-                                bbox=dict(boxstyle="round,pad=0.5",
-                                          facecolor="lightyellow", alpha=0.8),
-                                verticalalignment='top')
-                    except:
-                        pass
-
-            ax.set_xlabel('Specific Volume (m³/kg)', fontsize=14, fontweight='bold')
-            ax.set_ylabel('Pressure (kPa)', fontsize=14, fontweight='bold')
-            ax.set_title(f'P-V Diagram for {self.refrigerant}',
-                         fontsize=16, fontweight='bold')
-            ax.grid(True, alpha=0.3, linestyle='-', linewidth=0.5)
-            ax.set_yscale('log')
-            ax.set_xscale('log')
+        for point in state_points:
+            try:
+                entropy = point.get('entropy', 0)
+                temperature = point.get('temperature', 0) + 273.15
+                pressure = point.get('pressure', 0) * 1000  # Convert to Pa
 
-            # Set reasonable limits
-            if volumes and pressures:
-                v_min, v_max = min(volumes), max(volumes)
-                p_min, p_max = min(pressures), max(pressures)
+                entropies.append(entropy)
+                temperatures.append(temperature)
+                pressures.append(pressure)
+            except:
+                continue
 
-                ax.set_xlim(v_min * 0.5, v_max * 2.0)
-                ax.set_ylim(p_min * 0.5, p_max * 2.0)
+        return entropies, temperatures, pressures
 
-            ax.legend(fontsize=12, loc='upper right')
-            plt.tight_layout()
+    def _ts_limits(self, entropies, temperatures):
+        if not (entropies and temperatures):
+            return None
+        s_min, s_max = min(entropies), max(entropies)
+        t_min, t_max = min(temperatures), max(temperatures)
+        return (s_min * 0.8, s_max * 1.2), (t_min * 0.95, t_max * 1.05)
 
-            # Convert to base64
-            buffer = io.BytesIO()
-            plt.savefig(buffer, format='png', dpi=200, bbox_inches='tight',
-                        facecolor='white', edgecolor='none')
-            buffer.seek(0)
-            image_base64 = base64.b64encode(buffer.getvalue()).decode()
-            plt.close(fig)
+    def _draw_ts_background(self, ax, p_min=None, p_max=None):
+        """Draw isobars between p_min and p_max (Pa), the dome and quality lines on a T-S axes"""
+        isolines = IsolineGenerator(self.refrigerant)
 
-            return image_base64
+        # Get critical properties
+        T_crit = isolines.t_crit
 
-        except Exception as e:
-            plt.close('all')
-            return self._create_error_image(f"P-V Diagram Error: {str(e)}")
+        # Draw isobars (constant pressure lines) over a reasonable temperature range
+        if p_min is not None and p_max is not None:
+            pressure_lines = np.logspace(np.log10(p_min), np.log10(p_max), 8)
 
-    def create_ts_diagram(self, state_points: List[Dict]) -> str:
-        """Create detailed T-S diagram with isobars and quality lines"""
-        try:
-            fig, ax = plt.subplots(figsize=(12, 10))
-
-            # Get critical properties
-            T_crit = CP.PropsSI('Tcrit', self.refrigerant)
-            P_crit = CP.PropsSI('Pcrit', self.refrigerant)
-
-            # Extract cycle data
-            entropies = []
-            temperatures = []
-            pressures = []
-
-            for point in state_points:
-                try:
-                    entropy = point.get('entropy', 0)
-                    temperature = point.get('temperature', 0) + 273.15
-                    pressure = point.get('pressure', 0) * 1000  # Convert to Pa
-
-                    entropies.append(entropy)
-                    temperatures.append(temperature)
-                    pressures.append(pressure)
-                except:
+            for p in pressure_lines:
+                line = isolines.isobar('S', p, 200, T_crit * 1.5)
+                if line is None:
                     continue
+                entropies_iso, temps_iso = line[0] / 1000, line[1]
+                ax.plot(entropies_iso, temps_iso, 'purple', alpha=0.6, linewidth=1.5)
+
+                # Label pressure
+                ax.annotate(f'{p / 1000:.0f} kPa', (entropies_iso[-1], temps_iso[-1]),
+                            fontsize=9, alpha=0.8, color='purple')
+
+        # Draw saturation dome
+        dome = isolines.saturation_dome('S', T_crit * 0.5, T_crit * 0.99, y_output='T')
+        if dome is not None:
+            s_sat_liq, s_sat_vap, T_sat = dome[0] / 1000, dome[1] / 1000, dome[2]
+            ax.plot(s_sat_liq, T_sat, 'b-', linewidth=3, label='Saturated Liquid', alpha=0.8)
+            ax.plot(s_sat_vap, T_sat, 'r-', linewidth=3, label='Saturated Vapor', alpha=0.8)
+
+            # Fill saturation dome
+            ax.fill_betweenx(T_sat, s_sat_liq, s_sat_vap, alpha=0.1, color='lightpink')
+
+        # Draw quality lines
+        qualities = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
+        for quality in qualities:
+            line = isolines.quality_line(quality, 'S', T_crit * 0.5, T_crit * 0.95, y_output='T')
+            if line is None:
+                continue
+            entropies_q, temps_q = line[0] / 1000, line[1]
+            ax.plot(entropies_q, temps_q, 'orange', linewidth=1, alpha=0.6, linestyle='--')
+
+            # Label quality
+            mid_idx = len(entropies_q) // 2
+            ax.annotate(f'{quality:.1f}', (entropies_q[mid_idx], temps_q[mid_idx]),
+                        fontsize=8, alpha=0.7, color='orange')
+
+        ax.set_xlabel('Specific Entropy (kJ/kg·K)', fontsize=14, fontweight='bold')
+        ax.set_ylabel('Temperature (K)', fontsize=14, fontweight='bold')
+        ax.set_title(f'T-S Diagram for {self.refrigerant}',
+                     fontsize=16, fontweight='bold')
+        ax.grid(True, alpha=0.3, linestyle='-', linewidth=0.5)
+
+    def _draw_ts_cycle(self, ax, entropies, temperatures) -> List:
+        """Draw the cycle polygon, area and labels on a T-S axes"""
+        artists = []
+        if entropies and temperatures:
+            # Close the cycle
+            entropies_cycle = entropies + [entropies[0]]
+            temperatures_cycle = temperatures + [temperatures[0]]
 
-            # Draw isobars (constant pressure lines)
-            if pressures:
-                p_min = min(pressures) * 0.5
-                p_max = max(pressures) * 2.0
-                pressure_lines = np.logspace(np.log10(p_min), np.log10(p_max), 8)
-
-                for p in pressure_lines:
-                    try:
-                        # Create entropy range
-                        s_range = np.linspace(0.5, 3.0, 100)
-                        temps_iso = []
-                        entropies_iso = []
-
-                        for s in s_range:
-                            try:
-                                temp = CP.PropsSI('T', 'P', p, 'S', s * 1000, self.refrigerant)
-                                if temp > 200 and temp < T_crit * 1.5:  # Reasonable range
-                                    temps_iso.append(temp)
-                                    entropies_iso.append(s)
-                            except:
-                                continue
-
-                        if len(temps_iso) > 10:
-                            ax.plot(entropies_iso, temps_iso, 'purple',
-                                    alpha=0.6, linewidth=1.5)
-
-                            # Label pressure
-                            if entropies_iso and temps_iso:
-                                ax.annotate(f'{p / 1000:.0f} kPa',
-                                            (entropies_iso[-1], temps_iso[-1]),
-                                            fontsize=9, alpha=0.8, color='purple')
-                    except:
-                        continue
-
-            # Draw saturation dome
+            # Plot cycle
+            artists += ax.plot(entropies_cycle, temperatures_cycle, 'ko-',
+                               linewidth=4, markersize=12, markerfacecolor='cyan',
+                               markeredgecolor='darkblue', markeredgewidth=2,
+                               label='Thermodynamic Cycle', zorder=10)
+
+            # Fill cycle area
+            artists += ax.fill(entropies_cycle, temperatures_cycle, alpha=0.3,
+                               color='lightcyan', label='Cycle Area', zorder=5)
+
+            # Add point labels
+            for i, (s, t) in enumerate(zip(entropies, temperatures)):
+                artists.append(ax.annotate(f'  {i + 1}', (s, t), fontsize=14, fontweight='bold',
+                                           color='darkblue', ha='left', va='bottom',
+                                           bbox=dict(boxstyle="round,pad=0.3",
+                                                     facecolor="white", alpha=0.9),
+                                           zorder=11))
+
+            # Calculate and display entropy generation
             try:
-                T_sat_range = np.linspace(T_crit * 0.5, T_crit * 0.99, 100)
-                s_sat_liq = []
-                s_sat_vap = []
-                T_sat = []
-
-                for T in T_sat_range:
-                    try:
-                        s_l = CP.PropsSI('S', 'T', T, 'Q', 0, self.refrigerant) / 1000
-                        s_v = CP.PropsSI('S', 'T', T, 'Q', 1, self.refrigerant) / 1000
-
-                        s_sat_liq.append(s_l)
-                        s_sat_vap.append(s_v)
-                        T_sat.append(T)
-                    except:
-                        continue
-
-                if len(s_sat_liq) > 10:
-                    ax.plot(s_sat_liq, T_sat, 'b-', linewidth=3,
-                            label='Saturated Liquid', alpha=0.8)
-                    ax.plot(s_sat_vap, T_sat, 'r-', linewidth=3,
-                            label='Saturated Vapor', alpha=0.8)
-
-                    # Fill saturation dome
-                    ax.fill_betweenx(T_sat, s_sat_liq, s_sat_vap,
-                                     alpha=0.1, color='lightpink')
+                entropy_change = max(entropies) - min(entropies)
+                artists.append(ax.text(0.02, 0.98, f'ΔS_cycle ≈ {entropy_change:.3f} kJ/kg·K',
+                                       transform=ax.transAxes, fontsize=12, fontweight='bold',
+                                       bbox=dict(boxstyle="round,pad=0.5",
+                                                 facecolor="lightcyan", alpha=0.8),
+                                       verticalalignment='top'))
             except:
                 pass
+        return artists
 
-            # Draw quality lines
-            qualities = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
-            for quality in qualities:
-                try:
-                    T_range = np.linspace(T_crit * 0.5, T_crit * 0.95, 30)
-                    entropies_q = []
-                    temps_q = []
-
-                    for T in T_range:
-                        try:
-                            s = CP.PropsSI('S', 'T', T, 'Q', quality, self.refrigerant) / 1000
-                            entropies_q.append(s)
-                            temps_q.append(T)
-                        except:
-                            continue
-
-                    if len(entropies_q) > 5:
-                        ax.plot(entropies_q, temps_q, 'orange',
-                                linewidth=1, alpha=0.6, linestyle='--')
-
-                        # Label quality
-                        mid_idx = len(entropies_q) // 2
-                        if mid_idx < len(entropies_q):
-                            ax.annotate(f'{quality:.1f}',
-                                        (entropies_q[mid_idx], temps_q[mid_idx]),
-                                        fontsize=8, alpha=0.7, color='orange')
-                except:
-                    continue
-
-            # Plot cycle
-            if entropies and temperatures:
-                # Close the cycle
-                entropies_cycle = entropies + [entropies[0]]
-                temperatures_cycle = temperatures + [temperatures[0]]
-
-                # Plot cycle
-                ax.plot(entropies_cycle, temperatures_cycle, 'ko-',
-                        linewidth=4, markersize=12, markerfacecolor='cyan',
-                        markeredgecolor='darkblue', markeredgewidth=2,
-                        label='Thermodynamic Cycle', zorder=10)
-
-                # Fill cycle area
-                ax.fill(entropies_cycle, temperatures_cycle, alpha=0.3,
-                        color='lightcyan', label='Cycle Area', zorder=5)
-
-                # Add point labels
-                for i, (s, t) in enumerate(zip(entropies, temperatures)):
-                    ax.annotate(f'  {i + 1}', (s, t), fontsize=14, fontweight='bold',
-                                color='darkblue', ha='left', va='bottom',
-                                bbox=dict(boxstyle="round,pad=0.3",
-                                          facecolor="white", alpha=0.9),
-                                zorder=11)
-
-                # Calculate and display entropy generation
-                try:
-                    entropy_change = max(entropies) - min(entropies)
-                    ax.text(0.02, 0.98, f'ΔS_cycle ≈ {entropy_change:.3f} kJ/kg·K',
-                            transform=ax.transAxes, fontsize=12, fontweight='bold',
-                            bbox=dict(boxstyle="round,pad=0.5",
-                                      facecolor="lightcyan", alpha=0.8),
-                            verticalalignment='top')
-                except:
-                    pass
+    def _ts_figure(self, state_points: List[Dict]) -> Figure:
+        fig, ax = self._new_figure((12, 10))
 
-            ax.set_xlabel('Specific Entropy (kJ/kg·K)', fontsize=14, fontweight='bold')
-            ax.set_ylabel('Temperature (K)', fontsize=14, fontweight='bold')
-            ax.set_title(f'T-S Diagram for {self.refrigerant}',
-                         fontsize=16, fontweight='bold')
-            ax.grid(True, alpha=0.3, linestyle='-', linewidth=0.5)
+        # Extract cycle data
+        entropies, temperatures, pressures = self._ts_points(state_points)
 
-            # Set reasonable limits
-            if entropies and temperatures:
-                s_min, s_max = min(entropies), max(entropies)
-                t_min, t_max = min(temperatures), max(temperatures)
+        if pressures:
+            self._draw_ts_background(ax, min(pressures) * 0.5, max(pressures) * 2.0)
+        else:
+            self._draw_ts_background(ax)
 
-                ax.set_xlim(s_min * 0.8, s_max * 1.2)
-                ax.set_ylim(t_min * 0.95, t_max * 1.05)
+        # Plot cycle
+        self._draw_ts_cycle(ax, entropies, temperatures)
 
-            ax.legend(fontsize=12, loc='upper left')
-            plt.tight_layout()
+        # Set reasonable limits
+        limits = self._ts_limits(entropies, temperatures)
+        if limits:
+            ax.set_xlim(*limits[0])
+            ax.set_ylim(*limits[1])
 
-            # Convert to base64
-            buffer = io.BytesIO()
-            plt.savefig(buffer, format='png', dpi=200, bbox_inches='tight',
-                        facecolor='white', edgecolor='none')
-            buffer.seek(0)
-            image_base64 = base64.b64encode(buffer.getvalue()).decode()
-            plt.close(fig)
+        ax.legend(fontsize=12, loc='upper left')
+        self._apply_style(ax)
+        fig.tight_layout()
 
-            return image_base64
+        return fig
 
+    def create_ts_diagram(self, state_points: List[Dict]) -> str:
+        """Create detailed T-S diagram with isobars and quality lines"""
+        try:
+            with _measured('ts', 'full'):
+                return self._to_base64(self._ts_figure(state_points))
         except Exception as e:
-            plt.close('all')
             return self._create_error_image(f"T-S Diagram Error: {str(e)}")
 
-    def _create_error_image(self, error_msg: str) -> str:
-        """Create an enhanced error image"""
-        fig, ax = plt.subplots(figsize=(10, 6))
+    def _error_figure(self, error_msg: str) -> Figure:
+        fig, ax = self._new_figure((10, 6))
         ax.text(0.5, 0.5, f"⚠️ خطا در تولید نمودار\n\n{error_msg}\n\n"
                           f"لطفاً پارامترهای ورودی را بررسی کنید",
                 ha='center', va='center', fontsize=14, fontweight='bold',
                 bbox=dict(boxstyle="round,pad=0.5", facecolor="lightcoral", alpha=0.8),
-                color='darkred')
+                color='darkred', parse_math=False)
         ax.set_xlim(0, 1)
         ax.set_ylim(0, 1)
         ax.axis('off')
-        plt.tight_layout()
+        fig.tight_layout()
+        return fig
 
+    def _create_error_image(self, error_msg: str) -> str:
+        """Create an enhanced error image"""
+        return self._to_base64(self._error_figure(error_msg), dpi=150)
+
+    # Fast rendering on cached backgrounds
+
+    def _saturation_temperature(self, pressure: float) -> float:
+        """Saturation temperature (K) at a pressure (Pa), clamped to the two-phase range"""
+        T_low = CP.PropsSI('Tmin', self.refrigerant)
+        T_crit = CP.PropsSI('Tcrit', self.refrigerant)
+        p_low = CP.PropsSI('P', 'T', T_low, 'Q', 0, self.refrigerant)
+        p_crit = CP.PropsSI('Pcrit', self.refrigerant)
+        if pressure <= p_low:
+            return T_low
+        if pressure >= p_crit:
+            return T_crit
+        return CP.PropsSI('T', 'P', pressure, 'Q', 0, self.refrigerant)
+
+    def _saturation_pressure(self, temperature: float) -> float:
+        """Saturation pressure (Pa) at a temperature (K), clamped to the two-phase range"""
+        T_low = CP.PropsSI('Tmin', self.refrigerant)
+        T_crit = CP.PropsSI('Tcrit', self.refrigerant)
+        temperature = min(max(temperature, T_low), T_crit * 0.99)
+        return CP.PropsSI('P', 'T', temperature, 'Q', 0, self.refrigerant)
+
+    def _overlay_spec(self, diagram_type: str, state_points: List[Dict]):
+        """Get the cycle data, snapped axis window and background arguments for a diagram
+
+        Axis windows are widened to a coarse grid so that nearby cycles share a background.
+        """
+        if diagram_type == 'ph':
+            valid_points = self._ph_points(state_points)
+            limits = self._ph_limits(valid_points)
+            window = (_snap_linear(*limits[0], 25), _snap_log(*limits[1])) if limits else None
+            return (14, 10), (valid_points,), window, (window[1][0] * 1000,) if window else ()
+        if diagram_type == 'pv':
+            volumes, pressures, temperatures = self._pv_points(state_points)
+            limits = self._pv_limits(volumes, pressures)
+            window = (_snap_log(*limits[0]), _snap_log(*limits[1])) if limits else None
+            background = ()
+            if window:
+                background = (self._saturation_temperature(window[1][0] * 1000) * 0.9,
+                              self._saturation_temperature(window[1][1] * 1000) * 1.1)
+            return (12, 10), (volumes, pressures), window, background
+        if diagram_type == 'ts':
+            entropies, temperatures, pressures = self._ts_points(state_points)
+            limits = self._ts_limits(entropies, temperatures)
+            window = (_snap_linear(*limits[0], 0.1), _snap_linear(*limits[1], 10)) if limits else None
+            background = ()
+            if window:
+                background = (self._saturation_pressure(window[1][0]) * 0.5,
+                              self._saturation_pressure(window[1][1]) * 2.0)
+            return (12, 10), (entropies, temperatures), window, background
+        raise ValueError(f"Unknown diagram type: {diagram_type}")
+
+    def _build_background(self, diagram_type: str, figsize, cycle_data, window, background_args, dpi: int):
+        """Draw and lay out a background once, keeping its pixels for later overlays"""
+        fig, ax = self._new_figure(figsize, dpi=dpi)
+        getattr(self, f'_draw_{diagram_type}_background')(ax, *background_args)
+
+        # Draw the cycle only to build the legend, then remove it from the background
+        cycle_artists = getattr(self, f'_draw_{diagram_type}_cycle')(ax, *cycle_data)
+        ax.set_xlim(*window[0])
+        ax.set_ylim(*window[1])
+        ax.set_autoscale_on(False)
+        ax.legend(fontsize=12, loc='upper right' if diagram_type == 'pv' else 'upper left')
+        for artist in cycle_artists:
+            artist.remove()
+
+        self._apply_style(ax)
+        fig.tight_layout()
+        fig.canvas.draw()
+        return {
+            'figure': fig,
+            'axes': ax,
+            'region': fig.canvas.copy_from_bbox(fig.bbox),
+            'lock': threading.Lock(),
+        }
+
+    def _table_background(self, diagram_type: str, figsize, window, dpi: int):
+        """Look a background up in the memory-mapped background table, or None if it is not there
+
+        Only the bare axes are recreated, so nothing is drawn and the pixels
+        stay in the shared mapping.
+        """
+        table = open_table(background_table_path(self.refrigerant, diagram_type, dpi))
+        if table is None:
+            return None
+        windows = [tuple(map(tuple, row.tolist())) for row in table['windows']]
+        if window not in windows:
+            return None
+        index = windows.index(window)
+
+        fig = Figure(figsize=figsize, dpi=dpi)
+        ax = fig.add_axes(table['positions'][index].tolist())
+        ax.set_xscale(table.meta['xscale'])
+        ax.set_yscale(table.meta['yscale'])
+        ax.set_xlim(*window[0])
+        ax.set_ylim(*window[1])
+        ax.set_autoscale_on(False)
+        return {
+            'figure': fig,
+            'axes': ax,
+            'pixels': table['pixels'][index],
+            'lock': threading.Lock(),
+        }
+
+    def _get_background(self, diagram_type: str, figsize, cycle_data, window, background_args, dpi: int):
+        key = (self.refrigerant, diagram_type, window, dpi)
+        with _backgrounds_lock:
+            entry = _backgrounds.get(key)
+            if entry is not None:
+                _backgrounds.move_to_end(key)
+        metrics.cache_lookup('diagram_background', entry is not None)
+        if entry is not None:
+            return entry
+
+        entry = self._table_background(diagram_type, figsize, window, dpi)
+        metrics.cache_lookup('background_table', entry is not None)
+        if entry is None:
+            entry = self._build_background(diagram_type, figsize, cycle_data, window, background_args, dpi)
+        with _backgrounds_lock:
+            entry = _backgrounds.setdefault(key, entry)
+            _backgrounds.move_to_end(key)
+            while len(_backgrounds) > BACKGROUND_CACHE_SIZE:
+                _backgrounds.popitem(last=False)
+        return entry
+
+    def render_overlay(self, diagram_type: str, state_points: List[Dict],
+                       dpi: int = FAST_RENDER_DPI) -> np.ndarray:
+        """Render a diagram as an RGBA array by drawing only the cycle on a cached background"""
+        figsize, cycle_data, window, background_args = self._overlay_spec(diagram_type, state_points)
+        if window is None:
+            raise ValueError("No valid state points to plot")
+
+        entry = self._get_background(diagram_type, figsize, cycle_data, window, background_args, dpi)
+        with entry['lock']:
+            artists = getattr(self, f'_draw_{diagram_type}_cycle')(entry['axes'], *cycle_data)
+            for artist in artists:
+                if isinstance(artist, Text):
+                    self._style_text(artist)
+            try:
+                artists.sort(key=lambda artist: artist.get_zorder())
+                if 'region' in entry:
+                    canvas = entry['figure'].canvas
+                    canvas.restore_region(entry['region'])
+                    for artist in artists:
+                        entry['axes'].draw_artist(artist)
+                    return np.array(canvas.buffer_rgba())
+
+                # Mapped backgrounds are copied into a fresh renderer that lives only for this call
+                height, width = entry['pixels'].shape[:2]
+                renderer = RendererAgg(width, height, dpi)
+                pixels = np.asarray(renderer.buffer_rgba())
+                pixels[..., :3] = entry['pixels']
+                pixels[..., 3] = 255
+                for artist in artists:
+                    artist.draw(renderer)
+                return pixels
+            finally:
+                for artist in artists:
+                    artist.remove()
+
+    def _encode_pixels(self, pixels: np.ndarray, fmt: str = 'png') -> bytes:
+        """Encode an RGBA array with Pillow, favouring speed over size"""
         buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight',
-                    facecolor='white', edgecolor='none')
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.getvalue()).decode()
-        plt.close(fig)
-
-        return image_base64
+        image = Image.fromarray(pixels).convert('RGB')
+        if fmt == 'webp':
+            image.save(buffer, format='WEBP', lossless=True, method=0)
+        else:
+            image.save(buffer, format='PNG', compress_level=1)
+        return buffer.getvalue()
+
+    def create_diagram_fast(self, diagram_type: str, state_points: List[Dict],
+                            dpi: int = FAST_RENDER_DPI) -> str:
+        """Create a diagram from a cached background as a base64 encoded PNG"""
+        try:
+            with _measured(diagram_type, 'fast'):
+                pixels = self.render_overlay(diagram_type, state_points, dpi)
+                return base64.b64encode(self._encode_pixels(pixels)).decode()
+        except Exception as e:
+            return self._create_error_image(f"{diagram_type} Diagram Error: {str(e)}")
+
+    def render_image(self, diagram_type: str, state_points: List[Dict], fmt: str = 'png',
+                     dpi: int = FAST_RENDER_DPI, fast: bool = True) -> bytes:
+        """Render one diagram as PNG, WebP or SVG bytes
+
+        Raster formats use the cached background path when fast is set; SVG is
+        always drawn in full since vector output cannot reuse a pixel buffer.
+        """
+        if fmt not in IMAGE_FORMATS:
+            raise ValueError(f"Unknown image format: {fmt}")
+        if diagram_type not in DIAGRAM_TYPES:
+            raise ValueError(f"Unknown diagram type: {diagram_type}")
+        if fast and fmt != 'svg':
+            with _measured(diagram_type, 'fast'):
+                return self._encode_pixels(self.render_overlay(diagram_type, state_points, dpi), fmt)
+        with _measured(diagram_type, 'full'):
+            fig = getattr(self, f'_{diagram_type}_figure')(state_points)
+            return self._to_bytes(fig, fmt, dpi)
+
+    def render_error_image(self, error_msg: str, fmt: str = 'png', dpi: int = FAST_RENDER_DPI) -> bytes:
+        """Render the error image as PNG, WebP or SVG bytes"""
+        return self._to_bytes(self._error_figure(error_msg), fmt, dpi)
+
+
+def _comparison_cycle(diagrams: 'ThermodynamicDiagrams', diagram_type: str, state_points: List[Dict]):
+    """Get the closed (x, y) cycle coordinates used for a comparison overlay"""
+    if diagram_type == 'ph':
+        points = diagrams._ph_points(state_points)
+        x, y = ([h for h, _ in points], [p for _, p in points])
+    else:
+        x, y, _ = diagrams._ts_points(state_points)
+    return list(x), list(y)
+
+
+def render_comparison(diagram_type: str, cycles: List[Dict], fmt: str = 'png',
+                      dpi: int = FAST_RENDER_DPI) -> bytes:
+    """Overlay several cycles on one P-h or T-S diagram
+
+    Each cycle is a dict with 'label', 'refrigerant' and 'state_points'. The
+    isolines of a single refrigerant are drawn once under every cycle; with
+    several refrigerants only their saturation domes are drawn, one per fluid.
+    """
+    if diagram_type not in COMPARISON_TYPES:
+        raise ValueError(f"Unknown comparison diagram type: {diagram_type}")
+    if fmt not in IMAGE_FORMATS:
+        raise ValueError(f"Unknown image format: {fmt}")
+    with _measured(diagram_type, 'comparison'):
+        return _render_comparison(diagram_type, cycles, fmt, dpi)
+
+
+def _render_comparison(diagram_type: str, cycles: List[Dict], fmt: str, dpi: int) -> bytes:
+    fluids = list(dict.fromkeys(cycle['refrigerant'] for cycle in cycles))
+    base = ThermodynamicDiagrams(fluids[0] if len(fluids) == 1 else ', '.join(fluids))
+    fig, ax = base._new_figure((14, 10) if diagram_type == 'ph' else (12, 10))
+
+    coordinates = [_comparison_cycle(ThermodynamicDiagrams(cycle['refrigerant']), diagram_type,
+                                     cycle['state_points'])
+                   for cycle in cycles]
+    xs = [value for x, _ in coordinates for value in x]
+    ys = [value for _, y in coordinates for value in y]
+    if not xs:
+        raise ValueError("No valid state points to plot")
+
+    # Background, computed once per fluid
+    if len(fluids) == 1:
+        if diagram_type == 'ph':
+            base._draw_ph_background(ax)
+        else:
+            pressures = [p for cycle in cycles for p in base._ts_points(cycle['state_points'])[2]]
+            base._draw_ts_background(ax, min(pressures) * 0.5, max(pressures) * 2.0)
+    else:
+        for i, fluid in enumerate(fluids):
+            isolines = IsolineGenerator(fluid)
+            if diagram_type == 'ph':
+                dome = isolines.saturation_dome('H', isolines.t_crit * 0.5, isolines.t_crit * 0.99, log_y=True)
+                liquid, vapor, y = (dome[0] / 1000, dome[1] / 1000, dome[2] / 1000) if dome else (None,) * 3
+            else:
+                dome = isolines.saturation_dome('S', isolines.t_crit * 0.5, isolines.t_crit * 0.99, y_output='T')
+                liquid, vapor, y = (dome[0] / 1000, dome[1] / 1000, dome[2]) if dome else (None,) * 3
+            if dome is None:
+                continue
+            style = COMPARISON_DOME_STYLES[i % len(COMPARISON_DOME_STYLES)]
+            ax.plot(liquid, y, color='gray', linestyle=style, linewidth=2, alpha=0.8,
+                    label=f'{fluid} saturation')
+            ax.plot(vapor, y, color='gray', linestyle=style, linewidth=2, alpha=0.8)
+
+        if diagram_type == 'ph':
+            ax.set_xlabel('Specific Enthalpy (kJ/kg)', fontsize=14, fontweight='bold')
+            ax.set_ylabel('Pressure (kPa)', fontsize=14, fontweight='bold')
+            ax.set_yscale('log')
+        else:
+            ax.set_xlabel('Specific Entropy (kJ/kg·K)', fontsize=14, fontweight='bold')
+            ax.set_ylabel('Temperature (K)', fontsize=14, fontweight='bold')
+        ax.grid(True, alpha=0.3, linestyle='-', linewidth=0.5)
+
+    title = 'P-h' if diagram_type == 'ph' else 'T-S'
+    ax.set_title(f'{title} Comparison ({", ".join(fluids)})', fontsize=16, fontweight='bold')
+
+    # Cycles
+    for i, (cycle, (x, y)) in enumerate(zip(cycles, coordinates)):
+        if not x:
+            continue
+        color = COMPARISON_COLORS[i % len(COMPARISON_COLORS)]
+        ax.plot(x + [x[0]], y + [y[0]], color=color, marker=COMPARISON_MARKERS[i % len(COMPARISON_MARKERS)],
+                linewidth=3, markersize=9, markeredgecolor='black', label=cycle['label'], zorder=10)
+        ax.fill(x + [x[0]], y + [y[0]], color=color, alpha=0.08, zorder=5)
+        for number, point in enumerate(zip(x, y), start=1):
+            ax.annotate(f' {number}', point, fontsize=11, fontweight='bold', color=color,
+                        ha='left', va='bottom', zorder=11)
+
+    # Set reasonable limits around all cycles
+    if diagram_type == 'ph':
+        ax.set_xlim(min(xs) * 0.8, max(xs) * 1.2)
+        ax.set_ylim(min(ys) * 0.5, max(ys) * 2.0)
+    else:
+        ax.set_xlim(min(xs) * 0.8, max(xs) * 1.2)
+        ax.set_ylim(min(ys) * 0.95, max(ys) * 1.05)
+
+    ax.legend(fontsize=11, loc='upper left')
+    base._apply_style(ax)
+    fig.tight_layout()
+    return base._to_bytes(fig, fmt, dpi)
+
+
+def render_diagrams(refrigerant_name: str, state_points: List[Dict], fast: bool = False) -> Dict[str, str]:
+    """Render the P-h, P-V and T-S diagrams of a cycle as base64 PNGs"""
+    diagrams = ThermodynamicDiagrams(refrigerant_name)
+    if fast:
+        return {f'{diagram_type}_diagram': diagrams.create_diagram_fast(diagram_type, state_points)
+                for diagram_type in DIAGRAM_TYPES}
+    return {
+        'ph_diagram': diagrams.create_ph_diagram(state_points),
+        'pv_diagram': diagrams.create_pv_diagram(state_points),
+        'ts_diagram': diagrams.create_ts_diagram(state_points),
+    }
+
+
+def background_table_path(refrigerant: str, diagram_type: str, dpi: int) -> Optional[str]:
+    return table_path('backgrounds', f'{refrigerant}-{diagram_type}-{dpi}.table')
+
+
+def build_background_table(refrigerant: str, diagram_type: str, dpi: int, cycles: List[List[Dict]],
+                           path: str) -> int:
+    """Pre-render the backgrounds the given cycles need into a table file, returning how many were stored
+
+    Pixels are stored as opaque RGB with the axes geometry needed to draw a
+    cycle over them, one row per distinct axis window.
+    """
+    diagrams = ThermodynamicDiagrams(refrigerant)
+    windows, positions, pixels = [], [], []
+    scales = ('linear', 'linear')
+    for state_points in cycles:
+        figsize, cycle_data, window, background_args = diagrams._overlay_spec(diagram_type, state_points)
+        if window is None or window in windows:
+            continue
+        entry = diagrams._build_background(diagram_type, figsize, cycle_data, window, background_args, dpi)
+        windows.append(window)
+        positions.append(entry['axes'].get_position().bounds)
+        pixels.append(np.asarray(entry['figure'].canvas.buffer_rgba())[..., :3].copy())
+        scales = (entry['axes'].get_xscale(), entry['axes'].get_yscale())
+
+    write_table(path, {
+        'windows': np.array(windows, dtype=float).reshape(-1, 2, 2),
+        'positions': np.array(positions, dtype=float).reshape(-1, 4),
+        'pixels': np.array(pixels, dtype=np.uint8),
+    }, {'refrigerant': refrigerant, 'diagram_type': diagram_type, 'dpi': dpi,
+        'xscale': scales[0], 'yscale': scales[1]})
+    return len(windows)
+
+
+def warm_worker(fluids: List[str]):
+    """Preload CoolProp fluid data and the matplotlib Agg and font machinery in a pool worker"""
+    warm_fluids(fluids)
+    ThermodynamicDiagrams('').render_error_image('', 'png', dpi=10)
+
+
+def render_image_task(refrigerant: str, diagram_type: str, state_points: List[Dict], fmt: str = 'png',
+                      dpi: int = FAST_RENDER_DPI, fast: bool = True) -> bytes:
+    """Render one diagram in a pool worker"""
+    return ThermodynamicDiagrams(refrigerant).render_image(diagram_type, state_points, fmt, dpi, fast)
@@ -0,0 +1,278 @@
+import numpy as np
+import CoolProp
+import CoolProp.CoolProp as CP
+from typing import Callable, List, Optional, Tuple
+
+# Largest deviation from a straight segment, as a fraction of the curve's extent on screen
+DEFAULT_TOLERANCE = 0.0005
+INITIAL_POINTS = 9
+MAX_POINTS = 257
+
+# Relative offset that keeps single-phase inputs clear of the saturation line
+SATURATION_MARGIN = 1e-4
+
+
+def _display(values: np.ndarray, log: bool) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.log10(values) if log else values
+
+
+def _midpoints(params: np.ndarray, log_param: bool) -> np.ndarray:
+    if log_param:
+        return np.sqrt(params[:-1] * params[1:])
+    return 0.5 * (params[:-1] + params[1:])
+
+
+def adaptive_sample(evaluate: Callable[[np.ndarray], List[Tuple[np.ndarray, np.ndarray]]],
+                    low: float, high: float, log_param: bool = False, log_x: bool = False,
+                    log_y: bool = False, tolerance: float = DEFAULT_TOLERANCE,
+                    initial: int = INITIAL_POINTS, max_points: int = MAX_POINTS):
+    """Sample one or more curves sharing a parameter, refining where they bend
+
+    evaluate maps an array of parameter values to a list of (x, y) arrays. Each
+    pass evaluates the midpoints of the segments still being refined in a single
+    vectorized call, and keeps a midpoint only where it lies further than
+    tolerance from the straight segment in display (linear or log) coordinates.
+    Returns the sorted parameters and the list of (x, y) arrays.
+    """
+    params = np.geomspace(low, high, initial) if log_param else np.linspace(low, high, initial)
+    curves = [tuple(np.asarray(c, dtype=float) for c in curve) for curve in evaluate(params)]
+
+    # Scale deviations by the extent of each curve on screen
+    scales = []
+    for x, y in curves:
+        dx, dy = _display(x, log_x), _display(y, log_y)
+        scale_x = np.nanmax(dx) - np.nanmin(dx) if np.isfinite(dx).any() else 0.0
+        scale_y = np.nanmax(dy) - np.nanmin(dy) if np.isfinite(dy).any() else 0.0
+        scales.append((scale_x or 1.0, scale_y or 1.0))
+
+    active = np.ones(len(params) - 1, dtype=bool)
+    while active.any() and len(params) < max_points:
+        segments = np.flatnonzero(active)[:max_points - len(params)]
+        mids = _midpoints(params, log_param)[segments]
+        mid_curves = evaluate(mids)
+
+        error = np.zeros(len(segments))
+        valid = np.ones(len(segments), dtype=bool)
+        for (x, y), (mx, my), (scale_x, scale_y) in zip(curves, mid_curves, scales):
+            mx, my = np.asarray(mx, dtype=float), np.asarray(my, dtype=float)
+            dx, dy = _display(x, log_x), _display(y, log_y)
+            chord_x = 0.5 * (dx[segments] + dx[segments + 1])
+            chord_y = 0.5 * (dy[segments] + dy[segments + 1])
+            deviation = np.hypot((_display(mx, log_x) - chord_x) / scale_x,
+                                 (_display(my, log_y) - chord_y) / scale_y)
+            valid &= np.isfinite(deviation)
+            error = np.maximum(error, np.where(np.isfinite(deviation), deviation, 0.0))
+
+        refine = valid & (error > tolerance)
+        if not refine.any():
+            break
+
+        # Insert the refined midpoints; both halves of a refined segment stay active
+        keep = segments[refine]
+        insert_at = keep + 1
+        params = np.insert(params, insert_at, mids[refine])
+        curves = [
+            (np.insert(x, insert_at, np.asarray(mx, dtype=float)[refine]),
+             np.insert(y, insert_at, np.asarray(my, dtype=float)[refine]))
+            for (x, y), (mx, my) in zip(curves, mid_curves)
+        ]
+        refined = np.zeros(len(active), dtype=bool)
+        refined[keep] = True
+        active = np.repeat(refined, np.where(refined, 2, 1))
+
+    return params, curves
+
+
+class IsolineGenerator:
+    """Isolines of a fluid sampled within its valid temperature and pressure range
+
+    Every sampling range is derived from the fluid limits (minimum, critical and
+    maximum temperature and pressure) and the saturation line, so no property
+    call is made outside the domain and none has to be retried or skipped.
+    """
+
+    def __init__(self, refrigerant: str, tolerance: float = DEFAULT_TOLERANCE):
+        self.refrigerant = refrigerant
+        self.tolerance = tolerance
+        self.t_min = CP.PropsSI('Tmin', refrigerant)
+        self.t_max = CP.PropsSI('Tmax', refrigerant)
+        self.t_crit = CP.PropsSI('Tcrit', refrigerant)
+        self.p_crit = CP.PropsSI('Pcrit', refrigerant)
+        self.p_max = CP.PropsSI('pmax', refrigerant)
+        self.p_sat_min = CP.PropsSI('P', 'T', self.t_min, 'Q', 0, refrigerant)
+
+        backend, _, fluid = refrigerant.rpartition('::')
+        state = CP.AbstractState(backend or 'HEOS', fluid)
+        self._melting_state = state if state.has_melting_line() else None
+
+    def _props(self, output: str, name1: str, value1, name2: str, value2) -> np.ndarray:
+        value1, value2 = np.broadcast_arrays(np.asarray(value1, dtype=float), np.asarray(value2, dtype=float))
+        if value1.size == 0:
+            return value1.copy()
+        try:
+            with np.errstate(invalid='ignore'):
+                result = np.asarray(CP.PropsSI(output, name1, value1.ravel(), name2, value2.ravel(),
+                                               self.refrigerant), dtype=float).reshape(value1.shape)
+        except ValueError:
+            # Vectorized PropsSI raises only when no input at all could be evaluated
+            return np.full(value1.shape, np.nan)
+        result[~np.isfinite(result)] = np.nan
+        return result
+
+    def _sample(self, evaluate, low: float, high: float, log_param: bool = False,
+                log_x: bool = False, log_y: bool = False):
+        return adaptive_sample(evaluate, low, high, log_param, log_x, log_y, self.tolerance)
+
+    def saturation_range(self, t_low: float, t_high: float) -> Optional[Tuple[float, float]]:
+        """Clamp a temperature range (K) to the two-phase region, or None if they do not overlap"""
+        t_low = max(t_low, self.t_min)
+        t_high = min(t_high, self.t_crit * (1 - SATURATION_MARGIN))
+        return (t_low, t_high) if t_low < t_high else None
+
+    def saturation_pressure(self, temperature: float, quality: float = 0) -> float:
+        """Bubble (quality 0) or dew (quality 1) pressure in Pa; they differ for blends"""
+        return float(self._props('P', 'T', temperature, 'Q', quality))
+
+    def saturation_temperature(self, pressure: float, quality: float = 0) -> float:
+        """Bubble (quality 0) or dew (quality 1) temperature in K"""
+        return float(self._props('T', 'P', pressure, 'Q', quality))
+
+    def saturated(self, output: str, temperature: float, quality: float) -> float:
+        """Property of the saturated liquid (quality 0) or vapor (quality 1) at a temperature (K)"""
+        return float(self._props(output, 'T', temperature, 'Q', quality))
+
+    def melting_temperature(self, pressure: float) -> float:
+        """Lowest liquid temperature (K) at a pressure, from the melting line when the fluid has one"""
+        if self._melting_state is None or pressure <= self.p_sat_min:
+            return self.t_min
+        return max(self.t_min, self._melting_state.melting_line(CoolProp.iT, CoolProp.iP, pressure))
+
+    def melting_pressure(self, temperature: float) -> float:
+        """Highest liquid pressure (Pa) at a temperature, from the melting line when the fluid has one"""
+        if self._melting_state is None:
+            return self.p_max
+        try:
+            return min(self.p_max, self._melting_state.melting_line(CoolProp.iP, CoolProp.iT, temperature))
+        except ValueError:
+            return self.p_max
+
+    def saturation_dome(self, output: str, t_low: float, t_high: float, y_output: str = 'P',
+                        log_x: bool = False, log_y: bool = False):
+        """Saturated liquid and vapor values of output against y_output ('P' or 'T')
+
+        Returns (liquid, vapor, y) arrays, or None when the range has no two-phase states.
+        """
+        t_range = self.saturation_range(t_low, t_high)
+        if t_range is None:
+            return None
+
+        def evaluate(temperatures):
+            y = temperatures if y_output == 'T' else self._props(y_output, 'T', temperatures, 'Q', 0)
+            return [(self._props(output, 'T', temperatures, 'Q', 0), y),
+                    (self._props(output, 'T', temperatures, 'Q', 1), y)]
+
+        _, ((liquid, y), (vapor, _)) = self._sample(evaluate, *t_range, log_x=log_x, log_y=log_y)
+        return liquid, vapor, y
+
+    def quality_line(self, quality: float, output: str, t_low: float, t_high: float, y_output: str = 'P',
+                     log_x: bool = False, log_y: bool = False):
+        """Line of constant vapor quality as (output, y_output) arrays, or None outside the two-phase range
+
+        output must be a specific property that is linear in quality, such as H or S.
+        """
+        t_range = self.saturation_range(t_low, t_high)
+        if t_range is None:
+            return None
+
+        # Mix the saturated states, which also works for pseudo-pure blends that reject 0 < Q < 1
+        def evaluate(temperatures):
+            y = temperatures if y_output == 'T' else self._props(y_output, 'T', temperatures, 'Q', 0)
+            liquid = self._props(output, 'T', temperatures, 'Q', 0)
+            vapor = self._props(output, 'T', temperatures, 'Q', 1)
+            return [(liquid + quality * (vapor - liquid), y)]
+
+        _, ((x, y),) = self._sample(evaluate, *t_range, log_x=log_x, log_y=log_y)
+        return x, y
+
+    def liquid_isotherm(self, output: str, temperature: float, p_high: float,
+                        log_x: bool = False, log_y: bool = True):
+        """Compressed liquid branch of an isotherm from saturation up to p_high, as (output, P) arrays"""
+        if not (self.t_min <= temperature < self.t_crit):
+            return None
+        p_sat = self.saturation_pressure(temperature)
+        p_high = min(p_high, self.melting_pressure(temperature) * (1 - SATURATION_MARGIN))
+        if not p_sat * (1 + SATURATION_MARGIN) < p_high:
+            return None
+
+        def evaluate(pressures):
+            return [(self._props(output, 'T', temperature, 'P', pressures), pressures)]
+
+        _, ((x, p),) = self._sample(evaluate, p_sat * (1 + SATURATION_MARGIN), p_high,
+                                    log_param=True, log_x=log_x, log_y=log_y)
+        x_sat = self._props(output, 'T', temperature, 'Q', 0)
+        return np.concatenate([[x_sat], x]), np.concatenate([[p_sat], p])
+
+    def isotherm(self, output: str, temperature: float, p_low: float, p_high: float,
+                 log_x: bool = False, log_y: bool = True):
+        """Isotherm across the vapor, two-phase and liquid regions, as (output, P) arrays in rising pressure"""
+        if not (self.t_min <= temperature < self.t_crit):
+            return None
+        p_dew = self.saturation_pressure(temperature, 1)
+        p_bubble = self.saturation_pressure(temperature, 0)
+        # Near the triple point the liquid freezes a little above its saturation pressure
+        p_high = min(p_high, self.melting_pressure(temperature) * (1 - SATURATION_MARGIN))
+        # CoolProp rejects any pressure below the triple point, which low isotherms reach
+        p_low = max(p_low, self.p_sat_min)
+
+        def evaluate(pressures):
+            return [(self._props(output, 'T', temperature, 'P', pressures), pressures)]
+
+        xs, ps = [], []
+        vapor_high = p_dew * (1 - SATURATION_MARGIN)
+        if p_low < vapor_high:
+            _, ((x, p),) = self._sample(evaluate, p_low, vapor_high, log_param=True, log_x=log_x, log_y=log_y)
+            xs += [x, self._props(output, 'T', temperature, 'Q', 1)[None]]
+            ps += [p, [p_dew]]
+        liquid_low = p_bubble * (1 + SATURATION_MARGIN)
+        if liquid_low < p_high:
+            _, ((x, p),) = self._sample(evaluate, liquid_low, p_high, log_param=True, log_x=log_x, log_y=log_y)
+            xs += [self._props(output, 'T', temperature, 'Q', 0)[None], x]
+            ps += [[p_bubble], p]
+        if not xs:
+            return None
+        return np.concatenate(xs), np.concatenate(ps)
+
+    def isobar(self, output: str, pressure: float, t_low: float, t_high: float,
+               log_x: bool = False, log_y: bool = False):
+        """Isobar across the liquid, two-phase and vapor regions, as (output, T) arrays in rising temperature"""
+        if not self.p_sat_min <= pressure <= self.p_max:
+            return None
+        t_low = max(t_low, self.melting_temperature(pressure) * (1 + SATURATION_MARGIN))
+        t_high = min(t_high, self.t_max)
+        if not t_low < t_high:
+            return None
+
+        def evaluate(temperatures):
+            return [(self._props(output, 'P', pressure, 'T', temperatures), temperatures)]
+
+        if pressure >= self.p_crit:
+            _, ((x, t),) = self._sample(evaluate, t_low, t_high, log_x=log_x, log_y=log_y)
+            return x, t
+
+        t_bubble = self.saturation_temperature(pressure, 0)
+        t_dew = self.saturation_temperature(pressure, 1)
+        xs, ts = [], []
+        liquid_high = t_bubble * (1 - SATURATION_MARGIN)
+        if t_low < liquid_high:
+            _, ((x, t),) = self._sample(evaluate, t_low, liquid_high, log_x=log_x, log_y=log_y)
+            xs += [x, self._props(output, 'P', pressure, 'Q', 0)[None]]
+            ts += [t, [t_bubble]]
+        vapor_low = t_dew * (1 + SATURATION_MARGIN)
+        if vapor_low < t_high:
+            _, ((x, t),) = self._sample(evaluate, vapor_low, t_high, log_x=log_x, log_y=log_y)
+            xs += [self._props(output, 'P', pressure, 'Q', 1)[None], x]
+            ts += [[t_dew], t]
+        if not xs:
+            return None
+        return np.concatenate(xs), np.concatenate(ts)
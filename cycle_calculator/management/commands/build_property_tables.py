@@ -0,0 +1,85 @@
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.executors import map_in_processes
+from cycle_calculator.calculations.absorption import build_solution_table, solution_table_path
+from cycle_calculator.calculations.refrigerants import build_saturation_table, saturation_table_path
+from cycle_calculator.diagrams import DIAGRAM_TYPES, background_table_path, build_background_table, warm_worker
+from cycle_calculator.models import Calculation, Refrigerant, StatePoint
+from cycle_calculator.solver import solve_vapor_compression, state_point_dict
+from cycle_calculator.tables import table_path
+
+# Operating points whose diagram backgrounds --grid adds, in C
+GRID_EVAPORATOR_TEMPS = range(-40, 11, 10)
+GRID_CONDENSER_TEMPS = range(20, 61, 10)
+
+
+def stored_cycles(fluids):
+    """State points of the solved calculations of each refrigerant"""
+    cycles = defaultdict(dict)
+    points = (StatePoint.objects
+              .filter(calculation__refrigerant__coolprop_name__in=fluids, calculation__cop__isnull=False)
+              .select_related('calculation__refrigerant')
+              .order_by('calculation_id', 'point_number'))
+    for point in points:
+        fluid = point.calculation.refrigerant.coolprop_name
+        cycles[fluid].setdefault(point.calculation_id, []).append(state_point_dict(point))
+    return {fluid: list(by_calculation.values()) for fluid, by_calculation in cycles.items()}
+
+
+def grid_cycles(fluid):
+    """State points of vapor compression cycles over a coarse grid of operating points"""
+    cycles = []
+    for t_evap in GRID_EVAPORATOR_TEMPS:
+        for t_cond in GRID_CONDENSER_TEMPS:
+            for expansion_device in dict(Calculation.EXPANSION_CHOICES):
+                try:
+                    solution = solve_vapor_compression(fluid, t_evap, t_cond, expansion_device)
+                except ValueError:
+                    continue
+                cycles.append(solution['points'])
+    return cycles
+
+
+class Command(BaseCommand):
+    help = ('Build the memory-mapped saturation property, LiBr solution and diagram background tables '
+            'shared by all workers')
+
+    def add_arguments(self, parser):
+        parser.add_argument('refrigerants', nargs='*', help='CoolProp names (all refrigerants if omitted)')
+        parser.add_argument('--dpi', default=str(settings.DIAGRAM_DEFAULT_DPI),
+                            help='Comma separated diagram resolutions to pre-render')
+        parser.add_argument('--grid', action='store_true',
+                            help='Also pre-render backgrounds for a grid of typical operating points')
+        parser.add_argument('--skip-backgrounds', action='store_true', help='Only build the saturation tables')
+
+    def handle(self, *args, **options):
+        if table_path() is None:
+            raise CommandError("PROPERTY_TABLE_DIR is not set")
+        dpis = [int(dpi) for dpi in options['dpi'].split(',')]
+        for dpi in dpis:
+            if dpi not in settings.DIAGRAM_DPI_CHOICES:
+                raise CommandError(f"dpi must be one of {settings.DIAGRAM_DPI_CHOICES}")
+
+        fluids = options['refrigerants'] or list(Refrigerant.objects.values_list('coolprop_name', flat=True))
+        jobs = [(fluid, saturation_table_path(fluid)) for fluid in fluids]
+        rows = map_in_processes(build_saturation_table, jobs, initializer=warm_worker, initargs=(fluids,))
+        for (fluid, path), count in zip(jobs, rows):
+            self.stdout.write(f"{fluid}: {count} saturation rows in {path}")
+        path = solution_table_path()
+        self.stdout.write(f"LiBr solution: {build_solution_table(path)} cells in {path}")
+
+        if not options['skip_backgrounds']:
+            cycles = stored_cycles(fluids)
+            if options['grid']:
+                for fluid in fluids:
+                    cycles.setdefault(fluid, []).extend(grid_cycles(fluid))
+            jobs = [(fluid, diagram_type, dpi, cycles.get(fluid, []),
+                     background_table_path(fluid, diagram_type, dpi))
+                    for fluid in fluids for diagram_type in DIAGRAM_TYPES for dpi in dpis]
+            counts = map_in_processes(build_background_table, jobs, initializer=warm_worker, initargs=(fluids,))
+            for (fluid, diagram_type, dpi, _, path), count in zip(jobs, counts):
+                self.stdout.write(f"{fluid} {diagram_type} at {dpi} dpi: {count} backgrounds in {path}")
+
+        self.stdout.write(self.style.SUCCESS(f"Built property tables for {len(fluids)} refrigerants"))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.executors import map_in_processes
+from cycle_calculator.calculations.comparison import warm_fluids
+from cycle_calculator.calculations.surface import (DEFAULT_CONDENSER_RANGE, DEFAULT_EVAPORATOR_RANGE, DEFAULT_STEP,
+                                                   build_surface_file)
+from cycle_calculator.models import Calculation, Refrigerant
+from cycle_calculator.quoting import surface_path
+from cycle_calculator.tables import table_path
+
+
+def temperature_range(value: str):
+    low, high = (float(t) for t in value.split(','))
+    return low, high
+
+
+class Command(BaseCommand):
+    help = 'Precompute the COP and capacity response surfaces used for instant quotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('refrigerants', nargs='*', help='CoolProp names (all refrigerants if omitted)')
+        parser.add_argument('--devices', default=','.join(dict(Calculation.EXPANSION_CHOICES)),
+                            help='Comma separated expansion devices')
+        parser.add_argument('--evaporator-range', type=temperature_range,
+                            default=DEFAULT_EVAPORATOR_RANGE, help='Lowest,highest evaporator temperature (C)')
+        parser.add_argument('--condenser-range', type=temperature_range,
+                            default=DEFAULT_CONDENSER_RANGE, help='Lowest,highest condenser temperature (C)')
+        parser.add_argument('--step', type=float, default=DEFAULT_STEP, help='Grid spacing (K)')
+
+    def handle(self, *args, **options):
+        devices = options['devices'].split(',')
+        for device in devices:
+            if device not in dict(Calculation.EXPANSION_CHOICES):
+                raise CommandError(f"Unknown expansion device: {device}")
+        if options['step'] <= 0:
+            raise CommandError("step must be positive")
+
+        if table_path() is None:
+            raise CommandError("PROPERTY_TABLE_DIR is not set")
+
+        fluids = options['refrigerants'] or list(Refrigerant.objects.values_list('coolprop_name', flat=True))
+        jobs = [(fluid, device, surface_path(fluid, device), options['evaporator_range'],
+                 options['condenser_range'], options['step'])
+                for fluid in fluids for device in devices]
+
+        cells = map_in_processes(build_surface_file, jobs, initializer=warm_fluids, initargs=(fluids,))
+        for (fluid, device, path, *_), usable in zip(jobs, cells):
+            self.stdout.write(f"{fluid} ({device}): {usable} usable cells in {path}")
+        self.stdout.write(self.style.SUCCESS(f"Built {len(jobs)} response surfaces"))
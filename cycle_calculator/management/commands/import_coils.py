@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cooling_load.importers import read_rows
+from cycle_calculator.coils import import_coils
+
+
+class Command(BaseCommand):
+    help = ('Import evaporator and condenser coils from a CSV or XLSX file with manufacturer, model_number, '
+            'coil_type, heat_transfer_area (m2), u_value (W/m2.K), air_flow (m3/h) and fan_power (W) columns')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file with one coil per row')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            with open(path, 'rb') as file:
+                report = import_coils(read_rows(file, path))
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in report.errors:
+            messages = '; '.join(
+                f"{field}: {' '.join(field_errors)}" for field, field_errors in error['errors'].items()
+            )
+            self.stderr.write(f"Row {error['row']}: {messages}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report.created} of {report.total} coils ({report.failed} rows failed)"
+        ))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cooling_load.importers import read_rows
+from cycle_calculator.compressors import import_compressors
+
+
+class Command(BaseCommand):
+    help = ('Import AHRI 540 compressor maps from a CSV or XLSX file with manufacturer, model_number, '
+            'refrigerant, mass_flow_1..10 (kg/h), power_1..10 (W) and envelope columns')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or XLSX file with one compressor per row; envelope vertices are "
+                                         "'evaporating:condensing' pairs separated by semicolons")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            with open(path, 'rb') as file:
+                report = import_compressors(read_rows(file, path))
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in report.errors:
+            messages = '; '.join(
+                f"{field}: {' '.join(field_errors)}" for field, field_errors in error['errors'].items()
+            )
+            self.stderr.write(f"Row {error['row']}: {messages}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report.created} of {report.total} compressors ({report.failed} rows failed)"
+        ))
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from cycle_calculator.diagram_storage import warm_diagrams
+from cycle_calculator.diagrams import IMAGE_FORMATS
+from cycle_calculator.models import Calculation
+
+
+class Command(BaseCommand):
+    help = 'Render and store the diagram images of calculations ahead of the first page view'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help='Calculation ids (all solved calculations if omitted)')
+        parser.add_argument('--formats', default='webp,png', help='Comma separated image formats')
+        parser.add_argument('--dpi', type=int, default=settings.DIAGRAM_DEFAULT_DPI)
+
+    def handle(self, *args, **options):
+        formats = options['formats'].split(',')
+        for fmt in formats:
+            if fmt not in IMAGE_FORMATS:
+                raise CommandError(f"Unknown image format: {fmt}")
+        if options['dpi'] not in settings.DIAGRAM_DPI_CHOICES:
+            raise CommandError(f"dpi must be one of {settings.DIAGRAM_DPI_CHOICES}")
+
+        calculations = Calculation.objects.select_related('refrigerant').filter(cop__isnull=False)
+        if options['ids']:
+            calculations = calculations.filter(pk__in=options['ids'])
+
+        stored = 0
+        for calculation in calculations.iterator():
+            for fmt in formats:
+                stored += warm_diagrams(calculation, fmt, options['dpi'])
+
+        self.stdout.write(self.style.SUCCESS(f"Stored {stored} diagram images"))
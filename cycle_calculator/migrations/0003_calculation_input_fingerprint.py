@@ -0,0 +1,60 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:36
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+
+def input_fingerprint(cycle_type, refrigerant_id, evaporator_temp, condenser_temp, expansion_device,
+                      generator_temp, absorber_temp):
+    """Frozen copy of cycle_calculator.solver.input_fingerprint as of this migration"""
+    def temperature(value):
+        return None if value is None else round(float(value), 6) + 0.0
+
+    inputs = {
+        'cycle_type': cycle_type,
+        'refrigerant': refrigerant_id,
+        'evaporator_temp': temperature(evaporator_temp),
+        'condenser_temp': temperature(condenser_temp),
+    }
+    if cycle_type == 'absorption':
+        inputs['generator_temp'] = temperature(generator_temp)
+        inputs['absorber_temp'] = temperature(absorber_temp)
+    else:
+        inputs['expansion_device'] = expansion_device
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+def fingerprint_calculations(apps, schema_editor):
+    Calculation = apps.get_model('cycle_calculator', 'Calculation')
+
+    # The oldest solved calculation of each group of identical inputs becomes the one reused
+    seen = set()
+    for calculation in Calculation.objects.filter(cop__isnull=False).order_by('pk'):
+        fingerprint = input_fingerprint(
+            calculation.cycle_type, calculation.refrigerant_id, calculation.evaporator_temp,
+            calculation.condenser_temp, calculation.expansion_device, calculation.generator_temp,
+            calculation.absorber_temp,
+        )
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+        calculation.input_fingerprint = fingerprint
+        calculation.save(update_fields=['input_fingerprint'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cycle_calculator', '0002_add_refrigerants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calculation',
+            name='input_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(fingerprint_calculations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:51
+
+from django.db import migrations, models
+
+
+def create_co2(apps, schema_editor):
+    Refrigerant = apps.get_model('cycle_calculator', 'Refrigerant')
+    Refrigerant.objects.get_or_create(
+        coolprop_name='R744',
+        defaults={
+            'name': 'R-744',
+            'description': 'Natural refrigerant (carbon dioxide), run transcritical above 31 C ambient',
+            'gwp': 1,
+            'odp': 0.0,
+            'safety_class': 'A1',
+            'application': 'Supermarket racks, heat pump water heaters, industrial refrigeration'
+        },
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cycle_calculator', '0003_calculation_input_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='calculation',
+            name='cycle_type',
+            field=models.CharField(choices=[('vapor_compression', 'Vapor Compression'), ('absorption', 'Absorption'), ('transcritical', 'Transcritical CO2')], max_length=20),
+        ),
+        migrations.RunPython(create_co2, migrations.RunPython.noop),
+    ]
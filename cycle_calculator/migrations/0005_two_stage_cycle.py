@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cycle_calculator', '0004_transcritical_co2'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='calculation',
+            name='cycle_type',
+            field=models.CharField(choices=[('vapor_compression', 'Vapor Compression'), ('absorption', 'Absorption'), ('two_stage', 'Two-Stage Vapor Compression'), ('transcritical', 'Transcritical CO2')], max_length=20),
+        ),
+    ]
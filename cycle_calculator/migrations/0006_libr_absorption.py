@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+def create_water(apps, schema_editor):
+    Refrigerant = apps.get_model('cycle_calculator', 'Refrigerant')
+    Refrigerant.objects.get_or_create(
+        coolprop_name='Water',
+        defaults={
+            'name': 'R-718',
+            'description': 'Water, the refrigerant of lithium bromide absorption chillers',
+            'gwp': 0,
+            'odp': 0.0,
+            'safety_class': 'A1',
+            'application': 'Absorption chillers driven by waste heat, solar heat or steam'
+        },
+    )
+
+
+def forget_absorption_results(apps, schema_editor):
+    # Absorption results of the former placeholder model must not be reused for new requests
+    Calculation = apps.get_model('cycle_calculator', 'Calculation')
+    Calculation.objects.filter(cycle_type='absorption').update(input_fingerprint=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cycle_calculator', '0005_two_stage_cycle'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_water, migrations.RunPython.noop),
+        migrations.RunPython(forget_absorption_results, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cycle_calculator', '0006_libr_absorption'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Compressor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('manufacturer', models.CharField(max_length=100)),
+                ('model_number', models.CharField(max_length=100)),
+                ('mass_flow_coefficients', models.JSONField()),
+                ('power_coefficients', models.JSONField()),
+                ('envelope', models.JSONField(blank=True, default=list)),
+                ('refrigerant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cycle_calculator.refrigerant')),
+            ],
+            options={
+                'unique_together': {('manufacturer', 'model_number')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:15
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cycle_calculator', '0007_compressor_maps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Coil',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('manufacturer', models.CharField(max_length=100)),
+                ('model_number', models.CharField(max_length=100)),
+                ('coil_type', models.CharField(choices=[('evaporator', 'Evaporator'), ('condenser', 'Condenser')], max_length=20)),
+                ('heat_transfer_area', models.FloatField(validators=[django.core.validators.MinValueValidator(0.01)])),
+                ('u_value', models.FloatField(validators=[django.core.validators.MinValueValidator(0.1)])),
+                ('air_flow', models.FloatField(validators=[django.core.validators.MinValueValidator(1)])),
+                ('fan_power', models.FloatField(default=0, validators=[django.core.validators.MinValueValidator(0)])),
+            ],
+            options={
+                'unique_together': {('manufacturer', 'model_number')},
+            },
+        ),
+    ]
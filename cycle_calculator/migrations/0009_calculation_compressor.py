@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cycle_calculator', '0008_coil_catalog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calculation',
+            name='compressor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='cycle_calculator.compressor'),
+        ),
+        migrations.AddField(
+            model_name='calculation',
+            name='compressor_capacity',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='calculation',
+            name='compressor_cop',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='calculation',
+            name='compressor_power',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='calculation',
+            name='inside_envelope',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='calculation',
+            name='mass_flow',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -1,3 +1,5 @@
+from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator
 from django.db import models
 
 
@@ -18,6 +20,8 @@ class Calculation(models.Model):
     CYCLE_CHOICES = [
         ('vapor_compression', 'Vapor Compression'),
         ('absorption', 'Absorption'),
+        ('two_stage', 'Two-Stage Vapor Compression'),
+        ('transcritical', 'Transcritical CO2'),
     ]
 
     EXPANSION_CHOICES = [
@@ -29,7 +33,7 @@ class Calculation(models.Model):
     refrigerant = models.ForeignKey(Refrigerant, on_delete=models.CASCADE)
     expansion_device = models.CharField(max_length=10, choices=EXPANSION_CHOICES, default='throttle')
 
-    # Common parameters
+    # Common parameters; for transcritical cycles the condenser temperature is the gas cooler exit temperature
     evaporator_temp = models.FloatField()
     condenser_temp = models.FloatField()
 
@@ -37,15 +41,36 @@ class Calculation(models.Model):
     generator_temp = models.FloatField(null=True, blank=True)
     absorber_temp = models.FloatField(null=True, blank=True)
 
+    # Vapor compression specific: rate the cycle with this compressor's map instead of ideal compression only
+    compressor = models.ForeignKey('Compressor', on_delete=models.SET_NULL, null=True, blank=True)
+
     # Results
     cop = models.FloatField(null=True, blank=True)
     cooling_capacity = models.FloatField(null=True, blank=True)
 
+    # Compressor map results at the operating point
+    mass_flow = models.FloatField(null=True, blank=True)  # kg/s
+    compressor_capacity = models.FloatField(null=True, blank=True)  # kW
+    compressor_power = models.FloatField(null=True, blank=True)  # kW
+    compressor_cop = models.FloatField(null=True, blank=True)
+    inside_envelope = models.BooleanField(null=True, blank=True)
+
+    # Hash of the solver inputs, set once solved so identical submissions reuse the results
+    input_fingerprint = models.CharField(max_length=64, null=True, blank=True, unique=True, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.get_cycle_type_display()} - {self.refrigerant} ({self.created_at})"
 
+    def clean(self):
+        if self.compressor_id is None:
+            return
+        if self.cycle_type != 'vapor_compression':
+            raise ValidationError({'compressor': 'Compressor maps apply to single-stage vapor compression cycles.'})
+        if self.refrigerant_id is not None and self.compressor.refrigerant_id != self.refrigerant_id:
+            raise ValidationError({'compressor': 'The compressor is mapped for a different refrigerant.'})
+
 
 class StatePoint(models.Model):
     calculation = models.ForeignKey(Calculation, on_delete=models.CASCADE)
@@ -58,3 +83,44 @@ class StatePoint(models.Model):
 
     class Meta:
         unique_together = ['calculation', 'point_number']
+
+
+class Compressor(models.Model):
+    manufacturer = models.CharField(max_length=100)
+    model_number = models.CharField(max_length=100)
+    refrigerant = models.ForeignKey(Refrigerant, on_delete=models.CASCADE)
+
+    # AHRI 540 coefficients C1 to C10 over evaporating and condensing dew point temperatures (C)
+    mass_flow_coefficients = models.JSONField()  # kg/h
+    power_coefficients = models.JSONField()  # W
+    # Operating envelope as [evaporating, condensing] vertices (C), empty when not limited
+    envelope = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        unique_together = ['manufacturer', 'model_number']
+
+    def __str__(self):
+        return f"{self.manufacturer} {self.model_number}"
+
+
+class Coil(models.Model):
+    COIL_TYPES = [
+        ('evaporator', 'Evaporator'),
+        ('condenser', 'Condenser'),
+    ]
+
+    manufacturer = models.CharField(max_length=100)
+    model_number = models.CharField(max_length=100)
+    coil_type = models.CharField(max_length=20, choices=COIL_TYPES)
+
+    # Air side geometry and rating; the overall heat transfer coefficient refers to the air side area
+    heat_transfer_area = models.FloatField(validators=[MinValueValidator(0.01)])  # m2
+    u_value = models.FloatField(validators=[MinValueValidator(0.1)])  # W/m2.K
+    air_flow = models.FloatField(validators=[MinValueValidator(1)])  # m3/h
+    fan_power = models.FloatField(default=0, validators=[MinValueValidator(0)])  # W
+
+    class Meta:
+        unique_together = ['manufacturer', 'model_number']
+
+    def __str__(self):
+        return f"{self.manufacturer} {self.model_number}"
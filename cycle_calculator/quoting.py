@@ -0,0 +1,59 @@
+from typing import Dict, Optional
+
+from core import metrics
+from .calculations.comparison import compare_fluid
+from .calculations.surface import SURFACE_FIELDS, ResponseSurface
+from .tables import open_table, table_path
+
+_surfaces = {}
+
+
+def surface_path(refrigerant: str, expansion_device: str) -> Optional[str]:
+    return table_path('surfaces', f'{refrigerant}-{expansion_device}.table')
+
+
+def get_surface(refrigerant: str, expansion_device: str) -> Optional[ResponseSurface]:
+    """Get the response surface of a refrigerant, or None if it was not built"""
+    table = open_table(surface_path(refrigerant, expansion_device))
+    if table is None:
+        return None
+    key = (refrigerant, expansion_device)
+    surface = _surfaces.get(key)
+    if surface is None or surface.table is not table:
+        surface = _surfaces[key] = ResponseSurface.from_table(table)
+    return surface
+
+
+def quote(refrigerant: str, t_evap: float, t_cond: float, expansion_device: str = 'throttle',
+          exact: bool = False, max_cop_error: Optional[float] = None) -> Dict:
+    """Cycle results interpolated from the response surface, or solved exactly
+
+    The exact solve is used when asked for, when the operating point is not
+    covered by a built surface, or when the COP error bound exceeds max_cop_error.
+    """
+    result = None
+    if not exact:
+        surface = get_surface(refrigerant, expansion_device)
+        if surface is not None:
+            result = surface.lookup(t_evap, t_cond)
+        if result is not None and max_cop_error is not None and result['errors']['cop'] > max_cop_error:
+            result = None
+        metrics.cache_lookup('response_surface', result is not None)
+
+    if result is None:
+        result = compare_fluid(refrigerant, t_evap, t_cond, expansion_device)
+        source = 'exact'
+        if result['valid']:
+            result['errors'] = {field: 0.0 for field in SURFACE_FIELDS}
+    else:
+        result['valid'] = True
+        source = 'surface'
+
+    return {
+        'refrigerant': refrigerant,
+        'evaporator_temp': t_evap,
+        'condenser_temp': t_cond,
+        'expansion_device': expansion_device,
+        'source': source,
+        **result,
+    }
@@ -0,0 +1,74 @@
+import base64
+from concurrent.futures import wait
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from typing import Dict, List, Optional
+
+from core.executors import get_process_pool, reset_process_pool
+from .diagrams import DIAGRAM_TYPES, FAST_RENDER_DPI, ThermodynamicDiagrams, render_image_task, warm_worker
+from .models import Refrigerant
+
+
+def worker_initargs() -> tuple:
+    """Arguments for warm_worker covering every known refrigerant"""
+    return (list(Refrigerant.objects.values_list('coolprop_name', flat=True)),)
+
+
+def render_images(refrigerant: str, state_points: List[Dict], diagram_types: Optional[List[str]] = None,
+                  fmt: str = 'png', dpi: int = FAST_RENDER_DPI, fast: bool = True,
+                  timeout: Optional[float] = None, fallback: bool = True) -> Dict[str, bytes]:
+    """Render several diagrams at once, one process pool task per diagram
+
+    Results are gathered for up to timeout seconds (DIAGRAM_RENDER_TIMEOUT by
+    default), so the wall-clock time is close to that of the slowest diagram.
+    A diagram that fails or is not ready in time gets the error image, or is
+    left out of the result when fallback is off.
+    """
+    diagram_types = list(diagram_types or DIAGRAM_TYPES)
+    if timeout is None:
+        timeout = settings.DIAGRAM_RENDER_TIMEOUT
+    arguments = {diagram_type: (refrigerant, diagram_type, state_points, fmt, dpi, fast)
+                 for diagram_type in diagram_types}
+
+    futures = {}
+    if settings.CALCULATION_PROCESSES and len(arguments) > 1:
+        try:
+            pool = get_process_pool(warm_worker, worker_initargs)
+            futures = {diagram_type: pool.submit(render_image_task, *args)
+                       for diagram_type, args in arguments.items()}
+        except BrokenProcessPool:
+            reset_process_pool()
+            futures = {}
+    if futures:
+        wait(futures.values(), timeout=timeout)
+
+    images = {}
+    errors = {}
+    for diagram_type, args in arguments.items():
+        future = futures.get(diagram_type)
+        try:
+            if future is None:
+                images[diagram_type] = render_image_task(*args)
+            elif not future.done():
+                future.cancel()
+                errors[diagram_type] = 'rendering timed out'
+            else:
+                images[diagram_type] = future.result()
+        except BrokenProcessPool as e:
+            reset_process_pool()
+            errors[diagram_type] = str(e)
+        except Exception as e:
+            errors[diagram_type] = str(e)
+
+    if fallback:
+        diagrams = ThermodynamicDiagrams(refrigerant)
+        for diagram_type, error in errors.items():
+            images[diagram_type] = diagrams.render_error_image(f"{diagram_type} Diagram Error: {error}", fmt, dpi)
+    return {diagram_type: images[diagram_type] for diagram_type in diagram_types if diagram_type in images}
+
+
+def render_diagrams_parallel(refrigerant: str, state_points: List[Dict], fast: bool = True) -> Dict[str, str]:
+    """Parallel equivalent of diagrams.render_diagrams, returning base64 PNGs"""
+    images = render_images(refrigerant, state_points, fast=fast)
+    return {f'{diagram_type}_diagram': base64.b64encode(image).decode()
+            for diagram_type, image in images.items()}
@@ -0,0 +1,136 @@
+import numpy as np
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from cooling_load.calculations import calculate_loads, project_inputs
+from core import metrics
+from .calculations.batch import BatchVaporCompressionCycle
+from .sizing import DEFAULT_CONDENSER_APPROACH, DEFAULT_EVAPORATOR_TD, evaporator_temperature
+
+DEFAULT_BIN_WIDTH = 1.0  # K
+# Head pressure control keeps condensing above this temperature in cold weather
+DEFAULT_MIN_CONDENSER_TEMP = 20.0
+# Cycling loss at part load, PLF = 1 - Cd * (1 - PLR), as in the AHRI 210/240 SEER rating
+DEFAULT_DEGRADATION_COEFFICIENT = 0.25
+# Distinct (refrigerant, evaporator, condenser temperatures) solves kept per process
+SOLVE_CACHE_SIZE = 256
+
+_solves = OrderedDict()
+_solves_lock = threading.Lock()
+
+
+def bin_temperatures(hourly_temps, bin_width: float = DEFAULT_BIN_WIDTH) -> Tuple[np.ndarray, np.ndarray]:
+    """Bin centre temperatures and the hours that fall in each bin"""
+    hourly_temps = np.asarray(hourly_temps, dtype=float)
+    hourly_temps = hourly_temps[np.isfinite(hourly_temps)]
+    bins, hours = np.unique(np.floor(hourly_temps / bin_width), return_counts=True)
+    return (bins + 0.5) * bin_width, hours
+
+
+def _solve_bins(refrigerant: str, t_evap: float, condenser_temps: Tuple[float, ...],
+                expansion_device: str, isentropic_efficiency: float) -> Tuple[Dict[str, np.ndarray], bool]:
+    """COP and validity per distinct condenser temperature, in one batch, and whether they were cached
+
+    The hit is decided under the cache lock, so concurrent requests each
+    report their own lookup.
+    """
+    key = (refrigerant, t_evap, condenser_temps, expansion_device, isentropic_efficiency)
+    with _solves_lock:
+        solved = _solves.get(key)
+        if solved is not None:
+            _solves.move_to_end(key)
+            return solved, True
+
+    results = BatchVaporCompressionCycle(refrigerant, t_evap, np.array(condenser_temps), expansion_device,
+                                         isentropic_efficiency).calculate()
+    solved = {'cop': results['cop'], 'valid': results['valid']}
+    with _solves_lock:
+        solved = _solves.setdefault(key, solved)
+        _solves.move_to_end(key)
+        while len(_solves) > SOLVE_CACHE_SIZE:
+            _solves.popitem(last=False)
+    return solved, False
+
+
+def seasonal_performance(project, hourly_temps, refrigerant: str, bin_width: float = DEFAULT_BIN_WIDTH,
+                         evaporator_td: float = DEFAULT_EVAPORATOR_TD,
+                         condenser_approach: float = DEFAULT_CONDENSER_APPROACH,
+                         min_condenser_temp: float = DEFAULT_MIN_CONDENSER_TEMP,
+                         degradation_coefficient: float = DEFAULT_DEGRADATION_COEFFICIENT,
+                         isentropic_efficiency: float = 1.0, expansion_device: str = 'throttle') -> Dict:
+    """Seasonal energy efficiency of a project's refrigeration over an ambient temperature series
+
+    The series is binned, the room load is evaluated for every bin at once,
+    and the cycle is solved once per distinct condensing temperature; with
+    the condensing floor many cold bins share one solve. Capacity matches
+    the design load at the project's design outdoor temperature, so hours
+    whose load exceeds it, safety factor included, are reported as unmet. The seasonal ratio is the cooling
+    delivered over the compressor energy, with cycling losses at part load.
+    """
+    if bin_width <= 0:
+        raise ValueError("Bin width must be positive")
+    ambient, hours = bin_temperatures(hourly_temps, bin_width)
+    if not ambient.size:
+        raise ValueError("No ambient temperatures given")
+
+    inputs = project_inputs([project])
+    design_load = float(calculate_loads(**inputs)['design_load'][0])  # W
+    inputs['outdoor_temp'] = ambient
+    load = np.maximum(calculate_loads(**inputs)['total_load'], 0.0)  # W
+
+    t_evap = evaporator_temperature(project.indoor_temp, evaporator_td)
+    t_cond = np.maximum(ambient + condenser_approach, min_condenser_temp)
+    condenser_temps, index = np.unique(t_cond, return_inverse=True)
+    results, hit = _solve_bins(refrigerant, float(t_evap), tuple(condenser_temps.tolist()), expansion_device,
+                               isentropic_efficiency)
+    metrics.cache_lookup('seasonal_cycles', hit)
+    cop = results['cop'][index]
+    valid = results['valid'][index]
+
+    delivered = np.minimum(load, design_load)
+    part_load = delivered / design_load if design_load > 0 else np.zeros_like(delivered)
+    part_load_factor = 1 - degradation_coefficient * (1 - part_load)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        power = np.where(delivered > 0, delivered / (cop * part_load_factor), 0.0)  # W
+    cooling_energy = delivered * hours / 1000  # kWh
+    electric_energy = power * hours / 1000  # kWh
+
+    solved = valid | (delivered == 0)
+    total_cooling = float(cooling_energy[solved].sum())
+    total_electric = float(electric_energy[solved].sum())
+    bins = []
+    for i in range(ambient.size):
+        row = {
+            'ambient_temp': round(float(ambient[i]), 2),
+            'hours': int(hours[i]),
+            'condenser_temp': round(float(t_cond[i]), 2),
+            'load': round(float(load[i]), 2),  # W
+            'valid': bool(valid[i]),
+        }
+        if valid[i]:
+            row.update({
+                'cop': round(float(cop[i]), 3),
+                'part_load': round(float(part_load[i]), 3),
+                'cooling_energy': round(float(cooling_energy[i]), 2),
+                'electric_energy': round(float(electric_energy[i]), 2),
+            })
+        bins.append(row)
+
+    return {
+        'project': str(project.pk),
+        'refrigerant': refrigerant,
+        'evaporator_temp': t_evap,
+        'isentropic_efficiency': isentropic_efficiency,
+        'expansion_device': expansion_device,
+        'design_load': round(design_load, 2),
+        'hours': int(hours.sum()),
+        'bin_count': int(ambient.size),
+        'cycle_solves': int(condenser_temps.size),
+        'unmet_hours': int(hours[load > design_load].sum()),
+        'unsolved_hours': int(hours[~solved].sum()),
+        'cooling_energy': round(total_cooling, 2),  # kWh
+        'electric_energy': round(total_electric, 2),  # kWh
+        'seasonal_cop': round(total_cooling / total_electric, 3) if total_electric > 0 else None,
+        'bins': bins,
+    }
@@ -0,0 +1,78 @@
+import numpy as np
+from typing import Dict, List, Optional
+
+from cooling_load.calculations import calculate_project_loads
+from .calculations.batch import BatchVaporCompressionCycle
+from .models import Refrigerant
+
+# Evaporator runs this many kelvin below the room air temperature
+DEFAULT_EVAPORATOR_TD = 8.0
+# Condensing runs this many kelvin above the outdoor air temperature
+DEFAULT_CONDENSER_APPROACH = 10.0
+DEFAULT_CONDENSER_TEMPS = [35.0, 40.0, 45.0, 50.0]
+
+
+def evaporator_temperature(indoor_temp: float, evaporator_td: float = DEFAULT_EVAPORATOR_TD) -> float:
+    """Derive the evaporating temperature (°C) from the room temperature"""
+    return indoor_temp - evaporator_td
+
+
+def size_project(project, refrigerants=None, condenser_temps: Optional[List[float]] = None,
+                 evaporator_td: float = DEFAULT_EVAPORATOR_TD,
+                 expansion_device: str = 'throttle') -> Dict:
+    """Size the refrigeration system for a project across refrigerants and condenser temperatures
+
+    Each refrigerant is solved once for all candidate condenser temperatures,
+    and the options are ranked by compressor power for the project design load.
+    """
+    if refrigerants is None:
+        refrigerants = Refrigerant.objects.all()
+    condenser_temps = np.asarray(condenser_temps or DEFAULT_CONDENSER_TEMPS, dtype=float)
+
+    design_load = calculate_project_loads(project)['design_load']  # W
+    t_evap = evaporator_temperature(project.indoor_temp, evaporator_td)
+
+    options = []
+    failed = []
+    for refrigerant in refrigerants:
+        try:
+            results = BatchVaporCompressionCycle(
+                refrigerant.coolprop_name, t_evap, condenser_temps, expansion_device
+            ).calculate()
+        except ValueError as e:
+            failed.append({'refrigerant': refrigerant.name, 'error': str(e)})
+            continue
+
+        for i, t_cond in enumerate(condenser_temps):
+            if not results['valid'][i]:
+                failed.append({'refrigerant': refrigerant.name, 'condenser_temp': float(t_cond),
+                               'error': 'Operating point outside the refrigerant range'})
+                continue
+
+            mass_flow = design_load / (results['cooling_capacity'][i] * 1000)  # kg/s
+            options.append({
+                'refrigerant': refrigerant.name,
+                'coolprop_name': refrigerant.coolprop_name,
+                'gwp': refrigerant.gwp,
+                'condenser_temp': float(t_cond),
+                'cop': round(float(results['cop'][i]), 3),
+                'mass_flow': round(float(mass_flow), 5),
+                'compressor_power': round(float(mass_flow * results['net_work'][i]), 3),  # kW
+                'suction_volume_flow': round(float(mass_flow / results['suction_density'][i] * 3600), 3),  # m3/h
+                'discharge_temp': round(float(results['discharge_temp'][i]), 1),
+                'pressure_ratio': round(float(results['pressure_ratio'][i]), 2),
+            })
+
+    options.sort(key=lambda option: option['compressor_power'])
+    for rank, option in enumerate(options, start=1):
+        option['rank'] = rank
+
+    return {
+        'project': str(project.pk),
+        'design_load': round(design_load, 2),
+        'indoor_temp': project.indoor_temp,
+        'evaporator_temp': t_evap,
+        'expansion_device': expansion_device,
+        'options': options,
+        'failed': failed,
+    }
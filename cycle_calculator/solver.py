@@ -0,0 +1,323 @@
+import hashlib
+import json
+from django.db import IntegrityError, transaction
+from typing import Dict, List, Optional, Tuple
+
+from core import metrics
+from .calculations.absorption import BatchAbsorptionCycle, is_water
+from .calculations.compressor import CompressorMap
+from .calculations.multistage import TwoStageCycle
+from .calculations.properties import props
+from .calculations.transcritical import TranscriticalCO2Cycle
+from .models import Calculation, StatePoint
+
+# Decimal places kept when fingerprinting temperatures, well below what the form can express
+FINGERPRINT_DIGITS = 6
+
+CYCLE_SOLVES = metrics.counter('cycle_solves_total', 'Cycle solves by cycle type and outcome',
+                               ['cycle_type', 'outcome'])
+CYCLE_SOLVE_SECONDS = metrics.histogram('cycle_solve_seconds', 'Time to solve one cycle', ['cycle_type'])
+
+
+def _point(point_number: int, temperature: float, pressure: float, enthalpy: float,
+           entropy: float, quality: Optional[float] = None) -> Dict:
+    return {
+        'point_number': point_number,
+        'temperature': temperature,
+        'pressure': pressure,
+        'enthalpy': enthalpy,
+        'entropy': entropy,
+        'quality': quality,
+    }
+
+
+def solve_vapor_compression(refrigerant: str, evaporator_temp: float, condenser_temp: float,
+                            expansion_device: str = 'throttle', compressor: Optional[CompressorMap] = None) -> Dict:
+    """Solve a vapor compression cycle, returning COP, capacity and state points
+
+    With a compressor map, its mass flow, power and envelope status at the
+    operating point are returned as well.
+    """
+    if compressor is not None and compressor.refrigerant != refrigerant:
+        raise ValueError(f"{compressor.name} is mapped for {compressor.refrigerant}, not {refrigerant}")
+    T_evap = evaporator_temp + 273.15
+    T_cond = condenser_temp + 273.15
+
+    # State points
+    P_low = props('P', 'T', T_evap, 'Q', 1, refrigerant)
+    P_high = props('P', 'T', T_cond, 'Q', 0, refrigerant)
+
+    # Point 1: Evaporator exit (saturated vapor)
+    h1 = props('H', 'T', T_evap, 'Q', 1, refrigerant)
+    s1 = props('S', 'T', T_evap, 'Q', 1, refrigerant)
+
+    # Point 2: Compressor exit
+    s2 = s1  # Isentropic compression
+    h2 = props('H', 'P', P_high, 'S', s2, refrigerant)
+    T2 = props('T', 'P', P_high, 'H', h2, refrigerant)
+
+    # Point 3: Condenser exit (saturated liquid)
+    h3 = props('H', 'T', T_cond, 'Q', 0, refrigerant)
+    s3 = props('S', 'T', T_cond, 'Q', 0, refrigerant)
+
+    # Point 4: After expansion
+    if expansion_device == 'throttle':
+        # Throttling: h4 = h3
+        h4 = h3
+        T4 = props('T', 'P', P_low, 'H', h4, refrigerant)
+        s4 = props('S', 'P', P_low, 'H', h4, refrigerant)
+        x4 = props('Q', 'P', P_low, 'H', h4, refrigerant)
+    else:
+        # Turbine: s4 = s3 (isentropic)
+        s4 = s3
+        h4 = props('H', 'P', P_low, 'S', s4, refrigerant)
+        T4 = props('T', 'P', P_low, 'H', h4, refrigerant)
+        x4 = props('Q', 'P', P_low, 'H', h4, refrigerant)
+
+    # Calculate COP
+    q_evap = h1 - h4  # Cooling effect
+    w_comp = h2 - h1  # Compressor work
+    w_turb = h3 - h4 if expansion_device == 'turbine' else 0
+
+    net_work = w_comp - w_turb
+    cop = q_evap / net_work if net_work > 0 else 0
+
+    solution = {
+        'cop': cop,
+        'cooling_capacity': q_evap / 1000,  # kJ/kg
+        'points': [
+            _point(1, T_evap - 273.15, P_low / 1000, h1 / 1000, s1 / 1000, 1.0),
+            _point(2, T2 - 273.15, P_high / 1000, h2 / 1000, s2 / 1000),
+            _point(3, T_cond - 273.15, P_high / 1000, h3 / 1000, s3 / 1000, 0.0),
+            _point(4, T4 - 273.15, P_low / 1000, h4 / 1000, s4 / 1000, x4),
+        ],
+    }
+    if compressor is not None:
+        # Real mass flow and power from the map, in place of ideal compression
+        solution['compressor'] = compressor.rate(evaporator_temp, condenser_temp, q_evap / 1000, w_comp / 1000)
+    return solution
+
+
+def solve_absorption(refrigerant: str, evaporator_temp: float, condenser_temp: float,
+                     generator_temp: Optional[float] = None, absorber_temp: Optional[float] = None) -> Dict:
+    """Solve a single-effect LiBr-water absorption cycle
+
+    The state points are those of the water loop: generator vapor,
+    condensate, evaporator inlet and evaporator exit.
+    """
+    if generator_temp is None or absorber_temp is None:
+        raise ValueError("Absorption cycles need generator and absorber temperatures")
+    if not is_water(refrigerant):
+        raise ValueError("LiBr absorption cycles use water (R-718) as the refrigerant")
+    r = BatchAbsorptionCycle(evaporator_temp, condenser_temp, generator_temp, absorber_temp).calculate()
+    if not r['valid']:
+        raise ValueError("No feasible absorption cycle for these temperatures")
+    r = {key: float(value) for key, value in r.items()}
+
+    return {
+        'cop': r['cop'],
+        'cooling_capacity': r['cooling_capacity'],
+        'points': [
+            _point(1, r['t7'], r['p_cond'], r['h7'], r['s7']),
+            _point(2, r['t8'], r['p_cond'], r['h8'], r['s8'], 0.0),
+            _point(3, r['t9'], r['p_evap'], r['h9'], r['s9'], r['x9']),
+            _point(4, r['t10'], r['p_evap'], r['h10'], r['s10'], 1.0),
+        ],
+    }
+
+
+def solve_transcritical(refrigerant: str, evaporator_temp: float, gas_cooler_temp: float,
+                        expansion_device: str = 'throttle') -> Dict:
+    """Solve a transcritical cycle at its COP-optimal high-side pressure"""
+    results = TranscriticalCO2Cycle(evaporator_temp, gas_cooler_temp, expansion_device,
+                                    refrigerant=refrigerant).calculate()
+    return {
+        'cop': results['cop'],
+        'cooling_capacity': results['cooling_capacity'],
+        'points': [_point(number, *state) for number, state in enumerate(results['points'], start=1)],
+    }
+
+
+def solve_two_stage(refrigerant: str, evaporator_temp: float, condenser_temp: float,
+                    expansion_device: str = 'throttle') -> Dict:
+    """Solve a two-stage flash-intercooled cycle at its COP-optimal intermediate pressure"""
+    results = TwoStageCycle(refrigerant, evaporator_temp, condenser_temp, expansion_device).calculate()
+    return {
+        'cop': results['cop'],
+        'cooling_capacity': results['cooling_capacity'],
+        'points': [_point(number, *state) for number, state in enumerate(results['points'], start=1)],
+    }
+
+
+def solve_calculation(cycle_type: str, refrigerant: str, evaporator_temp: float, condenser_temp: float,
+                      expansion_device: str = 'throttle', generator_temp: Optional[float] = None,
+                      absorber_temp: Optional[float] = None, compressor: Optional[CompressorMap] = None) -> Dict:
+    """Solve the cycle described by a Calculation's inputs, counting solves and their duration"""
+    with CYCLE_SOLVE_SECONDS.labels(cycle_type).time():
+        try:
+            solution = _solve(cycle_type, refrigerant, evaporator_temp, condenser_temp, expansion_device,
+                              generator_temp, absorber_temp, compressor)
+        except Exception:
+            CYCLE_SOLVES.labels(cycle_type, 'error').inc()
+            raise
+    CYCLE_SOLVES.labels(cycle_type, 'ok').inc()
+    return solution
+
+
+def _solve(cycle_type: str, refrigerant: str, evaporator_temp: float, condenser_temp: float,
+           expansion_device: str, generator_temp: Optional[float], absorber_temp: Optional[float],
+           compressor: Optional[CompressorMap]) -> Dict:
+    if compressor is not None and cycle_type != 'vapor_compression':
+        raise ValueError("Compressor maps apply to single-stage vapor compression cycles")
+    if cycle_type == 'vapor_compression':
+        return solve_vapor_compression(refrigerant, evaporator_temp, condenser_temp, expansion_device, compressor)
+    elif cycle_type == 'absorption':
+        return solve_absorption(refrigerant, evaporator_temp, condenser_temp, generator_temp, absorber_temp)
+    elif cycle_type == 'two_stage':
+        return solve_two_stage(refrigerant, evaporator_temp, condenser_temp, expansion_device)
+    elif cycle_type == 'transcritical':
+        # The condenser temperature is the gas cooler exit temperature
+        return solve_transcritical(refrigerant, evaporator_temp, condenser_temp, expansion_device)
+    raise ValueError(f"Unknown cycle type: {cycle_type}")
+
+
+def calculation_compressor(calculation) -> Optional[CompressorMap]:
+    """Map of a Calculation's compressor, if it has one
+
+    The refrigerant is taken from the calculation, which Calculation.clean
+    keeps equal to the compressor's, so no query is needed once the form has
+    set the compressor.
+    """
+    compressor = calculation.compressor
+    if compressor is None:
+        return None
+    return CompressorMap(str(compressor), calculation.refrigerant.coolprop_name, compressor.mass_flow_coefficients,
+                         compressor.power_coefficients, compressor.envelope)
+
+
+def calculation_inputs(calculation) -> Dict:
+    """Get the solve_calculation arguments for a Calculation"""
+    return {
+        'cycle_type': calculation.cycle_type,
+        'refrigerant': calculation.refrigerant.coolprop_name,
+        'evaporator_temp': calculation.evaporator_temp,
+        'condenser_temp': calculation.condenser_temp,
+        'expansion_device': calculation.expansion_device,
+        'generator_temp': calculation.generator_temp,
+        'absorber_temp': calculation.absorber_temp,
+        'compressor': calculation_compressor(calculation),
+    }
+
+
+def input_fingerprint(cycle_type: str, refrigerant_id: int, evaporator_temp: float, condenser_temp: float,
+                      expansion_device: str = 'throttle', generator_temp: Optional[float] = None,
+                      absorber_temp: Optional[float] = None, compressor: Optional[CompressorMap] = None) -> str:
+    """SHA-256 of the inputs a cycle's solver actually uses
+
+    Inputs the cycle type ignores are left out, so an absorption calculation
+    does not differ by its unused expansion device. A compressor enters by
+    its map, so results are solved again once its coefficients change;
+    calculations without one keep the fingerprints they had.
+    """
+    def temperature(value):
+        # Adding 0.0 folds -0.0 into 0.0
+        return None if value is None else round(float(value), FINGERPRINT_DIGITS) + 0.0
+
+    inputs = {
+        'cycle_type': cycle_type,
+        'refrigerant': refrigerant_id,
+        'evaporator_temp': temperature(evaporator_temp),
+        'condenser_temp': temperature(condenser_temp),
+    }
+    if cycle_type == 'absorption':
+        inputs['generator_temp'] = temperature(generator_temp)
+        inputs['absorber_temp'] = temperature(absorber_temp)
+    else:
+        inputs['expansion_device'] = expansion_device
+    if compressor is not None:
+        inputs['compressor'] = [compressor.name, compressor.mass_flow_coefficients, compressor.power_coefficients,
+                                compressor.envelope]
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+def calculation_fingerprint(calculation) -> str:
+    """Get the input fingerprint of a Calculation, saved or not"""
+    return input_fingerprint(
+        calculation.cycle_type, calculation.refrigerant_id, calculation.evaporator_temp,
+        calculation.condenser_temp, calculation.expansion_device, calculation.generator_temp,
+        calculation.absorber_temp, calculation_compressor(calculation),
+    )
+
+
+def find_solved(calculation) -> Optional[Calculation]:
+    """Get the stored, solved calculation with the same inputs, if there is one"""
+    solved = Calculation.objects.filter(input_fingerprint=calculation_fingerprint(calculation)).first()
+    metrics.cache_lookup('calculation', solved is not None)
+    return solved
+
+
+async def afind_solved(calculation) -> Optional[Calculation]:
+    """Async variant of find_solved"""
+    solved = await Calculation.objects.filter(input_fingerprint=calculation_fingerprint(calculation)).afirst()
+    metrics.cache_lookup('calculation', solved is not None)
+    return solved
+
+
+def state_point_dict(point: StatePoint) -> Dict:
+    """Convert a StatePoint to the dict format used by the diagrams"""
+    return {
+        'temperature': point.temperature,
+        'pressure': point.pressure,
+        'enthalpy': point.enthalpy,
+        'entropy': point.entropy,
+        'quality': point.quality
+    }
+
+
+def _state_points(calculation, solution: Dict) -> List[StatePoint]:
+    return [StatePoint(calculation=calculation, **point) for point in solution['points']]
+
+
+def _set_results(calculation, solution: Dict):
+    calculation.cop = solution['cop']
+    calculation.cooling_capacity = solution['cooling_capacity']
+    rating = solution.get('compressor')
+    if rating is not None:
+        calculation.mass_flow = rating['mass_flow']
+        calculation.compressor_capacity = rating['capacity']
+        calculation.compressor_power = rating['power']
+        calculation.compressor_cop = rating['cop']
+        calculation.inside_envelope = rating['inside_envelope']
+
+
+def save_solution(calculation, solution: Dict):
+    """Store the state points and results of a solved calculation"""
+    StatePoint.objects.bulk_create(_state_points(calculation, solution))
+    _set_results(calculation, solution)
+    calculation.save()
+
+
+async def asave_solution(calculation, solution: Dict):
+    """Async variant of save_solution"""
+    await StatePoint.objects.abulk_create(_state_points(calculation, solution))
+    _set_results(calculation, solution)
+    await calculation.asave()
+
+
+def store_solved(calculation, solution: Dict) -> Tuple[Calculation, bool]:
+    """Save a new calculation together with its solution and fingerprint
+
+    If an identical calculation was stored meanwhile, nothing is saved and
+    that one is returned instead. The flag tells whether it was reused.
+    """
+    fingerprint = calculation_fingerprint(calculation)
+    calculation.input_fingerprint = fingerprint
+    try:
+        with transaction.atomic():
+            calculation.save()
+            save_solution(calculation, solution)
+    except IntegrityError:
+        calculation.pk = None
+        calculation.input_fingerprint = None
+        return Calculation.objects.get(input_fingerprint=fingerprint), True
+    return calculation, False
@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+import numpy as np
+from typing import Dict, Optional
+
+# File layout: magic, header length (uint64 little endian), JSON header, then the
+# raw array buffers, each starting on an ALIGNMENT byte boundary
+MAGIC = b'CCTABLE1'
+ALIGNMENT = 64
+
+_directory = None
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def configure(directory: Optional[str]):
+    """Set the directory tables are read from, done once at startup"""
+    global _directory
+    _directory = directory
+
+
+def table_path(*parts: str) -> Optional[str]:
+    """Path of a table inside the configured directory, or None when tables are disabled"""
+    return os.path.join(_directory, *parts) if _directory else None
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_table(path: str, arrays: Dict[str, np.ndarray], meta: Optional[Dict] = None):
+    """Write arrays and JSON metadata to a table file, replacing any previous file only once complete"""
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = _aligned(offset)
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += array.nbytes
+    header = json.dumps({'meta': meta or {}, 'arrays': layout}).encode()
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    partial_path = f'{path}.partial'
+    with open(partial_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, 'little'))
+        f.write(header)
+        for name, array in arrays.items():
+            f.write(b'\0' * (data_start + layout[name]['offset'] - f.tell()))
+            f.write(array.tobytes())
+    os.replace(partial_path, path)
+
+
+class Table:
+    """A table file mapped into memory
+
+    The arrays are read-only views of the mapping, so every process that
+    opens the same file shares its pages through the OS page cache.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a table file: {path}")
+            header = json.loads(f.read(int.from_bytes(f.read(8), 'little')))
+            data_start = _aligned(f.tell())
+
+        self.path = path
+        self.meta = header['meta']
+        buffer = np.memmap(path, dtype=np.uint8, mode='r') if header['arrays'] else None
+        self.arrays = {
+            name: np.ndarray(tuple(spec['shape']), dtype=np.dtype(spec['dtype']), buffer=buffer,
+                             offset=data_start + spec['offset'])
+            for name, spec in header['arrays'].items()
+        }
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.arrays
+
+
+def open_table(path: Optional[str]) -> Optional[Table]:
+    """Get a table, mapping it once per process, or None if there is no such file
+
+    A file replaced on disk is mapped again on the next call, while views of
+    the previous mapping stay valid for whoever still holds them.
+    """
+    if path is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    version = (stat.st_ino, stat.st_mtime_ns)
+    cached = _tables.get(path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with _tables_lock:
+        cached = _tables.get(path)
+        if cached is None or cached[0] != version:
+            cached = _tables[path] = (version, Table(path))
+    return cached[1]
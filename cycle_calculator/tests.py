@@ -1,3 +1,743 @@
-from django.test import TestCase
+import base64
+import math
+import os
+import tempfile
+import threading
+import uuid
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from cooling_load.calculations import calculate_project_loads
+from cooling_load.tests import create_project
+from core import metrics
+from core.executors import reset_process_pool
+
+from .calculations.batch import BatchVaporCompressionCycle
+from .calculations.comparison import compare_fluid
+from .calculations.compressor import CompressorCatalog, CompressorMap, ahri_terms, inside_envelopes
+from .calculations.cycles import VaporCompressionCycle
+from .calculations.heat_exchangers import (CoilCatalog, effectiveness, log_mean_temperature_difference,
+                                           minimum_air_flow, required_ua)
+from .calculations.inverse import solve_design
+from .calculations.multistage import BatchCascadeCycle, BatchTwoStageCycle
+from .calculations.optimize import find_roots, grid_maximize, maximize_scalar, minimize_scalar
+from .calculations.properties import props
+from .calculations.refrigerants import CoolPropRefrigerant, build_saturation_table, saturation_table_path
+from .calculations.surface import SURFACE_FIELDS, ResponseSurface
+from .calculations.transcritical import TranscriticalCO2Cycle
+from .comparison import compare_refrigerants
+from .diagrams import DIAGRAM_TYPES, ThermodynamicDiagrams
+from .coils import size_coils
+from .compressors import compressor_envelope, select_compressors
+from .models import Calculation, Coil, Compressor, Refrigerant
+from .quoting import quote, surface_path
+from .seasonal import bin_temperatures, seasonal_performance
+from .sizing import DEFAULT_EVAPORATOR_TD, size_project
+from .solver import input_fingerprint, solve_calculation, solve_vapor_compression, store_solved
+from .tables import ALIGNMENT, Table, open_table, write_table
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def render_cases(refrigerant: str):
+    """Cycles each seeded refrigerant is rendered for, as solve_calculation arguments"""
+    if refrigerant == 'Water':
+        return [('absorption', 5, 40, 'throttle', 85, 35)]
+    if refrigerant == 'R744':
+        return [('vapor_compression', -30, 10), ('transcritical', -10, 35)]
+    return [('vapor_compression', -30, 40)]
+
+
+class DiagramRenderTests(TestCase):
+    def test_every_seeded_refrigerant_renders(self):
+        refrigerants = list(Refrigerant.objects.values_list('coolprop_name', flat=True))
+        self.assertTrue(refrigerants)
+        for refrigerant in refrigerants:
+            for cycle_type, *inputs in render_cases(refrigerant):
+                points = solve_calculation(cycle_type, refrigerant, *inputs)['points']
+                diagrams = ThermodynamicDiagrams(refrigerant)
+                for diagram_type in DIAGRAM_TYPES:
+                    for fast in (True, False):
+                        with self.subTest(refrigerant=refrigerant, cycle_type=cycle_type,
+                                          diagram_type=diagram_type, fast=fast):
+                            image = diagrams.render_image(diagram_type, points, 'png', dpi=40, fast=fast)
+                            self.assertTrue(image.startswith(PNG_SIGNATURE))
+
+
+class TranscriticalTests(SimpleTestCase):
+    def test_minimize_scalar_finds_parabola_vertex(self):
+        x, fx, evaluations = minimize_scalar(lambda x: (x - 2.3) ** 2 + 1, 0, 5, xtol=1e-8)
+        self.assertAlmostEqual(x, 2.3, places=7)
+        self.assertAlmostEqual(fx, 1.0, places=12)
+        self.assertLess(evaluations, 20)
+
+    def test_minimize_scalar_scan_matches_brute_force(self):
+        def f(x):
+            return math.sin(3 * x) + 0.1 * x
+
+        grid = np.linspace(0, 10, 100001)
+        best = grid[np.argmin(np.sin(3 * grid) + 0.1 * grid)]
+        x, fx, _ = minimize_scalar(f, 0, 10, xtol=1e-8, scan_points=31)
+        self.assertAlmostEqual(x, best, places=4)
+        self.assertLessEqual(fx, f(best) + 1e-12)
+
+    def test_minimize_scalar_returns_scanned_interval_end(self):
+        x, fx, _ = minimize_scalar(lambda x: x, 0, 1, scan_points=11)
+        self.assertEqual((x, fx), (0, 0))
+
+    def test_minimize_scalar_skips_infeasible_points(self):
+        def f(x):
+            if x < 1:
+                raise ValueError
+            return (x - 1.5) ** 2 if x < 2.5 else math.nan
+
+        x, _, _ = minimize_scalar(f, 0, 3, xtol=1e-8)
+        self.assertAlmostEqual(x, 1.5, places=7)
+
+    def test_maximize_scalar(self):
+        x, fx, _ = maximize_scalar(lambda x: -(x + 1) ** 2 + 4, -3, 3, xtol=1e-8)
+        self.assertAlmostEqual(x, -1, places=7)
+        self.assertAlmostEqual(fx, 4, places=12)
+
+    def test_transcritical_pressure_matches_brute_force(self):
+        for t_evap, t_gc_exit in [(-10, 35), (0, 40), (-5, 31)]:
+            with self.subTest(t_evap=t_evap, t_gc_exit=t_gc_exit):
+                cycle = TranscriticalCO2Cycle(t_evap, t_gc_exit)
+                pressures = np.linspace(*cycle.pressure_bounds(), 1001)
+                cops = np.array([cycle.cop(p) for p in pressures])
+                p_high, _ = cycle.optimal_pressure()
+                self.assertGreaterEqual(cycle.cop(p_high), cops.max() - 1e-9)
+                self.assertLess(abs(p_high - pressures[np.argmax(cops)]), 2 * (pressures[1] - pressures[0]))
+
+
+class MultistageTests(SimpleTestCase):
+    def test_grid_maximize_solves_every_problem(self):
+        peaks = np.array([0.3, 1.7, 4.95, -2.2])
+        infeasible = np.array([False, False, False, True])
+
+        def f(x):
+            return np.where(infeasible[:, None], np.nan, 5 - (x - peaks[:, None]) ** 2)
+
+        x, value = grid_maximize(f, np.full(4, -1.0), np.full(4, 5.0))
+        np.testing.assert_allclose(x[:3], peaks[:3], atol=1e-9)
+        np.testing.assert_allclose(value[:3], 5)
+        self.assertTrue(np.isnan(x[3]) and np.isnan(value[3]))
+
+    def test_grid_maximize_matches_brute_force(self):
+        peaks = np.array([0.5, 2.0, 3.5])
+
+        def f(x):
+            return np.exp(-(x - peaks[:, None]) ** 2) * np.cos(x - peaks[:, None])
+
+        x, value = grid_maximize(f, np.zeros(3), np.full(3, 4.0))
+        grid = np.linspace(0, 4, 400001)
+        brute = f(np.broadcast_to(grid, (3, grid.size))).max(axis=1)
+        np.testing.assert_allclose(x, peaks, atol=1e-4)
+        self.assertTrue(np.all(value >= brute - 1e-9))
+
+    def test_two_stage_intermediate_matches_brute_force(self):
+        t_evap, t_cond = np.array([-40.0, -30.0, -20.0]), np.array([40.0, 45.0, 30.0])
+        results = BatchTwoStageCycle.optimize('R404A', t_evap, t_cond)
+        grid = np.linspace(t_evap + 1, t_cond - 1, 2001, axis=1)
+        cops = BatchTwoStageCycle('R404A', t_evap[:, None], t_cond[:, None], grid).calculate()['cop']
+        self.assertTrue(results['valid'].all())
+        self.assertTrue(np.all(results['cop'] >= np.nanmax(cops, axis=1) - 1e-7))
+
+    def test_cascade_temperature_matches_brute_force(self):
+        t_evap, t_cond = np.array([-50.0, -40.0]), np.array([35.0, 40.0])
+        results = BatchCascadeCycle.optimize('R744', 'R134a', t_evap, t_cond)
+        grid = np.linspace(t_evap + 1, 25, 2001, axis=1)
+        cops = BatchCascadeCycle('R744', 'R134a', t_evap[:, None], t_cond[:, None], grid).calculate()['cop']
+        self.assertTrue(results['valid'].all())
+        self.assertTrue(np.all(results['cop'] >= np.nanmax(cops, axis=1) - 1e-7))
+
+
+class InverseDesignTests(SimpleTestCase):
+    def forward(self, t_evap, t_cond, isentropic_efficiency=1.0):
+        results = BatchVaporCompressionCycle('R134a', t_evap, t_cond, isentropic_efficiency=isentropic_efficiency)
+        results = results.calculate()
+        results['volumetric_capacity'] = results['cooling_capacity'] * results['suction_density']
+        return results
+
+    def test_find_roots_cube_roots(self):
+        targets = np.array([0.001, 1.0, 2.0, 27.0, 500.0])
+        roots, evaluations = find_roots(lambda x, rows: x ** 3 - targets[rows], np.zeros(5), np.full(5, 10.0),
+                                        xtol=1e-10)
+        np.testing.assert_allclose(roots, np.cbrt(targets), rtol=1e-8)
+        # Bisection to 1e-10 on an interval of 10 takes 37 evaluations
+        self.assertLess(evaluations, 37)
+
+    def test_find_roots_marks_unbracketed_and_infeasible_problems(self):
+        targets = np.array([2.0, -1.0, 3.0])
+
+        def f(x, rows):
+            return np.where(targets[rows] == 3.0, np.nan, x - targets[rows])
+
+        roots, _ = find_roots(f, np.zeros(3), np.full(3, 5.0))
+        self.assertAlmostEqual(roots[0], 2.0, places=6)
+        self.assertTrue(np.isnan(roots[1]) and np.isnan(roots[2]))
+
+    def test_find_roots_at_interval_end(self):
+        roots, evaluations = find_roots(lambda x, rows: x - 1, np.array([1.0]), np.array([3.0]))
+        self.assertEqual((roots[0], evaluations), (1.0, 2))
+
+    def test_recovers_evaporator_temperature(self):
+        t_evap = np.array([-30.0, -12.5, 5.0])
+        for target in ('cop', 'cooling_capacity', 'volumetric_capacity'):
+            with self.subTest(target=target):
+                values = self.forward(t_evap, 40.0)[target]
+                designs = solve_design('R134a', target, values, 'evaporator_temp', condenser_temp=40.0)['designs']
+                self.assertTrue(all(design['valid'] for design in designs))
+                np.testing.assert_allclose([design['evaporator_temp'] for design in designs], t_evap, atol=2e-3)
+
+    def test_recovers_condenser_temperature(self):
+        t_cond = np.array([25.0, 40.0, 55.0])
+        values = self.forward(-10.0, t_cond)['cop']
+        designs = solve_design('R134a', 'cop', values, 'condenser_temp', evaporator_temp=-10.0)['designs']
+        np.testing.assert_allclose([design['condenser_temp'] for design in designs], t_cond, atol=2e-3)
+
+    def test_recovers_isentropic_efficiency(self):
+        efficiency = np.array([0.55, 0.7, 0.85])
+        values = self.forward(-10.0, 40.0, efficiency)['cop']
+        result = solve_design('R134a', 'cop', values, 'isentropic_efficiency', evaporator_temp=-10.0,
+                              condenser_temp=40.0)
+        np.testing.assert_allclose([design['isentropic_efficiency'] for design in result['designs']], efficiency,
+                                   atol=1e-4)
+        self.assertEqual(result['evaluations'], 1)
+
+    def test_unreachable_targets(self):
+        ideal = float(self.forward(-10.0, 40.0)['cop'])
+        designs = solve_design('R134a', 'cop', [ideal * 1.5, -1.0], 'isentropic_efficiency',
+                               evaporator_temp=-10.0, condenser_temp=40.0)['designs']
+        self.assertEqual([design['valid'] for design in designs], [False, False])
+        designs = solve_design('R134a', 'cop', [1000.0], 'evaporator_temp', condenser_temp=40.0)['designs']
+        self.assertFalse(designs[0]['valid'])
+
+
+class SizingTests(TestCase):
+    def setUp(self):
+        self.project = create_project()
+
+    def test_options_match_single_solves(self):
+        refrigerants = Refrigerant.objects.filter(coolprop_name__in=['R134a', 'Ammonia'])
+        results = size_project(self.project, refrigerants, condenser_temps=[35.0, 45.0, 130.0])
+        design_load = calculate_project_loads(self.project)['design_load']
+        t_evap = self.project.indoor_temp - DEFAULT_EVAPORATOR_TD
+        self.assertEqual(results['evaporator_temp'], t_evap)
+
+        # 130 C is above the critical temperature of R134a but not of ammonia
+        self.assertEqual([(f['refrigerant'], f['condenser_temp']) for f in results['failed']],
+                         [(refrigerants.get(coolprop_name='R134a').name, 130.0)])
+        options = results['options']
+        self.assertEqual(len(options), 5)
+        self.assertEqual([option['rank'] for option in options], [1, 2, 3, 4, 5])
+        powers = [option['compressor_power'] for option in options]
+        self.assertEqual(powers, sorted(powers))
+        for option in options:
+            single = solve_vapor_compression(option['coolprop_name'], t_evap, option['condenser_temp'])
+            self.assertAlmostEqual(option['cop'], single['cop'], places=3)
+            self.assertAlmostEqual(option['compressor_power'], design_load / 1000 / single['cop'], places=2)
+            self.assertAlmostEqual(option['mass_flow'], design_load / 1000 / single['cooling_capacity'], places=4)
+
+    def test_view_rejects_bad_parameters(self):
+        url = reverse('project_sizing', args=[self.project.pk])
+        response = self.client.get(url, {'condenser_temps': '35,45'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['options'])
+        for params in ({'condenser_temps': '35,nan'}, {'condenser_temps': 'x'}, {'evaporator_td': 'inf'},
+                       {'condenser_temps': ','.join(['40'] * 201)}, {'expansion_device': 'valve'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+        self.assertEqual(self.client.get(reverse('project_sizing', args=[uuid.uuid4()])).status_code, 404)
+
+
+class ComparisonTests(TestCase):
+    @override_settings(CALCULATION_PROCESSES=0)
+    def test_rows_match_single_solves_and_rank_by_cop(self):
+        results = compare_refrigerants(-10.0, 40.0)
+        rows = results['refrigerants']
+        self.assertEqual(len(rows), Refrigerant.objects.count())
+        # Water freezes and CO2 is supercritical at these temperatures
+        invalid = {row['coolprop_name'] for row in rows if not row['valid']}
+        self.assertEqual(invalid, {'Water', 'R744'})
+        self.assertEqual([row['valid'] for row in rows], sorted([row['valid'] for row in rows], reverse=True))
+        valid = [row for row in rows if row['valid']]
+        self.assertEqual([row['cop'] for row in valid], sorted([row['cop'] for row in valid], reverse=True))
+
+        for row in valid:
+            single = solve_vapor_compression(row['coolprop_name'], -10.0, 40.0)
+            self.assertAlmostEqual(row['cop'], single['cop'], places=3)
+            self.assertAlmostEqual(row['cooling_capacity'], single['cooling_capacity'], places=2)
+            self.assertAlmostEqual(row['gwp_mass_per_kwh'], row['gwp'] * 3600 / single['cooling_capacity'], delta=0.1)
+
+    def test_process_pool_gives_the_same_rows(self):
+        refrigerants = Refrigerant.objects.filter(coolprop_name__in=['R134a', 'R290', 'Ammonia'])
+        with override_settings(CALCULATION_PROCESSES=0):
+            expected = compare_refrigerants(-20.0, 35.0, refrigerants=refrigerants)
+        self.addCleanup(reset_process_pool)
+        with override_settings(CALCULATION_PROCESSES=2):
+            self.assertEqual(compare_refrigerants(-20.0, 35.0, refrigerants=refrigerants), expected)
+
+    @override_settings(CALCULATION_PROCESSES=0)
+    def test_view_rejects_bad_parameters(self):
+        url = reverse('refrigerant_comparison')
+        self.assertEqual(self.client.get(url, {'evaporator_temp': -5}).status_code, 200)
+        for params in ({'evaporator_temp': 'nan'}, {'condenser_temp': 'inf'}, {'expansion_device': 'valve'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.r134a = Refrigerant.objects.get(coolprop_name='R134a')
+
+    def submit(self, **values):
+        data = {'cycle_type': 'vapor_compression', 'refrigerant': self.r134a.pk, 'expansion_device': 'throttle',
+                'evaporator_temp': -10, 'condenser_temp': 40, **values}
+        return self.client.post(reverse('calculate_async'), data)
+
+    def test_calculate_solves_and_stores(self):
+        response = self.submit()
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        calculation = Calculation.objects.get(pk=data['id'])
+        self.assertAlmostEqual(data['cop'], solve_vapor_compression('R134a', -10, 40)['cop'], places=3)
+        self.assertEqual(calculation.cop, data['cop'])
+        self.assertEqual(calculation.statepoint_set.count(), 4)
+
+        self.assertEqual(self.client.get(reverse('calculate_async')).status_code, 405)
+        response = self.submit(evaporator_temp='warm')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('evaporator_temp', response.json()['errors'])
+
+    @override_settings(CALCULATION_PROCESSES=0)
+    def test_diagrams_are_rendered_off_the_event_loop(self):
+        calculation_id = self.submit().json()['id']
+        response = self.client.get(reverse('calculation_diagrams_async', args=[calculation_id]))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        for diagram_type in DIAGRAM_TYPES:
+            self.assertTrue(base64.b64decode(data[f'{diagram_type}_diagram']).startswith(PNG_SIGNATURE))
+        self.assertEqual(self.client.get(reverse('calculation_diagrams_async', args=[0])).status_code, 404)
+
+    def test_full_queue_sheds_load(self):
+        project = create_project()
+        with mock.patch('core.executors._queue_slots', threading.BoundedSemaphore(1)) as slots:
+            slots.acquire()
+            for response in (self.submit(), self.client.get(reverse('project_result_async', args=[project.pk]))):
+                self.assertEqual(response.status_code, 503)
+                self.assertEqual(response['Retry-After'], '5')
+            self.assertFalse(Calculation.objects.exists())
+            slots.release()
+            self.assertEqual(self.submit().status_code, 201)
+            response = self.client.get(reverse('project_result_async', args=[project.pk]))
+            self.assertEqual(response.status_code, 200)
+            self.assertAlmostEqual(response.context['design_load'], calculate_project_loads(project)['design_load'])
+
+
+class DeduplicationTests(TestCase):
+    def setUp(self):
+        self.r134a = Refrigerant.objects.get(coolprop_name='R134a')
+
+    def test_fingerprint_covers_only_the_inputs_solved_on(self):
+        base = input_fingerprint('vapor_compression', 1, -10, 40)
+        self.assertEqual(input_fingerprint('vapor_compression', 1, -10.0000001, 40.0, generator_temp=90), base)
+        self.assertEqual(input_fingerprint('vapor_compression', 1, -0.0, 40),
+                         input_fingerprint('vapor_compression', 1, 0, 40))
+        for other in (input_fingerprint('vapor_compression', 1, -10.001, 40),
+                      input_fingerprint('vapor_compression', 2, -10, 40),
+                      input_fingerprint('vapor_compression', 1, -10, 40, 'turbine'),
+                      input_fingerprint('transcritical', 1, -10, 40)):
+            self.assertNotEqual(other, base)
+
+        self.assertEqual(input_fingerprint('absorption', 1, 5, 40, 'throttle', 85, 35),
+                         input_fingerprint('absorption', 1, 5, 40, 'turbine', 85, 35))
+        self.assertNotEqual(input_fingerprint('absorption', 1, 5, 40, 'throttle', 85, 35),
+                            input_fingerprint('absorption', 1, 5, 40, 'throttle', 90, 35))
+
+        coefficients = [1.0] * 10
+        compressor = CompressorMap('C1', 'R134a', coefficients, coefficients)
+        with_map = input_fingerprint('vapor_compression', 1, -10, 40, compressor=compressor)
+        self.assertNotEqual(with_map, base)
+        compressor.power_coefficients[0] = 2.0
+        self.assertNotEqual(input_fingerprint('vapor_compression', 1, -10, 40, compressor=compressor), with_map)
+
+    def test_identical_submission_reuses_the_stored_calculation(self):
+        data = {'cycle_type': 'vapor_compression', 'refrigerant': self.r134a.pk, 'expansion_device': 'throttle',
+                'evaporator_temp': -10, 'condenser_temp': 40}
+        for _ in range(2):
+            self.assertEqual(self.client.post(reverse('calculator'), data).status_code, 302)
+        self.assertEqual(Calculation.objects.count(), 1)
+        self.assertEqual(Calculation.objects.get().statepoint_set.count(), 4)
+
+    def test_store_losing_the_unique_index_race_returns_the_winner(self):
+        def calculation():
+            return Calculation(cycle_type='vapor_compression', refrigerant=self.r134a, expansion_device='throttle',
+                               evaporator_temp=-10, condenser_temp=40)
+
+        solution = solve_calculation('vapor_compression', 'R134a', -10, 40)
+        first, reused = store_solved(calculation(), solution)
+        self.assertFalse(reused)
+        # Both requests missed the lookup, so the second insert hits the unique fingerprint
+        second, reused = store_solved(calculation(), solution)
+        self.assertTrue(reused)
+        self.assertEqual(second.pk, first.pk)
+        self.assertEqual(Calculation.objects.count(), 1)
+        self.assertEqual(first.statepoint_set.count(), 4)
+
+
+class ResponseSurfaceTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.surface = ResponseSurface.build('R134a', evaporator_range=(-40.0, 10.0), condenser_range=(20.0, 60.0),
+                                            step=2.0)
+
+    def test_error_bounds_hold_against_exact_solves(self):
+        rng = np.random.default_rng(0)
+        for t_evap, t_cond in zip(rng.uniform(-40, 10, 60), rng.uniform(20, 60, 60)):
+            result = self.surface.lookup(t_evap, t_cond)
+            exact = compare_fluid('R134a', t_evap, t_cond)
+            self.assertTrue(exact['valid'])
+            for field in SURFACE_FIELDS:
+                with self.subTest(t_evap=t_evap, t_cond=t_cond, field=field):
+                    # Values are stored in single precision
+                    tolerance = result['errors'][field] + 1e-6 * abs(exact[field])
+                    self.assertLessEqual(abs(result[field] - exact[field]), tolerance)
+        self.assertLess(self.surface.lookup(-12.3, 41.7)['errors']['cop'], 0.01)
+
+    def test_lookups_outside_the_grid_or_range_give_nothing(self):
+        self.assertIsNone(self.surface.lookup(-41.0, 40.0))
+        self.assertIsNone(self.surface.lookup(-10.0, 61.0))
+        self.assertIsNotNone(self.surface.lookup(10.0, 60.0))
+        # Above the critical temperature of R134a (101 C) no cell is usable
+        hot = ResponseSurface.build('R134a', evaporator_range=(0.0, 10.0), condenser_range=(96.0, 106.0), step=2.0)
+        self.assertIsNone(hot.lookup(5.0, 103.0))
+
+    def test_quote_falls_back_to_exact_solves(self):
+        with tempfile.TemporaryDirectory() as directory, mock.patch('cycle_calculator.tables._directory', directory):
+            self.assertEqual(quote('R134a', -10.5, 40.5)['source'], 'exact')
+            self.surface.save(surface_path('R134a', 'throttle'))
+            self.assertTrue(os.path.exists(surface_path('R134a', 'throttle')))
+
+            result = quote('R134a', -10.5, 40.5)
+            self.assertEqual(result['source'], 'surface')
+            self.assertAlmostEqual(result['cop'], compare_fluid('R134a', -10.5, 40.5)['cop'],
+                                   delta=result['errors']['cop'])
+            for arguments in ({'exact': True}, {'max_cop_error': 1e-9}):
+                result = quote('R134a', -10.5, 40.5, **arguments)
+                self.assertEqual(result['source'], 'exact')
+                self.assertEqual(result['errors']['cop'], 0.0)
+            self.assertEqual(quote('R134a', -45.0, 40.0)['source'], 'exact')
+            self.assertEqual(quote('R134a', -10.5, 40.5, 'turbine')['source'], 'exact')
+
+
+class TableTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.path = os.path.join(self.directory, 'sub', 'values.table')
+
+    def test_round_trip(self):
+        arrays = {
+            'grid': np.arange(12, dtype=np.float32).reshape(3, 4),
+            'flags': np.array([True, False, True]),
+            'counts': np.array([1, -2, 3], dtype=np.int64)[::-1],
+            'empty': np.zeros(0),
+        }
+        write_table(self.path, arrays, {'refrigerant': 'R134a', 'step': 0.5})
+        self.assertFalse(os.path.exists(f'{self.path}.partial'))
+
+        table = Table(self.path)
+        self.assertEqual(table.meta, {'refrigerant': 'R134a', 'step': 0.5})
+        for name, array in arrays.items():
+            self.assertIn(name, table)
+            self.assertEqual(table[name].dtype, array.dtype)
+            np.testing.assert_array_equal(table[name], array)
+            if array.size:
+                self.assertEqual(table[name].ctypes.data % ALIGNMENT, 0)
+        with self.assertRaises(ValueError):
+            table['grid'][0, 0] = 1.0
+
+    def test_replaced_files_are_mapped_again(self):
+        self.assertIsNone(open_table(self.path))
+        self.assertIsNone(open_table(None))
+        write_table(self.path, {'values': np.ones(4)})
+        first = open_table(self.path)
+        self.assertIs(open_table(self.path), first)
+
+        write_table(self.path, {'values': np.full(4, 2.0)})
+        second = open_table(self.path)
+        self.assertIsNot(second, first)
+        np.testing.assert_array_equal(second['values'], 2.0)
+        # Holders of the previous mapping keep reading the previous file
+        np.testing.assert_array_equal(first['values'], 1.0)
+
+        with open(self.path, 'wb') as f:
+            f.write(b'not a table')
+        with self.assertRaises(ValueError):
+            Table(self.path)
+
+    def test_saturation_table_matches_coolprop(self):
+        with mock.patch('cycle_calculator.tables._directory', self.directory):
+            self.assertGreater(build_saturation_table('R134a', saturation_table_path('R134a')), 8000)
+            refrigerant = CoolPropRefrigerant('R134a')
+        self.assertIsNotNone(refrigerant.saturation_table)
+        for t in (-40.0, -10.3, 25.0, 80.7):
+            with self.subTest(t=t):
+                p = props('P', 'T', t + 273.15, 'Q', 0, 'R134a')
+                self.assertAlmostEqual(refrigerant.get_pressure(t) / p, 1, delta=1e-5)
+                self.assertAlmostEqual(refrigerant.get_temperature(p), t, delta=1e-3)
+                for quality in (0, 1):
+                    h = props('H', 'P', p, 'Q', quality, 'R134a')
+                    self.assertAlmostEqual(refrigerant.get_enthalpy(p, quality) / h, 1, delta=1e-5)
+        # Within the margin below the critical point CoolProp answers
+        p = props('P', 'T', 374.0, 'Q', 1, 'R134a')
+        self.assertEqual(refrigerant.get_enthalpy(p, 1), props('H', 'P', p, 'Q', 1, 'R134a'))
+
+
+class SeasonalTests(TestCase):
+    def setUp(self):
+        self.project = create_project(outdoor_temp=35.0)
+        # A year of hourly temperatures swinging between -5 and 43 C
+        hours = np.arange(8760)
+        self.hourly_temps = 19 + 16 * np.sin(2 * np.pi * hours / 8760) + 8 * np.sin(2 * np.pi * hours / 24)
+
+    def test_bins_count_hours_and_skip_missing_readings(self):
+        centres, hours = bin_temperatures([0.2, 0.7, 1.5, -0.5, np.nan], 1.0)
+        np.testing.assert_array_equal(centres, [-0.5, 0.5, 1.5])
+        np.testing.assert_array_equal(hours, [1, 2, 1])
+        centres, hours = bin_temperatures(self.hourly_temps, 2.0)
+        self.assertEqual(hours.sum(), 8760)
+        np.testing.assert_array_equal(np.diff(centres) % 2.0, 0.0)
+
+    def test_one_solve_per_condensing_temperature(self):
+        results = seasonal_performance(self.project, self.hourly_temps, 'R134a', min_condenser_temp=25.0)
+        bins = results['bins']
+        self.assertEqual(results['hours'], 8760)
+        self.assertEqual(results['bin_count'], len(bins))
+        # Every bin below 15 C condenses at the 25 C floor and shares its solve
+        self.assertEqual(results['cycle_solves'], len({row['condenser_temp'] for row in bins}))
+        floored = [row for row in bins if row['ambient_temp'] < 15]
+        self.assertGreater(len(floored), 10)
+        self.assertEqual({row['condenser_temp'] for row in floored}, {25.0})
+        self.assertEqual(results['cycle_solves'], results['bin_count'] - len(floored) + 1)
+        # The design load carries the safety factor, so only the hottest hours exceed it
+        unmet = [row for row in bins if row['load'] > results['design_load']]
+        self.assertTrue(unmet)
+        self.assertGreater(min(row['ambient_temp'] for row in unmet), 35)
+        self.assertEqual(results['unmet_hours'], sum(row['hours'] for row in unmet))
+        self.assertEqual(results['unsolved_hours'], 0)
+
+        for row in (bins[0], bins[-1]):
+            cop = solve_vapor_compression('R134a', results['evaporator_temp'], row['condenser_temp'])['cop']
+            self.assertAlmostEqual(row['cop'], cop, places=3)
+        cooling = sum(row['cooling_energy'] for row in bins)
+        electric = sum(row['electric_energy'] for row in bins)
+        self.assertAlmostEqual(results['cooling_energy'], cooling, delta=0.01 * len(bins))
+        self.assertAlmostEqual(results['seasonal_cop'], cooling / electric, places=2)
+
+        hits = metrics.CACHE_REQUESTS.labels('seasonal_cycles', 'hit')
+        before = hits.snapshot()
+        self.assertEqual(seasonal_performance(self.project, self.hourly_temps, 'R134a', min_condenser_temp=25.0),
+                         results)
+        self.assertEqual(hits.snapshot(), before + 1)
+
+    def test_view_rejects_bad_parameters(self):
+        url = reverse('project_seasonal', args=[self.project.pk])
+        data = {'refrigerant': 'R134a', 'hourly_temps': '10, 20 30,25'}
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['hours'], 4)
+        self.assertEqual(self.client.get(url, data).status_code, 405)
+        for values in ({'hourly_temps': '10,nan'}, {'hourly_temps': ''}, {'bin_width': '0'},
+                       {'degradation_coefficient': '1'}, {'isentropic_efficiency': 'inf'}):
+            with self.subTest(values=values):
+                self.assertEqual(self.client.post(url, {**data, **values}).status_code, 400)
+        self.assertEqual(self.client.post(url, {**data, 'refrigerant': 'R999'}).status_code, 404)
+
+
+# AHRI 540 coefficients of a compressor giving 170 kg/h and 6.4 kW at -10/40 C
+MASS_FLOW_COEFFICIENTS = [300.0, 5.0, -2.0] + [0.0] * 7
+POWER_COEFFICIENTS = [3000.0, -20.0, 80.0] + [0.0] * 7
+# A pentagon notched at low evaporating and high condensing temperatures
+ENVELOPE = [[-30.0, 25.0], [5.0, 25.0], [5.0, 60.0], [-15.0, 60.0], [-30.0, 45.0]]
+
+
+class CompressorTests(TestCase):
+    def setUp(self):
+        self.r134a = Refrigerant.objects.get(coolprop_name='R134a')
+        self.compressor = Compressor.objects.create(
+            manufacturer='Acme', model_number='S1', refrigerant=self.r134a,
+            mass_flow_coefficients=MASS_FLOW_COEFFICIENTS, power_coefficients=POWER_COEFFICIENTS, envelope=ENVELOPE)
+        self.map = CompressorMap('Acme S1', 'R134a', MASS_FLOW_COEFFICIENTS, POWER_COEFFICIENTS, ENVELOPE)
+
+    def test_polynomial_terms(self):
+        s, d = -10.0, 40.0
+        expected = [1, s, d, s * s, s * d, d * d, s ** 3, d * s * s, s * d * d, d ** 3]
+        np.testing.assert_allclose(ahri_terms(s, d), expected)
+        self.assertEqual(ahri_terms(np.zeros((3, 1)), np.zeros(4)).shape, (3, 4, 10))
+        self.assertAlmostEqual(float(self.map.mass_flow(s, d)), 170 / 3600)
+        self.assertAlmostEqual(float(self.map.power(s, d)), 6.4)
+
+    def test_envelope_point_in_polygon(self):
+        square = [[0.0, 0.0], [10.0, 0.0], [10.0, 10.0], [0.0, 10.0]]
+        vertices = CompressorCatalog(['notched', 'square', 'unlimited'], ['R134a'] * 3, [MASS_FLOW_COEFFICIENTS] * 3,
+                                     [POWER_COEFFICIENTS] * 3, [ENVELOPE, square, None]).envelopes
+        t_evap = np.array([-10.0, -28.0, -28.0, 4.0, -31.0, 5.0])
+        t_cond = np.array([40.0, 30.0, 55.0, 59.0, 40.0, 40.0])
+        inside = inside_envelopes(vertices, t_evap, t_cond)
+        np.testing.assert_array_equal(inside[0], [True, True, False, True, False, True])
+        np.testing.assert_array_equal(inside[1], False)
+        np.testing.assert_array_equal(inside[2], True)
+        np.testing.assert_array_equal(inside_envelopes(vertices, [[5.0]], [[5.0]])[:, 0, 0], [False, True, True])
+        # Every edge and vertex belongs to the envelope
+        edges = inside_envelopes(vertices[1:2], [0.0, 10.0, 5.0, 5.0, 10.0, 10.0001], [5.0, 5.0, 0.0, 10.0, 10.0, 5.0])
+        np.testing.assert_array_equal(edges[0], [True, True, True, True, True, False])
+
+    def test_catalog_agrees_with_the_cycle(self):
+        cycle = solve_vapor_compression('R134a', -10.0, 40.0)
+        rating = self.map.rate(-10.0, 40.0, cycle['cooling_capacity'], 0.0)
+        self.assertAlmostEqual(rating['capacity'], 170 / 3600 * cycle['cooling_capacity'])
+        self.assertAlmostEqual(rating['cop'], rating['capacity'] / 6.4)
+        self.assertTrue(rating['inside_envelope'])
+
+        results = CompressorCatalog.from_maps([self.map]).evaluate(np.array([-10.0, -28.0]), np.array([40.0, 55.0]))
+        self.assertAlmostEqual(float(results['capacity'][0, 0]), rating['capacity'], places=6)
+        # Outside the envelope the catalog gives no result, while rate flags the point
+        self.assertFalse(results['valid'][0, 1])
+        self.assertTrue(np.isnan(results['cop'][0, 1]))
+        self.assertFalse(self.map.rate(-28.0, 55.0, 150.0, 30.0)['inside_envelope'])
+        with self.assertRaises(ValueError):
+            CompressorMap('Dead', 'R134a', [-1.0] + [0.0] * 9, POWER_COEFFICIENTS).rate(-10.0, 40.0, 150.0, 30.0)
+
+    def test_selection_ranks_by_power_within_the_envelope(self):
+        Compressor.objects.create(
+            manufacturer='Acme', model_number='S2', refrigerant=self.r134a,
+            mass_flow_coefficients=[2 * c for c in MASS_FLOW_COEFFICIENTS],
+            power_coefficients=[1.5 * c for c in POWER_COEFFICIENTS], envelope=[])
+        capacity = float(self.map.rate(-10.0, 40.0, solve_vapor_compression('R134a', -10, 40)['cooling_capacity'],
+                                       0.0)['capacity'])
+        results = select_compressors(-10.0, 40.0, 0.9 * capacity, 'R134a')
+        self.assertEqual(results['candidates'], 2)
+        self.assertEqual([option['model_number'] for option in results['options']], ['S1', 'S2'])
+        self.assertEqual(select_compressors(-10.0, 40.0, 1.1 * capacity, 'R134a')['options'][0]['model_number'],
+                         'S2')
+        self.assertEqual(len(select_compressors(-10.0, 40.0, 0.9 * capacity, 'R134a', max_oversize=1.5)['options']),
+                         1)
+        # Only S2 has no envelope to leave
+        self.assertEqual([option['model_number'] for option in select_compressors(8.0, 40.0, 0.1)['options']],
+                         ['S2'])
+
+        response = self.client.get(reverse('compressor_selection'), {'capacity': capacity / 2, 'refrigerant': 'R134a'})
+        self.assertEqual(response.status_code, 200)
+        for params in ({'capacity': 'nan'}, {'evaporator_temp': 'inf'}, {'max_oversize': '-inf'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(reverse('compressor_selection'), params).status_code, 400)
+
+    def test_envelope_map_is_null_outside(self):
+        results = compressor_envelope(self.compressor, step=5.0)
+        self.assertEqual(results['evaporator_temps'][0], -30.0)
+        self.assertEqual(results['condenser_temps'][-1], 60.0)
+        cop = results['cop']
+        self.assertIsNotNone(cop[4][3])  # -10 / 40 C
+        self.assertIsNone(cop[0][6])  # -30 / 55 C, cut off by the notch
+        url = reverse('compressor_envelope', args=[self.compressor.pk])
+        self.assertEqual(self.client.get(url, {'step': 'nan'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'step': '0.0001'}).status_code, 400)
+
+    def test_calculations_rate_their_compressor(self):
+        results = VaporCompressionCycle('R134a', -10.0, 40.0, compressor=self.map).calculate()
+        solution = solve_calculation('vapor_compression', 'R134a', -10.0, 40.0, compressor=self.map)
+        self.assertAlmostEqual(results['compressor']['power'], 6.4)
+        self.assertAlmostEqual(solution['compressor']['cop'], results['compressor']['cop'], places=3)
+        with self.assertRaises(ValueError):
+            solve_calculation('vapor_compression', 'R290', -10.0, 40.0, compressor=self.map)
+        with self.assertRaises(ValueError):
+            solve_calculation('transcritical', 'R134a', -10.0, 40.0, compressor=self.map)
+
+        data = {'cycle_type': 'vapor_compression', 'refrigerant': self.r134a.pk, 'expansion_device': 'throttle',
+                'evaporator_temp': -10, 'condenser_temp': 40, 'compressor': self.compressor.pk}
+        response = self.client.post(reverse('calculate_async'), data)
+        self.assertEqual(response.status_code, 201)
+        rating = response.json()['compressor']
+        self.assertAlmostEqual(rating['power'], 6.4)
+        self.assertTrue(rating['inside_envelope'])
+        calculation = Calculation.objects.get(pk=response.json()['id'])
+        self.assertAlmostEqual(calculation.compressor_cop, solution['compressor']['cop'])
+        # The same inputs without the map are a different calculation
+        del data['compressor']
+        self.assertEqual(self.client.post(reverse('calculate_async'), data).status_code, 201)
+
+        r290 = Refrigerant.objects.get(coolprop_name='R290')
+        for values in ({'refrigerant': r290.pk}, {'cycle_type': 'transcritical'}):
+            with self.subTest(values=values):
+                response = self.client.post(reverse('calculate_async'),
+                                            {**data, 'compressor': self.compressor.pk, **values})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('compressor', response.json()['errors'])
+
+
+class CoilTests(TestCase):
+    def test_effectiveness_and_lmtd(self):
+        ntu = np.array([0.0, 0.5, 2.0])
+        np.testing.assert_allclose(effectiveness(ntu), 1 - np.exp(-ntu))
+        np.testing.assert_allclose(effectiveness(ntu, 1.0), ntu / (1 + ntu))
+        decay = np.exp(-2.0 * 0.5)
+        self.assertAlmostEqual(float(effectiveness(2.0, 0.5)), (1 - decay) / (1 - 0.5 * decay))
+        np.testing.assert_allclose(log_mean_temperature_difference([20.0, 8.0], [10.0, 8.0]), [10 / math.log(2), 8.0])
+
+    def test_lmtd_ua_of_the_rated_duty_is_the_coil_ua(self):
+        # With the refrigerant at a uniform temperature the two methods agree exactly
+        catalog = CoilCatalog(['a', 'b'], [50.0, 120.0], [25.0, 20.0], [8000.0, 12000.0], [300.0, 500.0])
+        for t_air_in, t_refrigerant in ((2.0, -6.0), (35.0, 45.0)):
+            ratings = catalog.rate(t_air_in, t_refrigerant)
+            np.testing.assert_allclose(required_ua(ratings['duty'], catalog.air_flow, t_air_in, t_refrigerant),
+                                       ratings['ua'])
+            np.testing.assert_array_less(0, (ratings['air_outlet_temp'] - t_refrigerant) * (t_air_in - t_refrigerant))
+        # No air flow below the minimum can carry the duty
+        air_flow = float(minimum_air_flow(5000.0, 2.0, -6.0))
+        self.assertTrue(np.isnan(required_ua(5000.0, 0.99 * air_flow, 2.0, -6.0)))
+        self.assertTrue(np.isfinite(required_ua(5000.0, 1.01 * air_flow, 2.0, -6.0)))
+
+    def test_selection_by_area_within_margin(self):
+        catalog = CoilCatalog(['small', 'large', 'mid', 'mid quiet'], [20.0, 200.0, 80.0, 80.0],
+                              [25.0] * 4, [6000.0, 20000.0, 12000.0, 12000.0], [200.0, 900.0, 500.0, 400.0])
+        duties = catalog.rate(2.0, -6.0)['duty']
+        options = catalog.select(duties[2] * 0.9, 2.0, -6.0)
+        self.assertEqual([option['name'] for option in options], ['mid quiet', 'mid', 'large'])
+        self.assertTrue(all(option['margin'] >= 1 for option in options))
+        self.assertEqual([option['name'] for option in catalog.select(duties[2] * 0.9, 2.0, -6.0, max_oversize=2)],
+                         ['mid quiet', 'mid'])
+        self.assertEqual(len(catalog.select(duties[2] * 0.9, 2.0, -6.0, limit=1)), 1)
+        # Condenser duties are negative, heating the air
+        self.assertEqual([option['name'] for option in catalog.select(-duties[0], 35.0, 45.0)][0], 'small')
+
+    def test_project_coils(self):
+        project = create_project()
+        for i, (coil_type, area) in enumerate([('evaporator', 60.0), ('evaporator', 400.0), ('condenser', 150.0),
+                                               ('condenser', 600.0)]):
+            Coil.objects.create(manufacturer='Acme', model_number=f'C{i}', coil_type=coil_type,
+                                heat_transfer_area=area, u_value=25.0, air_flow=area * 150, fan_power=area)
+        results = size_coils(project, 'R134a')
+        cop = solve_vapor_compression('R134a', results['evaporator_temp'], results['condenser_temp'])['cop']
+        self.assertAlmostEqual(results['cop'], cop, places=3)
+        self.assertEqual(results['evaporator']['duty'], results['design_load'])
+        self.assertAlmostEqual(results['condenser']['duty'], results['design_load'] * (1 + 1 / cop), delta=0.01)
+        for side in ('evaporator', 'condenser'):
+            self.assertEqual(results[side]['candidates'], 2)
+            self.assertTrue(results[side]['options'])
+            for option in results[side]['options']:
+                self.assertGreaterEqual(option['duty'], results[side]['duty'])
+
+        url = reverse('project_coils', args=[project.pk])
+        self.assertEqual(self.client.get(url, {'refrigerant': 'R134a'}).status_code, 200)
+        for params in ({'condenser_temp': 'nan'}, {'max_oversize': 'inf'}, {'limit': '1.5'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, {'refrigerant': 'R134a', **params}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'refrigerant': 'R134a', 'condenser_temp': 150}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'refrigerant': 'R999'}).status_code, 404)
@@ -1,8 +1,31 @@
 from django.urls import path
-from .views import CalculationCreateView, CalculationListView, CalculationDetailView
+from .views import (CalculationCreateView, CalculationListView, CalculationDetailView, project_sizing,
+                    refrigerant_comparison, calculate_async, calculation_diagrams_async, calculation_diagram_image,
+                    calculation_comparison_diagram, cycle_quote, transcritical_sweep,
+                    multistage_comparison, absorption_sweep, inverse_design, project_seasonal,
+                    compressor_selection, compressor_envelope_map, project_coils)
 
 urlpatterns = [
     path('', CalculationCreateView.as_view(), name='calculator'),
     path('calculations/', CalculationListView.as_view(), name='calculation_list'),
     path('calculations/<int:pk>/', CalculationDetailView.as_view(), name='calculation_detail'),
+    path('calculations/<int:pk>/diagrams/<slug:diagram_type>/', calculation_diagram_image,
+         name='calculation_diagram'),
+    path('calculations/<int:pk>/diagrams/<slug:diagram_type>.<slug:fmt>', calculation_diagram_image,
+         name='calculation_diagram_image'),
+    path('async/calculate/', calculate_async, name='calculate_async'),
+    path('async/calculations/<int:pk>/diagrams/', calculation_diagrams_async, name='calculation_diagrams_async'),
+    path('sizing/<uuid:project_pk>/', project_sizing, name='project_sizing'),
+    path('sizing/<uuid:project_pk>/coils/', project_coils, name='project_coils'),
+    path('seasonal/<uuid:project_pk>/', project_seasonal, name='project_seasonal'),
+    path('quote/', cycle_quote, name='cycle_quote'),
+    path('design/', inverse_design, name='inverse_design'),
+    path('compressors/select/', compressor_selection, name='compressor_selection'),
+    path('compressors/<int:pk>/envelope/', compressor_envelope_map, name='compressor_envelope'),
+    path('absorption/', absorption_sweep, name='absorption_sweep'),
+    path('transcritical/', transcritical_sweep, name='transcritical_sweep'),
+    path('compare/multistage/', multistage_comparison, name='multistage_comparison'),
+    path('compare/', refrigerant_comparison, name='refrigerant_comparison'),
+    path('compare/diagrams/<slug:diagram_type>.<slug:fmt>', calculation_comparison_diagram,
+         name='calculation_comparison_diagram'),
 ]
@@ -1,149 +1,85 @@
+import logging
+import math
+from functools import partial
+from typing import List
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.forms import modelform_factory
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect, JsonResponse
 from django.shortcuts import render
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
 from django.views.generic import CreateView, ListView
-from django.urls import reverse_lazy
-from .models import Calculation, Refrigerant, StatePoint
-from .diagrams import ThermodynamicDiagrams
-import CoolProp.CoolProp as CP
+from django.urls import reverse, reverse_lazy
+from cooling_load.models import ColdStorageProject
+from core import metrics
+from core.executors import ExecutorBusy, run_offloaded
+from .models import Calculation, Compressor, Refrigerant, StatePoint
+from .diagrams import COMPARISON_TYPES, DIAGRAM_TYPES, IMAGE_FORMATS, ThermodynamicDiagrams, render_comparison
+from .diagram_storage import diagram_name, stored_diagram
+from .rendering import render_diagrams_parallel
+from .comparison import compare_multistage, compare_refrigerants, sweep_ambient
+from .coils import DEFAULT_OPTION_LIMIT, size_coils
+from .compressors import DEFAULT_ENVELOPE_STEP, compressor_envelope, select_compressors
+from .quoting import quote
+from .seasonal import (DEFAULT_BIN_WIDTH, DEFAULT_DEGRADATION_COEFFICIENT, DEFAULT_MIN_CONDENSER_TEMP,
+                       seasonal_performance)
+from .sizing import DEFAULT_CONDENSER_APPROACH, DEFAULT_EVAPORATOR_TD, size_project
+from .calculations.absorption import DEFAULT_HEAT_EXCHANGER_EFFECTIVENESS, sweep_absorption
+from .calculations.inverse import solve_design
+from .calculations.multistage import DEFAULT_CASCADE_DELTA_T
+from .calculations.transcritical import DEFAULT_APPROACH
+from .solver import (afind_solved, calculation_inputs, find_solved, solve_calculation, state_point_dict,
+                     store_solved)
+
+logger = logging.getLogger(__name__)
+
+DIAGRAM_ERROR_IMAGES = metrics.counter('diagram_error_images_total', 'Error images served in place of diagrams',
+                                       ['diagram_type'])
+
+
+# Largest number of temperatures a sweep or sizing request may ask for
+MAX_SWEEP_POINTS = 200
+
+
+def finite_number(value) -> float:
+    """Parse a number, rejecting NaN and infinities that JSON cannot carry"""
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"{value} is not a finite number")
+    return number
+
+
+def finite_numbers(value: str) -> List[float]:
+    """Parse comma-separated finite numbers"""
+    return [finite_number(v) for v in value.split(',')]
 
 
 class CalculationCreateView(CreateView):
     model = Calculation
     fields = ['cycle_type', 'refrigerant', 'expansion_device', 'evaporator_temp', 'condenser_temp', 'generator_temp',
-              'absorber_temp']
+              'absorber_temp', 'compressor']
     template_name = 'cycle_calculator/calculate.html'
     success_url = reverse_lazy('calculation_list')
 
     def form_valid(self, form):
-        response = super().form_valid(form)
-        self.perform_calculation(self.object)
-        return response
+        calculation = form.save(commit=False)
+        self.object = find_solved(calculation) or self.perform_calculation(calculation)
+        return HttpResponseRedirect(self.get_success_url())
 
     def perform_calculation(self, calculation):
         try:
-            refrigerant = calculation.refrigerant.coolprop_name
-
-            if calculation.cycle_type == 'vapor_compression':
-                self.calculate_vapor_compression(calculation, refrigerant)
-            elif calculation.cycle_type == 'absorption':
-                self.calculate_absorption(calculation, refrigerant)
-
+            solution = solve_calculation(**calculation_inputs(calculation))
         except Exception as e:
-            print(f"Calculation error: {e}")
-
-    def calculate_vapor_compression(self, calc, refrigerant):
-        T_evap = calc.evaporator_temp + 273.15
-        T_cond = calc.condenser_temp + 273.15
-
-        # State points
-        P_low = CP.PropsSI('P', 'T', T_evap, 'Q', 1, refrigerant)
-        P_high = CP.PropsSI('P', 'T', T_cond, 'Q', 0, refrigerant)
-
-        # Point 1: Evaporator exit (saturated vapor)
-        h1 = CP.PropsSI('H', 'T', T_evap, 'Q', 1, refrigerant)
-        s1 = CP.PropsSI('S', 'T', T_evap, 'Q', 1, refrigerant)
-
-        StatePoint.objects.create(
-            calculation=calc, point_number=1,
-            temperature=T_evap - 273.15, pressure=P_low / 1000,
-            enthalpy=h1 / 1000, entropy=s1 / 1000, quality=1.0
-        )
-
-        # Point 2: Compressor exit
-        s2 = s1  # Isentropic compression
-        h2 = CP.PropsSI('H', 'P', P_high, 'S', s2, refrigerant)
-        T2 = CP.PropsSI('T', 'P', P_high, 'H', h2, refrigerant)
-
-        StatePoint.objects.create(
-            calculation=calc, point_number=2,
-            temperature=T2 - 273.15, pressure=P_high / 1000,
-            enthalpy=h2 / 1000, entropy=s2 / 1000
-        )
-
-        # Point 3: Condenser exit (saturated liquid)
-        h3 = CP.PropsSI('H', 'T', T_cond, 'Q', 0, refrigerant)
-        s3 = CP.PropsSI('S', 'T', T_cond, 'Q', 0, refrigerant)
-
-        StatePoint.objects.create(
-            calculation=calc, point_number=3,
-            temperature=T_cond - 273.15, pressure=P_high / 1000,
-            enthalpy=h3 / 1000, entropy=s3 / 1000, quality=0.0
-        )
-
-        # Point 4: After expansion
-        if calc.expansion_device == 'throttle':
-            # Throttling: h4 = h3
-            h4 = h3
-            T4 = CP.PropsSI('T', 'P', P_low, 'H', h4, refrigerant)
-            s4 = CP.PropsSI('S', 'P', P_low, 'H', h4, refrigerant)
-            x4 = CP.PropsSI('Q', 'P', P_low, 'H', h4, refrigerant)
-        else:
-            # Turbine: s4 = s3 (isentropic)
-            s4 = s3
-            h4 = CP.PropsSI('H', 'P', P_low, 'S', s4, refrigerant)
-            T4 = CP.PropsSI('T', 'P', P_low, 'H', h4, refrigerant)
-            x4 = CP.PropsSI('Q', 'P', P_low, 'H', h4, refrigerant)
-
-        StatePoint.objects.create(
-            calculation=calc, point_number=4,
-            temperature=T4 - 273.15, pressure=P_low / 1000,
-            enthalpy=h4 / 1000, entropy=s4 / 1000, quality=x4
-        )
-
-        # Calculate COP
-        q_evap = h1 - h4  # Cooling effect
-        w_comp = h2 - h1  # Compressor work
-        w_turb = h3 - h4 if calc.expansion_device == 'turbine' else 0
-
-        net_work = w_comp - w_turb
-        cop = q_evap / net_work if net_work > 0 else 0
-
-        calc.cop = cop
-        calc.cooling_capacity = q_evap / 1000  # kJ/kg
-        calc.save()
-
-    def calculate_absorption(self, calc, refrigerant):
-        # Simplified absorption cycle calculation
-        T_evap = calc.evaporator_temp + 273.15
-        T_cond = calc.condenser_temp + 273.15
-        T_gen = calc.generator_temp + 273.15 if calc.generator_temp else T_cond + 20
-        T_abs = calc.absorber_temp + 273.15 if calc.absorber_temp else T_evap + 10
-
-        # Basic absorption cycle points (simplified)
-        P_low = CP.PropsSI('P', 'T', T_evap, 'Q', 1, refrigerant)
-        P_high = CP.PropsSI('P', 'T', T_cond, 'Q', 0, refrigerant)
-
-        h1 = CP.PropsSI('H', 'T', T_evap, 'Q', 1, refrigerant)
-        h2 = CP.PropsSI('H', 'T', T_cond, 'Q', 0, refrigerant)
-        h3 = h2  # Throttling
-
-        s1 = CP.PropsSI('S', 'T', T_evap, 'Q', 1, refrigerant)
-        s2 = CP.PropsSI('S', 'T', T_cond, 'Q', 0, refrigerant)
-        s3 = s2
-
-        StatePoint.objects.create(
-            calculation=calc, point_number=1,
-            temperature=T_evap - 273.15, pressure=P_low / 1000,
-            enthalpy=h1 / 1000, entropy=s1 / 1000, quality=1.0
-        )
-        StatePoint.objects.create(
-            calculation=calc, point_number=2,
-            temperature=T_cond - 273.15, pressure=P_high / 1000,
-            enthalpy=h2 / 1000, entropy=s2 / 1000, quality=0.0
-        )
-        StatePoint.objects.create(
-            calculation=calc, point_number=3,
-            temperature=T_evap - 273.15, pressure=P_low / 1000,
-            enthalpy=h3 / 1000, entropy=s3 / 1000
-        )
-
-        # Simplified COP calculation for absorption
-        q_evap = h1 - h3
-        q_gen = 2000000  # Simplified heat input
-        cop = q_evap / q_gen if q_gen > 0 else 0
-
-        calc.cop = cop
-        calc.cooling_capacity = q_evap / 1000
-        calc.save()
+            # Counted by solve_calculation
+            logger.warning("Calculation error for %s: %s", calculation.refrigerant.coolprop_name, e)
+            # Unsolved calculations are kept but never fingerprinted, so a resubmission solves again
+            calculation.save()
+            return calculation
+
+        calculation, _ = store_solved(calculation, solution)
+        return calculation
 
 
 class CalculationListView(ListView):
@@ -166,30 +102,439 @@ class CalculationDetailView(ListView):
         context = super().get_context_data(**kwargs)
         calculation = Calculation.objects.get(id=self.kwargs['pk'])
         context['calculation'] = calculation
+        return context
 
-        # Generate diagrams
-        try:
-            refrigerant_name = calculation.refrigerant.coolprop_name
-            diagrams = ThermodynamicDiagrams(refrigerant_name)
-
-            # Convert state points to dict format
-            state_points = []
-            for point in self.get_queryset():
-                state_points.append({
-                    'temperature': point.temperature,
-                    'pressure': point.pressure,
-                    'enthalpy': point.enthalpy,
-                    'entropy': point.entropy,
-                    'quality': point.quality
-                })
-
-            # Generate diagrams
-            context['ph_diagram'] = diagrams.create_ph_diagram(state_points)
-            context['pv_diagram'] = diagrams.create_pv_diagram(state_points)
-            context['ts_diagram'] = diagrams.create_ts_diagram(state_points)
 
+def project_sizing(request, project_pk):
+    try:
+        project = ColdStorageProject.objects.get(pk=project_pk)
+    except ColdStorageProject.DoesNotExist:
+        return JsonResponse({'error': 'Project not found'}, status=404)
+
+    try:
+        condenser_temps = request.GET.get('condenser_temps')
+        condenser_temps = finite_numbers(condenser_temps) if condenser_temps else None
+        evaporator_td = finite_number(request.GET.get('evaporator_td', DEFAULT_EVAPORATOR_TD))
+    except ValueError:
+        return JsonResponse({'error': 'condenser_temps and evaporator_td must be finite numbers'}, status=400)
+    if condenser_temps and len(condenser_temps) > MAX_SWEEP_POINTS:
+        return JsonResponse({'error': f'At most {MAX_SWEEP_POINTS} condenser_temps'}, status=400)
+
+    expansion_device = request.GET.get('expansion_device', 'throttle')
+    if expansion_device not in dict(Calculation.EXPANSION_CHOICES):
+        return JsonResponse({'error': f'Unknown expansion device: {expansion_device}'}, status=400)
+
+    return JsonResponse(size_project(project, condenser_temps=condenser_temps,
+                                     evaporator_td=evaporator_td, expansion_device=expansion_device))
+
+
+def project_coils(request, project_pk):
+    try:
+        project = ColdStorageProject.objects.get(pk=project_pk)
+    except ColdStorageProject.DoesNotExist:
+        return JsonResponse({'error': 'Project not found'}, status=404)
+
+    try:
+        condenser_temp = request.GET.get('condenser_temp')
+        condenser_temp = finite_number(condenser_temp) if condenser_temp else None
+        evaporator_td = finite_number(request.GET.get('evaporator_td', DEFAULT_EVAPORATOR_TD))
+        max_oversize = request.GET.get('max_oversize')
+        max_oversize = finite_number(max_oversize) if max_oversize else None
+        limit = int(request.GET.get('limit', DEFAULT_OPTION_LIMIT))
+    except ValueError:
+        return JsonResponse({'error': 'condenser_temp, evaporator_td, max_oversize and limit must be finite numbers'},
+                            status=400)
+
+    expansion_device = request.GET.get('expansion_device', 'throttle')
+    if expansion_device not in dict(Calculation.EXPANSION_CHOICES):
+        return JsonResponse({'error': f'Unknown expansion device: {expansion_device}'}, status=400)
+
+    refrigerant = request.GET.get('refrigerant', '')
+    if not Refrigerant.objects.filter(coolprop_name=refrigerant).exists():
+        return JsonResponse({'error': f'Unknown refrigerant: {refrigerant}'}, status=404)
+
+    try:
+        return JsonResponse(size_coils(project, refrigerant, condenser_temp, evaporator_td, expansion_device,
+                                       max_oversize, limit))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+def project_seasonal(request, project_pk):
+    """Seasonal efficiency of a project over an hourly ambient temperature series posted as hourly_temps"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+
+    try:
+        project = ColdStorageProject.objects.get(pk=project_pk)
+    except ColdStorageProject.DoesNotExist:
+        return JsonResponse({'error': 'Project not found'}, status=404)
+
+    try:
+        hourly_temps = [finite_number(t) for t in request.POST.get('hourly_temps', '').replace(',', ' ').split()]
+        options = {
+            'bin_width': finite_number(request.POST.get('bin_width', DEFAULT_BIN_WIDTH)),
+            'evaporator_td': finite_number(request.POST.get('evaporator_td', DEFAULT_EVAPORATOR_TD)),
+            'condenser_approach': finite_number(request.POST.get('condenser_approach', DEFAULT_CONDENSER_APPROACH)),
+            'min_condenser_temp': finite_number(request.POST.get('min_condenser_temp', DEFAULT_MIN_CONDENSER_TEMP)),
+            'degradation_coefficient': finite_number(request.POST.get('degradation_coefficient',
+                                                                      DEFAULT_DEGRADATION_COEFFICIENT)),
+            'isentropic_efficiency': finite_number(request.POST.get('isentropic_efficiency', 1.0)),
+        }
+    except ValueError:
+        return JsonResponse({'error': 'hourly_temps and the seasonal options must be finite numbers'}, status=400)
+    if not 0 <= options['degradation_coefficient'] < 1:
+        return JsonResponse({'error': 'degradation_coefficient must be at least 0 and below 1'}, status=400)
+    if not 0 < options['isentropic_efficiency'] <= 1:
+        return JsonResponse({'error': 'isentropic_efficiency must be above 0 and at most 1'}, status=400)
+
+    expansion_device = request.POST.get('expansion_device', 'throttle')
+    if expansion_device not in dict(Calculation.EXPANSION_CHOICES):
+        return JsonResponse({'error': f'Unknown expansion device: {expansion_device}'}, status=400)
+
+    refrigerant = request.POST.get('refrigerant', '')
+    if not Refrigerant.objects.filter(coolprop_name=refrigerant).exists():
+        return JsonResponse({'error': f'Unknown refrigerant: {refrigerant}'}, status=404)
+
+    try:
+        return JsonResponse(seasonal_performance(project, hourly_temps, refrigerant,
+                                                 expansion_device=expansion_device, **options))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+def refrigerant_comparison(request):
+    try:
+        t_evap = finite_number(request.GET.get('evaporator_temp', -10))
+        t_cond = finite_number(request.GET.get('condenser_temp', 40))
+    except ValueError:
+        return JsonResponse({'error': 'evaporator_temp and condenser_temp must be finite numbers'}, status=400)
+
+    expansion_device = request.GET.get('expansion_device', 'throttle')
+    if expansion_device not in dict(Calculation.EXPANSION_CHOICES):
+        return JsonResponse({'error': f'Unknown expansion device: {expansion_device}'}, status=400)
+
+    return JsonResponse(compare_refrigerants(t_evap, t_cond, expansion_device))
+
+
+def multistage_comparison(request):
+    try:
+        t_evap = finite_number(request.GET.get('evaporator_temp', -35))
+        t_cond = finite_number(request.GET.get('condenser_temp', 40))
+        cascade_delta_t = finite_number(request.GET.get('cascade_delta_t', DEFAULT_CASCADE_DELTA_T))
+    except ValueError:
+        return JsonResponse({'error': 'evaporator_temp, condenser_temp and cascade_delta_t must be finite numbers'},
+                            status=400)
+
+    expansion_device = request.GET.get('expansion_device', 'throttle')
+    if expansion_device not in dict(Calculation.EXPANSION_CHOICES):
+        return JsonResponse({'error': f'Unknown expansion device: {expansion_device}'}, status=400)
+
+    return JsonResponse(compare_multistage(t_evap, t_cond, expansion_device, cascade_delta_t))
+
+
+# Largest generator x absorber grid of an absorption sweep, solved as one batch
+MAX_ABSORPTION_GRID_POINTS = 10000
+
+
+def absorption_sweep(request):
+    try:
+        t_evap = finite_number(request.GET.get('evaporator_temp', 5))
+        t_cond = finite_number(request.GET.get('condenser_temp', 40))
+        generator_temps = finite_numbers(request.GET.get('generator_temps', '70,80,90,100'))
+        absorber_temps = finite_numbers(request.GET.get('absorber_temps', '30,35,40'))
+        effectiveness = finite_number(request.GET.get('effectiveness', DEFAULT_HEAT_EXCHANGER_EFFECTIVENESS))
+    except ValueError:
+        return JsonResponse({'error': 'Temperatures and effectiveness must be finite numbers'}, status=400)
+    if not 0 <= effectiveness <= 1:
+        return JsonResponse({'error': 'effectiveness must be between 0 and 1'}, status=400)
+    if len(generator_temps) * len(absorber_temps) > MAX_ABSORPTION_GRID_POINTS:
+        return JsonResponse({'error': f'At most {MAX_ABSORPTION_GRID_POINTS} generator and absorber '
+                                      f'temperature pairs'}, status=400)
+
+    return JsonResponse(sweep_absorption(t_evap, t_cond, generator_temps, absorber_temps, effectiveness))
+
+
+def transcritical_sweep(request):
+    try:
+        t_evap = finite_number(request.GET.get('evaporator_temp', -10))
+        approach = finite_number(request.GET.get('approach', DEFAULT_APPROACH))
+        ambient_temps = finite_numbers(request.GET.get('ambient_temps', '20,25,30,35,40'))
+    except ValueError:
+        return JsonResponse({'error': 'evaporator_temp, approach and ambient_temps must be finite numbers'},
+                            status=400)
+    if len(ambient_temps) > MAX_SWEEP_POINTS:
+        return JsonResponse({'error': f'At most {MAX_SWEEP_POINTS} ambient_temps'}, status=400)
+
+    expansion_device = request.GET.get('expansion_device', 'throttle')
+    if expansion_device not in dict(Calculation.EXPANSION_CHOICES):
+        return JsonResponse({'error': f'Unknown expansion device: {expansion_device}'}, status=400)
+
+    return JsonResponse(sweep_ambient(t_evap, ambient_temps, approach, expansion_device))
+
+
+def cycle_quote(request):
+    try:
+        t_evap = finite_number(request.GET.get('evaporator_temp', -10))
+        t_cond = finite_number(request.GET.get('condenser_temp', 40))
+        max_cop_error = request.GET.get('max_cop_error')
+        max_cop_error = finite_number(max_cop_error) if max_cop_error else None
+    except ValueError:
+        return JsonResponse({'error': 'evaporator_temp, condenser_temp and max_cop_error must be finite numbers'},
+                            status=400)
+
+    expansion_device = request.GET.get('expansion_device', 'throttle')
+    if expansion_device not in dict(Calculation.EXPANSION_CHOICES):
+        return JsonResponse({'error': f'Unknown expansion device: {expansion_device}'}, status=400)
+
+    refrigerant = request.GET.get('refrigerant', '')
+    if not Refrigerant.objects.filter(coolprop_name=refrigerant).exists():
+        return JsonResponse({'error': f'Unknown refrigerant: {refrigerant}'}, status=404)
+
+    exact = request.GET.get('exact') in ('1', 'true')
+    return JsonResponse(quote(refrigerant, t_evap, t_cond, expansion_device, exact, max_cop_error))
+
+
+def compressor_selection(request):
+    try:
+        t_evap = finite_number(request.GET.get('evaporator_temp', -10))
+        t_cond = finite_number(request.GET.get('condenser_temp', 40))
+        capacity = finite_number(request.GET.get('capacity', 0))
+        max_oversize = request.GET.get('max_oversize')
+        max_oversize = finite_number(max_oversize) if max_oversize else None
+    except ValueError:
+        return JsonResponse({'error': 'evaporator_temp, condenser_temp, capacity and max_oversize must be finite '
+                                      'numbers'}, status=400)
+
+    expansion_device = request.GET.get('expansion_device', 'throttle')
+    if expansion_device not in dict(Calculation.EXPANSION_CHOICES):
+        return JsonResponse({'error': f'Unknown expansion device: {expansion_device}'}, status=400)
+
+    refrigerant = request.GET.get('refrigerant') or None
+    if refrigerant is not None and not Refrigerant.objects.filter(coolprop_name=refrigerant).exists():
+        return JsonResponse({'error': f'Unknown refrigerant: {refrigerant}'}, status=404)
+
+    return JsonResponse(select_compressors(t_evap, t_cond, capacity, refrigerant, expansion_device, max_oversize))
+
+
+def compressor_envelope_map(request, pk):
+    try:
+        compressor = Compressor.objects.select_related('refrigerant').get(pk=pk)
+    except Compressor.DoesNotExist:
+        return JsonResponse({'error': 'Compressor not found'}, status=404)
+
+    try:
+        step = finite_number(request.GET.get('step', DEFAULT_ENVELOPE_STEP))
+    except ValueError:
+        return JsonResponse({'error': 'step must be a finite number'}, status=400)
+    if step <= 0:
+        return JsonResponse({'error': 'step must be positive'}, status=400)
+
+    expansion_device = request.GET.get('expansion_device', 'throttle')
+    if expansion_device not in dict(Calculation.EXPANSION_CHOICES):
+        return JsonResponse({'error': f'Unknown expansion device: {expansion_device}'}, status=400)
+
+    try:
+        return JsonResponse(compressor_envelope(compressor, step, expansion_device))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+def inverse_design(request):
+    """Operating temperatures or compressor efficiency meeting a batch of target results"""
+    def optional_number(name):
+        value = request.GET.get(name)
+        return finite_number(value) if value else None
+
+    try:
+        values = finite_numbers(request.GET.get('values', ''))
+        t_evap = optional_number('evaporator_temp')
+        t_cond = optional_number('condenser_temp')
+        isentropic_efficiency = finite_number(request.GET.get('isentropic_efficiency', 1.0))
+    except ValueError:
+        return JsonResponse({'error': 'values, temperatures and isentropic_efficiency must be finite numbers'},
+                            status=400)
+
+    expansion_device = request.GET.get('expansion_device', 'throttle')
+    if expansion_device not in dict(Calculation.EXPANSION_CHOICES):
+        return JsonResponse({'error': f'Unknown expansion device: {expansion_device}'}, status=400)
+
+    refrigerant = request.GET.get('refrigerant', '')
+    if not Refrigerant.objects.filter(coolprop_name=refrigerant).exists():
+        return JsonResponse({'error': f'Unknown refrigerant: {refrigerant}'}, status=404)
+
+    try:
+        return JsonResponse(solve_design(refrigerant, request.GET.get('target', 'cop'), values,
+                                         request.GET.get('solve_for', 'evaporator_temp'), t_evap, t_cond,
+                                         isentropic_efficiency, expansion_device))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+def negotiate_image_format(request) -> str:
+    """Pick WebP for browsers that accept it and PNG otherwise"""
+    accept = request.headers.get('Accept', '')
+    return 'webp' if 'image/webp' in accept else 'png'
+
+
+def calculation_diagram_image(request, pk, diagram_type, fmt=None):
+    if diagram_type not in DIAGRAM_TYPES:
+        return JsonResponse({'error': f'Unknown diagram type: {diagram_type}'}, status=404)
+    negotiated = fmt is None
+    fmt = fmt or negotiate_image_format(request)
+    if fmt not in IMAGE_FORMATS:
+        return JsonResponse({'error': f'Unknown image format: {fmt}'}, status=404)
+
+    try:
+        dpi = int(request.GET.get('dpi', settings.DIAGRAM_DEFAULT_DPI))
+    except ValueError:
+        return JsonResponse({'error': 'dpi must be an integer'}, status=400)
+    if dpi not in settings.DIAGRAM_DPI_CHOICES:
+        return JsonResponse({'error': f'dpi must be one of {settings.DIAGRAM_DPI_CHOICES}'}, status=400)
+
+    try:
+        calculation = Calculation.objects.select_related('refrigerant').get(pk=pk)
+    except Calculation.DoesNotExist:
+        return JsonResponse({'error': 'Calculation not found'}, status=404)
+
+    etag = f'"{diagram_name(calculation, diagram_type, fmt, dpi)}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        try:
+            name = stored_diagram(calculation, diagram_type, fmt, dpi)
         except Exception as e:
-            print(f"Diagram generation error: {e}")
-            context['diagram_error'] = str(e)
-
-        return context
+            logger.exception("Diagram generation error for calculation %s (%s)", calculation.pk, diagram_type)
+            DIAGRAM_ERROR_IMAGES.labels(diagram_type).inc()
+            content = ThermodynamicDiagrams(calculation.refrigerant.coolprop_name).render_error_image(
+                f"{diagram_type} Diagram Error: {str(e)}", fmt, dpi)
+            response = HttpResponse(content, content_type=IMAGE_FORMATS[fmt])
+            patch_cache_control(response, no_store=True)
+            return response
+        response = FileResponse(default_storage.open(name), content_type=IMAGE_FORMATS[fmt])
+        response['ETag'] = etag
+
+    patch_cache_control(response, public=True, max_age=settings.DIAGRAM_CACHE_MAX_AGE)
+    if negotiated:
+        patch_vary_headers(response, ['Accept'])
+    return response
+
+
+# Largest number of calculations overlaid on one comparison diagram
+MAX_COMPARED_CALCULATIONS = 8
+
+
+def calculation_comparison_diagram(request, diagram_type, fmt):
+    if diagram_type not in COMPARISON_TYPES:
+        return JsonResponse({'error': f'Unknown comparison diagram type: {diagram_type}'}, status=404)
+    if fmt not in IMAGE_FORMATS:
+        return JsonResponse({'error': f'Unknown image format: {fmt}'}, status=404)
+
+    try:
+        ids = [int(value) for values in request.GET.getlist('ids') for value in values.split(',') if value]
+        dpi = int(request.GET.get('dpi', settings.DIAGRAM_DEFAULT_DPI))
+    except ValueError:
+        return JsonResponse({'error': 'ids and dpi must be integers'}, status=400)
+    ids = list(dict.fromkeys(ids))
+    if not 1 <= len(ids) <= MAX_COMPARED_CALCULATIONS:
+        return JsonResponse({'error': f'Select between 1 and {MAX_COMPARED_CALCULATIONS} calculations'}, status=400)
+    if dpi not in settings.DIAGRAM_DPI_CHOICES:
+        return JsonResponse({'error': f'dpi must be one of {settings.DIAGRAM_DPI_CHOICES}'}, status=400)
+
+    calculations = Calculation.objects.select_related('refrigerant').in_bulk(ids)
+    missing = [pk for pk in ids if pk not in calculations]
+    if missing:
+        return JsonResponse({'error': f'Calculations not found: {missing}'}, status=404)
+
+    state_points = {pk: [] for pk in ids}
+    for point in StatePoint.objects.filter(calculation_id__in=ids).order_by('point_number'):
+        state_points[point.calculation_id].append(state_point_dict(point))
+
+    cycles = [{
+        'label': f'#{pk} {calculations[pk].refrigerant.name} '
+                 f'{calculations[pk].evaporator_temp:g}/{calculations[pk].condenser_temp:g}°C',
+        'refrigerant': calculations[pk].refrigerant.coolprop_name,
+        'state_points': state_points[pk],
+    } for pk in ids]
+
+    try:
+        content = render_comparison(diagram_type, cycles, fmt, dpi)
+    except Exception as e:
+        # Counted by render_comparison
+        logger.warning("Comparison diagram error for calculations %s: %s", ids, e)
+        return JsonResponse({'error': str(e)}, status=400)
+
+    response = HttpResponse(content, content_type=IMAGE_FORMATS[fmt])
+    patch_cache_control(response, public=True, max_age=settings.DIAGRAM_CACHE_MAX_AGE)
+    return response
+
+
+def busy_response() -> JsonResponse:
+    response = JsonResponse({'error': 'Server is busy, please retry shortly'}, status=503)
+    response['Retry-After'] = '5'
+    return response
+
+
+def calculation_created_response(calculation, reused: bool):
+    """JSON for a submitted calculation, 201 when it was newly solved and 200 when an identical one was reused"""
+    data = {
+        'id': calculation.pk,
+        'cop': calculation.cop,
+        'cooling_capacity': calculation.cooling_capacity,
+        'reused': reused,
+        'detail_url': reverse('calculation_detail', args=[calculation.pk]),
+    }
+    if calculation.compressor_power is not None:
+        data['compressor'] = {
+            'id': calculation.compressor_id,
+            'mass_flow': calculation.mass_flow,  # kg/s
+            'capacity': calculation.compressor_capacity,  # kW
+            'power': calculation.compressor_power,  # kW
+            'cop': calculation.compressor_cop,
+            'inside_envelope': calculation.inside_envelope,
+        }
+    return JsonResponse(data, status=200 if reused else 201)
+
+
+async def calculate_async(request):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+
+    form_class = modelform_factory(Calculation, fields=CalculationCreateView.fields)
+    form = form_class(request.POST)
+    if not await sync_to_async(form.is_valid)():
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    calculation = form.save(commit=False)
+    existing = await afind_solved(calculation)
+    if existing is not None:
+        return calculation_created_response(existing, reused=True)
+
+    try:
+        solution = await run_offloaded(partial(solve_calculation, **calculation_inputs(calculation)))
+    except ExecutorBusy:
+        return busy_response()
+    except Exception as e:
+        return JsonResponse({'error': f'Calculation error: {e}'}, status=400)
+
+    calculation, reused = await sync_to_async(store_solved)(calculation, solution)
+    return calculation_created_response(calculation, reused)
+
+
+async def calculation_diagrams_async(request, pk):
+    try:
+        calculation = await Calculation.objects.select_related('refrigerant').aget(pk=pk)
+    except Calculation.DoesNotExist:
+        return JsonResponse({'error': 'Calculation not found'}, status=404)
+
+    state_points = [
+        state_point_dict(point)
+        async for point in StatePoint.objects.filter(calculation=calculation).order_by('point_number')
+    ]
+    try:
+        # Fans the diagrams out to the process pool from a worker thread
+        diagrams = await run_offloaded(render_diagrams_parallel, calculation.refrigerant.coolprop_name,
+                                       state_points, settings.DIAGRAM_FAST_RENDERING)
+    except ExecutorBusy:
+        return busy_response()
+
+    return JsonResponse({'id': calculation.pk, **diagrams})